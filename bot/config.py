@@ -19,6 +19,8 @@ class Config:
     MAX_ACTIVE_QUIZZES_PER_GROUP: int = int(os.getenv('MAX_ACTIVE_QUIZZES_PER_GROUP', '2'))
     MAX_ACTIVE_QUIZZES_PER_USER_IN_GROUP: int = int(os.getenv('MAX_ACTIVE_QUIZZES_PER_USER_IN_GROUP', '1'))
     MAX_ACTIVE_QUIZZES_PER_USER_PRIVATE: int = int(os.getenv('MAX_ACTIVE_QUIZZES_PER_USER_PRIVATE', '3'))  # Shaxsiy chatda limit
+    # Due sessionlarni tekshiruvchi fon sweep intervali (sekund)
+    SESSION_SWEEP_INTERVAL: int = int(os.getenv('SESSION_SWEEP_INTERVAL', '5'))
     
     # ==================== FILE VALIDATION / LIMITS ====================
     MIN_QUESTIONS_REQUIRED: int = int(os.getenv('MIN_QUESTIONS_REQUIRED', '2'))
@@ -26,10 +28,33 @@ class Config:
     TARGET_QUESTIONS_PER_QUIZ: int = int(os.getenv('TARGET_QUESTIONS_PER_QUIZ', '50'))
     MAX_TEXT_CHARS_FOR_AI: int = int(os.getenv('MAX_TEXT_CHARS_FOR_AI', '35000'))
     REQUIRE_CORRECT_ANSWER: bool = os.getenv('REQUIRE_CORRECT_ANSWER', '1').strip() not in ['0', 'false', 'False']
+    # PDF/DOCX matnini alohida process'larda ajratish (0 worker - event loop ichida)
+    FILE_EXTRACT_WORKERS: int = int(os.getenv('FILE_EXTRACT_WORKERS', '2'))
+    FILE_EXTRACT_TIMEOUT: float = float(os.getenv('FILE_EXTRACT_TIMEOUT', '60'))
+    FILE_EXTRACT_MAX_MEMORY_MB: int = int(os.getenv('FILE_EXTRACT_MAX_MEMORY_MB', '1024'))
+    # Fayldan olinadigan matn chegarasi (~500 savol * 600 belgi); yetgach qolgan sahifalar o'qilmaydi (0 - cheksiz)
+    FILE_MAX_TEXT_CHARS: int = int(os.getenv('FILE_MAX_TEXT_CHARS', '300000'))
+    # Fayl tahlil navbati: bir vaqtda tahlil qilinadigan fayllar va navbatdagi fayllar umumiy hajmi (MB, 0 - cheksiz)
+    INGEST_WORKERS: int = int(os.getenv('INGEST_WORKERS', '3'))
+    INGEST_MAX_QUEUED_MB: int = int(os.getenv('INGEST_MAX_QUEUED_MB', '200'))
+    # Tugallanmagan fayl tahlillari restart'dan keyin davom ettiriladi: urinishlar soni va eng katta yoshi (soat)
+    FILE_JOB_MAX_ATTEMPTS: int = int(os.getenv('FILE_JOB_MAX_ATTEMPTS', '3'))
+    FILE_JOB_MAX_AGE_HOURS: int = int(os.getenv('FILE_JOB_MAX_AGE_HOURS', '24'))
     
     # ==================== AI TIMEOUTS ====================
     MAX_AI_SECONDS: int = int(os.getenv('MAX_AI_SECONDS', '180'))
     MAX_CONCURRENT_AI_REQUESTS: int = int(os.getenv('MAX_CONCURRENT_AI_REQUESTS', '2'))
+    # AI API uchun umumiy HTTP client (connection pool, keep-alive, HTTP/2)
+    AI_HTTP_MAX_CONNECTIONS: int = int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '10'))
+    AI_HTTP_MAX_KEEPALIVE: int = int(os.getenv('AI_HTTP_MAX_KEEPALIVE', '5'))
+    AI_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv('AI_HTTP_KEEPALIVE_EXPIRY', '60'))
+    AI_HTTP_CONNECT_TIMEOUT: float = float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', '10'))
+    AI_HTTP2: bool = os.getenv('AI_HTTP2', '1').strip() in ['1', 'true', 'True']
+    # AI natijalari cache'i (data/ai_cache.sqlite3, LRU; 0 - o'chirilgan)
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv('AI_CACHE_MAX_ENTRIES', '5000'))
+    AI_CACHE_PATH: str = os.getenv('AI_CACHE_PATH', '')
+    # Savollarni ajratishda javobni SSE oqimi bilan olish (tayyor savollar timeout'da ham saqlanadi)
+    AI_STREAMING: bool = os.getenv('AI_STREAMING', '1').strip() in ['1', 'true', 'True']
     
     # ==================== ANSWER KEY ====================
     ANSWER_KEY_TAIL_CHARS: int = int(os.getenv('ANSWER_KEY_TAIL_CHARS', '12000'))
@@ -80,6 +105,21 @@ class Config:
     VOTING_MIN_VOTES_TO_STOP: int = int(os.getenv('VOTING_MIN_VOTES_TO_STOP', '3'))  # Minimum ovozlar quizni to'xtatish uchun
     VOTING_TIMEOUT_SECONDS: int = int(os.getenv('VOTING_TIMEOUT_SECONDS', '60'))  # Voting poll muddati
     
+    # ==================== TELEGRAM EGRESS (RATE LIMIT) ====================
+    # Umumiy limit (xabar/s), guruh uchun (xabar/daqiqa), private chat uchun (xabar/s va burst)
+    EGRESS_GLOBAL_PER_SECOND: float = float(os.getenv('EGRESS_GLOBAL_PER_SECOND', '30'))
+    EGRESS_GROUP_PER_MINUTE: float = float(os.getenv('EGRESS_GROUP_PER_MINUTE', '20'))
+    EGRESS_PRIVATE_PER_SECOND: float = float(os.getenv('EGRESS_PRIVATE_PER_SECOND', '1'))
+    EGRESS_PRIVATE_BURST: int = int(os.getenv('EGRESS_PRIVATE_BURST', '3'))
+    # RetryAfter (flood control) bo'lganda qayta urinishlar soni
+    EGRESS_MAX_RETRIES: int = int(os.getenv('EGRESS_MAX_RETRIES', '3'))
+    
+    # ==================== BROADCAST ====================
+    # Parallel yuborish / guruh tekshiruvi worker'lari (tezlikni egress scheduler cheklaydi)
+    BROADCAST_CONCURRENCY: int = int(os.getenv('BROADCAST_CONCURRENCY', '20'))
+    # Shundan eski yakunlanmagan broadcast restart'dan keyin davom ettirilmaydi (soat)
+    BROADCAST_MAX_AGE_HOURS: int = int(os.getenv('BROADCAST_MAX_AGE_HOURS', '24'))
+    
     # ==================== WEBHOOK SETTINGS ====================
     USE_WEBHOOK: bool = os.getenv('USE_WEBHOOK', '0').strip() in ['1', 'true', 'True']
     WEBHOOK_URL: str = os.getenv('WEBHOOK_URL', '')
@@ -100,6 +140,22 @@ class Config:
     DB_USE_POOL: bool = os.getenv('DB_USE_POOL', '1').strip() in ['1', 'true', 'True']  # Default: Pool ishlatish
     DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', '10'))  # Default: 10 connection
     DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', '20'))  # Default: 20 additional connections
+    # Async storage executor (blocking DB chaqiruvlari event loop'dan tashqarida bajariladi)
+    DB_EXECUTOR_WORKERS: int = int(os.getenv('DB_EXECUTOR_WORKERS', os.getenv('DB_POOL_SIZE', '10')))
+    # Quiz cache (get_quiz natijalari xotirada saqlanadi, 0 - o'chirilgan)
+    QUIZ_CACHE_SIZE: int = int(os.getenv('QUIZ_CACHE_SIZE', '256'))
+    QUIZ_CACHE_TTL: int = int(os.getenv('QUIZ_CACHE_TTL', '600'))  # sekund
+    # User/guruh tracking write-behind buffer: flush intervali va last_seen oynasi (sekund)
+    ACTIVITY_FLUSH_INTERVAL: int = int(os.getenv('ACTIVITY_FLUSH_INTERVAL', '15'))
+    LAST_SEEN_WINDOW: int = int(os.getenv('LAST_SEEN_WINDOW', '300'))
+    # Sudo/VIP/premium xotira indeksini DB'dan qayta yuklash intervali (sekund, 0 - o'chirilgan)
+    ROLE_INDEX_REFRESH_INTERVAL: int = int(os.getenv('ROLE_INDEX_REFRESH_INTERVAL', '300'))
+    # Majburiy obuna: kanallar ro'yxati cache'i va a'zolik tekshiruvi natijalari (sekund)
+    REQUIRED_CHANNELS_CACHE_TTL: int = int(os.getenv('REQUIRED_CHANNELS_CACHE_TTL', '300'))
+    CHANNEL_MEMBER_CACHE_TTL: int = int(os.getenv('CHANNEL_MEMBER_CACHE_TTL', '600'))
+    CHANNEL_NON_MEMBER_CACHE_TTL: int = int(os.getenv('CHANNEL_NON_MEMBER_CACHE_TTL', '30'))
+    # Bot persistence (data/bot_persistence.sqlite3) flush intervali (sekund)
+    PERSISTENCE_UPDATE_INTERVAL: int = int(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '60'))
     
     # ==================== EMAIL SETTINGS (Gmail) ====================
     GMAIL_SMTP_SERVER: str = os.getenv('GMAIL_SMTP_SERVER', 'smtp.gmail.com')
@@ -5,7 +5,8 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from bot.models import storage
+from bot.models import async_storage
+from bot.models.persistence import mark_dirty
 from bot.utils.helpers import (
     track_update, is_admin_user, collect_known_group_ids, safe_edit_text,
     admin_only, admin_or_sudo, reply_or_edit, get_webhook_status, get_chat_title_cached
@@ -64,15 +65,15 @@ def _calculate_quiz_stats(all_quizzes: list, now: datetime) -> tuple[int, int, i
 async def show_admin_menu(update_or_query, context: ContextTypes.DEFAULT_TYPE, as_edit: bool):
     """Admin menyusini ko'rsatish"""
     # Asosiy statistikalar
-    quizzes_count = storage.get_quizzes_count()
-    results_count = storage.get_results_count()
-    users_count = storage.get_users_count()
-    groups_count = storage.get_groups_count()
+    quizzes_count = await async_storage.get_quizzes_count()
+    results_count = await async_storage.get_results_count()
+    users_count = await async_storage.get_users_count()
+    groups_count = await async_storage.get_groups_count()
     sessions = context.bot_data.get('sessions', {}) or {}
     active_sessions = sum(1 for s in sessions.values() if s.get('is_active', False))
     
     # Quiz statistikalarini hisoblash (cache qilinishi mumkin, lekin hozircha oddiy)
-    all_quizzes = storage.get_all_quizzes()
+    all_quizzes = await async_storage.get_all_quizzes()
     quizzes_today, quizzes_this_week, quizzes_this_month = _calculate_quiz_stats(all_quizzes, datetime.now())
     
     # User ID va huquqlar
@@ -124,7 +125,7 @@ async def _admin_gq_get_title(context: ContextTypes.DEFAULT_TYPE, gid: int) -> s
 
 async def _admin_gq_show_groups(message, context: ContextTypes.DEFAULT_TYPE):
     """Guruhlar ro'yxati"""
-    group_ids = list(collect_known_group_ids(context))
+    group_ids = list(await collect_known_group_ids(context))
     if not group_ids:
         keyboard = [[InlineKeyboardButton("⬅️ Admin", callback_data="admin_menu")]]
         await safe_edit_text(
@@ -145,7 +146,7 @@ async def _admin_gq_show_groups(message, context: ContextTypes.DEFAULT_TYPE):
         title = await _admin_gq_get_title(context, gid)
         allowed_count = 0
         try:
-            allowed_count = len(storage.get_group_allowed_quiz_ids(gid))
+            allowed_count = len(await async_storage.get_group_allowed_quiz_ids(gid))
         except Exception:
             allowed_count = 0
         mode = "ON" if allowed_count > 0 else "OFF"
@@ -163,7 +164,7 @@ async def _admin_gq_show_groups(message, context: ContextTypes.DEFAULT_TYPE):
 async def _admin_gq_show_group_menu(message, context: ContextTypes.DEFAULT_TYPE, gid: int):
     """Guruh menyu"""
     title = await _admin_gq_get_title(context, gid)
-    allowed_ids = storage.get_group_allowed_quiz_ids(gid)
+    allowed_ids = await async_storage.get_group_allowed_quiz_ids(gid)
     mode = "ON" if allowed_ids else "OFF"
     text = (
         f"🎛 **Guruh quizlari**\n\n"
@@ -187,7 +188,7 @@ async def _admin_gq_show_group_menu(message, context: ContextTypes.DEFAULT_TYPE,
 async def _admin_gq_show_allowed_list(message, context: ContextTypes.DEFAULT_TYPE, gid: int, page: int = 0):
     """Tanlangan quizlar ro'yxati"""
     title = await _admin_gq_get_title(context, gid)
-    allowed_ids = storage.get_group_allowed_quiz_ids(gid)
+    allowed_ids = await async_storage.get_group_allowed_quiz_ids(gid)
     rows = []
     keyboard = []
     if not allowed_ids:
@@ -203,7 +204,7 @@ async def _admin_gq_show_allowed_list(message, context: ContextTypes.DEFAULT_TYP
         page_ids = allowed_ids[start_idx:end_idx]
         
         for qid in page_ids:
-            quiz = storage.get_quiz(qid)
+            quiz = await async_storage.get_quiz(qid)
             if not quiz:
                 continue
             qtitle = (quiz.get('title') or qid)[:28]
@@ -236,7 +237,7 @@ async def _admin_gq_show_allowed_list(message, context: ContextTypes.DEFAULT_TYP
 async def _admin_gq_show_pick_latest(message, context: ContextTypes.DEFAULT_TYPE, gid: int, page: int = 0):
     """Oxirgi quizlardan tanlash"""
     title = await _admin_gq_get_title(context, gid)
-    all_quizzes = storage.get_all_quizzes()
+    all_quizzes = await async_storage.get_all_quizzes()
     all_quizzes.sort(key=lambda q: q.get('created_at', ''), reverse=True)
     
     QUIZZES_PER_PAGE = 10
@@ -280,10 +281,10 @@ async def _admin_gq_show_pick_latest(message, context: ContextTypes.DEFAULT_TYPE
 @admin_only
 async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin statistika"""
-    quizzes_count = storage.get_quizzes_count()
-    results_count = storage.get_results_count()
-    users_count = storage.get_users_count()
-    groups_count = storage.get_groups_count()
+    quizzes_count = await async_storage.get_quizzes_count()
+    results_count = await async_storage.get_results_count()
+    users_count = await async_storage.get_users_count()
+    groups_count = await async_storage.get_groups_count()
     sessions = context.bot_data.get('sessions', {}) or {}
     active_sessions = sum(1 for s in sessions.values() if s.get('is_active', False))
 
@@ -324,7 +325,7 @@ async def admin_quizzes_command(update: Update, context: ContextTypes.DEFAULT_TY
 async def admin_users_command(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0):
     """Admin foydalanuvchilar ro'yxati (pagination bilan)"""
     
-    users = storage.get_users()
+    users = await async_storage.get_users()
     USERS_PER_PAGE = 15
     total_users = len(users)
     total_pages = (total_users + USERS_PER_PAGE - 1) // USERS_PER_PAGE if total_users > 0 else 1
@@ -369,7 +370,7 @@ async def admin_groups_command(update: Update, context: ContextTypes.DEFAULT_TYP
     """Admin guruhlar ro'yxati"""
     
     bot_id = context.bot.id
-    group_ids = list(collect_known_group_ids(context))
+    group_ids = list(await collect_known_group_ids(context))
     if not group_ids:
         keyboard = [[InlineKeyboardButton("⬅️ Admin", callback_data="admin_menu")]]
         text = (
@@ -405,7 +406,7 @@ async def admin_groups_command(update: Update, context: ContextTypes.DEFAULT_TYP
             status = "no-access"
 
         try:
-            storage.track_group(chat_id=gid, title=title, chat_type=chat_type, bot_status=status, bot_is_admin=is_admin)
+            await async_storage.track_group(chat_id=gid, title=title, chat_type=chat_type, bot_status=status, bot_is_admin=is_admin)
         except Exception:
             pass
 
@@ -445,6 +446,7 @@ async def admin_cleanup_command(update: Update, context: ContextTypes.DEFAULT_TY
     
     cleared_locks = len(group_locks)
     group_locks.clear()
+    mark_dirty(context.bot_data, 'group_locks')
     
     keyboard = [[InlineKeyboardButton("⬅️ Admin", callback_data="admin_menu")]]
     text = f"🧹 Tozalandi.\n\nSession yopildi: {cleared_sessions}\nLock: {cleared_locks}"
@@ -454,7 +456,7 @@ async def admin_cleanup_command(update: Update, context: ContextTypes.DEFAULT_TY
 @admin_only
 async def admin_sudo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin sudo userlar"""
-    sudo_users = storage.get_sudo_users()
+    sudo_users = await async_storage.get_sudo_users()
     text = "🛡 **Sudo userlar:**\n\n"
     if not sudo_users:
         text += "📭 Sudo userlar yo'q."
@@ -470,7 +472,7 @@ async def admin_sudo_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 @admin_only
 async def admin_vip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin VIP userlar"""
-    vip_users = storage.get_vip_users()
+    vip_users = await async_storage.get_vip_users()
     text = "⭐ **VIP userlar:**\n\n"
     if not vip_users:
         text += "📭 VIP userlar yo'q."
@@ -492,7 +494,7 @@ async def admin_vip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @admin_only
 async def admin_channels_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin majburiy obuna kanallari"""
-    channels = storage.get_required_channels()
+    channels = await async_storage.get_required_channels()
     text = "📢 **Majburiy obuna kanallari**\n\n"
     
     if not channels:
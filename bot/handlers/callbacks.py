@@ -1,18 +1,18 @@
 """Callback va poll handlerlar"""
 import time
-import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from bot.config import Config
-from bot.models import storage
+from bot.models import async_storage, activity_buffer
 from bot.utils.helpers import (
     track_update, is_admin_user, is_sudo_user,
     safe_edit_text, TIME_OPTIONS
 )
-from bot.services.quiz_service import start_quiz_session, send_quiz_question, advance_due_sessions
+from bot.services.quiz_service import start_quiz_session, send_quiz_question
+from bot.services.broadcast import KIND_GROUPS, KIND_USERS, start_broadcast
 from bot.handlers.admin import (
     show_admin_menu, _admin_gq_show_groups, _admin_gq_show_group_menu,
     _admin_gq_show_allowed_list, _admin_gq_show_pick_latest
@@ -26,11 +26,10 @@ async def poll_answer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     try:
         if update.poll_answer and update.poll_answer.user:
             u = update.poll_answer.user
-            storage.track_user(user_id=u.id, username=getattr(u, "username", None), first_name=getattr(u, "first_name", None), last_name=getattr(u, "last_name", None))
+            activity_buffer.track_user(user_id=u.id, username=getattr(u, "username", None), first_name=getattr(u, "first_name", None), last_name=getattr(u, "last_name", None))
     except Exception:
         pass
     
-    await advance_due_sessions(context)
     poll_answer = update.poll_answer
     user_id = poll_answer.user.id
     poll_id = poll_answer.poll_id
@@ -56,44 +55,21 @@ async def poll_answer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     logger.info(f"Poll info: quiz_id={quiz_id}, q_index={question_index}, session_key={session_key}, chat_id={chat_id}")
     
-    if 'sessions' not in context.bot_data:
-        context.bot_data['sessions'] = {}
-    
-    if session_key not in context.bot_data['sessions']:
+    session = context.bot_data.get('sessions', {}).get(session_key)
+    if session is None:
         logger.warning(f"Session {session_key} not found in bot_data")
         return
     
-    # Save answer
-    if 'answers' not in context.bot_data['sessions'][session_key]:
-        context.bot_data['sessions'][session_key]['answers'] = {}
-    
-    if 'user_answers' not in context.bot_data['sessions'][session_key]:
-        context.bot_data['sessions'][session_key]['user_answers'] = {}
-    
-    if user_id not in context.bot_data['sessions'][session_key]['user_answers']:
-        context.bot_data['sessions'][session_key]['user_answers'][user_id] = {}
-    
-    context.bot_data['sessions'][session_key]['user_answers'][user_id][question_index] = selected_option
-    context.bot_data['sessions'][session_key]['answers'][question_index] = selected_option
+    # Javobni va javob vaqtini saqlash (savol yuborilgan vaqtdan hisoblanadi)
+    import time
+    answer_time = session.record_answer(user_id, question_index, selected_option, time.time())
+    if answer_time is not None:
+        logger.info(f"Answer time saved: user={user_id}, q_index={question_index}, time={answer_time:.2f}s")
     
     # Javob berilganligini belgilash (pauza uchun)
-    context.bot_data['sessions'][session_key]['last_answered_question'] = question_index
+    session.last_answered_question = question_index
     # Consecutive counter'ni reset qilish
-    context.bot_data['sessions'][session_key]['consecutive_no_answers'] = 0
-    
-    # Vaqtni hisoblash va saqlash
-    import time
-    current_time = time.time()
-    question_times = context.bot_data['sessions'][session_key].get('question_times', {})
-    if question_index in question_times:
-        sent_at = question_times[question_index].get('sent_at')
-        if sent_at:
-            answer_time = current_time - sent_at  # soniyalarda
-            # Har bir user uchun vaqtni saqlash
-            if 'user_times' not in question_times[question_index]:
-                question_times[question_index]['user_times'] = {}
-            question_times[question_index]['user_times'][user_id] = answer_time
-            logger.info(f"Answer time saved: user={user_id}, q_index={question_index}, time={answer_time:.2f}s")
+    session.consecutive_no_answers = 0
     
     logger.info(f"Answer saved: user={user_id}, q_index={question_index}, selected={selected_option}")
 
@@ -103,7 +79,7 @@ async def poll_answer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     except Exception:
         starter_id = None
 
-    sess = context.bot_data['sessions'].get(session_key, {})
+    sess = session
     if starter_id is not None and user_id == starter_id and sess.get('is_active', False) and sess.get('chat_type') == 'private':
         # Pauzada bo'lsa, early advance qilmaymiz
         if sess.get('is_paused', False):
@@ -112,11 +88,12 @@ async def poll_answer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         current_q = sess.get('current_question', 0)
         if current_q == question_index:
-            # Quiz yakunlanganligini tekshirish
-            quiz = storage.get_quiz(quiz_id)
+            # Quiz yakunlanganligini tekshirish (session snapshot'idan)
+            from bot.services.quiz_snapshot import get_session_snapshot
+            quiz = await get_session_snapshot(sess, quiz_id)
             if not quiz:
                 return
-            questions = quiz.get('questions', [])
+            questions = quiz.questions
             
             next_idx = question_index + 1
             
@@ -139,7 +116,9 @@ async def poll_answer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             except Exception as e:
                 logger.warning(f"stop_poll failed: {e}")
 
-            # Keyingi savolga o'tish - auto_next ni cancel qilish uchun current_question ni yangilaymiz
+            # Keyingi savolga o'tish - rejalashtirilgan auto_next'ni bekor qilamiz
+            from bot.services.question_scheduler import question_scheduler
+            question_scheduler.cancel(session_key)
             sess['current_question'] = next_idx
             sess['next_due_at'] = time.time() + 10.0
             sess['consecutive_no_answers'] = 0  # Reset counter
@@ -154,7 +133,6 @@ async def poll_answer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Callback handler"""
     track_update(update)
-    await advance_due_sessions(context)
     query = update.callback_query
     await query.answer()
     
@@ -203,9 +181,9 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parts = data.replace("admin_gq_addid_", "").split("_", 1)
             gid = int(parts[0])
             quiz_id = parts[1]
-            quiz = storage.get_quiz(quiz_id)
+            quiz = await async_storage.get_quiz(quiz_id)
             if quiz:
-                storage.add_group_allowed_quiz(gid, quiz_id)
+                await async_storage.add_group_allowed_quiz(gid, quiz_id)
                 await query.answer(f"✅ Quiz qo'shildi: {quiz.get('title', quiz_id)[:20]}", show_alert=True)
             await _admin_gq_show_pick_latest(query.message, context, gid, 0)
             return
@@ -214,14 +192,14 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parts = data.replace("admin_gq_rm_", "").split("_", 1)
             gid = int(parts[0])
             quiz_id = parts[1]
-            storage.remove_group_allowed_quiz(gid, quiz_id)
+            await async_storage.remove_group_allowed_quiz(gid, quiz_id)
             await query.answer("✅ Olib tashlandi")
             await _admin_gq_show_allowed_list(query.message, context, gid, 0)
             return
 
         if data.startswith("admin_gq_off_"):
             gid = int(data.replace("admin_gq_off_", ""))
-            storage.set_group_allowed_quiz_ids(gid, [])
+            await async_storage.set_group_allowed_quiz_ids(gid, [])
             await query.answer("✅ Filtr o'chirildi")
             await _admin_gq_show_group_menu(query.message, context, gid)
             return
@@ -277,7 +255,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except Exception as e:
                 logger.error(f"admin_users_command error: {e}", exc_info=True)
                 # Fallback: to'g'ridan-to'g'ri edit qilish
-                users = storage.get_users()
+                users = await async_storage.get_users()
                 text = "👤 **Bot foydalanuvchilari (oxirgilar):**\n\n"
                 if not users:
                     text += "Hali userlar yo'q."
@@ -388,7 +366,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         if data == "admin_channel_remove":
-            channels = storage.get_required_channels()
+            channels = await async_storage.get_required_channels()
             if not channels:
                 await query.answer("📭 Kanallar yo'q.", show_alert=True)
                 return
@@ -414,7 +392,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if data.startswith("remove_channel_"):
             channel_id = int(data.replace("remove_channel_", ""))
-            success = storage.remove_required_channel(channel_id)
+            success = await async_storage.remove_required_channel(channel_id)
             
             if success:
                 await query.answer("✅ Kanal o'chirildi.")
@@ -519,115 +497,13 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Chat ID ni olish
             chat_id = query.message.chat.id if query.message and query.message.chat else query.from_user.id
             
-            sent = 0
-            failed = 0
             logger.info(f"Broadcast starting: action={admin_action}, text_length={len(pending_text) if pending_text else 0}")
+            context.user_data.pop('admin_action', None)
+            context.user_data.pop('admin_pending_text', None)
             
-            if admin_action == "broadcast_users":
-                users = storage.get_users()
-                # Barcha userlarga yuborish - private chatlarga yuborishga harakat qilamiz
-                # last_chat_type None yoki group bo'lishi mumkin, lekin private chatga yuborish mumkin
-                targets = []
-                for u in users:
-                    user_id = int(u.get('user_id', 0))
-                    if user_id > 0:  # Valid user_id
-                        # last_chat_type 'private' bo'lsa yoki None bo'lsa (private chatga yuborish mumkin)
-                        if u.get('last_chat_type') in ['private', None] or u.get('last_chat_id') == user_id:
-                            targets.append(user_id)
-                    if len(targets) >= 2000:  # Limit
-                        break
-                logger.info(f"Broadcast users: found {len(users)} total users, {len(targets)} target users for broadcast")
-            else:
-                bot_id = context.bot.id
-                groups = storage.get_groups()
-                targets = []
-                for g in groups:
-                    gid = int(g['chat_id'])
-                    try:
-                        m = await context.bot.get_chat_member(gid, bot_id)
-                        if m.status in ['administrator', 'creator']:
-                            targets.append(gid)
-                    except Exception as e:
-                        logger.debug(f"Group {gid} check failed: {e}")
-                        continue
-                targets = targets[:500]
-                logger.info(f"Broadcast groups: found {len(groups)} total groups, {len(targets)} valid groups")
-
-            if not targets:
-                await query.answer("❌ Hech qanday target topilmadi.", show_alert=True)
-                context.user_data.pop('admin_action', None)
-                context.user_data.pop('admin_pending_text', None)
-                return
-
-            status_msg = await context.bot.send_message(
-                chat_id=chat_id,
-                text=f"🚀 Yuborish boshlandi... target: {len(targets)} ta\n\n⏳ Kuting..."
-            )
-            
-            # Background task sifatida yuborish
-            async def send_broadcast():
-                task_sent = 0
-                task_failed = 0
-                failed_users = []
-                
-                for i, tid in enumerate(targets):
-                    try:
-                        await context.bot.send_message(chat_id=tid, text=pending_text)
-                        task_sent += 1
-                        # Har 10 ta yuborilgandan keyin status yangilash
-                        if (i + 1) % 10 == 0:
-                            try:
-                                await status_msg.edit_text(
-                                    f"🚀 Yuborilmoqda...\n\n✅ Yuborildi: {task_sent}/{len(targets)}\n❌ Xatolik: {task_failed}"
-                                )
-                            except Exception as e:
-                                logger.debug(f"Status message edit xatolik (broadcast): {e}")
-                    except Exception as e:
-                        error_msg = str(e)
-                        logger.warning(f"Broadcast failed for {tid}: {error_msg}")
-                        task_failed += 1
-                        # Faqat muhim xatoliklarni saqlash
-                        if "chat not found" not in error_msg.lower() and "blocked" not in error_msg.lower():
-                            if len(failed_users) < 10:  # Faqat birinchi 10 tasini saqlash
-                                failed_users.append(str(tid))
-                    
-                    # Rate limit - Telegram API limitlarini e'tiborga olish
-                    await asyncio.sleep(0.05)  # 20 msg/sec (50ms delay)
-                
-                # Yakuniy natija
-                context.user_data.pop('admin_action', None)
-                context.user_data.pop('admin_pending_text', None)
-                keyboard = [[KeyboardButton("⬅️ Orqaga")]]
-                markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                
-                final_text = (
-                    f"✅ **Yakunlandi**\n\n"
-                    f"✅ Yuborildi: **{task_sent}**\n"
-                    f"❌ Xatolik: **{task_failed}**\n"
-                    f"📊 Jami: **{len(targets)}** ta"
-                )
-                
-                if failed_users:
-                    final_text += f"\n\n⚠️ Xatolik bo'lgan userlar (namuna): {', '.join(failed_users[:5])}"
-                
-                try:
-                    await status_msg.edit_text(
-                        final_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                except Exception as e:
-                    logger.warning(f"Status message edit failed: {e}")
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text=final_text,
-                        reply_markup=markup,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                
-                logger.info(f"Broadcast completed: sent={task_sent}, failed={task_failed}, total={len(targets)}")
-            
-            # Background taskni ishga tushirish
-            asyncio.create_task(send_broadcast())
+            # Qabul qiluvchilar parallel aniqlanadi, yetkazish fonda va holati DB'da saqlanadi
+            kind = KIND_USERS if admin_action == "broadcast_users" else KIND_GROUPS
+            await start_broadcast(context.bot, kind, pending_text, query.from_user.id, chat_id)
             return
 
         # Other admin actions
@@ -663,7 +539,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # QUIZ MENU
     if data.startswith("quiz_menu_"):
         quiz_id = data.replace("quiz_menu_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -703,7 +579,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # TOGGLE PRIVATE
     if data.startswith("toggle_private_"):
         quiz_id = data.replace("toggle_private_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -719,7 +595,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         current_private = quiz.get('is_private', False)
         new_private = not current_private
         
-        storage.set_quiz_private(quiz_id, new_private)
+        await async_storage.set_quiz_private(quiz_id, new_private)
         
         status_text = "🔒 Private" if new_private else "🌐 Public"
         await query.answer(f"✅ Quiz {status_text} qilindi!")
@@ -752,7 +628,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # QUIZ GROUPS (Private quiz uchun guruhlar ro'yxati)
     if data.startswith("quiz_groups_"):
         quiz_id = data.replace("quiz_groups_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -769,7 +645,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("❌ Bu quiz private emas!", show_alert=True)
             return
         
-        allowed_groups = storage.get_quiz_allowed_groups(quiz_id)
+        allowed_groups = await async_storage.get_quiz_allowed_groups(quiz_id)
         title = quiz.get('title', 'Quiz')
         
         text = f"👥 **Guruhlar ro'yxati**\n\n"
@@ -813,7 +689,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if data.startswith("quiz_add_group_"):
         quiz_id = data.replace("quiz_add_group_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -846,7 +722,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         quiz_id = parts[0]
         group_id = int(parts[1])
         
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -859,11 +735,11 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("❌ Siz bu quizni o'zgartira olmaysiz.", show_alert=True)
             return
         
-        storage.remove_quiz_allowed_group(quiz_id, group_id)
+        await async_storage.remove_quiz_allowed_group(quiz_id, group_id)
         await query.answer("✅ Guruh olib tashlandi!")
         
         # Qayta ko'rsatish
-        allowed_groups = storage.get_quiz_allowed_groups(quiz_id)
+        allowed_groups = await async_storage.get_quiz_allowed_groups(quiz_id)
         title = quiz.get('title', 'Quiz')
         
         text = f"👥 **Guruhlar ro'yxati**\n\n"
@@ -908,7 +784,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if data.startswith("share_quiz_") and data.count("_") == 1:
         # share_quiz_{quiz_id} format (eski)
         quiz_id = data.replace("share_quiz_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -935,7 +811,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # QUIZ INFO
     if data.startswith("quiz_info_"):
         quiz_id = data.replace("quiz_info_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -959,7 +835,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # DELETE QUIZ
     if data.startswith("delete_"):
         quiz_id = data.replace("delete_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -970,7 +846,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         title = quiz.get('title') or quiz_id
-        storage.delete_quiz(quiz_id)
+        await async_storage.delete_quiz(quiz_id)
         await safe_edit_text(
             query.message,
             f"✅ O'chirildi: **{title}**",
@@ -981,7 +857,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # RENAME QUIZ
     if data.startswith("rename_quiz_"):
         quiz_id = data.replace("rename_quiz_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -1009,7 +885,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # SELECT TIME
     if data.startswith("select_time_"):
         quiz_id = data.replace("select_time_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -1054,7 +930,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.info(f"🚀 Guruhda quiz boshlash: quiz_id={quiz_id}, chat_id={chat_id}, user_id={user_id}, time={time_seconds}s")
             
             # Quiz mavjudligini tekshiramiz
-            quiz = storage.get_quiz(quiz_id)
+            quiz = await async_storage.get_quiz(quiz_id)
             if not quiz:
                 logger.error(f"❌ Quiz topilmadi: {quiz_id}")
                 await query.answer("❌ Quiz topilmadi", show_alert=True)
@@ -1106,7 +982,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # START QUIZ (group) - vaqt tanlash menyusini ko'rsatish
     if data.startswith("start_group_"):
         quiz_id = data.replace("start_group_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -1129,7 +1005,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # RESTART QUIZ
     if data.startswith("restart_"):
         quiz_id = data.replace("restart_", "")
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
@@ -1201,13 +1077,14 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("❌ Quiz sesiyasi 6 soatdan o'tgan. Yangi quizni boshlang.", show_alert=True)
             return
         
-        # Quiz ma'lumotlarini olish
-        quiz = storage.get_quiz(quiz_id)
+        # Quiz ma'lumotlarini olish (session snapshot'idan)
+        from bot.services.quiz_snapshot import get_session_snapshot
+        quiz = await get_session_snapshot(session, quiz_id)
         if not quiz:
             await query.answer("❌ Quiz topilmadi.", show_alert=True)
             return
         
-        questions = quiz.get('questions', [])
+        questions = quiz.questions
         paused_at_question = session.get('paused_at_question', 0)
         
         # Resume qilganda, pauza qilingan savolga qaytamiz (chunki u javob berilmagan)
@@ -1269,7 +1146,9 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # CHECK SUBSCRIPTION (obuna tekshiruvi)
     if data == "check_subscription":
         from bot.handlers.start import start
-        # Obunani tekshirish va start command'ni qayta ishlatish
+        from bot.services.channel_membership import forget_user
+        # Obunani tekshirish va start command'ni qayta ishlatish ("a'zo emas" cache'i e'tiborga olinmaydi)
+        forget_user(query.from_user.id)
         fake_update = type('FakeUpdate', (), {
             'message': query.message,
             'effective_user': query.from_user,
@@ -1285,8 +1164,8 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         group_chat_id = int(parts[0])
         page = int(parts[1])
 
-        all_quizzes = storage.get_all_quizzes()
-        allowed_ids = storage.get_group_allowed_quiz_ids(group_chat_id)
+        all_quizzes = await async_storage.get_all_quizzes()
+        allowed_ids = await async_storage.get_group_allowed_quiz_ids(group_chat_id)
         if allowed_ids:
             allowed_set = set(allowed_ids)
             all_quizzes = [q for q in all_quizzes if str(q.get('quiz_id')) in allowed_set]
@@ -1353,8 +1232,8 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
         
         # Quizlar ro'yxatini ko'rsatish (tanlash uchun - faqat bitta quiz)
-        all_quizzes = storage.get_all_quizzes()
-        allowed_ids = storage.get_group_allowed_quiz_ids(group_chat_id)
+        all_quizzes = await async_storage.get_all_quizzes()
+        allowed_ids = await async_storage.get_group_allowed_quiz_ids(group_chat_id)
         if allowed_ids:
             allowed_set = set(allowed_ids)
             all_quizzes = [q for q in all_quizzes if str(q.get('quiz_id')) in allowed_set]
@@ -1404,8 +1283,8 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer("✅ Quiz tanlandi!")
         
         # Qayta ko'rsatish
-        all_quizzes = storage.get_all_quizzes()
-        allowed_ids = storage.get_group_allowed_quiz_ids(group_chat_id)
+        all_quizzes = await async_storage.get_all_quizzes()
+        allowed_ids = await async_storage.get_group_allowed_quiz_ids(group_chat_id)
         if allowed_ids:
             allowed_set = set(allowed_ids)
             all_quizzes = [q for q in all_quizzes if str(q.get('quiz_id')) in allowed_set]
@@ -1539,8 +1418,8 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer("✅ Tozalandi")
         # Qayta ko'rsatish
         group_chat_id = int(data.replace("championship_clear_", ""))
-        all_quizzes = storage.get_all_quizzes()
-        allowed_ids = storage.get_group_allowed_quiz_ids(group_chat_id)
+        all_quizzes = await async_storage.get_all_quizzes()
+        allowed_ids = await async_storage.get_group_allowed_quiz_ids(group_chat_id)
         if allowed_ids:
             allowed_set = set(allowed_ids)
             all_quizzes = [q for q in all_quizzes if str(q.get('quiz_id')) in allowed_set]
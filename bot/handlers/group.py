@@ -4,9 +4,9 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from bot.models import storage
+from bot.models import async_storage
 from bot.utils.helpers import track_update, safe_reply_text, _is_group_admin
-from bot.services.quiz_service import advance_due_sessions
+from bot.services.session_manager import get_session_registry
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +23,7 @@ async def my_chat_member_handler(update: Update, context: ContextTypes.DEFAULT_T
 
         new_status = getattr(cmu.new_chat_member, "status", None)
         is_admin = new_status in ['administrator', 'creator']
-        storage.track_group(
+        await async_storage.track_group(
             chat_id=chat.id,
             title=getattr(chat, "title", None),
             chat_type=getattr(chat, "type", None),
@@ -56,17 +56,17 @@ async def allowquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if arg.lower() in ['off', 'disable', 'all', 'reset', 'clear']:
-        storage.set_group_allowed_quiz_ids(chat.id, [])
+        await async_storage.set_group_allowed_quiz_ids(chat.id, [])
         await update.message.reply_text("✅ Filtr o'chirildi. Endi guruhda hamma quizlar ko'rinadi.")
         return
 
     quiz_id = arg.split()[0]
-    quiz = storage.get_quiz(quiz_id)
+    quiz = await async_storage.get_quiz(quiz_id)
     if not quiz:
         await update.message.reply_text("❌ Quiz topilmadi. ID ni tekshiring.")
         return
 
-    added = storage.add_group_allowed_quiz(chat.id, quiz_id)
+    added = await async_storage.add_group_allowed_quiz(chat.id, quiz_id)
     title = quiz.get('title') or quiz_id
     if added:
         await safe_reply_text(update.message, f"✅ Guruhga ruxsat berildi: **{title}** (`{quiz_id}`)", parse_mode=ParseMode.MARKDOWN)
@@ -92,12 +92,12 @@ async def disallowquiz_command(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     if arg.lower() in ['all', 'reset', 'clear']:
-        storage.set_group_allowed_quiz_ids(chat.id, [])
+        await async_storage.set_group_allowed_quiz_ids(chat.id, [])
         await update.message.reply_text("✅ Tanlangan quizlar tozalandi (filtr o'chdi).")
         return
 
     quiz_id = arg.split()[0]
-    ok = storage.remove_group_allowed_quiz(chat.id, quiz_id)
+    ok = await async_storage.remove_group_allowed_quiz(chat.id, quiz_id)
     await update.message.reply_text("✅ Olib tashlandi." if ok else "ℹ️ Bu quiz ro'yxatda yo'q.")
 
 
@@ -109,7 +109,7 @@ async def allowedquizzes_command(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text("ℹ️ Bu buyruq faqat guruhda ishlaydi.")
         return
 
-    allowed_ids = storage.get_group_allowed_quiz_ids(chat.id)
+    allowed_ids = await async_storage.get_group_allowed_quiz_ids(chat.id)
     if not allowed_ids:
         await update.message.reply_text(
             "ℹ️ Hozir filtr yoqilmagan — guruhda hamma quizlar boshlanadi.\n\n"
@@ -120,7 +120,7 @@ async def allowedquizzes_command(update: Update, context: ContextTypes.DEFAULT_T
 
     items = []
     for qid in allowed_ids[:30]:
-        quiz = storage.get_quiz(qid)
+        quiz = await async_storage.get_quiz(qid)
         if not quiz:
             continue
         title = quiz.get('title') or qid
@@ -135,7 +135,6 @@ async def allowedquizzes_command(update: Update, context: ContextTypes.DEFAULT_T
 async def startquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Guruhda quiz boshlash"""
     track_update(update)
-    await advance_due_sessions(context)
 
     chat_type = update.effective_chat.type
     chat_id = update.effective_chat.id
@@ -163,10 +162,10 @@ async def startquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Xatolik yuz berdi.")
         return
     
-    all_quizzes = storage.get_all_quizzes()
+    all_quizzes = await async_storage.get_all_quizzes()
 
     # Group allowlist filter
-    allowed_ids = storage.get_group_allowed_quiz_ids(chat_id)
+    allowed_ids = await async_storage.get_group_allowed_quiz_ids(chat_id)
     if allowed_ids:
         allowed_set = set(allowed_ids)
         all_quizzes = [q for q in all_quizzes if str(q.get('quiz_id')) in allowed_set]
@@ -233,8 +232,6 @@ async def stopquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("ℹ️ Bu buyruq faqat guruhda ishlaydi.\n\nShaxsiy chatda /finishquiz ishlating.")
         return
 
-    await advance_due_sessions(context)
-
     chat_id = chat.id
     user_id = update.effective_user.id
 
@@ -255,27 +252,8 @@ async def stopquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Hozircha faqat adminlar to'xtata oladi
 
     # Agar voting yaratib bo'lmasa, to'g'ridan-to'g'ri to'xtatamiz
-    sessions = context.bot_data.setdefault('sessions', {})
-    group_locks = context.bot_data.setdefault('group_locks', {})
-
-    stopped = 0
-
-    # Lock orqali topish
-    session_key = group_locks.get(chat_id)
-    if session_key and session_key in sessions and sessions[session_key].get('is_active', False):
-        sessions[session_key]['is_active'] = False
-        stopped += 1
-
-    # Barcha aktiv sessionlarni topish
-    prefix = f"quiz_{chat_id}_"
-    for k, s in list(sessions.items()):
-        if k.startswith(prefix) and s.get('is_active', False):
-            s['is_active'] = False
-            stopped += 1
-
-    # Lock bo'shatish
-    if chat_id in group_locks:
-        group_locks.pop(chat_id)
+    # Guruhdagi barcha aktiv sessionlarni to'xtatish va lock'ni bo'shatish
+    stopped = len(get_session_registry(context.bot_data).deactivate_chat(chat_id))
 
     if stopped > 0:
         await update.message.reply_text(f"✅ {stopped} ta aktiv quiz to'xtatildi.")
@@ -291,8 +269,6 @@ async def startchemp_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("ℹ️ Bu buyruq faqat guruhda ishlaydi.")
         return
     
-    await advance_due_sessions(context)
-    
     chat_id = chat.id
     user_id = update.effective_user.id
     
@@ -311,7 +287,7 @@ async def startchemp_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     championship = await get_championship_status(context, chat_id)
     if championship:
         quiz_id = championship.get('quiz_id', '')
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
         await update.message.reply_text(
             f"⛔️ **Chempionat allaqachon davom etmoqda!**\n\n"
@@ -322,8 +298,8 @@ async def startchemp_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     # Quizlar ro'yxatini ko'rsatish
-    all_quizzes = storage.get_all_quizzes()
-    allowed_ids = storage.get_group_allowed_quiz_ids(chat_id)
+    all_quizzes = await async_storage.get_all_quizzes()
+    allowed_ids = await async_storage.get_group_allowed_quiz_ids(chat_id)
     if allowed_ids:
         allowed_set = set(allowed_ids)
         all_quizzes = [q for q in all_quizzes if str(q.get('quiz_id')) in allowed_set]
@@ -338,7 +314,7 @@ async def startchemp_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Agar argument bo'lsa, quiz ID ni olish
     if context.args:
         quiz_id = context.args[0]
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await update.message.reply_text("❌ Quiz topilmadi.")
             return
@@ -403,8 +379,6 @@ async def stopchemp_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("ℹ️ Bu buyruq faqat guruhda ishlaydi.")
         return
     
-    await advance_due_sessions(context)
-    
     chat_id = chat.id
     user_id = update.effective_user.id
     
@@ -443,7 +417,7 @@ async def statistika_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     chat_id = chat.id
     
     # Guruhdagi barcha natijalarni olish
-    group_results = storage.get_all_group_results(chat_id)
+    group_results = await async_storage.get_all_group_results(chat_id)
     
     if not group_results:
         await update.message.reply_text(
@@ -456,7 +430,7 @@ async def statistika_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Foydalanuvchilar bo'yicha statistikani hisoblash
     user_stats = {}
-    users_data = storage.get_users()
+    users_data = await async_storage.get_users()
     users_dict = {u.get('user_id'): u for u in users_data}
     
     for result in group_results:
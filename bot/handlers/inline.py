@@ -4,7 +4,7 @@ from telegram import Update, InlineQueryResultArticle, InputTextMessageContent,
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from bot.models import storage
+from bot.models import async_storage
 from bot.utils.helpers import track_update
 
 logger = logging.getLogger(__name__)
@@ -52,7 +52,7 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         # Agar query bo'sh bo'lsa yoki "quiz" yozilsa, foydalanuvchi yaratgan quizlarni ko'rsatish
         if not query or query.lower() in ['quiz', 'quizzes', 'test']:
             # Foydalanuvchi yaratgan quizlarni olish
-            user_quizzes = storage.get_user_quizzes(user_id)
+            user_quizzes = await async_storage.get_user_quizzes(user_id)
             
             if user_quizzes:
                 # Foydalanuvchi yaratgan quizlarni ko'rsatish
@@ -82,7 +82,7 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
                     results.append(result)
             else:
                 # Agar foydalanuvchi yaratgan quizlar yo'q bo'lsa, barcha quizlarni ko'rsatish
-                all_quizzes = storage.get_all_quizzes()
+                all_quizzes = await async_storage.get_all_quizzes()
                 for quiz in all_quizzes[:10]:  # Birinchi 10 tasini
                     quiz_id = quiz.get('quiz_id')
                     title = quiz.get('title', 'Quiz')
@@ -109,7 +109,7 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         # Agar query quiz ID bo'lsa (to'g'ridan-to'g'ri ID yozilsa)
         elif query and len(query) >= 8:  # Quiz ID odatda 12-13 belgi
             # Aniq quiz ID ni qidirish
-            quiz = storage.get_quiz(query)
+            quiz = await async_storage.get_quiz(query)
             if quiz:
                 quiz_id = quiz.get('quiz_id')
                 title = quiz.get('title', 'Quiz')
@@ -137,7 +137,7 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         # Agar query quiz nomi bo'lsa, qidirish
         elif query:
             # Avval foydalanuvchi yaratgan quizlarni qidirish
-            user_quizzes = storage.get_user_quizzes(user_id)
+            user_quizzes = await async_storage.get_user_quizzes(user_id)
             query_lower = query.lower()
             
             for quiz in user_quizzes:
@@ -172,7 +172,7 @@ async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             
             # Agar foydalanuvchi quizlari orasida topilmasa, barcha quizlarni qidirish
             if not results:
-                all_quizzes = storage.get_all_quizzes()
+                all_quizzes = await async_storage.get_all_quizzes()
                 for quiz in all_quizzes:
                     quiz_id = quiz.get('quiz_id')
                     title = quiz.get('title', 'Quiz')
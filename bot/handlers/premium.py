@@ -6,7 +6,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler, PreCheckoutQueryHandler
 from telegram.constants import ParseMode
 
-from bot.models import storage
+from bot.models import async_storage
 from bot.services.subscription import (
     PLAN_FREE, PLAN_CORE, PLAN_PRO,
     PLAN_PRICES, PLAN_FEATURES,
@@ -23,12 +23,12 @@ async def premium_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
     # Foydalanuvchi tarifini olish
-    current_plan = get_user_plan(user_id)
+    current_plan = await get_user_plan(user_id)
     plan_features = get_plan_features(current_plan)
-    premium_info = storage.get_premium_user(user_id)
+    premium_info = await async_storage.get_premium_user(user_id)
     
     # Tarif ma'lumotlari
-    text = get_plan_info_text(user_id)
+    text = await get_plan_info_text(user_id)
     
     # Agar premium faol bo'lsa, muddati ko'rsatish
     if premium_info and premium_info.get('premium_until'):
@@ -336,7 +336,7 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
         username = message.from_user.username
         first_name = message.from_user.first_name
         
-        storage.add_premium_user(
+        await async_storage.add_premium_user(
             user_id=user_id,
             stars_amount=payment.total_amount,
             months=package_info['months'],
@@ -345,7 +345,7 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
             subscription_plan=plan
         )
         
-        premium_info = storage.get_premium_user(user_id)
+        premium_info = await async_storage.get_premium_user(user_id)
         plan_features = get_plan_features(plan)
         
         text = f"""✅ <b>{plan_features['name_uz']} Tarif Aktivlashtirildi!</b>
@@ -388,11 +388,11 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
         )
 
 
-def is_premium_or_has_quota(user_id: int) -> tuple[bool, str]:
+async def is_premium_or_has_quota(user_id: int) -> tuple[bool, str]:
     """Premium yoki quota borligini tekshirish (backward compatibility)
     
     Returns:
         (is_allowed, message) - ruxsat berilganmi va xabar
     """
     from bot.services.subscription import can_create_quiz
-    return can_create_quiz(user_id)
+    return await can_create_quiz(user_id)
@@ -5,28 +5,32 @@ import hashlib
 import time
 import asyncio
 import logging
+import uuid
+from datetime import datetime, timedelta
 from io import BytesIO
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from telegram import Message, Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from bot.config import Config
-from bot.models import storage
+from bot.models import async_storage
 from bot.utils.helpers import (
     track_update, is_sudo_user, is_admin_user, is_vip_user,
     private_main_keyboard, safe_reply_text
 )
 from bot.handlers.premium import is_premium_or_has_quota
-from bot.services.subscription import can_parse_file, can_use_ai_parsing
+from bot.services.subscription import can_parse_file, can_use_ai_parsing, get_user_plan, PLAN_PRO
 from bot.utils.validators import (
     sanitize_ai_input, extract_answer_key_map, apply_answer_key_to_questions,
-    validate_questions, quick_has_quiz_patterns, parse_tilde_quiz, parse_numbered_quiz
+    validate_questions, quick_has_quiz_patterns, split_parsed_and_residue
 )
-from bot.services.file_parser import FileAnalyzer
+from bot.services.extraction_pool import extraction_pool
+from bot.services.ingestion_queue import IngestionJob, ingestion_queue
 from bot.services.ai_parser import AIParser
-from bot.services.quiz_service import show_quiz_results, advance_due_sessions
+from bot.services.quiz_service import show_quiz_results
+from bot.services.session_manager import get_session_registry
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +46,7 @@ async def myquizzes_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
     """Foydalanuvchining quizlari"""
     track_update(update)
     user_id = update.effective_user.id
-    user_quizzes = storage.get_user_quizzes(user_id)
+    user_quizzes = await async_storage.get_user_quizzes(user_id)
     
     if not user_quizzes:
         await update.message.reply_text(
@@ -122,7 +126,7 @@ async def sudo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     action = context.args[0].lower().strip()
     if action == "list":
-        sudo_users = storage.get_sudo_users()
+        sudo_users = await async_storage.get_sudo_users()
         if not sudo_users:
             await update.message.reply_text("📭 Sudo userlar yo'q.")
             return
@@ -147,18 +151,18 @@ async def sudo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             username = None
             first_name = None
             try:
-                for u in storage.get_users():
+                for u in await async_storage.get_users():
                     if int(u.get('user_id')) == target_id:
                         username = u.get('username')
                         first_name = u.get('first_name')
                         break
             except Exception:
                 pass
-            storage.add_sudo_user(target_id, username=username, first_name=first_name)
+            await async_storage.add_sudo_user(target_id, username=username, first_name=first_name)
             await safe_reply_text(update.message, f"✅ Sudo berildi: `{target_id}`", parse_mode=ParseMode.MARKDOWN)
             return
 
-        ok = storage.remove_sudo_user(target_id)
+        ok = await async_storage.remove_sudo_user(target_id)
         await safe_reply_text(
             update.message,
             ("✅ Sudo olib tashlandi: " if ok else "ℹ️ Sudo topilmadi: ") + f"`{target_id}`",
@@ -193,7 +197,7 @@ async def vip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     action = context.args[0].lower().strip()
     if action == "list":
-        vip_users = storage.get_vip_users()
+        vip_users = await async_storage.get_vip_users()
         if not vip_users:
             await update.message.reply_text("📭 VIP userlar yo'q.")
             return
@@ -209,7 +213,7 @@ async def vip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Admin o'zini VIP qilish
         username = update.effective_user.username
         first_name = update.effective_user.first_name
-        storage.add_vip_user(admin_id, username=username, first_name=first_name, nickname=f"{first_name} ⭐")
+        await async_storage.add_vip_user(admin_id, username=username, first_name=first_name, nickname=f"{first_name} ⭐")
         await safe_reply_text(update.message, f"✅ Siz VIP user qilib tayinlandingiz! ⭐", parse_mode=ParseMode.MARKDOWN)
         return
 
@@ -227,18 +231,18 @@ async def vip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             username = None
             first_name = None
             try:
-                for u in storage.get_users():
+                for u in await async_storage.get_users():
                     if int(u.get('user_id')) == target_id:
                         username = u.get('username')
                         first_name = u.get('first_name')
                         break
             except Exception:
                 pass
-            storage.add_vip_user(target_id, username=username, first_name=first_name, nickname=f"{first_name or 'VIP User'} ⭐")
+            await async_storage.add_vip_user(target_id, username=username, first_name=first_name, nickname=f"{first_name or 'VIP User'} ⭐")
             await safe_reply_text(update.message, f"✅ VIP berildi: `{target_id}` ⭐", parse_mode=ParseMode.MARKDOWN)
             return
 
-        ok = storage.remove_vip_user(target_id)
+        ok = await async_storage.remove_vip_user(target_id)
         await safe_reply_text(
             update.message,
             ("✅ VIP olib tashlandi: " if ok else "ℹ️ VIP topilmadi: ") + f"`{target_id}`",
@@ -272,7 +276,7 @@ async def channels_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     action = context.args[0].lower().strip()
     if action == "list":
-        channels = storage.get_required_channels()
+        channels = await async_storage.get_required_channels()
         if not channels:
             await update.message.reply_text("📭 Majburiy kanallar yo'q.")
             return
@@ -352,7 +356,7 @@ async def channels_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     return
             
             # Kanalni qo'shish
-            success = storage.add_required_channel(channel_id, channel_username, channel_title)
+            success = await async_storage.add_required_channel(channel_id, channel_username, channel_title)
             if success:
                 ch_name = channel_title or channel_username or f"Channel {channel_id}"
                 await safe_reply_text(
@@ -375,7 +379,7 @@ async def channels_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        ok = storage.remove_required_channel(channel_id)
+        ok = await async_storage.remove_required_channel(channel_id)
         await safe_reply_text(
             update.message,
             ("✅ Kanal o'chirildi: " if ok else "ℹ️ Kanal topilmadi: ") + f"`{channel_id}`",
@@ -397,7 +401,7 @@ async def quizzes_command(update: Update, context: ContextTypes.DEFAULT_TYPE, pa
         )
         return
 
-    all_quizzes = storage.get_all_quizzes()
+    all_quizzes = await async_storage.get_all_quizzes()
     if not all_quizzes:
         await update.message.reply_text("📭 Hozircha quizlar yo'q.")
         return
@@ -468,7 +472,7 @@ async def searchquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     q_lower = query.lower()
-    all_quizzes = storage.get_all_quizzes()
+    all_quizzes = await async_storage.get_all_quizzes()
     matches = []
     for quiz in all_quizzes:
         title = (quiz.get('title') or '').lower()
@@ -501,7 +505,7 @@ async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Foydalanish: `/quiz b672034fe4b4`", parse_mode=ParseMode.MARKDOWN)
         return
 
-    quiz = storage.get_quiz(quiz_id)
+    quiz = await async_storage.get_quiz(quiz_id)
     if not quiz:
         await update.message.reply_text("❌ Quiz topilmadi.")
         return
@@ -517,7 +521,7 @@ async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_type = None
         chat_id = None
     
-    if chat_type in ['group', 'supergroup'] and chat_id is not None and (not storage.group_allows_quiz(chat_id, quiz_id)):
+    if chat_type in ['group', 'supergroup'] and chat_id is not None and (not await async_storage.group_allows_quiz(chat_id, quiz_id)):
         keyboard.append([InlineKeyboardButton("📊 Ma'lumot", callback_data=f"quiz_info_{quiz_id}")])
     else:
         keyboard.extend([
@@ -546,7 +550,7 @@ async def deletequiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("Foydalanish: `/deletequiz b672034fe4b4`", parse_mode=ParseMode.MARKDOWN)
         return
 
-    quiz = storage.get_quiz(quiz_id)
+    quiz = await async_storage.get_quiz(quiz_id)
     if not quiz:
         await update.message.reply_text("❌ Quiz topilmadi.")
         return
@@ -557,7 +561,7 @@ async def deletequiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     title = quiz.get('title') or quiz_id
-    ok = storage.delete_quiz(quiz_id)
+    ok = await async_storage.delete_quiz(quiz_id)
     if ok:
         await safe_reply_text(update.message, f"✅ O'chirildi: **{title}** (`{quiz_id}`)", parse_mode=ParseMode.MARKDOWN)
     else:
@@ -572,24 +576,17 @@ async def finishquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("ℹ️ Bu buyruq faqat shaxsiy chatda ishlaydi.\n\nGuruhda /stopquiz ishlating.")
         return
     
-    await advance_due_sessions(context)
-    
     chat_id = chat.id
     user_id = update.effective_user.id
     
-    sessions = context.bot_data.setdefault('sessions', {})
-    
     stopped = 0
     finished_quizzes = []
     
-    user_prefix = f"quiz_{chat_id}_{user_id}_"
-    for k, s in list(sessions.items()):
-        if k.startswith(user_prefix) and s.get('is_active', False):
-            quiz_id = s.get('quiz_id')
-            if quiz_id:
-                finished_quizzes.append(quiz_id)
-            s['is_active'] = False
-            stopped += 1
+    for k, s in get_session_registry(context.bot_data).deactivate_chat(chat_id, user_id=user_id):
+        quiz_id = s.get('quiz_id')
+        if quiz_id:
+            finished_quizzes.append(quiz_id)
+        stopped += 1
     
     if stopped == 0:
         await update.message.reply_text("ℹ️ Hozir sizda aktiv quiz yo'q.")
@@ -607,8 +604,6 @@ async def finishquiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Matnli xabarlarni qayta ishlash (klaviatura tugmalari)"""
     track_update(update)
-    # Har bir update'da quiz session'larni tekshirish
-    await advance_due_sessions(context)
     
     text = update.message.text.strip()
     user_id = update.effective_user.id
@@ -758,7 +753,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                     return
             
             # Kanalni qo'shish
-            success = storage.add_required_channel(channel_id, channel_username, channel_title)
+            success = await async_storage.add_required_channel(channel_id, channel_username, channel_title)
             if success:
                 ch_name = channel_title or channel_username or f"Channel {channel_id}"
                 await update.message.reply_text(
@@ -814,12 +809,12 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             return
 
         quiz_id = raw.split()[0]
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         if not quiz:
             await update.message.reply_text("❌ Quiz topilmadi. ID ni tekshiring (yoki `cancel`).", parse_mode=ParseMode.MARKDOWN)
             return
 
-        storage.add_group_allowed_quiz(int(gid), quiz_id)
+        await async_storage.add_group_allowed_quiz(int(gid), quiz_id)
         context.user_data.pop('admin_action', None)
         context.user_data.pop('admin_target_group_id', None)
         title = quiz.get('title') or quiz_id
@@ -897,7 +892,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     # Quiz add group action
     elif context.user_data.get('quiz_add_group_action'):
         quiz_id = context.user_data.get('quiz_add_group_action')
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         
         if not quiz:
             context.user_data.pop('quiz_add_group_action', None)
@@ -957,7 +952,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 return
         
         # Guruhni qo'shish
-        success = storage.add_quiz_allowed_group(quiz_id, group_id)
+        success = await async_storage.add_quiz_allowed_group(quiz_id, group_id)
         if success:
             await update.message.reply_text(
                 f"✅ Guruh qo'shildi!\n\n"
@@ -1063,7 +1058,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 user_id = update.effective_user.id
                 is_admin = is_admin_user(user_id) or is_sudo_user(user_id)
                 if not is_admin:
-                    can_use_ai, error_msg = can_use_ai_parsing(user_id)
+                    can_use_ai, error_msg = await can_use_ai_parsing(user_id)
                     if not can_use_ai:
                         await status_msg.edit_text(error_msg)
                         context.user_data.pop('admin_action', None)
@@ -1125,7 +1120,7 @@ Kamida 10 ta savol yarating."""
                 user_id = update.effective_user.id
                 chat_id = update.effective_chat.id
                 
-                storage.save_quiz(quiz_id, questions, user_id, chat_id, ai_title)
+                await async_storage.save_quiz(quiz_id, questions, user_id, chat_id, ai_title)
                 
                 keyboard = [
                     [KeyboardButton("⬅️ Orqaga")],
@@ -1162,7 +1157,7 @@ Kamida 10 ta savol yarating."""
                 await update.message.reply_text("❌ Quiz topilmadi. Qayta urinib ko'ring.")
                 return
             
-            quiz = storage.get_quiz(quiz_id)
+            quiz = await async_storage.get_quiz(quiz_id)
             if not quiz:
                 context.user_data.pop('admin_action', None)
                 context.user_data.pop('rename_quiz_id', None)
@@ -1186,7 +1181,7 @@ Kamida 10 ta savol yarating."""
                 return
             
             # Update quiz title
-            storage.update_quiz_title(quiz_id, new_title)
+            await async_storage.update_quiz_title(quiz_id, new_title)
             
             context.user_data.pop('admin_action', None)
             context.user_data.pop('rename_quiz_id', None)
@@ -1223,7 +1218,7 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Premium yoki quota tekshirish (adminlar va sudo userlar uchun emas)
     if not is_admin:
-        is_allowed, error_msg = is_premium_or_has_quota(user_id)
+        is_allowed, error_msg = await is_premium_or_has_quota(user_id)
         if not is_allowed:
             await message.reply_text(error_msg)
             return
@@ -1242,14 +1237,14 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await message.reply_text("❌ Jarayon bekor qilindi.")
         return
     
-    file = await context.bot.get_file(message.document.file_id)
     file_name = message.document.file_name
     file_extension = os.path.splitext(file_name)[1].lower()
-    file_size_mb = message.document.file_size / (1024 * 1024) if message.document.file_size else 0
+    file_size = message.document.file_size or 0
+    file_size_mb = file_size / (1024 * 1024)
     
     # Tarif tekshiruvi - fayl parsing
     if not is_admin:
-        can_parse, error_msg = can_parse_file(user_id, file_extension, file_size_mb)
+        can_parse, error_msg = await can_parse_file(user_id, file_extension, file_size_mb)
         if not can_parse:
             await message.reply_text(error_msg)
             return
@@ -1263,24 +1258,198 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"❌ Bekor qilish: /cancel"
     )
     
-    # Quiz yaratish jarayonini background task sifatida ishlatish
-    # Bu botning boshqa commandlarni qabul qilishini ta'minlaydi
-    asyncio.create_task(process_file_background(
-        context, message, file, file_name, file_extension, status_msg, user_id, is_admin
-    ))
+    # Ish DB'da ro'yxatga olinadi - bot qayta ishga tushsa, tahlil shu yerdan davom etadi
+    job_id = uuid.uuid4().hex
+    created = await async_storage.create_file_job(
+        job_id, user_id, message.chat_id, message.document.file_id, file_name, file_extension,
+        file_size, is_admin, status_msg.message_id
+    )
+    if not created:
+        job_id = None
+    
+    position = await submit_file_job(
+        context, job_id, message.document.file_id, file_name, file_extension, file_size,
+        status_msg, user_id, is_admin
+    )
+    if position is None:
+        if job_id:
+            await async_storage.delete_file_job(job_id)
+        await status_msg.edit_text(
+            "⏳ Hozir tahlil navbati to'la (juda ko'p fayl yuklangan).\n\n"
+            "Iltimos, birozdan keyin qayta yuboring."
+        )
 
 
-async def process_file_background(
+def clear_file_processing_flags(context: ContextTypes.DEFAULT_TYPE):
+    """Fayl tahlili flag'larini tozalash"""
+    context.user_data.pop('file_processing', None)
+    context.user_data.pop('file_processing_user', None)
+    context.user_data.pop('cancel_file_processing', None)
+
+
+async def submit_file_job(
+    context: ContextTypes.DEFAULT_TYPE,
+    job_id: Optional[str],
+    file_id: str,
+    file_name: str,
+    file_extension: str,
+    file_size: int,
+    status_msg,
+    user_id: int,
+    is_admin: bool = False
+) -> Optional[int]:
+    """Fayl tahlilini umumiy navbatga qo'yish (navbatdagi o'rni, navbat to'la bo'lsa None)"""
+    
+    async def on_position(position: int):
+        await status_msg.edit_text(
+            f"📥 **Fayl:** {file_name}\n\n⏳ Navbatda: {position}-o'rin\n\n"
+            f"❌ Bekor qilish: /cancel"
+        )
+    
+    async def on_cancel():
+        clear_file_processing_flags(context)
+        if job_id:
+            await async_storage.delete_file_job(job_id)
+        await status_msg.edit_text("❌ Jarayon bekor qilindi.")
+    
+    # Quiz yaratish jarayoni umumiy navbat orqali background'da bajariladi
+    # (bir vaqtda INGEST_WORKERS ta fayl, Pro > Core > Free ustuvorligi bilan)
+    plan = PLAN_PRO if is_admin else await get_user_plan(user_id)
+    job = IngestionJob(
+        user_id=user_id,
+        plan=plan,
+        size_bytes=file_size,
+        run=lambda: run_file_job(
+            context, job_id, file_id, file_name, file_extension, status_msg, user_id, is_admin
+        ),
+        on_position=on_position,
+        on_cancel=on_cancel,
+    )
+    position = ingestion_queue.submit(job)
+    if position is None:
+        clear_file_processing_flags(context)
+    return position
+
+
+async def run_file_job(
     context: ContextTypes.DEFAULT_TYPE,
-    message,
-    file,
+    job_id: Optional[str],
+    file_id: str,
     file_name: str,
     file_extension: str,
     status_msg,
     user_id: int,
     is_admin: bool = False
 ):
-    """Quiz yaratish jarayonini background'da bajarish"""
+    """Fayl tahlili va uning checkpoint'larini tozalash
+    
+    Tahlil qanday yakunlanmasin (quiz yaratildi, xatolik, /cancel), ish
+    DB'dan o'chiriladi. Bot to'xtatilganda (`ingestion_queue.stop()`,
+    CancelledError) yozuv qoladi va keyingi ishga tushishda
+    `resume_file_jobs` uni davom ettiradi.
+    """
+    await process_file_background(
+        context, file_id, file_name, file_extension, status_msg, user_id, is_admin, job_id=job_id
+    )
+    if job_id:
+        await async_storage.delete_file_job(job_id)
+
+
+async def resume_file_jobs(application) -> int:
+    """Restart'dan oldin tugallanmagan fayl tahlillarini navbatga qayta qo'yish
+    
+    Fayl Telegram'dan `file_id` bo'yicha qayta yuklab olinadi; AI tahlil
+    qilib bo'lgan qismlar DB'dagi checkpoint'dan olinadi. Juda eski yoki
+    FILE_JOB_MAX_ATTEMPTS martadan ko'p davom ettirilgan ishlar tashlab yuboriladi.
+    """
+    jobs = await async_storage.get_pending_file_jobs()
+    if not jobs:
+        return 0
+    
+    max_age = timedelta(hours=Config.FILE_JOB_MAX_AGE_HOURS)
+    bot = application.bot
+    resumed = 0
+    for job in jobs:
+        job_id = job['job_id']
+        user_id = job['user_id']
+        chat_id = job['chat_id']
+        file_name = job.get('file_name') or 'fayl'
+        try:
+            created_at = datetime.fromisoformat(job['created_at']) if job.get('created_at') else None
+        except (TypeError, ValueError):
+            created_at = None
+        expired = created_at is not None and datetime.utcnow() - created_at > max_age
+        attempts = await async_storage.bump_file_job_attempts(job_id)
+        
+        if expired or attempts > Config.FILE_JOB_MAX_ATTEMPTS:
+            logger.warning(f"🗑 Fayl tahlili davom ettirilmaydi (job_id={job_id}, urinish={attempts}, eski={expired})")
+            await async_storage.delete_file_job(job_id)
+            try:
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=f"❌ «{file_name}» fayli tahlilini yakunlab bo'lmadi. Iltimos, faylni qayta yuboring."
+                )
+            except Exception as e:
+                logger.debug(f"Resume xabarini yuborishda xatolik: {e}")
+            continue
+        
+        context = application.context_types.context(application, chat_id=chat_id, user_id=user_id)
+        context.user_data['file_processing'] = True
+        context.user_data['file_processing_user'] = user_id
+        context.user_data.pop('cancel_file_processing', None)
+        
+        resume_text = (
+            f"📥 **Fayl:** {file_name}\n\n♻️ Bot qayta ishga tushdi, tahlil davom ettirilmoqda...\n\n"
+            f"❌ Bekor qilish: /cancel"
+        )
+        status_msg = None
+        if job.get('status_message_id'):
+            try:
+                status_msg = await bot.edit_message_text(
+                    chat_id=chat_id, message_id=job['status_message_id'], text=resume_text
+                )
+            except Exception as e:
+                logger.debug(f"Eski status xabarini tahrirlab bo'lmadi (job_id={job_id}): {e}")
+        if not isinstance(status_msg, Message):
+            try:
+                status_msg = await bot.send_message(chat_id=chat_id, text=resume_text)
+            except Exception as e:
+                logger.warning(f"⚠️ Fayl tahlilini davom ettirib bo'lmadi (job_id={job_id}): {e}")
+                clear_file_processing_flags(context)
+                await async_storage.delete_file_job(job_id)
+                continue
+        
+        position = await submit_file_job(
+            context, job_id, job['file_id'], file_name, job.get('file_extension') or '',
+            job.get('file_size') or 0, status_msg, user_id, bool(job.get('is_admin'))
+        )
+        if position is None:
+            await async_storage.delete_file_job(job_id)
+            await status_msg.edit_text(
+                "⏳ Hozir tahlil navbati to'la. Iltimos, faylni birozdan keyin qayta yuboring."
+            )
+            continue
+        resumed += 1
+        logger.info(f"♻️ Fayl tahlili davom ettirildi (job_id={job_id}, user_id={user_id}, urinish={attempts})")
+    return resumed
+
+
+async def process_file_background(
+    context: ContextTypes.DEFAULT_TYPE,
+    file_id: str,
+    file_name: str,
+    file_extension: str,
+    status_msg,
+    user_id: int,
+    is_admin: bool = False,
+    job_id: Optional[str] = None
+):
+    """Quiz yaratish jarayonini background'da bajarish
+    
+    `job_id` berilsa, AI tahlil qilgan har bir qism natijasi DB'ga yoziladi
+    va qayta ishga tushganda tayyor qismlar AI'ga qayta yuborilmaydi.
+    """
+    chat_id = status_msg.chat_id
 
     last_percent = -1
     last_ts = 0.0
@@ -1310,17 +1479,31 @@ async def process_file_background(
     
     try:
         await update_progress(10, "📂 Yuklanmoqda...")
+        file = await context.bot.get_file(file_id)
         file_bytes = BytesIO()
         await file.download_to_memory(file_bytes)
         file_content = file_bytes.getvalue()
         
         await update_progress(20, "📖 O'qilmoqda...")
-        analyzer = FileAnalyzer()
-        text = analyzer.extract_text(bytes(file_content), file_extension)
+        text, truncated = await extraction_pool.extract_text(bytes(file_content), file_extension)
         
         if not text or len(text.strip()) < 10:
             await status_msg.edit_text("❌ Fayldan matn o'qib bo'lmadi.")
             return
+        
+        if truncated:
+            # Cheklovdan keyingi savollar tahlil qilinmaydi - foydalanuvchi bilishi kerak
+            try:
+                await context.bot.send_message(
+                    chat_id=chat_id,
+                    text=(
+                        f"ℹ️ Fayl juda katta: faqat birinchi ~{Config.FILE_MAX_TEXT_CHARS // 1000}K belgi tahlil qilinadi, "
+                        f"qolgan qismdagi savollar olinmaydi.\n\n"
+                        f"💡 Barcha savollar uchun faylni bir necha qismga bo'lib yuboring."
+                    )
+                )
+            except Exception as e:
+                logger.debug(f"Kesilgan fayl xabarini yuborishda xatolik: {e}")
 
         # Extract answer key if present
         try:
@@ -1333,25 +1516,23 @@ async def process_file_background(
         has_patterns = quick_has_quiz_patterns(text)
         target_limit = max(1, min(int(TARGET_QUESTIONS_PER_QUIZ or 50), int(MAX_QUESTIONS_PER_QUIZ or 100)))
         
+        # Algoritmik parser'lar butun matn bo'yicha: ishonchli savollar darhol olinadi,
+        # AI'ga faqat ular ajrata olmagan qismlar yuboriladi
+        try:
+            algo_parsed, algo_residue = split_parsed_and_residue(text)
+        except Exception as e:
+            logger.debug(f"Algoritmik parser xatolik: {e}")
+            algo_parsed, algo_residue = [], []
+        
         if not has_patterns:
-            # Algoritmik parser'larni sinab ko'rish
-            algo_check: List[Dict] = []
-            try:
-                algo_check.extend(parse_tilde_quiz(text)[:5])
-            except Exception as e:
-                logger.debug(f"parse_tilde_quiz xatolik: {e}")
-            try:
-                algo_check.extend(parse_numbered_quiz(text)[:5])
-            except Exception as e:
-                logger.debug(f"parse_numbered_quiz xatolik: {e}")
-            has_patterns = len(algo_check) >= 2
+            has_patterns = len(algo_parsed) >= 2
         
         # Agar hali ham pattern topilmasa, AI'ga yuborishga ruxsat berish
         # AI turli formatlarni aniqlay oladi
         if not has_patterns:
             # AI parsing uchun tarif tekshiruvi
             if not is_admin:
-                can_use_ai, error_msg = can_use_ai_parsing(user_id)
+                can_use_ai, error_msg = await can_use_ai_parsing(user_id)
                 if not can_use_ai:
                     await status_msg.edit_text(error_msg)
                     return
@@ -1391,14 +1572,13 @@ async def process_file_background(
         ai_title = ""
         chunk_results = []  # Track chunk processing results
         
-        if text_length > max_chars_per_chunk:  # If larger than max, split it
-            # Split text into chunks
-            lines = text.splitlines()
+        def split_into_chunks(source: str) -> List[str]:
+            """Matnni satrlar bo'yicha max_chars_per_chunk dan oshmaydigan qismlarga bo'lish"""
             chunks = []
             current_chunk = []
             current_length = 0
             
-            for line in lines:
+            for line in source.splitlines():
                 line_length = len(line) + 1  # +1 for newline
                 if current_length + line_length > max_chars_per_chunk and current_chunk:
                     chunks.append("\n".join(current_chunk))
@@ -1410,140 +1590,208 @@ async def process_file_background(
             
             if current_chunk:
                 chunks.append("\n".join(current_chunk))
-            
+            return chunks
+        
+        async def run_ai_chunks(ai_parser: AIParser, chunks: List[str]) -> Optional[List[Optional[Dict]]]:
+            """Qismlarni AI orqali tahlil qilish (natijalar qismlar tartibida, bekor qilinsa None)"""
             num_chunks = len(chunks)
-            logger.info(f"Large file detected ({text_length} chars), splitting into {num_chunks} chunks")
-            
-            await update_progress(30, f"📦 Fayl {num_chunks} qismga bo'linmoqda...")
-            
-            # AI parsing uchun tarif tekshiruvi
-            if not is_admin:
-                can_use_ai, error_msg = can_use_ai_parsing(user_id)
-                if not can_use_ai:
-                    await status_msg.edit_text(error_msg)
-                    return
             
-            ai_parser = AIParser(Config.DEEPSEEK_API_KEY, Config.DEEPSEEK_API_URL)
+            def cancel_check():
+                return context.user_data.get('cancel_file_processing', False)
             
-            # Process each chunk
-            for chunk_idx, chunk_text in enumerate(chunks):
-                # Cancel tekshiruvi
-                if context.user_data.get('cancel_file_processing'):
-                    await status_msg.edit_text("❌ Jarayon bekor qilindi.")
-                    context.user_data.pop('cancel_file_processing', None)
-                    context.user_data.pop('file_processing', None)
-                    return
-                
-                base_progress = 30 + int((chunk_idx / num_chunks) * 40)
-                await update_progress(
-                    base_progress,
-                    f"🤖 AI qism {chunk_idx + 1}/{num_chunks} ni tahlil qilmoqda..."
-                )
-                
-                ai_started_at = time.time()
-                heartbeat_stop = False
-                
-                async def chunk_progress_callback(percent, text):
-                    """Progress callback for chunk processing"""
+            # Qismlar parallel tahlil qilinadi (MAX_CONCURRENT_AI_REQUESTS tadan ko'p emas),
+            # natijalar esa asl tartibda yig'iladi
+            chunk_limit = asyncio.Semaphore(max(1, Config.MAX_CONCURRENT_AI_REQUESTS))
+            completed_chunks = 0
+            chunk_outputs = [None] * num_chunks
+            
+            # Checkpoint: oldingi ishga tushishda tayyor bo'lgan qismlar qayta tahlil qilinmaydi
+            # (qism matni o'zgarmagan bo'lsa - hash bo'yicha tekshiriladi)
+            chunk_hashes = [hashlib.sha256(chunk.encode('utf-8')).hexdigest() for chunk in chunks]
+            pending = list(range(num_chunks))
+            if job_id:
+                saved_chunks = await async_storage.get_file_job_chunks(job_id)
+                restored = {
+                    i for i, saved in saved_chunks.items()
+                    if 0 <= i < num_chunks and saved.get('chunk_hash') == chunk_hashes[i]
+                }
+                for i in restored:
+                    chunk_outputs[i] = saved_chunks[i].get('result')
+                completed_chunks = len(restored)
+                pending = [i for i in pending if i not in restored]
+                if restored:
+                    logger.info(f"♻️ Checkpoint: {completed_chunks}/{num_chunks} qism tayyor (job_id={job_id})")
+            
+            def chunks_progress() -> int:
+                return 30 + int((completed_chunks / num_chunks) * 40)
+            
+            async def analyze_chunk(chunk_idx: int, chunk_text: str):
+                """Bitta qismni AI orqali tahlil qilish (chat, xatolikda reasoner)"""
+                async with chunk_limit:
+                    if cancel_check():
+                        return chunk_idx, None
+                    
+                    async def chunk_progress_callback(percent, text):
+                        """Progress callback for chunk processing"""
+                        try:
+                            if cancel_check():
+                                return
+                            await update_progress(chunks_progress(), f"🤖 Qism {chunk_idx + 1}/{num_chunks}: {text}")
+                        except Exception as e:
+                            logger.debug(f"Progress update xatolik: {e}")
+                    
+                    # Try deepseek-chat first
+                    # Chunk'larda strict_correct=False - kichik chunk'larda to'g'ri javob topish qiyinroq
+                    # Timeout analyze_with_ai ichida umumiy AI semaphore olingandan keyin boshlanadi -
+                    # boshqa fayllar qismlari ortida kutilgan vaqt hisoblanmaydi
                     try:
-                        if context.user_data.get('cancel_file_processing'):
-                            return
-                        # Map AI progress (0-100) to chunk progress range
-                        chunk_progress = base_progress + int((percent / 100) * (40 / num_chunks))
-                        display_text = f"🤖 Qism {chunk_idx + 1}/{num_chunks}: {text}"
-                        await update_progress(chunk_progress, display_text)
-                    except Exception as e:
-                        logger.debug(f"Progress update xatolik: {e}")
-                
-                async def heartbeat():
-                    while not heartbeat_stop:
-                        if context.user_data.get('cancel_file_processing'):
-                            return
-                        elapsed = int(time.time() - ai_started_at)
-                        # Update progress every 5 seconds
-                        await asyncio.sleep(5)
-                
-                hb_task = asyncio.create_task(heartbeat())
-                
-                def cancel_check():
-                    return context.user_data.get('cancel_file_processing', False)
-                
-                chunk_result = None
-                
-                # Try deepseek-chat first
-                # Chunk'larda strict_correct=False - kichik chunk'larda to'g'ri javob topish qiyinroq
-                try:
-                    chunk_result = await asyncio.wait_for(
-                        ai_parser.analyze_with_ai(
+                        return chunk_idx, await ai_parser.analyze_with_ai(
                             sanitize_ai_input(chunk_text),
-                            progress_callback=chunk_progress_callback,  # Use progress callback
+                            progress_callback=chunk_progress_callback,
                             strict_correct=False,  # Chunk'larda qattiq tekshiruvni o'chirish
                             model="deepseek-chat",
+                            timeout=MAX_AI_SECONDS + 30,
                             cancel_check=cancel_check
-                        ),
-                        timeout=MAX_AI_SECONDS + 30  # Timeout'ni oshirish
-                    )
-                except asyncio.TimeoutError:
-                    logger.warning(f"AI (chat) timeout for chunk {chunk_idx + 1}/{num_chunks} (size: {len(chunk_text)} chars)")
+                        )
+                    except Exception as e:
+                        logger.error(f"AI (chat) error for chunk {chunk_idx + 1}/{num_chunks}: {e}", exc_info=True)
+                    
+                    # Try reasoner as fallback
+                    if cancel_check():
+                        return chunk_idx, None
                     await update_progress(
-                        base_progress + int((40 / num_chunks) * 0.5),
+                        chunks_progress(),
                         f"🧠 Qism {chunk_idx + 1}/{num_chunks} uchun reasoner urinmoqda..."
                     )
-                    # Try reasoner as fallback
                     try:
-                        chunk_result = await asyncio.wait_for(
-                            ai_parser.analyze_with_ai(
-                                sanitize_ai_input(chunk_text),
-                                progress_callback=chunk_progress_callback,
-                                strict_correct=False,  # Chunk'larda qattiq tekshiruvni o'chirish
-                                model="deepseek-reasoner",
-                                cancel_check=cancel_check
-                            ),
-                            timeout=MAX_AI_SECONDS + 90  # Timeout'ni oshirish
+                        return chunk_idx, await ai_parser.analyze_with_ai(
+                            sanitize_ai_input(chunk_text),
+                            progress_callback=chunk_progress_callback,
+                            strict_correct=False,  # Chunk'larda qattiq tekshiruvni o'chirish
+                            model="deepseek-reasoner",
+                            timeout=MAX_AI_SECONDS + 90,
+                            cancel_check=cancel_check
                         )
                     except Exception as e:
                         logger.error(f"AI (reasoner) error for chunk {chunk_idx + 1}/{num_chunks}: {e}", exc_info=True)
-                        chunk_result = None
-                except Exception as e:
-                    logger.error(f"AI (chat) error for chunk {chunk_idx + 1}/{num_chunks}: {e}", exc_info=True)
-                    # Try reasoner as fallback even on error
-                    try:
+                        return chunk_idx, None
+            
+            await update_progress(chunks_progress(), f"🤖 AI {len(pending)} ta qismni tahlil qilmoqda...")
+            chunk_tasks = [asyncio.create_task(analyze_chunk(i, chunks[i])) for i in pending]
+            found_so_far = sum(len((r or {}).get("questions") or []) for r in chunk_outputs)
+            try:
+                for next_done in asyncio.as_completed(chunk_tasks):
+                    chunk_idx, chunk_result = await next_done
+                    chunk_outputs[chunk_idx] = chunk_result
+                    completed_chunks += 1
+                    
+                    # Tayyor qismni saqlash (AI javob bermagan yoki to'liq bo'lmagan qism keyin qayta so'raladi)
+                    if job_id and chunk_result is not None and not chunk_result.get("partial"):
+                        await async_storage.save_file_job_chunk(job_id, chunk_idx, chunk_hashes[chunk_idx], chunk_result)
+                    
+                    # Cancel tekshiruvi
+                    if cancel_check():
+                        await status_msg.edit_text("❌ Jarayon bekor qilindi.")
+                        context.user_data.pop('cancel_file_processing', None)
+                        context.user_data.pop('file_processing', None)
+                        return None
+                    
+                    if chunk_result and chunk_result.get("questions"):
+                        found_so_far += len(chunk_result.get("questions") or [])
                         await update_progress(
-                            base_progress + int((40 / num_chunks) * 0.5),
-                            f"🧠 Qism {chunk_idx + 1}/{num_chunks} uchun reasoner urinmoqda..."
+                            chunks_progress(),
+                            f"✅ Qism {chunk_idx + 1}/{num_chunks} tayyor ({completed_chunks}/{num_chunks} qism, ~{found_so_far} ta savol)"
                         )
-                        chunk_result = await asyncio.wait_for(
-                            ai_parser.analyze_with_ai(
-                                sanitize_ai_input(chunk_text),
-                                progress_callback=chunk_progress_callback,
-                                strict_correct=False,  # Chunk'larda qattiq tekshiruvni o'chirish
-                                model="deepseek-reasoner",
-                                cancel_check=cancel_check
-                            ),
-                            timeout=MAX_AI_SECONDS + 90  # Timeout'ni oshirish
+                    else:
+                        await update_progress(
+                            chunks_progress(),
+                            f"⚠️ Qism {chunk_idx + 1}/{num_chunks} da savollar topilmadi ({completed_chunks}/{num_chunks} qism)"
                         )
-                    except Exception as e2:
-                        logger.error(f"AI (reasoner) error for chunk {chunk_idx + 1}/{num_chunks}: {e2}", exc_info=True)
-                        chunk_result = None
-                
-                heartbeat_stop = True
-                try:
-                    hb_task.cancel()
-                except Exception:
-                    pass
-                
+            finally:
+                for task in chunk_tasks:
+                    if not task.done():
+                        task.cancel()
+            
+            return chunk_outputs
+        
+        if algo_parsed and len(algo_parsed) >= MIN_QUESTIONS_REQUIRED:
+            # Bosqichli pipeline: algoritmik savollar + faqat qoldiq uchun AI
+            logger.info(
+                f"Algoritmik parser: {len(algo_parsed)} ta savol, "
+                f"AI'ga {len(algo_residue)} ta qoldiq qism ({sum(len(r) for _, r in algo_residue)} belgi)"
+            )
+            
+            # AI parsing uchun tarif tekshiruvi (to'g'ri javoblarni aniqlash ham AI orqali)
+            if not is_admin:
+                can_use_ai, error_msg = await can_use_ai_parsing(user_id)
+                if not can_use_ai:
+                    await status_msg.edit_text(error_msg)
+                    return
+            
+            ai_parser = AIParser(Config.DEEPSEEK_API_KEY, Config.DEEPSEEK_API_URL)
+            positioned = list(algo_parsed)
+            
+            # Qoldiq qismlar - har biri o'z satr raqami bilan (hujjat tartibi saqlanadi)
+            residue_chunks = []
+            for pos, span in algo_residue:
+                for part in split_into_chunks(span):
+                    if part.strip():
+                        residue_chunks.append((pos, part))
+            
+            if residue_chunks:
+                await update_progress(30, f"✅ {len(algo_parsed)} ta savol ajratildi, qolgan {len(residue_chunks)} qism AI'ga yuborilmoqda...")
+                residue_outputs = await run_ai_chunks(ai_parser, [part for _, part in residue_chunks])
+                if residue_outputs is None:
+                    return
+                for (pos, _), residue_result in zip(residue_chunks, residue_outputs):
+                    if not residue_result or not residue_result.get("questions"):
+                        continue
+                    for q in residue_result.get("questions") or []:
+                        positioned.append((pos, q))
+                    if not ai_title and residue_result.get("title"):
+                        ai_title = residue_result.get("title", "").strip()
+            
+            # sort barqaror - bitta qoldiq ichidagi AI savollari tartibi o'zgarmaydi
+            positioned.sort(key=lambda item: item[0])
+            questions = validate_questions([q for _, q in positioned], require_correct=False)
+            if not ai_title:
+                ai_title = os.path.splitext(file_name)[0] or file_name
+            
+            if len(questions) < MIN_QUESTIONS_REQUIRED:
+                await status_msg.edit_text(
+                    "❌ Fayldan yetarli test savollari topilmadi.\n\n"
+                    f"Topildi: {len(questions)} ta (minimum: {MIN_QUESTIONS_REQUIRED})\n\n"
+                    "ℹ️ Formatni aniqroq qilib qayta yuboring."
+                )
+                context.user_data.pop('file_processing', None)
+                return
+            
+            await update_progress(70, f"✅ {len(questions)} ta savol topildi")
+            
+        elif text_length > max_chars_per_chunk:  # If larger than max, split it
+            # Split text into chunks
+            chunks = split_into_chunks(text)
+            num_chunks = len(chunks)
+            logger.info(f"Large file detected ({text_length} chars), splitting into {num_chunks} chunks")
+            
+            await update_progress(30, f"📦 Fayl {num_chunks} qismga bo'linmoqda...")
+            
+            # AI parsing uchun tarif tekshiruvi
+            if not is_admin:
+                can_use_ai, error_msg = await can_use_ai_parsing(user_id)
+                if not can_use_ai:
+                    await status_msg.edit_text(error_msg)
+                    return
+            
+            ai_parser = AIParser(Config.DEEPSEEK_API_KEY, Config.DEEPSEEK_API_URL)
+            chunk_outputs = await run_ai_chunks(ai_parser, chunks)
+            if chunk_outputs is None:
+                return
+            
+            # Natijalarni asl tartibda yig'ish
+            for chunk_idx, (chunk_text, chunk_result) in enumerate(zip(chunks, chunk_outputs)):
                 if chunk_result and chunk_result.get("questions"):
                     chunk_questions = validate_questions(chunk_result.get("questions", []), require_correct=False)
-                    
-                    # Har bir savol topilganda xabar berish
-                    for q_idx, question in enumerate(chunk_questions, 1):
-                        total_found = len(all_questions) + q_idx
-                        await update_progress(
-                            30 + int(((chunk_idx + 1) / num_chunks) * 40),
-                            f"✅ {total_found} ta savol topildi! (Qism {chunk_idx + 1}/{num_chunks})"
-                        )
-                        await asyncio.sleep(0.1)  # Kichik kechikish - xabarlar ko'rinishi uchun
-                    
                     all_questions.extend(chunk_questions)
                     if not ai_title and chunk_result.get("title"):
                         ai_title = chunk_result.get("title", "").strip()
@@ -1554,10 +1802,6 @@ async def process_file_background(
                         'questions': len(chunk_questions),
                         'chunk_size': len(chunk_text)
                     })
-                    await update_progress(
-                        30 + int(((chunk_idx + 1) / num_chunks) * 40),
-                        f"✅ Qism {chunk_idx + 1}/{num_chunks} tayyor ({len(chunk_questions)} savol, jami: {len(all_questions)} ta)"
-                    )
                 else:
                     # Log why chunk failed
                     if chunk_result is None:
@@ -1579,10 +1823,6 @@ async def process_file_background(
                         'reason': reason,
                         'chunk_size': len(chunk_text)
                     })
-                    await update_progress(
-                        30 + int(((chunk_idx + 1) / num_chunks) * 40),
-                        f"⚠️ Qism {chunk_idx + 1}/{num_chunks} da savollar topilmadi"
-                    )
             
             # Combine all questions
             questions = all_questions
@@ -1660,7 +1900,7 @@ async def process_file_background(
             
             # AI parsing uchun tarif tekshiruvi
             if not is_admin:
-                can_use_ai, error_msg = can_use_ai_parsing(user_id)
+                can_use_ai, error_msg = await can_use_ai_parsing(user_id)
                 if not can_use_ai:
                     await status_msg.edit_text(error_msg)
                     return
@@ -2195,7 +2435,7 @@ async def process_file_background(
         if without_correct > 0:
             try:
                 await context.bot.send_message(
-                    chat_id=message.chat_id,
+                    chat_id=chat_id,
                     text=f"ℹ️ {without_correct} ta savolda to'g'ri javob topilmadi — ular oddiy poll sifatida ishlaydi."
                 )
             except Exception:
@@ -2208,8 +2448,6 @@ async def process_file_background(
             )
             return
 
-        user_id = message.from_user.id
-        chat_id = message.chat_id
         title_to_save = (ai_title[:100] if ai_title else file_name)
         
         # Check if we need to split into multiple quizzes
@@ -2248,7 +2486,7 @@ async def process_file_background(
                 else:
                     chunk_title = title_to_save
                 
-                storage.save_quiz(quiz_id, chunk_questions, user_id, chat_id, chunk_title)
+                await async_storage.save_quiz(quiz_id, chunk_questions, user_id, chat_id, chunk_title)
                 created_quizzes.append({
                     'quiz_id': quiz_id,
                     'title': chunk_title,
@@ -2306,7 +2544,7 @@ async def process_file_background(
                 questions = questions[:MAX_QUESTIONS_PER_QUIZ]
             try:
                 await context.bot.send_message(
-                    chat_id=message.chat_id,
+                    chat_id=chat_id,
                     text=f"ℹ️ Juda ko'p savol topildi. Cheklov: {MAX_QUESTIONS_PER_QUIZ} ta savol saqlandi."
                 )
             except Exception:
@@ -2315,7 +2553,7 @@ async def process_file_background(
         quiz_content = json.dumps(questions, sort_keys=True)
         quiz_id = hashlib.md5(quiz_content.encode()).hexdigest()[:12]
         
-        storage.save_quiz(quiz_id, questions, user_id, chat_id, title_to_save)
+        await async_storage.save_quiz(quiz_id, questions, user_id, chat_id, title_to_save)
         
         keyboard = [
             [InlineKeyboardButton("🚀 Quizni boshlash", callback_data=f"quiz_menu_{quiz_id}")],
@@ -5,9 +5,10 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from bot.config import Config
-from bot.models import storage
+from bot.models import storage, async_storage, activity_buffer
 from bot.utils.helpers import is_vip_user
-from bot.services.quiz_service import advance_due_sessions
+from bot.services.channel_membership import get_unsubscribed_channels
+from bot.services.ingestion_queue import ingestion_queue
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +42,7 @@ def track_update(update: Update):
         user = update.effective_user
         chat = update.effective_chat
         if user:
-            storage.track_user(
+            activity_buffer.track_user(
                 user_id=user.id,
                 username=getattr(user, "username", None),
                 first_name=getattr(user, "first_name", None),
@@ -50,7 +51,7 @@ def track_update(update: Update):
                 last_chat_type=getattr(chat, "type", None) if chat else None,
             )
         if chat and getattr(chat, "type", None) in ['group', 'supergroup']:
-            storage.track_group(
+            activity_buffer.track_group(
                 chat_id=chat.id,
                 title=getattr(chat, "title", None),
                 chat_type=getattr(chat, "type", None),
@@ -62,7 +63,6 @@ def track_update(update: Update):
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command"""
     track_update(update)
-    await advance_due_sessions(context)
     chat_type = update.effective_chat.type
     
     if chat_type in ['group', 'supergroup']:
@@ -72,54 +72,39 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Majburiy obuna kanallarini tekshirish
-    required_channels = storage.get_required_channels()
-    if required_channels:
-        user_id = update.effective_user.id
-        not_subscribed = []
+    # Majburiy obuna kanallarini tekshirish (natijalar cache'lanadi, kanallar parallel tekshiriladi)
+    not_subscribed = await get_unsubscribed_channels(context.bot, update.effective_user.id)
+    if not_subscribed:
+        text = "📢 **Majburiy obuna**\n\n"
+        text += "Botdan foydalanish uchun quyidagi kanallarga obuna bo'lishingiz kerak:\n\n"
         
-        for ch in required_channels:
-            channel_id = ch.get('channel_id')
-            try:
-                member = await context.bot.get_chat_member(channel_id, user_id)
-                if member.status in ['left', 'kicked']:
-                    not_subscribed.append(ch)
-            except Exception as e:
-                logger.error(f"Channel subscription check error: {e}")
-                # Agar xatolik bo'lsa, kanalni not_subscribed ga qo'shamiz
-                not_subscribed.append(ch)
-        
-        if not_subscribed:
-            text = "📢 **Majburiy obuna**\n\n"
-            text += "Botdan foydalanish uchun quyidagi kanallarga obuna bo'lishingiz kerak:\n\n"
-            
-            buttons = []
-            for ch in not_subscribed:
-                ch_id = ch.get('channel_id')
-                ch_username = ch.get('channel_username', '')
-                ch_title = ch.get('channel_title', '')
-                
-                if ch_username:
-                    ch_link = f"https://t.me/{ch_username.lstrip('@')}"
-                    ch_name = ch_title or ch_username
-                else:
-                    ch_link = f"https://t.me/c/{str(ch_id)[4:]}" if str(ch_id).startswith('-100') else f"https://t.me/c/{str(ch_id)[1:]}"
-                    ch_name = ch_title or f"Channel {ch_id}"
-                
-                text += f"• {ch_name}\n"
-                buttons.append([InlineKeyboardButton(f"📢 {ch_name}", url=ch_link)])
+        buttons = []
+        for ch in not_subscribed:
+            ch_id = ch.get('channel_id')
+            ch_username = ch.get('channel_username', '')
+            ch_title = ch.get('channel_title', '')
             
-            text += "\nObuna bo'lgach, /start buyrug'ini qayta ishlating."
-            buttons.append([InlineKeyboardButton("✅ Obuna bo'ldim", callback_data="check_subscription")])
+            if ch_username:
+                ch_link = f"https://t.me/{ch_username.lstrip('@')}"
+                ch_name = ch_title or ch_username
+            else:
+                ch_link = f"https://t.me/c/{str(ch_id)[4:]}" if str(ch_id).startswith('-100') else f"https://t.me/c/{str(ch_id)[1:]}"
+                ch_name = ch_title or f"Channel {ch_id}"
             
-            markup = InlineKeyboardMarkup(buttons)
-            
-            await update.message.reply_text(
-                text,
-                reply_markup=markup,
-                parse_mode=ParseMode.MARKDOWN
-            )
-            return
+            text += f"• {ch_name}\n"
+            buttons.append([InlineKeyboardButton(f"📢 {ch_name}", url=ch_link)])
+        
+        text += "\nObuna bo'lgach, /start buyrug'ini qayta ishlating."
+        buttons.append([InlineKeyboardButton("✅ Obuna bo'ldim", callback_data="check_subscription")])
+        
+        markup = InlineKeyboardMarkup(buttons)
+        
+        await update.message.reply_text(
+            text,
+            reply_markup=markup,
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
     
     if is_sudo_user(update.effective_user.id):
         welcome_message = """
@@ -159,7 +144,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Yordam"""
     track_update(update)
-    await advance_due_sessions(context)
     help_text = """
 📖 **Yordam**
 
@@ -196,7 +180,10 @@ async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     track_update(update)
     user_id = update.effective_user.id
     
-    # File processing bekor qilish
+    # File processing bekor qilish (navbatdagi va bajarilayotgan fayllar - slot darhol bo'shaydi)
+    if ingestion_queue.cancel_user(user_id):
+        await update.message.reply_text("✅ Fayl tahlil qilish jarayoni bekor qilindi.")
+        return
     if context.user_data.get('file_processing'):
         if context.user_data.get('file_processing_user') == user_id:
             context.user_data['cancel_file_processing'] = True
@@ -227,7 +214,6 @@ async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def myresults_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Foydalanuvchining oxirgi natijalari"""
     track_update(update)
-    await advance_due_sessions(context)
     
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
@@ -235,7 +221,7 @@ async def myresults_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Guruhda - faqat guruhdagi natijalar
     if chat_type in ['group', 'supergroup']:
-        results = storage.get_user_results_in_group(user_id, chat_id, limit=15)
+        results = await async_storage.get_user_results_in_group(user_id, chat_id, limit=15)
         if not results:
             await update.message.reply_text("📭 Bu guruhda hozircha natijalaringiz yo'q.")
             return
@@ -253,14 +239,14 @@ async def myresults_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"• Jami to'g'ri javoblar: **{total_correct}/{total_questions}**\n"
         text += f"• O'rtacha natija: **{avg_percentage:.1f}%**\n"
         if best_result:
-            quiz = storage.get_quiz(best_result.get('quiz_id', ''))
+            quiz = await async_storage.get_quiz(best_result.get('quiz_id', ''))
             quiz_title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
             text += f"• Eng yaxshi natija: **{best_result.get('percentage', 0):.1f}%** ({quiz_title})\n"
         text += "\n📋 **Oxirgi natijalar:**\n\n"
         
         for r in results[:10]:  # Faqat 10 ta ko'rsatamiz
             quiz_id = r.get('quiz_id')
-            quiz = storage.get_quiz(quiz_id) if quiz_id else None
+            quiz = await async_storage.get_quiz(quiz_id) if quiz_id else None
             title = (quiz or {}).get('title') or quiz_id or "Quiz"
             correct = r.get('correct_count', 0)
             total = r.get('total_count', 0)
@@ -276,7 +262,7 @@ async def myresults_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Shaxsiy chatda - barcha natijalar
-    results = storage.get_user_results(user_id, limit=15)
+    results = await async_storage.get_user_results(user_id, limit=15)
     if not results:
         await update.message.reply_text("📭 Hozircha natijalaringiz yo'q.")
         return
@@ -284,7 +270,7 @@ async def myresults_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = "🏅 **Mening natijalarim (oxirgilar):**\n\n"
     for r in results:
         quiz_id = r.get('quiz_id')
-        quiz = storage.get_quiz(quiz_id) if quiz_id else None
+        quiz = await async_storage.get_quiz(quiz_id) if quiz_id else None
         title = (quiz or {}).get('title') or quiz_id or "Quiz"
         correct = r.get('correct_count', 0)
         total = r.get('total_count', 0)
@@ -320,15 +306,15 @@ async def sardorbek_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Sardorbek ma'lumotlarini olish
-    vip_info = storage.get_vip_user(sardorbek_id)
+    vip_info = await async_storage.get_vip_user(sardorbek_id)
     if not vip_info:
         # Agar VIP user bo'lmasa, qo'shamiz
-        storage.add_vip_user(sardorbek_id, nickname="Sardorbek ⭐")
-        vip_info = storage.get_vip_user(sardorbek_id)
+        await async_storage.add_vip_user(sardorbek_id, nickname="Sardorbek ⭐")
+        vip_info = await async_storage.get_vip_user(sardorbek_id)
     
     # Statistika
-    results = storage.get_user_results(sardorbek_id, limit=100)
-    quizzes = storage.get_user_quizzes(sardorbek_id)
+    results = await async_storage.get_user_results(sardorbek_id, limit=100)
+    quizzes = await async_storage.get_user_quizzes(sardorbek_id)
     
     total_quizzes = len(quizzes)
     total_results = len(results)
@@ -353,7 +339,7 @@ async def sardorbek_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"• Jami to'g'ri javoblar: **{total_correct}/{total_questions}**\n"
         text += f"• O'rtacha natija: **{avg_percentage:.1f}%**\n"
         if best_result:
-            quiz = storage.get_quiz(best_result.get('quiz_id', ''))
+            quiz = await async_storage.get_quiz(best_result.get('quiz_id', ''))
             quiz_title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
             text += f"• Eng yaxshi natija: **{best_result.get('percentage', 0):.1f}%** ({quiz_title})\n"
     
@@ -388,7 +374,7 @@ async def vipstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # VIP user ma'lumotlari
-    vip_info = storage.get_vip_user(user_id)
+    vip_info = await async_storage.get_vip_user(user_id)
     if not vip_info:
         # Agar VIP user bo'lmasa, lekin admin bo'lsa
         if Config.is_admin(user_id):
@@ -398,10 +384,10 @@ async def vipstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
     
     # Barcha natijalar
-    all_results = storage.get_user_results(user_id, limit=1000)
+    all_results = await async_storage.get_user_results(user_id, limit=1000)
     
     # Barcha quizlar
-    all_quizzes = storage.get_user_quizzes(user_id)
+    all_quizzes = await async_storage.get_user_quizzes(user_id)
     
     # Guruhlar bo'yicha statistika
     group_stats = {}
@@ -450,7 +436,7 @@ async def vipstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"• Umumiy foiz: **{overall_percentage:.1f}%**\n"
         text += f"• O'rtacha natija: **{avg_percentage:.1f}%**\n"
         if best_result:
-            quiz = storage.get_quiz(best_result.get('quiz_id', ''))
+            quiz = await async_storage.get_quiz(best_result.get('quiz_id', ''))
             quiz_title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
             text += f"• Eng yaxshi natija: **{best_result.get('percentage', 0):.1f}%** ({quiz_title})\n"
         if avg_time > 0:
@@ -6,7 +6,7 @@ Telegram Quiz Bot - Asosiy fayl (Modullashtirilgan)
 import os
 import logging
 from dotenv import load_dotenv
-from telegram.ext import Application, PicklePersistence
+from telegram.ext import Application
 from telegram import MenuButtonCommands, BotCommand, BotCommandScopeDefault
 
 # Load environment variables
@@ -31,24 +31,58 @@ if Config.ENVIRONMENT == 'production':
 from bot.handlers import register_handlers
 
 # Storage import
-from bot.models import storage
+from bot.models import async_storage
 
 
 async def periodic_cleanup(context):
     """Periodik tozalash - har 10 daqiqada bir marta"""
     try:
-        from bot.services.quiz_service import cleanup_inactive_sessions, advance_due_sessions
+        from bot.services.quiz_service import cleanup_inactive_sessions, advance_due_sessions, sweep_stats
         # JobQueue callback'da context.application qaytaradi
         application = context.application if hasattr(context, 'application') else context
         # Inactive sessionlarni tozalash
         await cleanup_inactive_sessions(application, max_age_seconds=3600)  # 1 soatdan eski sessionlar
         # Stuck sessionlarni ham tekshirish
         await advance_due_sessions(application)
-        logger.info("🧹 Periodic cleanup: inactive sessionlar tozalandi va stuck sessionlar tekshirildi")
+        logger.info(
+            f"🧹 Periodic cleanup: inactive sessionlar tozalandi va stuck sessionlar tekshirildi "
+            f"(sweep: runs={sweep_stats['runs']}, checked={sweep_stats['sessions_checked']}, "
+            f"advanced={sweep_stats['advanced']}, stuck={sweep_stats['stuck_cleaned']}, "
+            f"last={sweep_stats['last_duration_ms']:.1f}ms)"
+        )
     except Exception as e:
         logger.error(f"❌ Periodic cleanup xatolik: {e}", exc_info=True)
 
 
+async def periodic_session_sweep(context):
+    """Due sessionlarni fon rejimida keyingi savolga o'tkazish (har update'da emas)"""
+    try:
+        from bot.services.quiz_service import advance_due_sessions
+        application = context.application if hasattr(context, 'application') else context
+        await advance_due_sessions(application)
+    except Exception as e:
+        logger.error(f"❌ Session sweep xatolik: {e}", exc_info=True)
+
+
+async def flush_activity_buffer(context):
+    """Buffer'dagi user/guruh tracking yozuvlarini bulk upsert bilan yozish"""
+    try:
+        from bot.models import activity_buffer
+        written = await activity_buffer.flush(async_storage)
+        if written:
+            logger.debug(f"💾 Activity buffer: {written} ta yozuv saqlandi")
+    except Exception as e:
+        logger.error(f"❌ Activity buffer flush xatolik: {e}", exc_info=True)
+
+
+async def refresh_role_index(context):
+    """Sudo/VIP/premium indeksini DB bilan sinxronlash (boshqa process o'zgartirgan bo'lsa)"""
+    try:
+        await async_storage.load_role_index()
+    except Exception as e:
+        logger.error(f"❌ Role index refresh xatolik: {e}", exc_info=True)
+
+
 async def periodic_status_report(context):
     """Periodik holat hisoboti - Gmail orqali yuborish"""
     try:
@@ -62,9 +96,21 @@ async def periodic_status_report(context):
 
 async def post_init(application):
     """Bot ishga tushgandan keyin sozlamalar"""
+    # Rollar indeksi (sudo/VIP/premium tekshiruvlari DB'ga bormasdan bajariladi)
+    try:
+        if await async_storage.load_role_index():
+            logger.info(f"✅ Role index yuklandi: {async_storage.role_index.stats()}")
+        else:
+            logger.warning("⚠️ Role index yuklanmadi, rollar DB'dan tekshiriladi")
+    except Exception as e:
+        logger.error(f"❌ Role index yuklashda xatolik: {e}", exc_info=True)
+    
     # Faol seanslarni tiklash va davom ettirish
     try:
         from bot.services.quiz_service import advance_due_sessions, cleanup_inactive_sessions
+        from bot.services.session_manager import get_session_registry
+        # Persistence'dan tiklangan sessionlarni indekslash (eski dict formatini yozuvga aylantiradi)
+        get_session_registry(application.bot_data)
         # Birinchi marta cleanup va advance qilamiz
         await cleanup_inactive_sessions(application)
         await advance_due_sessions(application)
@@ -72,6 +118,24 @@ async def post_init(application):
     except Exception as e:
         logger.error(f"❌ Faol seanslarni tiklashda xatolik: {e}", exc_info=True)
     
+    # Restart'dan oldin tugallanmagan fayl tahlillarini davom ettirish (tayyor qismlar checkpoint'dan)
+    try:
+        from bot.handlers.quiz import resume_file_jobs
+        resumed = await resume_file_jobs(application)
+        if resumed:
+            logger.info(f"♻️ {resumed} ta fayl tahlili davom ettirildi")
+    except Exception as e:
+        logger.error(f"❌ Fayl tahlillarini davom ettirishda xatolik: {e}", exc_info=True)
+    
+    # Yakunlanmagan broadcast'larni qolgan qabul qiluvchilar bilan davom ettirish
+    try:
+        from bot.services.broadcast import resume_broadcasts
+        resumed = await resume_broadcasts(application)
+        if resumed:
+            logger.info(f"♻️ {resumed} ta broadcast davom ettirildi")
+    except Exception as e:
+        logger.error(f"❌ Broadcast'larni davom ettirishda xatolik: {e}", exc_info=True)
+    
     # Periodic cleanup task qo'shish (har 10 daqiqada)
     try:
         job_queue = application.job_queue
@@ -83,6 +147,28 @@ async def post_init(application):
                 name="periodic_cleanup"
             )
             logger.info("✅ Periodic cleanup task qo'shildi (har 10 daqiqada)")
+            job_queue.run_repeating(
+                periodic_session_sweep,
+                interval=Config.SESSION_SWEEP_INTERVAL,
+                first=Config.SESSION_SWEEP_INTERVAL,
+                name="periodic_session_sweep"
+            )
+            logger.info(f"✅ Session sweep task qo'shildi (har {Config.SESSION_SWEEP_INTERVAL} sekundda)")
+            job_queue.run_repeating(
+                flush_activity_buffer,
+                interval=Config.ACTIVITY_FLUSH_INTERVAL,
+                first=Config.ACTIVITY_FLUSH_INTERVAL,
+                name="flush_activity_buffer"
+            )
+            logger.info(f"✅ Activity buffer flush task qo'shildi (har {Config.ACTIVITY_FLUSH_INTERVAL} sekundda)")
+            if Config.ROLE_INDEX_REFRESH_INTERVAL > 0:
+                job_queue.run_repeating(
+                    refresh_role_index,
+                    interval=Config.ROLE_INDEX_REFRESH_INTERVAL,
+                    first=Config.ROLE_INDEX_REFRESH_INTERVAL,
+                    name="refresh_role_index"
+                )
+                logger.info(f"✅ Role index refresh task qo'shildi (har {Config.ROLE_INDEX_REFRESH_INTERVAL} sekundda)")
         else:
             logger.warning("⚠️ JobQueue topilmadi, periodic cleanup qo'shilmadi")
     except Exception as e:
@@ -170,8 +256,8 @@ async def post_init(application):
     # Sardorbekni VIP user qilib qo'shish
     try:
         sardorbek_id = 6444578922
-        if not storage.is_vip_user(sardorbek_id):
-            storage.add_vip_user(sardorbek_id, nickname="Sardorbek ⭐")
+        if not await async_storage.is_vip_user(sardorbek_id):
+            await async_storage.add_vip_user(sardorbek_id, nickname="Sardorbek ⭐")
             logger.info(f"✅ Sardorbek ({sardorbek_id}) VIP user qilib qo'shildi")
         else:
             logger.info(f"ℹ️ Sardorbek ({sardorbek_id}) allaqachon VIP user")
@@ -179,6 +265,78 @@ async def post_init(application):
         logger.error(f"❌ Sardorbekni VIP user qilib qo'shishda xatolik: {e}", exc_info=True)
 
 
+async def post_stop(application):
+    """Update'lar to'xtagach (bot hali yopilmagan) fondagi ishlarni to'xtatish"""
+    # Fayl tahlillari to'xtatiladi, checkpoint'lar DB'da qoladi - restart'dan keyin davom etadi
+    try:
+        from bot.services.ingestion_queue import ingestion_queue
+        await ingestion_queue.stop()
+    except Exception as e:
+        logger.error(f"❌ Fayl tahlil navbatini to'xtatishda xatolik: {e}", exc_info=True)
+    
+    # Broadcast'lar bekor qilinadi, yetkazish holati saqlanadi - restart'dan keyin davom etadi
+    try:
+        from bot.services.broadcast import stop_broadcasts
+        await stop_broadcasts()
+    except Exception as e:
+        logger.error(f"❌ Broadcast'larni to'xtatishda xatolik: {e}", exc_info=True)
+
+
+async def post_shutdown(application):
+    """Bot to'xtaganda resurslarni bo'shatish"""
+    try:
+        from bot.services.question_scheduler import question_scheduler
+        await question_scheduler.shutdown()
+    except Exception as e:
+        logger.error(f"❌ Question scheduler to'xtatishda xatolik: {e}", exc_info=True)
+    
+    try:
+        from bot.services.ai_parser import AIParser
+        await AIParser.aclose()
+    except Exception as e:
+        logger.error(f"❌ AI HTTP client yopishda xatolik: {e}", exc_info=True)
+    
+    try:
+        from bot.services.extraction_pool import extraction_pool
+        extraction_pool.shutdown()
+    except Exception as e:
+        logger.error(f"❌ Matn ajratish pool'ini to'xtatishda xatolik: {e}", exc_info=True)
+    
+    # Buffer'da qolgan tracking yozuvlarini executor yopilishidan oldin yozish
+    try:
+        from bot.models import activity_buffer
+        await activity_buffer.flush(async_storage)
+    except Exception as e:
+        logger.error(f"❌ Activity buffer flush xatolik: {e}", exc_info=True)
+    
+    # Fonda yozilayotgan quiz natijalarini kutish
+    try:
+        from bot.services.quiz_service import drain_pending_result_writes
+        await drain_pending_result_writes()
+    except Exception as e:
+        logger.error(f"❌ Natijalarni yozishni kutishda xatolik: {e}", exc_info=True)
+    
+    # post_stop chaqirilmagan bo'lsa ham - executor yopilishidan oldin
+    # fayl tahlillari va broadcast'lar to'xtatilsin (checkpoint/holat saqlanadi)
+    try:
+        from bot.services.ingestion_queue import ingestion_queue
+        await ingestion_queue.stop()
+    except Exception as e:
+        logger.error(f"❌ Fayl tahlil navbatini to'xtatishda xatolik: {e}", exc_info=True)
+    
+    try:
+        from bot.services.broadcast import stop_broadcasts
+        await stop_broadcasts()
+    except Exception as e:
+        logger.error(f"❌ Broadcast'larni to'xtatishda xatolik: {e}", exc_info=True)
+    
+    try:
+        async_storage.shutdown(wait=True)
+        logger.info("✅ Storage executor to'xtatildi")
+    except Exception as e:
+        logger.error(f"❌ Storage executor to'xtatishda xatolik: {e}", exc_info=True)
+
+
 def main():
     """Bot ishga tushirish"""
     logger.info("🚀 Quiz Bot ishga tushmoqda (Modullashtirilgan)...")
@@ -193,11 +351,19 @@ def main():
     # Persistence - data/ papkasida saqlash
     persistence_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
     os.makedirs(persistence_dir, exist_ok=True)
-    persistence_file = os.path.join(persistence_dir, 'bot_persistence.pickle')
-    persistence = PicklePersistence(filepath=persistence_file)
+    # Har bir session/poll alohida yozuv - flush faqat o'zgarganlarni yozadi
+    from bot.models.persistence import SQLitePersistence
+    persistence = SQLitePersistence(
+        filepath=os.path.join(persistence_dir, 'bot_persistence.sqlite3'),
+        legacy_pickle_path=os.path.join(persistence_dir, 'bot_persistence.pickle'),
+        update_interval=Config.PERSISTENCE_UPDATE_INTERVAL,
+    )
+    
+    # Barcha Bot API so'rovlari umumiy/per-chat token bucket'lar va ustuvorlik yo'laklari orqali o'tadi
+    from bot.services.egress import egress_scheduler
     
     # Application yaratish
-    application = Application.builder().token(Config.BOT_TOKEN).persistence(persistence).post_init(post_init).build()
+    application = Application.builder().token(Config.BOT_TOKEN).persistence(persistence).rate_limiter(egress_scheduler).post_init(post_init).post_stop(post_stop).post_shutdown(post_shutdown).build()
     
     # Handlerlarni ro'yxatdan o'tkazish
     register_handlers(application)
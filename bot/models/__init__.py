@@ -20,3 +20,13 @@ else:
     storage = Storage()
     logger.info("✅ JSON Storage ishlatilmoqda")
 
+
+# Async facade - handlerlar va servislar DB chaqiruvlarini event loop'ni bloklamasdan bajaradi
+# JSON Storage fayl bilan read-modify-write qiladi, shuning uchun bitta worker ishlatiladi
+from bot.models.async_storage import AsyncStorage
+_storage_workers = Config.DB_EXECUTOR_WORKERS if type(storage).__name__ == 'StorageDB' else 1
+async_storage = AsyncStorage(storage, max_workers=_storage_workers)
+
+# User/guruh faolligi xotirada birlashtiriladi va davriy bulk upsert bilan yoziladi
+from bot.models.activity_buffer import ActivityBuffer
+activity_buffer = ActivityBuffer(window_seconds=Config.LAST_SEEN_WINDOW)
@@ -0,0 +1,151 @@
+"""User/guruh faolligini yozish uchun write-behind buffer
+
+`track_user` / `track_group` har bir xabar, callback va poll javobida
+chaqiriladi. Har chaqiruvni darhol DB'ga yozish (SELECT + UPDATE + COMMIT)
+o'rniga, o'zgarishlar xotirada user/chat id bo'yicha birlashtiriladi va
+davriy ravishda bitta bulk upsert bilan yoziladi. Ma'lumotlari o'zgarmagan
+user uchun `last_seen` `window_seconds` ichida qayta yozilmaydi.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+USER_FIELDS = ('username', 'first_name', 'last_name', 'last_chat_id', 'last_chat_type')
+GROUP_FIELDS = ('title', 'chat_type', 'bot_status', 'bot_is_admin')
+# None kelsa avvalgi qiymat saqlanadigan maydonlar (masalan, poll javobida chat yo'q)
+USER_COALESCE_FIELDS = ('last_chat_id', 'last_chat_type')
+
+
+class _Tracker:
+    """Bitta jadval (users yoki groups) uchun kutayotgan yozuvlar"""
+
+    def __init__(self, key_name: str, fields: Tuple[str, ...], coalesce: Tuple[str, ...]):
+        self.key_name = key_name
+        self.fields = fields
+        self.coalesce = coalesce
+        self.pending: Dict[int, Dict] = {}
+        # Oxirgi yozilgan qiymatlar va vaqt: key -> (fields, monotonic)
+        self.flushed: Dict[int, Tuple[Dict, float]] = {}
+
+    def add(self, key: int, values: Dict, now: float, window: float) -> bool:
+        """Yozuvni buffer'ga qo'shish; keraksiz bo'lsa False"""
+        current = self.pending.get(key)
+        if current is None:
+            prev = self.flushed.get(key)
+            if prev is not None and now - prev[1] < window:
+                prev_values = prev[0]
+                if all(prev_values.get(f) == v for f, v in values.items()
+                       if v is not None or f not in self.coalesce):
+                    return False
+            current = self.pending[key] = {self.key_name: key}
+        for f, v in values.items():
+            if v is None and f in self.coalesce:
+                continue
+            current[f] = v
+        current['last_seen'] = datetime.utcnow()
+        return True
+
+    def drain(self, now: float, window: float) -> List[Dict]:
+        rows = list(self.pending.values())
+        self.pending = {}
+        for row in rows:
+            key = row[self.key_name]
+            prev = self.flushed.get(key)
+            merged = dict(prev[0]) if prev is not None else {}
+            merged.update({f: row[f] for f in self.fields if f in row})
+            self.flushed[key] = (merged, now)
+        # Eskirgan yozuvlarni vaqti-vaqti bilan tozalash (xotira o'smasligi uchun)
+        if len(self.flushed) > 20000:
+            cutoff = now - window
+            self.flushed = {k: v for k, v in self.flushed.items() if v[1] >= cutoff}
+        return rows
+
+    def requeue(self, rows: List[Dict]):
+        """Yozib bo'lmagan qatorlarni qaytarish (yangiroq pending ustun)"""
+        for row in rows:
+            key = row[self.key_name]
+            self.flushed.pop(key, None)
+            newer = self.pending.get(key)
+            self.pending[key] = {**row, **newer} if newer else row
+
+
+class ActivityBuffer:
+    """track_user/track_group chaqiruvlarini birlashtiruvchi buffer"""
+
+    def __init__(self, window_seconds: float = 300):
+        self.window_seconds = float(window_seconds)
+        self._users = _Tracker('user_id', USER_FIELDS, USER_COALESCE_FIELDS)
+        self._groups = _Tracker('chat_id', GROUP_FIELDS, GROUP_FIELDS)
+        self._lock = threading.Lock()
+        self.events = 0
+        self.skipped = 0
+        self.flushed_rows = 0
+
+    def track_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None,
+                   last_chat_id: int = None, last_chat_type: str = None):
+        values = {
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'last_chat_id': last_chat_id,
+            'last_chat_type': last_chat_type,
+        }
+        self._add(self._users, user_id, values)
+
+    def track_group(self, chat_id: int, title: str = None, chat_type: str = None,
+                    bot_status: str = None, bot_is_admin: bool = None):
+        values = {
+            'title': title,
+            'chat_type': chat_type,
+            'bot_status': bot_status,
+            'bot_is_admin': bot_is_admin,
+        }
+        self._add(self._groups, chat_id, values)
+
+    def _add(self, tracker: _Tracker, key: int, values: Dict):
+        with self._lock:
+            self.events += 1
+            if not tracker.add(key, values, time.monotonic(), self.window_seconds):
+                self.skipped += 1
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._users.pending) + len(self._groups.pending)
+
+    async def flush(self, async_storage) -> int:
+        """Kutayotgan yozuvlarni bulk upsert bilan yozish (qaytaradi: yozilgan qatorlar)"""
+        with self._lock:
+            now = time.monotonic()
+            users = self._users.drain(now, self.window_seconds)
+            groups = self._groups.drain(now, self.window_seconds)
+        if not users and not groups:
+            return 0
+
+        written = 0
+        for tracker, rows, method in (
+            (self._users, users, 'track_users_bulk'),
+            (self._groups, groups, 'track_groups_bulk'),
+        ):
+            if not rows:
+                continue
+            try:
+                await getattr(async_storage, method)(rows)
+                written += len(rows)
+            except Exception as e:
+                logger.error(f"❌ Activity buffer flush xatolik ({method}, {len(rows)} ta): {e}", exc_info=True)
+                with self._lock:
+                    tracker.requeue(rows)
+        self.flushed_rows += written
+        return written
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'events': self.events,
+            'skipped': self.skipped,
+            'flushed_rows': self.flushed_rows,
+            'pending': self.pending_count(),
+        }
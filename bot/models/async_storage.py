@@ -0,0 +1,69 @@
+"""Async storage facade - blocking storage chaqiruvlarini executor'da bajarish"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStorage:
+    """StorageDB / Storage uchun async adapter
+
+    Har bir method sinxron storage bilan bir xil nom va argumentlarga ega,
+    lekin coroutine qaytaradi va blocking DB round-trip'ni cheklangan
+    ThreadPoolExecutor'da bajaradi. Shu tufayli sekin query event loop'ni
+    (quiz taymerlari, Telegram I/O) to'xtatib qo'ymaydi.
+    """
+
+    def __init__(self, storage, max_workers: int = 10):
+        self._storage = storage
+        self._max_workers = max(1, int(max_workers))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._wrappers = {}
+
+    @property
+    def sync(self):
+        """Asl (sinxron) storage obyekti"""
+        return self._storage
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Executor'ni lazy yaratish"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="storage"
+            )
+        return self._executor
+
+    async def run(self, func, *args, **kwargs) -> Any:
+        """Ixtiyoriy blocking funksiyani storage executor'ida bajarish"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs) if kwargs else functools.partial(func, *args)
+        return await loop.run_in_executor(self._get_executor(), call)
+
+    def __getattr__(self, name: str):
+        # Private atributlar va mavjud bo'lmagan methodlar uchun oddiy xatolik
+        if name.startswith('_'):
+            raise AttributeError(name)
+        target = getattr(self._storage, name)
+        if not callable(target):
+            return target
+
+        wrapper = self._wrappers.get(name)
+        if wrapper is None:
+            @functools.wraps(target)
+            async def wrapper(*args, **kwargs):
+                return await self.run(getattr(self._storage, name), *args, **kwargs)
+            self._wrappers[name] = wrapper
+        return wrapper
+
+    def shutdown(self, wait: bool = True):
+        """Executor'ni to'xtatish (bot to'xtaganda)"""
+        if self._executor is not None:
+            try:
+                self._executor.shutdown(wait=wait)
+            except Exception as e:
+                logger.warning(f"⚠️ Storage executor to'xtatishda xatolik: {e}")
+            self._executor = None
@@ -0,0 +1,47 @@
+"""Bitta qiymat uchun muddatli (TTL), versiyalangan cache"""
+import copy
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+
+class CachedValue:
+    """Kichik, kam o'zgaradigan ro'yxatlar uchun cache (masalan, majburiy kanallar)
+
+    QuizCache kabi versiya hisoblagichi bor: `invalidate()` dan oldin
+    boshlangan DB o'qish natijasi cache'ga yozilmaydi. Qaytariladigan
+    qiymat nusxa - chaqiruvchi cache'ni o'zgartira olmaydi.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = float(ttl_seconds)
+        self._value: Optional[Tuple[float, Any]] = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self) -> Tuple[bool, Any]:
+        """(topildimi, qiymat nusxasi)"""
+        with self._lock:
+            item = self._value
+            if item is None or item[0] < time.monotonic():
+                return False, None
+            value = item[1]
+        return True, copy.deepcopy(value)
+
+    def put(self, value: Any, version: int):
+        if self.ttl_seconds <= 0:
+            return
+        stored = copy.deepcopy(value)
+        with self._lock:
+            if version != self._version:
+                return
+            self._value = (time.monotonic() + self.ttl_seconds, stored)
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._version += 1
@@ -0,0 +1,389 @@
+"""Inkremental (yozuv bo'yicha) bot persistence - SQLite
+
+PicklePersistence har flush'da butun bot_data'ni (barcha sessionlar, pollar,
+chempionatlar, voting'lar) bitta faylga qayta pickle qilardi. Bu yerda har bir session, poll, bot_data kaliti, user va chat
+o'z yozuvi sifatida saqlanadi va flush'da faqat o'zgarganlari yoziladi:
+
+- sessionlar: `QuizSession.rev` reviziyasi oxirgi yozilgandan farq qilsa
+- pollar: faqat yangi qo'shilgan / o'chirilganlari (poll yozuvi o'zgarmaydi)
+- boshqa bot_data kalitlari: faqat "dirty" deb belgilanganlari - kalitga
+  yozish/o'chirish avtomatik belgilanadi, ichki obyektni o'zgartirgan kod
+  `mark_dirty(bot_data, kalit)` chaqiradi. Flush ishi umumiy holat hajmiga
+  emas, faollikka proporsional
+- user/chat data: PTB faqat update kelgan user/chat'larni beradi
+
+Eski `bot_persistence.pickle` fayli birinchi ishga tushishda import qilinadi.
+"""
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+# bot_data ichida alohida yozuv sifatida saqlanadigan kalitlar
+SESSIONS_KEY = 'sessions'
+POLLS_KEY = 'polls'
+# Endi bot_data'da saqlanmaydigan eski kalitlar (yuklashda tashlab yuboriladi)
+LEGACY_KEY_PREFIXES = ('_chat_title_',)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    kind  TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class PersistentBotData(dict):
+    """Application.bot_data uchun dict
+
+    PTB har update_interval'da bot_data'ni `deepcopy` qilib persistence'ga
+    beradi - bu butun holat hajmiga proporsional ish. Persistence o'zi jonli
+    obyekt bilan ishlagani uchun nusxa kerak emas: deepcopy o'zini qaytaradi.
+
+
+    Kalitga yozish/o'chirish kalitni "dirty" qiladi; ichki obyekt
+    (masalan, `bot_data['championships'][key]`) o'zgarganda chaqiruvchi
+    `mark_dirty()` bilan belgilaydi. Flush faqat dirty kalitlarni yozadi.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._dirty: set = set()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._dirty.add(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._dirty.add(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self._dirty.add(key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._dirty.add(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._dirty.add(key)
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        super().update(other)
+        self._dirty.update(other)
+
+    def clear(self):
+        self._dirty.update(self)
+        super().clear()
+
+    def mark_dirty(self, key):
+        self._dirty.add(key)
+
+    def take_dirty(self) -> set:
+        """Dirty kalitlarni olish va ro'yxatni tozalash"""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+
+def mark_dirty(bot_data: dict, key: str):
+    """bot_data[key] ichidagi obyekt o'zgardi - keyingi flush'da yozilsin
+
+    Persistence ulanmagan (oddiy dict) bo'lsa hech narsa qilmaydi.
+    """
+    marker = getattr(bot_data, 'mark_dirty', None)
+    if marker is not None:
+        marker(key)
+
+
+def _dumps(value) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class SQLitePersistence(BasePersistence):
+    """Har bir yozuvni alohida saqlaydigan, dirty-tracking'li persistence"""
+
+    def __init__(self, filepath: str, legacy_pickle_path: Optional[str] = None,
+                 update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.filepath = filepath
+        self.legacy_pickle_path = legacy_pickle_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._bot_data: Optional[PersistentBotData] = None
+        # Oxirgi yozilgan holat: session_key -> rev, poll_id'lar
+        self._saved_session_revs: Dict[str, int] = {}
+        self._saved_poll_ids: set = set()
+        self._conversations: Dict[str, dict] = {}
+        self.last_flush_stats: Dict[str, float] = {}
+
+    # ---------- SQLite ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.filepath, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._import_legacy_pickle()
+        return self._conn
+
+    def _load_kind(self, kind: str) -> List[Tuple[str, bytes]]:
+        with self._lock:
+            conn = self._connect()
+            return conn.execute("SELECT key, value FROM records WHERE kind = ?", (kind,)).fetchall()
+
+    def _write(self, upserts: Iterable[Tuple[str, str, bytes]], deletes: Iterable[Tuple[str, str]] = ()):
+        upserts = list(upserts)
+        deletes = list(deletes)
+        if not upserts and not deletes:
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO records (kind, key, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT(kind, key) DO UPDATE SET value = excluded.value",
+                        upserts,
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM records WHERE kind = ? AND key = ?", deletes)
+
+    async def _run(self, func, *args):
+        return await asyncio.to_thread(func, *args)
+
+    def _import_legacy_pickle(self):
+        """Eski PicklePersistence faylini bir marta import qilish"""
+        conn = self._conn
+        done = conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone()
+        path = self.legacy_pickle_path
+        if done or not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logger.error(f"❌ Eski persistence faylini o'qishda xatolik: {e}", exc_info=True)
+            return
+
+        rows = []
+        bot_data = data.get('bot_data') or {}
+        for name, value in bot_data.items():
+            if name == SESSIONS_KEY:
+                rows.extend(('session', k, _dumps(v)) for k, v in (value or {}).items())
+            elif name == POLLS_KEY:
+                rows.extend(('poll', str(k), _dumps(v)) for k, v in (value or {}).items())
+            else:
+                rows.append(('bot', name, _dumps(value)))
+        for user_id, value in (data.get('user_data') or {}).items():
+            rows.append(('user', str(user_id), _dumps(value)))
+        for chat_id, value in (data.get('chat_data') or {}).items():
+            # Sessionlarning chat_data'dagi eski nusxalari endi saqlanmaydi
+            value = {k: v for k, v in (value or {}).items() if not str(k).startswith('quiz_')}
+            if value:
+                rows.append(('chat', str(chat_id), _dumps(value)))
+        for name, conv in (data.get('conversations') or {}).items():
+            rows.append(('conversation', name, _dumps(conv)))
+
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO records (kind, key, value) VALUES (?, ?, ?)", rows
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(time.time()),))
+        logger.info(f"🔁 Eski persistence ({path}) import qilindi: {len(rows)} ta yozuv")
+
+    # ---------- load ----------
+
+    async def get_bot_data(self) -> PersistentBotData:
+        if self._bot_data is not None:
+            return self._bot_data
+        bot_data = PersistentBotData()
+        sessions, polls = {}, {}
+        for key, blob in await self._run(self._load_kind, 'session'):
+            try:
+                sessions[key] = pickle.loads(blob)
+            except Exception as e:
+                logger.warning(f"Session yozuvini o'qib bo'lmadi ({key}): {e}")
+        for key, blob in await self._run(self._load_kind, 'poll'):
+            try:
+                polls[key] = pickle.loads(blob)
+            except Exception as e:
+                logger.warning(f"Poll yozuvini o'qib bo'lmadi ({key}): {e}")
+        stale = set()
+        for key, blob in await self._run(self._load_kind, 'bot'):
+            if key.startswith(LEGACY_KEY_PREFIXES):
+                stale.add(key)
+                continue
+            try:
+                dict.__setitem__(bot_data, key, pickle.loads(blob))
+            except Exception as e:
+                logger.warning(f"bot_data yozuvini o'qib bo'lmadi ({key}): {e}")
+        dict.__setitem__(bot_data, SESSIONS_KEY, sessions)
+        dict.__setitem__(bot_data, POLLS_KEY, polls)
+        # Eski kalitlar birinchi flush'da o'chiriladi (bot_data'da yo'q + dirty)
+        bot_data.take_dirty()
+        for key in stale:
+            bot_data.mark_dirty(key)
+        # Reviziya hisoblagichi jarayon bo'yicha - yuklangan sessionlarga yangi reviziya beramiz
+        for sess in sessions.values():
+            if hasattr(sess, 'touch'):
+                sess.touch()
+        self._saved_session_revs = {k: getattr(s, 'rev', None) for k, s in sessions.items()}
+        self._saved_poll_ids = set(polls)
+        self._bot_data = bot_data
+        logger.info(f"✅ Persistence yuklandi: {len(sessions)} session, {len(polls)} poll, {len(bot_data) - 2} boshqa kalit")
+        return bot_data
+
+    async def _get_keyed(self, kind: str) -> Dict[int, dict]:
+        result = {}
+        for key, blob in await self._run(self._load_kind, kind):
+            try:
+                result[int(key)] = pickle.loads(blob)
+            except Exception as e:
+                logger.warning(f"{kind} yozuvini o'qib bo'lmadi ({key}): {e}")
+        return result
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return await self._get_keyed('user')
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return await self._get_keyed('chat')
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        if name not in self._conversations:
+            self._conversations[name] = {}
+            for key, blob in await self._run(self._load_kind, 'conversation'):
+                if key == name:
+                    self._conversations[name] = pickle.loads(blob)
+        return dict(self._conversations[name])
+
+    # ---------- update ----------
+
+    def _collect_bot_data_changes(self, bot_data: dict):
+        """O'zgargan yozuvlarni aniqlash (serializatsiya faqat o'zgarganlar uchun)"""
+        upserts: List[Tuple[str, str, bytes]] = []
+        deletes: List[Tuple[str, str]] = []
+
+        sessions = bot_data.get(SESSIONS_KEY) or {}
+        saved_revs = self._saved_session_revs
+        new_revs = {}
+        for key, sess in list(sessions.items()):
+            rev = getattr(sess, 'rev', None)
+            if rev is None or saved_revs.get(key) != rev:
+                upserts.append(('session', key, _dumps(sess)))
+            new_revs[key] = rev
+        deletes.extend(('session', key) for key in saved_revs.keys() - new_revs.keys())
+
+        polls = bot_data.get(POLLS_KEY) or {}
+        poll_ids = set(polls)
+        upserts.extend(('poll', str(pid), _dumps(polls[pid])) for pid in poll_ids - self._saved_poll_ids)
+        deletes.extend(('poll', str(pid)) for pid in self._saved_poll_ids - poll_ids)
+
+        # Boshqa kalitlar: faqat dirty'lari (butun bot_data qayta pickle qilinmaydi)
+        dirty = bot_data.take_dirty() if hasattr(bot_data, 'take_dirty') else set(bot_data)
+        for name in dirty:
+            if name in (SESSIONS_KEY, POLLS_KEY):
+                continue
+            if name not in bot_data:
+                deletes.append(('bot', str(name)))
+                continue
+            try:
+                upserts.append(('bot', str(name), _dumps(bot_data[name])))
+            except Exception as e:
+                logger.debug(f"bot_data['{name}'] pickle qilinmadi: {e}")
+
+        return upserts, deletes, new_revs, poll_ids, dirty
+
+    async def update_bot_data(self, data: dict) -> None:
+        started = time.perf_counter()
+        # PersistentBotData.__deepcopy__ tufayli bu jonli obyekt
+        upserts, deletes, new_revs, poll_ids, dirty = self._collect_bot_data_changes(data)
+        try:
+            await self._run(self._write, upserts, deletes)
+        except Exception:
+            # yozilmagan kalitlar keyingi flush'da qayta urinadi
+            for name in dirty:
+                mark_dirty(data, name)
+            raise
+        self._saved_session_revs = new_revs
+        self._saved_poll_ids = poll_ids
+        self.last_flush_stats = {
+            'written': len(upserts),
+            'deleted': len(deletes),
+            'duration_ms': (time.perf_counter() - started) * 1000.0,
+        }
+        if upserts or deletes:
+            logger.debug(f"💾 Persistence: {len(upserts)} ta yozuv yozildi, {len(deletes)} ta o'chirildi")
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        await self._run(self._write, [('user', str(user_id), _dumps(data))])
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        await self._run(self._write, [('chat', str(chat_id), _dumps(data))])
+
+    async def update_callback_data(self, data) -> None:
+        return
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        conv = self._conversations.setdefault(name, {})
+        if conv.get(key) == new_state:
+            return
+        if new_state is None:
+            conv.pop(key, None)
+        else:
+            conv[key] = new_state
+        await self._run(self._write, [('conversation', name, _dumps(conv))])
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._run(self._write, [], [('chat', str(chat_id))])
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._run(self._write, [], [('user', str(user_id))])
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        return
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        return
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        return
+
+    async def flush(self) -> None:
+        if self._bot_data is not None:
+            await self.update_bot_data(self._bot_data)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
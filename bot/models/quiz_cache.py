@@ -0,0 +1,108 @@
+"""Quiz kontenti uchun in-process cache (LRU + TTL, versiyalangan)"""
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def copy_quiz(quiz: Optional[Dict]) -> Optional[Dict]:
+    """Quiz dict nusxasi - chaqiruvchi cache'dagi obyektni o'zgartira olmasligi uchun"""
+    if quiz is None:
+        return None
+    copied = dict(quiz)
+    questions = quiz.get('questions')
+    if isinstance(questions, list):
+        copied['questions'] = [
+            {**q, 'options': list(q.get('options') or [])} if isinstance(q, dict) else q
+            for q in questions
+        ]
+    allowed_groups = quiz.get('allowed_groups')
+    if isinstance(allowed_groups, list):
+        copied['allowed_groups'] = list(allowed_groups)
+    return copied
+
+
+class QuizCache:
+    """Hajmi cheklangan (LRU) va muddatli (TTL) quiz cache
+
+    Har bir quiz_id uchun versiya hisoblagichi saqlanadi. `invalidate()`
+    versiyani oshiradi, shuning uchun invalidatsiyadan oldin boshlangan
+    DB o'qish natijasi (eski versiya bilan) cache'ga yozilmaydi.
+    Thread-safe - storage executor thread'laridan chaqiriladi.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 600):
+        self.max_size = max(0, int(max_size))
+        self.ttl_seconds = float(ttl_seconds)
+        self._items: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def version(self, quiz_id: str) -> int:
+        """Quiz versiyasini olish (DB o'qishdan oldin chaqiriladi)"""
+        with self._lock:
+            return self._versions.get(quiz_id, 0)
+
+    def get(self, quiz_id: str) -> Optional[Dict]:
+        """Cache'dan quiz nusxasini olish (topilmasa None)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._items.get(quiz_id)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, quiz = item
+            if expires_at < time.monotonic():
+                self._items.pop(quiz_id, None)
+                self.misses += 1
+                return None
+            self._items.move_to_end(quiz_id)
+            self.hits += 1
+        return copy_quiz(quiz)
+
+    def put(self, quiz_id: str, quiz: Dict, version: int):
+        """Quizni cache'ga yozish (versiya o'zgarmagan bo'lsa)"""
+        if not self.enabled or quiz is None:
+            return
+        stored = copy_quiz(quiz)
+        with self._lock:
+            if self._versions.get(quiz_id, 0) != version:
+                # O'qish paytida quiz o'zgargan - eski ma'lumotni saqlamaymiz
+                return
+            self._items[quiz_id] = (time.monotonic() + self.ttl_seconds, stored)
+            self._items.move_to_end(quiz_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, quiz_id: str):
+        """Quizni cache'dan o'chirish va versiyani oshirish"""
+        with self._lock:
+            self._items.pop(quiz_id, None)
+            self._versions[quiz_id] = self._versions.get(quiz_id, 0) + 1
+
+    def clear(self):
+        """Butun cache'ni tozalash"""
+        with self._lock:
+            for quiz_id in list(self._items.keys()):
+                self._versions[quiz_id] = self._versions.get(quiz_id, 0) + 1
+            self._items.clear()
+
+    def stats(self) -> Dict:
+        """Cache statistikasi"""
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,85 @@
+"""Sudo / VIP / premium rollari uchun xotiradagi indeks
+
+`is_sudo_user`, `is_vip_user`, `get_premium_user` har bir xabar, klaviatura
+va natijalar jadvalida chaqiriladi. Indeks ishga tushishda bir marta
+yuklanadi, `add_*`/`remove_*` metodlari uni darhol yangilaydi, shuning uchun
+tekshiruvlar oddiy set/dict lookup bo'ladi. Bir nechta process ishlaganda
+indeks davriy `refresh` bilan DB bilan sinxronlanadi.
+"""
+import threading
+from typing import Dict, Iterable, Optional
+
+
+class RoleIndex:
+    """Sudo/VIP id to'plamlari va premium yozuvlari
+
+    Yuklash paytida (executor thread'ida) rol o'zgarsa, eski o'qish natijasi
+    indeksga yozilmaydi - `begin_load()` qaytargan generatsiya `replace()`
+    paytida tekshiriladi. Thread-safe.
+    """
+
+    def __init__(self):
+        self._sudo: frozenset = frozenset()
+        self._vip: frozenset = frozenset()
+        self._premium: Dict[int, Dict] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def begin_load(self) -> int:
+        """Yuklashdan oldin generatsiyani olish"""
+        with self._lock:
+            return self._generation
+
+    def replace(self, sudo_ids: Iterable[int], vip_ids: Iterable[int], premium: Dict[int, Dict],
+                generation: int) -> bool:
+        """To'liq yuklangan rollarni o'rnatish (yuklash paytida o'zgarish bo'lsa False)"""
+        sudo, vip, premium = frozenset(sudo_ids), frozenset(vip_ids), dict(premium)
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._sudo, self._vip, self._premium = sudo, vip, premium
+            self.loaded = True
+            return True
+
+    # ---------- o'qish ----------
+
+    def is_sudo(self, user_id: int) -> bool:
+        return user_id in self._sudo
+
+    def is_vip(self, user_id: int) -> bool:
+        return user_id in self._vip
+
+    def premium(self, user_id: int) -> Optional[Dict]:
+        """Premium yozuvi (muddati tekshirilmagan) yoki None"""
+        return self._premium.get(user_id)
+
+    # ---------- yozish (add_*/remove_* dan keyin) ----------
+
+    def set_sudo(self, user_id: int, present: bool):
+        with self._lock:
+            self._sudo = self._sudo | {user_id} if present else self._sudo - {user_id}
+            self._generation += 1
+
+    def set_vip(self, user_id: int, present: bool):
+        with self._lock:
+            self._vip = self._vip | {user_id} if present else self._vip - {user_id}
+            self._generation += 1
+
+    def set_premium(self, user_id: int, record: Optional[Dict]):
+        with self._lock:
+            premium = dict(self._premium)
+            if record is None:
+                premium.pop(user_id, None)
+            else:
+                premium[user_id] = dict(record)
+            self._premium = premium
+            self._generation += 1
+
+    def stats(self) -> Dict:
+        return {
+            'loaded': self.loaded,
+            'sudo': len(self._sudo),
+            'vip': len(self._vip),
+            'premium': len(self._premium),
+        }
@@ -264,4 +264,100 @@ class RequiredChannel(Base):
     added_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     def __repr__(self):
-        return f"<RequiredChannel(channel_id={self.channel_id}, username={self.channel_username})>"
\ No newline at end of file
+        return f"<RequiredChannel(channel_id={self.channel_id}, username={self.channel_username})>"
+
+class FileJob(Base):
+    """Tugallanmagan fayl tahlili ishlari (bot qayta ishga tushganda davom ettiriladi)"""
+    __tablename__ = 'file_jobs'
+    
+    job_id = Column(String(32), primary_key=True, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
+    status_message_id = Column(BigInteger, nullable=True)
+    file_id = Column(String(255), nullable=False)
+    file_name = Column(String(500), nullable=True)
+    file_extension = Column(String(20), nullable=True)
+    file_size = Column(BigInteger, default=0, nullable=False)
+    is_admin = Column(Boolean, default=False, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    chunks = relationship("FileJobChunk", back_populates="job", cascade="all, delete-orphan")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_file_job_user_id', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f"<FileJob(job_id={self.job_id}, user_id={self.user_id}, file_name={self.file_name})>"
+
+
+class FileJobChunk(Base):
+    """Fayl tahlilining AI orqali tayyor bo'lgan qismlari (checkpoint)"""
+    __tablename__ = 'file_job_chunks'
+    
+    job_id = Column(String(32), ForeignKey('file_jobs.job_id', ondelete='CASCADE'), primary_key=True, nullable=False)
+    chunk_index = Column(Integer, primary_key=True, nullable=False)
+    chunk_hash = Column(String(64), nullable=False)
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    job = relationship("FileJob", back_populates="chunks")
+    
+    def __repr__(self):
+        return f"<FileJobChunk(job_id={self.job_id}, chunk_index={self.chunk_index})>"
+
+
+class Broadcast(Base):
+    """Admin broadcast'lari (tugallanmaganlari restart'dan keyin davom ettiriladi)"""
+    __tablename__ = 'broadcasts'
+    
+    broadcast_id = Column(String(32), primary_key=True, nullable=False)
+    kind = Column(String(20), nullable=False)  # 'users' yoki 'groups'
+    text = Column(Text, nullable=False)
+    created_by = Column(BigInteger, nullable=False)
+    admin_chat_id = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    recipients = relationship("BroadcastRecipient", back_populates="broadcast", cascade="all, delete-orphan")
+    
+    def __repr__(self):
+        return f"<Broadcast(broadcast_id={self.broadcast_id}, kind={self.kind})>"
+
+
+class BroadcastRecipient(Base):
+    """Broadcast qabul qiluvchilari va yetkazish holati"""
+    __tablename__ = 'broadcast_recipients'
+    
+    broadcast_id = Column(String(32), ForeignKey('broadcasts.broadcast_id', ondelete='CASCADE'), primary_key=True, nullable=False)
+    chat_id = Column(BigInteger, primary_key=True, nullable=False)
+    status = Column(String(20), default='pending', nullable=False)  # 'pending', 'sent', 'failed', 'blocked'
+    error = Column(String(255), nullable=True)
+    
+    # Relationships
+    broadcast = relationship("Broadcast", back_populates="recipients")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_broadcast_recipient_status', 'broadcast_id', 'status'),
+    )
+    
+    def __repr__(self):
+        return f"<BroadcastRecipient(broadcast_id={self.broadcast_id}, chat_id={self.chat_id}, status={self.status})>"
+
+
+class UnreachableChat(Base):
+    """Botni bloklagan yoki topilmaydigan chatlar (keyingi broadcast'larda o'tkazib yuboriladi)"""
+    __tablename__ = 'unreachable_chats'
+    
+    chat_id = Column(BigInteger, primary_key=True, nullable=False)
+    reason = Column(String(255), nullable=True)
+    marked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<UnreachableChat(chat_id={self.chat_id}, reason={self.reason})>"
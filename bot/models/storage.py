@@ -11,6 +11,11 @@ from typing import List, Dict, Optional
 from datetime import datetime
 import tempfile
 
+from bot.config import Config
+from bot.models.quiz_cache import QuizCache
+from bot.models.role_index import RoleIndex
+from bot.models.cached_value import CachedValue
+
 logger = logging.getLogger(__name__)
 
 # Storage fayl root direktoriyada bo'lishi kerak (eski versiya bilan moslik uchun)
@@ -23,6 +28,9 @@ class Storage:
     
     def __init__(self, storage_file: str = STORAGE_FILE):
         self.storage_file = storage_file
+        self.quiz_cache = QuizCache(Config.QUIZ_CACHE_SIZE, Config.QUIZ_CACHE_TTL)
+        self.role_index = RoleIndex()
+        self.channels_cache = CachedValue(Config.REQUIRED_CHANNELS_CACHE_TTL)
         self.init_storage()
     
     def init_storage(self):
@@ -57,6 +65,9 @@ class Storage:
         meta.setdefault('premium_users', {})  # Premium foydalanuvchilar
         meta.setdefault('premium_payments', [])  # Premium to'lovlar tarixi
         meta.setdefault('required_channels', [])  # Majburiy obuna kanallari
+        meta.setdefault('file_jobs', {})  # Tugallanmagan fayl tahlili ishlari
+        meta.setdefault('broadcasts', {})  # Admin broadcast'lari va yetkazish holati
+        meta.setdefault('unreachable_chats', {})  # Botni bloklagan / topilmaydigan chatlar
         # group settings schema
         try:
             groups = meta.get('groups') or {}
@@ -120,11 +131,20 @@ class Storage:
         }
         
         self._save_data(data)
+        self.quiz_cache.invalidate(quiz_id)
     
     def get_quiz(self, quiz_id: str) -> Optional[Dict]:
-        """Quizni olish"""
+        """Quizni olish (avval cache'dan)"""
+        cached = self.quiz_cache.get(quiz_id)
+        if cached is not None:
+            return cached
+        
+        version = self.quiz_cache.version(quiz_id)
         data = self._load_data()
-        return data['quizzes'].get(quiz_id)
+        quiz = data['quizzes'].get(quiz_id)
+        if quiz:
+            self.quiz_cache.put(quiz_id, quiz, version)
+        return quiz
     
     def get_all_quizzes(self) -> List[Dict]:
         """Barcha quizlarni olish"""
@@ -174,6 +194,44 @@ class Storage:
         groups[key] = payload
         self._save_data(data)
 
+    def track_users_bulk(self, rows: List[Dict]):
+        """Ko'p foydalanuvchini bitta yozishda tracking qilish (activity buffer uchun)"""
+        if not rows:
+            return
+        data = self._load_data()
+        users = data['meta']['users']
+        for r in rows:
+            key = str(r['user_id'])
+            payload = dict(users.get(key) or {}) if isinstance(users.get(key), dict) else {}
+            payload['user_id'] = r['user_id']
+            for f in ('username', 'first_name', 'last_name', 'last_chat_id', 'last_chat_type'):
+                if f in r:
+                    payload[f] = r[f]
+                else:
+                    payload.setdefault(f, None)
+            payload['last_seen'] = datetime.now().isoformat()
+            users[key] = payload
+        self._save_data(data)
+
+    def track_groups_bulk(self, rows: List[Dict]):
+        """Ko'p guruhni bitta yozishda tracking qilish (activity buffer uchun)"""
+        if not rows:
+            return
+        data = self._load_data()
+        groups = data['meta']['groups']
+        for r in rows:
+            key = str(r['chat_id'])
+            payload = dict(groups.get(key) or {}) if isinstance(groups.get(key), dict) else {}
+            payload['chat_id'] = r['chat_id']
+            for f in ('title', 'chat_type', 'bot_status', 'bot_is_admin'):
+                if r.get(f) is not None:
+                    payload[f] = r[f]
+            payload['last_seen'] = datetime.now().isoformat()
+            allowed = payload.get('allowed_quiz_ids', [])
+            payload['allowed_quiz_ids'] = [str(x) for x in allowed if str(x).strip()] if isinstance(allowed, list) else []
+            groups[key] = payload
+        self._save_data(data)
+
     # ===== group quiz allowlist =====
     def get_group_allowed_quiz_ids(self, chat_id: int) -> List[str]:
         data = self._load_data()
@@ -237,6 +295,16 @@ class Storage:
         users.sort(key=lambda u: u.get('last_seen', ''), reverse=True)
         return users
 
+    def get_user_names(self, user_ids: List[int]) -> Dict[int, str]:
+        """Bir nechta foydalanuvchining ismi (ismi yo'qlar qaytmaydi)"""
+        users = self._load_data().get('meta', {}).get('users', {}) or {}
+        names = {}
+        for uid in set(user_ids):
+            first_name = (users.get(str(uid)) or {}).get('first_name')
+            if first_name:
+                names[uid] = first_name
+        return names
+
     def get_groups(self) -> List[Dict]:
         data = self._load_data()
         groups = list((data.get('meta', {}).get('groups', {}) or {}).values())
@@ -270,6 +338,7 @@ class Storage:
             'added_at': datetime.now().isoformat()
         }
         self._save_data(data)
+        self.role_index.set_sudo(user_id, True)
 
     def remove_sudo_user(self, user_id: int) -> bool:
         data = self._load_data()
@@ -278,6 +347,7 @@ class Storage:
         if key in sudo_users:
             del sudo_users[key]
             self._save_data(data)
+            self.role_index.set_sudo(user_id, False)
             return True
         return False
 
@@ -288,6 +358,8 @@ class Storage:
         return items
 
     def is_sudo_user(self, user_id: int) -> bool:
+        if self.role_index.loaded:
+            return self.role_index.is_sudo(user_id)
         data = self._load_data()
         sudo_users = data.get('meta', {}).get('sudo_users', {}) or {}
         return str(user_id) in sudo_users
@@ -305,6 +377,7 @@ class Storage:
             'added_at': datetime.now().isoformat()
         }
         self._save_data(data)
+        self.role_index.set_vip(user_id, True)
 
     def remove_vip_user(self, user_id: int) -> bool:
         """VIP user olib tashlash"""
@@ -314,6 +387,7 @@ class Storage:
         if key in vip_users:
             del vip_users[key]
             self._save_data(data)
+            self.role_index.set_vip(user_id, False)
             return True
         return False
 
@@ -326,6 +400,8 @@ class Storage:
 
     def is_vip_user(self, user_id: int) -> bool:
         """VIP user tekshiruvi"""
+        if self.role_index.loaded:
+            return self.role_index.is_vip(user_id)
         data = self._load_data()
         vip_users = data.get('meta', {}).get('vip_users', {}) or {}
         return str(user_id) in vip_users
@@ -341,14 +417,10 @@ class Storage:
         data = self._load_data()
         return [quiz for quiz in data['quizzes'].values() if quiz['created_by'] == user_id]
     
-    def save_result(self, quiz_id: str, user_id: int, chat_id: int, answers: Dict, correct_count: int, total_count: int, answer_times: Dict = None):
-        """Quiz natijasini saqlash
-        
-        Args:
-            answer_times: {question_index: time_in_seconds} - har bir savol uchun javob berish vaqti
-        """
-        data = self._load_data()
-        
+    @staticmethod
+    def _build_result(quiz_id: str, user_id: int, chat_id: int, answers: Dict, correct_count: int,
+                      total_count: int, answer_times: Dict = None) -> Dict:
+        """Natija yozuvi (foiz va vaqt statistikasi bilan)"""
         percentage = (correct_count / total_count * 100) if total_count > 0 else 0
         
         # Vaqt statistikasini hisoblash
@@ -364,7 +436,7 @@ class Storage:
                 min_time = min(times_list)
                 max_time = max(times_list)
         
-        result = {
+        return {
             'quiz_id': quiz_id,
             'user_id': user_id,
             'chat_id': chat_id,
@@ -379,9 +451,31 @@ class Storage:
             'min_time': min_time,
             'max_time': max_time
         }
+
+    def save_result(self, quiz_id: str, user_id: int, chat_id: int, answers: Dict, correct_count: int, total_count: int, answer_times: Dict = None):
+        """Quiz natijasini saqlash
         
-        data['results'].append(result)
+        Args:
+            answer_times: {question_index: time_in_seconds} - har bir savol uchun javob berish vaqti
+        """
+        data = self._load_data()
+        data['results'].append(self._build_result(
+            quiz_id, user_id, chat_id, answers, correct_count, total_count, answer_times
+        ))
+        self._save_data(data)
+
+    def save_results_bulk(self, results: List[Dict]) -> int:
+        """Ko'p natijani bitta yuklash/saqlash bilan yozish (save_result kalitlari bilan dict'lar)"""
+        if not results:
+            return 0
+        data = self._load_data()
+        for r in results:
+            data['results'].append(self._build_result(
+                r['quiz_id'], r['user_id'], r['chat_id'], r.get('answers') or {},
+                r['correct_count'], r['total_count'], r.get('answer_times')
+            ))
         self._save_data(data)
+        return len(results)
 
     def get_user_results(self, user_id: int, limit: int = 20) -> List[Dict]:
         """Foydalanuvchining oxirgi natijalari (eng yangisi yuqorida)."""
@@ -419,6 +513,7 @@ class Storage:
             if quiz_id in data['quizzes']:
                 data['quizzes'][quiz_id]['title'] = new_title
                 self._save_data(data)
+                self.quiz_cache.invalidate(quiz_id)
                 return True
             
             return False
@@ -434,6 +529,7 @@ class Storage:
             if quiz_id in data['quizzes']:
                 del data['quizzes'][quiz_id]
                 self._save_data(data)
+                self.quiz_cache.invalidate(quiz_id)
                 return True
             
             return False
@@ -453,6 +549,7 @@ class Storage:
             data['quizzes'][quiz_id]['allowed_groups'] = []
         
         self._save_data(data)
+        self.quiz_cache.invalidate(quiz_id)
         return True
     
     def add_quiz_allowed_group(self, quiz_id: str, group_id: int) -> bool:
@@ -470,6 +567,7 @@ class Storage:
             allowed_groups.append(group_id)
             quiz['allowed_groups'] = allowed_groups
             self._save_data(data)
+            self.quiz_cache.invalidate(quiz_id)
         return True
     
     def remove_quiz_allowed_group(self, quiz_id: str, group_id: int) -> bool:
@@ -484,6 +582,7 @@ class Storage:
             allowed_groups.remove(group_id)
             quiz['allowed_groups'] = allowed_groups
             self._save_data(data)
+            self.quiz_cache.invalidate(quiz_id)
         return True
     
     def get_quiz_allowed_groups(self, quiz_id: str) -> List[int]:
@@ -512,8 +611,14 @@ class Storage:
     # ===== Majburiy obuna kanallari =====
     def get_required_channels(self) -> List[Dict]:
         """Majburiy obuna kanallari ro'yxati"""
+        found, channels = self.channels_cache.get()
+        if found:
+            return channels
+        version = self.channels_cache.version()
         data = self._load_data()
-        return data.get('meta', {}).get('required_channels', [])
+        channels = data.get('meta', {}).get('required_channels', [])
+        self.channels_cache.put(channels, version)
+        return channels
     
     def add_required_channel(self, channel_id: int, channel_username: str = None, channel_title: str = None) -> bool:
         """Majburiy obuna kanalini qo'shish"""
@@ -528,6 +633,7 @@ class Storage:
                 if channel_title:
                     ch['channel_title'] = channel_title
                 self._save_data(data)
+                self.channels_cache.invalidate()
                 return True
         
         # Yangi kanal qo'shish
@@ -538,6 +644,7 @@ class Storage:
             'added_at': datetime.now().isoformat()
         })
         self._save_data(data)
+        self.channels_cache.invalidate()
         return True
     
     def remove_required_channel(self, channel_id: int) -> bool:
@@ -551,6 +658,7 @@ class Storage:
         if len(channels) < original_len:
             data['meta']['required_channels'] = channels
             self._save_data(data)
+            self.channels_cache.invalidate()
             return True
         return False
     
@@ -612,14 +720,42 @@ class Storage:
         })
         
         self._save_data(data)
+        self.role_index.set_premium(user_id, premium_users[str(user_id)])
         return True
     
+    def _get_premium_record(self, user_id: int) -> Optional[Dict]:
+        if self.role_index.loaded:
+            return self.role_index.premium(user_id)
+        data = self._load_data()
+        premium_users = data.get('meta', {}).get('premium_users', {}) or {}
+        return premium_users.get(str(user_id))
+
+    def load_role_index(self) -> bool:
+        """Sudo/VIP/premium rollarini xotiradagi indeksga yuklash (startup va davriy refresh)"""
+        generation = self.role_index.begin_load()
+        meta = self._load_data().get('meta', {})
+
+        def _ids(section):
+            ids = []
+            for key in (meta.get(section) or {}):
+                try:
+                    ids.append(int(key))
+                except (TypeError, ValueError):
+                    continue
+            return ids
+
+        premium = {}
+        for key, user_data in (meta.get('premium_users') or {}).items():
+            try:
+                premium[int(key)] = user_data
+            except (TypeError, ValueError):
+                continue
+        return self.role_index.replace(_ids('sudo_users'), _ids('vip_users'), premium, generation)
+    
     def is_premium_user(self, user_id: int) -> bool:
         """Premium user tekshiruvi (Core yoki Pro tarif)"""
         from datetime import datetime
-        data = self._load_data()
-        premium_users = data.get('meta', {}).get('premium_users', {}) or {}
-        user_data = premium_users.get(str(user_id))
+        user_data = self._get_premium_record(user_id)
         
         if not user_data:
             return False
@@ -644,9 +780,7 @@ class Storage:
     def get_premium_user(self, user_id: int) -> Optional[Dict]:
         """Premium user ma'lumotlarini olish"""
         from datetime import datetime
-        data = self._load_data()
-        premium_users = data.get('meta', {}).get('premium_users', {}) or {}
-        user_data = premium_users.get(str(user_id))
+        user_data = self._get_premium_record(user_id)
         
         if not user_data:
             return None
@@ -723,4 +857,158 @@ class Storage:
                         pass
         
         return count
-
+    
+    # ===== File Jobs (fayl tahlili checkpoint'lari) =====
+    def create_file_job(self, job_id: str, user_id: int, chat_id: int, file_id: str, file_name: str,
+                        file_extension: str, file_size: int = 0, is_admin: bool = False,
+                        status_message_id: int = None) -> bool:
+        """Fayl tahlili ishini ro'yxatga olish"""
+        data = self._load_data()
+        data['meta']['file_jobs'][job_id] = {
+            'job_id': job_id,
+            'user_id': user_id,
+            'chat_id': chat_id,
+            'status_message_id': status_message_id,
+            'file_id': file_id,
+            'file_name': file_name,
+            'file_extension': file_extension,
+            'file_size': file_size or 0,
+            'is_admin': bool(is_admin),
+            'attempts': 0,
+            # DB bilan bir xil (UTC) - ishning yoshi resume'da tekshiriladi
+            'created_at': datetime.utcnow().isoformat(),
+            'chunks': {}
+        }
+        self._save_data(data)
+        return True
+    
+    def get_pending_file_jobs(self) -> List[Dict]:
+        """Tugallanmagan fayl tahlili ishlari (yaratilish tartibida)"""
+        data = self._load_data()
+        jobs = [
+            {k: v for k, v in job.items() if k != 'chunks'}
+            for job in data['meta']['file_jobs'].values()
+        ]
+        jobs.sort(key=lambda job: job.get('created_at') or '')
+        return jobs
+    
+    def bump_file_job_attempts(self, job_id: str) -> int:
+        """Davom ettirishlar sonini oshirish; yangi qiymat (ish topilmasa 0)"""
+        data = self._load_data()
+        job = data['meta']['file_jobs'].get(job_id)
+        if not job:
+            return 0
+        job['attempts'] = int(job.get('attempts') or 0) + 1
+        self._save_data(data)
+        return job['attempts']
+    
+    def save_file_job_chunk(self, job_id: str, chunk_index: int, chunk_hash: str, result: Optional[Dict]) -> bool:
+        """AI tahlil qilgan qism natijasini saqlash"""
+        data = self._load_data()
+        job = data['meta']['file_jobs'].get(job_id)
+        if not job:
+            return False
+        job.setdefault('chunks', {})[str(chunk_index)] = {'chunk_hash': chunk_hash, 'result': result}
+        self._save_data(data)
+        return True
+    
+    def get_file_job_chunks(self, job_id: str) -> Dict[int, Dict]:
+        """Saqlangan qismlar: {chunk_index: {'chunk_hash': ..., 'result': ...}}"""
+        data = self._load_data()
+        job = data['meta']['file_jobs'].get(job_id) or {}
+        return {int(idx): chunk for idx, chunk in (job.get('chunks') or {}).items()}
+    
+    def delete_file_job(self, job_id: str) -> bool:
+        """Ishni va uning qismlarini o'chirish (tahlil tugaganda yoki bekor qilinganda)"""
+        data = self._load_data()
+        if data['meta']['file_jobs'].pop(job_id, None) is None:
+            return False
+        self._save_data(data)
+        return True
+    
+    # ===== Broadcasts =====
+    def create_broadcast(self, broadcast_id: str, kind: str, text: str, created_by: int, admin_chat_id: int,
+                         recipients: List[int]) -> bool:
+        """Broadcast va uning barcha qabul qiluvchilarini ('pending') saqlash"""
+        data = self._load_data()
+        data['meta']['broadcasts'][broadcast_id] = {
+            'broadcast_id': broadcast_id,
+            'kind': kind,
+            'text': text,
+            'created_by': created_by,
+            'admin_chat_id': admin_chat_id,
+            'created_at': datetime.utcnow().isoformat(),
+            'finished_at': None,
+            'recipients': {str(cid): {'status': 'pending', 'error': None} for cid in recipients}
+        }
+        self._save_data(data)
+        return True
+    
+    def get_unfinished_broadcasts(self) -> List[Dict]:
+        """Yakunlanmagan broadcast'lar (yaratilish tartibida)"""
+        data = self._load_data()
+        broadcasts = [
+            {k: v for k, v in b.items() if k not in ('recipients', 'finished_at')}
+            for b in data['meta']['broadcasts'].values()
+            if not b.get('finished_at')
+        ]
+        broadcasts.sort(key=lambda b: b.get('created_at') or '')
+        return broadcasts
+    
+    def get_pending_broadcast_recipients(self, broadcast_id: str) -> List[int]:
+        """Hali yuborilmagan qabul qiluvchilar"""
+        broadcast = self._load_data()['meta']['broadcasts'].get(broadcast_id) or {}
+        return [
+            int(cid) for cid, r in (broadcast.get('recipients') or {}).items()
+            if r.get('status') == 'pending'
+        ]
+    
+    def get_broadcast_counts(self, broadcast_id: str) -> Dict[str, int]:
+        """Holatlar bo'yicha qabul qiluvchilar soni: {'pending': .., 'sent': .., ...}"""
+        broadcast = self._load_data()['meta']['broadcasts'].get(broadcast_id) or {}
+        counts: Dict[str, int] = {}
+        for r in (broadcast.get('recipients') or {}).values():
+            counts[r.get('status')] = counts.get(r.get('status'), 0) + 1
+        return counts
+    
+    def update_broadcast_recipients(self, broadcast_id: str, updates: List[Dict]) -> bool:
+        """Qabul qiluvchilar holatini yangilash: [{'chat_id', 'status', 'error'}]"""
+        if not updates:
+            return True
+        data = self._load_data()
+        broadcast = data['meta']['broadcasts'].get(broadcast_id)
+        if not broadcast:
+            return False
+        recipients = broadcast.setdefault('recipients', {})
+        for row in updates:
+            recipients[str(row['chat_id'])] = {'status': row['status'], 'error': row.get('error')}
+        self._save_data(data)
+        return True
+    
+    def finish_broadcast(self, broadcast_id: str) -> bool:
+        """Broadcast'ni yakunlangan deb belgilash"""
+        data = self._load_data()
+        broadcast = data['meta']['broadcasts'].get(broadcast_id)
+        if not broadcast:
+            return False
+        broadcast['finished_at'] = datetime.utcnow().isoformat()
+        self._save_data(data)
+        return True
+    
+    def mark_unreachable_chats(self, rows: List[Dict]) -> bool:
+        """Botni bloklagan / topilmaydigan chatlarni belgilash: [{'chat_id', 'reason'}]"""
+        if not rows:
+            return True
+        data = self._load_data()
+        unreachable = data['meta']['unreachable_chats']
+        # last_seen bilan bir xil (mahalliy) vaqt - qaytib kelgan foydalanuvchi qayta qo'shiladi
+        now = datetime.now().isoformat()
+        for row in rows:
+            unreachable[str(row['chat_id'])] = {'reason': row.get('reason'), 'marked_at': now}
+        self._save_data(data)
+        return True
+    
+    def get_unreachable_chats(self) -> Dict[int, str]:
+        """Belgilangan chatlar: {chat_id: marked_at (ISO, last_seen bilan bir xil vaqt)}"""
+        unreachable = self._load_data()['meta']['unreachable_chats']
+        return {int(cid): row.get('marked_at') for cid, row in unreachable.items()}
@@ -4,13 +4,18 @@ import logging
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
+from sqlalchemy import desc, and_, or_, func, insert
 
+from bot.config import Config
 from bot.models.database import SessionLocal
+from bot.models.quiz_cache import QuizCache
+from bot.models.role_index import RoleIndex
+from bot.models.cached_value import CachedValue
 from bot.models.schema import (
     User, Group, Quiz, Question, QuizResult,
     GroupQuizAllowlist, QuizAllowedGroup,
-    SudoUser, VipUser, PremiumUser, PremiumPayment, RequiredChannel
+    SudoUser, VipUser, PremiumUser, PremiumPayment, RequiredChannel,
+    FileJob, FileJobChunk, Broadcast, BroadcastRecipient, UnreachableChat
 )
 
 logger = logging.getLogger(__name__)
@@ -21,7 +26,9 @@ class StorageDB:
     
     def __init__(self):
         """StorageDB init"""
-        pass
+        self.quiz_cache = QuizCache(Config.QUIZ_CACHE_SIZE, Config.QUIZ_CACHE_TTL)
+        self.role_index = RoleIndex()
+        self.channels_cache = CachedValue(Config.REQUIRED_CHANNELS_CACHE_TTL)
     
     def _get_session(self) -> Session:
         """Database session olish"""
@@ -86,10 +93,16 @@ class StorageDB:
             db.rollback()
             raise
         finally:
+            self.quiz_cache.invalidate(quiz_id)
             db.close()
     
     def get_quiz(self, quiz_id: str) -> Optional[Dict]:
-        """Quizni olish"""
+        """Quizni olish (avval cache'dan)"""
+        cached = self.quiz_cache.get(quiz_id)
+        if cached is not None:
+            return cached
+        
+        version = self.quiz_cache.version(quiz_id)
         db = self._get_session()
         try:
             quiz = db.query(Quiz).filter(Quiz.quiz_id == quiz_id).first()
@@ -121,6 +134,7 @@ class StorageDB:
                 'allowed_groups': [ag.group_id for ag in quiz.allowed_groups]
             }
             
+            self.quiz_cache.put(quiz_id, quiz_dict, version)
             return quiz_dict
         except Exception as e:
             logger.error(f"Quiz olishda xatolik: {e}", exc_info=True)
@@ -211,6 +225,7 @@ class StorageDB:
             db.rollback()
             return False
         finally:
+            self.quiz_cache.invalidate(quiz_id)
             db.close()
     
     def update_quiz_title(self, quiz_id: str, new_title: str) -> bool:
@@ -228,6 +243,7 @@ class StorageDB:
             db.rollback()
             return False
         finally:
+            self.quiz_cache.invalidate(quiz_id)
             db.close()
     
     def set_quiz_private(self, quiz_id: str, is_private: bool) -> bool:
@@ -248,6 +264,7 @@ class StorageDB:
             db.rollback()
             return False
         finally:
+            self.quiz_cache.invalidate(quiz_id)
             db.close()
     
     def add_quiz_allowed_group(self, quiz_id: str, group_id: int) -> bool:
@@ -277,6 +294,7 @@ class StorageDB:
             db.rollback()
             return False
         finally:
+            self.quiz_cache.invalidate(quiz_id)
             db.close()
     
     def remove_quiz_allowed_group(self, quiz_id: str, group_id: int) -> bool:
@@ -298,6 +316,7 @@ class StorageDB:
             db.rollback()
             return False
         finally:
+            self.quiz_cache.invalidate(quiz_id)
             db.close()
     
     def get_quiz_allowed_groups(self, quiz_id: str) -> List[int]:
@@ -316,28 +335,16 @@ class StorageDB:
     
     def is_quiz_allowed_in_group(self, quiz_id: str, group_id: int) -> bool:
         """Quiz guruhda ruxsat berilganmi tekshirish"""
-        db = self._get_session()
-        try:
-            quiz = db.query(Quiz).filter(Quiz.quiz_id == quiz_id).first()
-            if not quiz:
-                return False
-            
-            # Agar quiz public bo'lsa, barcha guruhlarda ishlaydi
-            if not quiz.is_private:
-                return True
-            
-            # Private quiz uchun ruxsat berilganmi tekshirish
-            allowed = db.query(QuizAllowedGroup).filter(
-                QuizAllowedGroup.quiz_id == quiz_id,
-                QuizAllowedGroup.group_id == group_id
-            ).first()
-            
-            return allowed is not None
-        except Exception as e:
-            logger.error(f"Quiz allowed in group tekshirishda xatolik: {e}", exc_info=True)
+        quiz = self.get_quiz(quiz_id)
+        if not quiz:
             return False
-        finally:
-            db.close()
+        
+        # Agar quiz public bo'lsa, barcha guruhlarda ishlaydi
+        if not quiz.get('is_private', False):
+            return True
+        
+        # Private quiz uchun ruxsat berilganmi tekshirish
+        return group_id in (quiz.get('allowed_groups') or [])
     
     # ===== User Methods =====
     
@@ -395,6 +402,21 @@ class StorageDB:
         finally:
             db.close()
     
+    def get_user_names(self, user_ids: List[int]) -> Dict[int, str]:
+        """Bir nechta foydalanuvchining ismini bitta query bilan olish (ismi yo'qlar qaytmaydi)"""
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return {}
+        db = self._get_session()
+        try:
+            rows = db.query(User.user_id, User.first_name).filter(User.user_id.in_(user_ids)).all()
+            return {uid: first_name for uid, first_name in rows if first_name}
+        except Exception as e:
+            logger.error(f"User ismlarini olishda xatolik: {e}", exc_info=True)
+            return {}
+        finally:
+            db.close()
+    
     def get_users_count(self) -> int:
         """Foydalanuvchilar soni"""
         db = self._get_session()
@@ -440,6 +462,94 @@ class StorageDB:
         finally:
             db.close()
     
+    def _bulk_upsert(self, db: Session, model, key: str, rows: List[Dict], fields: tuple, coalesce: tuple) -> bool:
+        """Ko'p qatorli INSERT ... ON CONFLICT DO UPDATE (PostgreSQL/SQLite)
+        
+        `coalesce` dagi maydonlar uchun NULL kelsa mavjud qiymat saqlanadi.
+        Bunday maydon qatorga umuman qo'shilmaydi - yangi yozuvda ustun
+        default'i (masalan, bot_is_admin=False) ishlaydi, NULL yozilmaydi.
+        Dialekt ON CONFLICT ni qo'llamasa False qaytaradi.
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return False
+        
+        now = datetime.utcnow()
+        # Ko'p qatorli INSERT'da barcha qatorlar bir xil ustunlarga ega bo'lishi kerak -
+        # qatorlar qaysi coalesce maydonlari bo'sh ekaniga qarab guruhlanadi
+        groups: Dict[tuple, List[Dict]] = {}
+        for r in rows:
+            present = tuple(f for f in fields if f not in coalesce or r.get(f) is not None)
+            groups.setdefault(present, []).append(
+                {key: r[key], **{f: r.get(f) for f in present}, 'last_seen': r.get('last_seen') or now, 'created_at': now}
+            )
+        for present, values in groups.items():
+            for start in range(0, len(values), 500):
+                stmt = insert(model).values(values[start:start + 500])
+                excluded = stmt.excluded
+                set_ = {'last_seen': excluded.last_seen}
+                for f in present:
+                    if f in coalesce:
+                        set_[f] = func.coalesce(getattr(excluded, f), getattr(model, f))
+                    else:
+                        set_[f] = getattr(excluded, f)
+                db.execute(stmt.on_conflict_do_update(index_elements=[key], set_=set_))
+        return True
+    
+    def track_users_bulk(self, rows: List[Dict]):
+        """Ko'p foydalanuvchini bitta tranzaksiyada tracking qilish (activity buffer uchun)"""
+        if not rows:
+            return
+        fields = ('username', 'first_name', 'last_name', 'last_chat_id', 'last_chat_type')
+        db = self._get_session()
+        try:
+            if not self._bulk_upsert(db, User, 'user_id', rows, fields, ('last_chat_id', 'last_chat_type')):
+                for r in rows:
+                    user = db.get(User, r['user_id'])
+                    if user is None:
+                        user = User(user_id=r['user_id'])
+                        db.add(user)
+                    for f in fields:
+                        if f in r:
+                            setattr(user, f, r[f])
+                    user.last_seen = r.get('last_seen') or datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            logger.error(f"Bulk user tracking xatolik: {e}", exc_info=True)
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def track_groups_bulk(self, rows: List[Dict]):
+        """Ko'p guruhni bitta tranzaksiyada tracking qilish (activity buffer uchun)"""
+        if not rows:
+            return
+        fields = ('title', 'chat_type', 'bot_status', 'bot_is_admin')
+        db = self._get_session()
+        try:
+            if not self._bulk_upsert(db, Group, 'chat_id', rows, fields, fields):
+                for r in rows:
+                    group = db.get(Group, r['chat_id'])
+                    if group is None:
+                        group = Group(chat_id=r['chat_id'])
+                        db.add(group)
+                    for f in fields:
+                        if r.get(f) is not None:
+                            setattr(group, f, r[f])
+                    group.last_seen = r.get('last_seen') or datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            logger.error(f"Bulk group tracking xatolik: {e}", exc_info=True)
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
     def get_groups(self) -> List[Dict]:
         """Guruhlar ro'yxati"""
         db = self._get_session()
@@ -595,47 +705,106 @@ class StorageDB:
     
     # ===== Quiz Results =====
     
+    @staticmethod
+    def _build_result_row(quiz_id: str, user_id: int, chat_id: int, answers: Dict, correct_count: int,
+                          total_count: int, answer_times: Dict = None) -> Dict:
+        """quiz_results jadvali uchun qator (foiz va vaqt statistikasi bilan)"""
+        percentage = (correct_count / total_count * 100) if total_count > 0 else 0
+        
+        # Vaqt statistikasini hisoblash
+        total_time = 0.0
+        avg_time = 0.0
+        min_time = None
+        max_time = None
+        
+        if answer_times:
+            times_list = [t for t in answer_times.values() if t is not None]
+            if times_list:
+                total_time = sum(times_list)
+                avg_time = total_time / len(times_list)
+                min_time = min(times_list)
+                max_time = max(times_list)
+        
+        return {
+            'quiz_id': quiz_id,
+            'user_id': user_id,
+            'chat_id': chat_id,
+            'answers': answers,
+            'correct_count': correct_count,
+            'total_count': total_count,
+            'percentage': percentage,
+            'answer_times': answer_times or {},
+            'total_time': total_time,
+            'avg_time': avg_time,
+            'min_time': min_time,
+            'max_time': max_time,
+            'completed_at': datetime.utcnow(),
+        }
+    
+    def _ensure_users(self, db: Session, user_ids):
+        """FK uchun users qatorlari mavjudligini ta'minlash (tracking buffer hali yozmagan bo'lishi mumkin)"""
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return
+        dialect = db.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            now = datetime.utcnow()
+            stmt = insert(User).values([
+                {'user_id': uid, 'last_seen': now, 'created_at': now} for uid in user_ids
+            ]).on_conflict_do_nothing(index_elements=['user_id'])
+            db.execute(stmt)
+            return
+        existing = {uid for (uid,) in db.query(User.user_id).filter(User.user_id.in_(user_ids)).all()}
+        for uid in user_ids:
+            if uid not in existing:
+                db.add(User(user_id=uid))
+        db.flush()
+    
     def save_result(self, quiz_id: str, user_id: int, chat_id: int, answers: Dict, correct_count: int, 
                    total_count: int, answer_times: Dict = None):
         """Quiz natijasini saqlash"""
+        self.save_results_bulk([{
+            'quiz_id': quiz_id,
+            'user_id': user_id,
+            'chat_id': chat_id,
+            'answers': answers,
+            'correct_count': correct_count,
+            'total_count': total_count,
+            'answer_times': answer_times,
+        }])
+    
+    def save_results_bulk(self, results: List[Dict]) -> int:
+        """Ko'p natijani bitta tranzaksiyada saqlash (ko'p qatorli INSERT)
+        
+        Args:
+            results: save_result argumentlari bilan bir xil kalitli dict'lar ro'yxati
+        Returns:
+            Saqlangan natijalar soni
+        """
+        if not results:
+            return 0
+        rows = [
+            self._build_result_row(
+                r['quiz_id'], r['user_id'], r['chat_id'], r.get('answers') or {},
+                r['correct_count'], r['total_count'], r.get('answer_times')
+            )
+            for r in results
+        ]
         db = self._get_session()
         try:
-            percentage = (correct_count / total_count * 100) if total_count > 0 else 0
-            
-            # Vaqt statistikasini hisoblash
-            total_time = 0.0
-            avg_time = 0.0
-            min_time = None
-            max_time = None
-            
-            if answer_times:
-                times_list = [t for t in answer_times.values() if t is not None]
-                if times_list:
-                    total_time = sum(times_list)
-                    avg_time = total_time / len(times_list)
-                    min_time = min(times_list)
-                    max_time = max(times_list)
-            
-            result = QuizResult(
-                quiz_id=quiz_id,
-                user_id=user_id,
-                chat_id=chat_id,
-                answers=answers,
-                correct_count=correct_count,
-                total_count=total_count,
-                percentage=percentage,
-                answer_times=answer_times or {},
-                total_time=total_time,
-                avg_time=avg_time,
-                min_time=min_time,
-                max_time=max_time
-            )
-            
-            db.add(result)
+            self._ensure_users(db, (row['user_id'] for row in rows))
+            from sqlalchemy import insert
+            db.execute(insert(QuizResult), rows)
             db.commit()
+            return len(rows)
         except Exception as e:
-            logger.error(f"Result saqlashda xatolik: {e}", exc_info=True)
+            logger.error(f"Natijalarni bulk saqlashda xatolik ({len(rows)} ta): {e}", exc_info=True)
             db.rollback()
+            return 0
         finally:
             db.close()
     
@@ -794,6 +963,7 @@ class StorageDB:
                 )
                 db.add(sudo_user)
                 db.commit()
+                self.role_index.set_sudo(user_id, True)
                 return True
             return False
         except Exception as e:
@@ -811,6 +981,7 @@ class StorageDB:
             if sudo_user:
                 db.delete(sudo_user)
                 db.commit()
+                self.role_index.set_sudo(user_id, False)
                 return True
             return False
         except Exception as e:
@@ -842,6 +1013,8 @@ class StorageDB:
     
     def is_sudo_user(self, user_id: int) -> bool:
         """Sudo user tekshiruvi"""
+        if self.role_index.loaded:
+            return self.role_index.is_sudo(user_id)
         db = self._get_session()
         try:
             sudo_user = db.query(SudoUser).filter(SudoUser.user_id == user_id).first()
@@ -872,6 +1045,7 @@ class StorageDB:
                 )
                 db.add(vip_user)
             db.commit()
+            self.role_index.set_vip(user_id, True)
             return True
         except Exception as e:
             logger.error(f"VIP user qo'shishda xatolik: {e}", exc_info=True)
@@ -888,6 +1062,7 @@ class StorageDB:
             if vip_user:
                 db.delete(vip_user)
                 db.commit()
+                self.role_index.set_vip(user_id, False)
                 return True
             return False
         except Exception as e:
@@ -920,6 +1095,8 @@ class StorageDB:
     
     def is_vip_user(self, user_id: int) -> bool:
         """VIP user tekshiruvi"""
+        if self.role_index.loaded:
+            return self.role_index.is_vip(user_id)
         db = self._get_session()
         try:
             vip_user = db.query(VipUser).filter(VipUser.user_id == user_id).first()
@@ -973,6 +1150,7 @@ class StorageDB:
                     # Yangi premium yoki muddati tugagan
                     new_until = datetime.utcnow() + timedelta(days=30 * months)
             
+            activated_at = existing.activated_at if existing and existing.activated_at else datetime.utcnow()
             if existing:
                 existing.username = username
                 existing.first_name = first_name
@@ -989,7 +1167,8 @@ class StorageDB:
                     subscription_plan=subscription_plan,
                     premium_until=new_until,
                     stars_paid=stars_amount,
-                    months=months
+                    months=months,
+                    activated_at=activated_at
                 )
                 db.add(premium_user)
             
@@ -1003,6 +1182,16 @@ class StorageDB:
             db.add(payment)
             
             db.commit()
+            self.role_index.set_premium(user_id, {
+                'user_id': user_id,
+                'username': username,
+                'first_name': first_name,
+                'subscription_plan': subscription_plan,
+                'premium_until': new_until,
+                'stars_paid': stars_amount,
+                'months': months,
+                'activated_at': activated_at,
+            })
             return True
         except Exception as e:
             logger.error(f"Premium user qo'shishda xatolik: {e}", exc_info=True)
@@ -1011,60 +1200,71 @@ class StorageDB:
         finally:
             db.close()
     
-    def is_premium_user(self, user_id: int) -> bool:
-        """Premium user tekshiruvi (Core yoki Pro tarif)"""
+    @staticmethod
+    def _premium_record(premium_user: PremiumUser) -> Dict:
+        """PremiumUser qatoridan role index yozuvi (muddat datetime holida)"""
+        return {
+            'user_id': premium_user.user_id,
+            'username': premium_user.username,
+            'first_name': premium_user.first_name,
+            'subscription_plan': premium_user.subscription_plan,
+            'premium_until': premium_user.premium_until,
+            'stars_paid': premium_user.stars_paid,
+            'months': premium_user.months,
+            'activated_at': premium_user.activated_at,
+        }
+    
+    @staticmethod
+    def _active_premium(record: Optional[Dict]) -> Optional[Dict]:
+        """Premium yozuvini get_premium_user formatiga o'girish (muddati tugagan bo'lsa None)"""
+        if not record:
+            return None
+        activated_at = record.get('activated_at')
+        result = dict(record)
+        result['activated_at'] = activated_at.isoformat() if activated_at else None
+        # Free tarif bo'lsa ham ma'lumotlarni qaytarish
+        if record.get('subscription_plan') == 'free':
+            result['premium_until'] = None
+            return result
+        # Core yoki Pro tarif - muddati tekshirish
+        premium_until = record.get('premium_until')
+        if premium_until and premium_until > datetime.utcnow():
+            result['premium_until'] = premium_until.isoformat()
+            return result
+        return None
+    
+    def _get_premium_record(self, user_id: int) -> Optional[Dict]:
+        if self.role_index.loaded:
+            return self.role_index.premium(user_id)
         db = self._get_session()
         try:
             premium_user = db.query(PremiumUser).filter(PremiumUser.user_id == user_id).first()
-            if premium_user:
+            return self._premium_record(premium_user) if premium_user else None
+        finally:
+            db.close()
+    
+    def is_premium_user(self, user_id: int) -> bool:
+        """Premium user tekshiruvi (Core yoki Pro tarif)"""
+        try:
+            record = self._get_premium_record(user_id)
+            if record:
                 # Free tarif emas va muddati tugamagan
-                if premium_user.subscription_plan == 'free':
+                if record.get('subscription_plan') == 'free':
                     return False
-                if premium_user.premium_until:
-                    return premium_user.premium_until > datetime.utcnow()
+                if record.get('premium_until'):
+                    return record['premium_until'] > datetime.utcnow()
             return False
         except Exception as e:
             logger.error(f"Premium user tekshirishda xatolik: {e}", exc_info=True)
             return False
-        finally:
-            db.close()
     
     def get_premium_user(self, user_id: int) -> Optional[Dict]:
         """Premium user ma'lumotlarini olish"""
-        db = self._get_session()
         try:
-            premium_user = db.query(PremiumUser).filter(PremiumUser.user_id == user_id).first()
-            if premium_user:
-                # Free tarif bo'lsa ham ma'lumotlarni qaytarish
-                if premium_user.subscription_plan == 'free':
-                    return {
-                        'user_id': premium_user.user_id,
-                        'username': premium_user.username,
-                        'first_name': premium_user.first_name,
-                        'subscription_plan': premium_user.subscription_plan,
-                        'premium_until': None,
-                        'stars_paid': premium_user.stars_paid,
-                        'months': premium_user.months,
-                        'activated_at': premium_user.activated_at.isoformat() if premium_user.activated_at else None
-                    }
-                # Core yoki Pro tarif - muddati tekshirish
-                if premium_user.premium_until and premium_user.premium_until > datetime.utcnow():
-                    return {
-                        'user_id': premium_user.user_id,
-                        'username': premium_user.username,
-                        'first_name': premium_user.first_name,
-                        'subscription_plan': premium_user.subscription_plan,
-                        'premium_until': premium_user.premium_until.isoformat(),
-                        'stars_paid': premium_user.stars_paid,
-                        'months': premium_user.months,
-                        'activated_at': premium_user.activated_at.isoformat() if premium_user.activated_at else None
-                    }
-            return None
+            return self._active_premium(self._get_premium_record(user_id))
         except Exception as e:
             logger.error(f"Premium user olishda xatolik: {e}", exc_info=True)
             return None
-        finally:
-            db.close()
     
     def get_premium_users_count(self) -> int:
         """Faol premium userlar soni"""
@@ -1078,6 +1278,21 @@ class StorageDB:
         finally:
             db.close()
     
+    def load_role_index(self) -> bool:
+        """Sudo/VIP/premium rollarini xotiradagi indeksga yuklash (startup va davriy refresh)"""
+        generation = self.role_index.begin_load()
+        db = self._get_session()
+        try:
+            sudo_ids = [uid for (uid,) in db.query(SudoUser.user_id).all()]
+            vip_ids = [uid for (uid,) in db.query(VipUser.user_id).all()]
+            premium = {p.user_id: self._premium_record(p) for p in db.query(PremiumUser).all()}
+        except Exception as e:
+            logger.error(f"Role index yuklashda xatolik: {e}", exc_info=True)
+            return False
+        finally:
+            db.close()
+        return self.role_index.replace(sudo_ids, vip_ids, premium, generation)
+    
     def get_user_quizzes_count_this_month(self, user_id: int) -> int:
         """Foydalanuvchining shu oyda yaratgan quizlari soni"""
         db = self._get_session()
@@ -1101,10 +1316,14 @@ class StorageDB:
     
     def get_required_channels(self) -> List[Dict]:
         """Majburiy obuna kanallari ro'yxati"""
+        found, channels = self.channels_cache.get()
+        if found:
+            return channels
+        version = self.channels_cache.version()
         db = self._get_session()
         try:
             channels = db.query(RequiredChannel).all()
-            return [
+            result = [
                 {
                     'channel_id': ch.channel_id,
                     'channel_username': ch.channel_username,
@@ -1113,6 +1332,8 @@ class StorageDB:
                 }
                 for ch in channels
             ]
+            self.channels_cache.put(result, version)
+            return result
         except Exception as e:
             logger.error(f"Required channels olishda xatolik: {e}", exc_info=True)
             return []
@@ -1135,6 +1356,7 @@ class StorageDB:
                 )
                 db.add(channel)
             db.commit()
+            self.channels_cache.invalidate()
             return True
         except Exception as e:
             logger.error(f"Required channel qo'shishda xatolik: {e}", exc_info=True)
@@ -1151,6 +1373,7 @@ class StorageDB:
             if channel:
                 db.delete(channel)
                 db.commit()
+                self.channels_cache.invalidate()
                 return True
             return False
         except Exception as e:
@@ -1159,3 +1382,276 @@ class StorageDB:
             return False
         finally:
             db.close()
+    
+    # ===== File Jobs (fayl tahlili checkpoint'lari) =====
+    
+    @staticmethod
+    def _file_job_record(job: FileJob) -> Dict:
+        return {
+            'job_id': job.job_id,
+            'user_id': job.user_id,
+            'chat_id': job.chat_id,
+            'status_message_id': job.status_message_id,
+            'file_id': job.file_id,
+            'file_name': job.file_name,
+            'file_extension': job.file_extension,
+            'file_size': job.file_size or 0,
+            'is_admin': bool(job.is_admin),
+            'attempts': job.attempts or 0,
+            'created_at': job.created_at.isoformat() if job.created_at else None
+        }
+    
+    def create_file_job(self, job_id: str, user_id: int, chat_id: int, file_id: str, file_name: str,
+                        file_extension: str, file_size: int = 0, is_admin: bool = False,
+                        status_message_id: int = None) -> bool:
+        """Fayl tahlili ishini ro'yxatga olish"""
+        db = self._get_session()
+        try:
+            db.add(FileJob(
+                job_id=job_id,
+                user_id=user_id,
+                chat_id=chat_id,
+                status_message_id=status_message_id,
+                file_id=file_id,
+                file_name=file_name,
+                file_extension=file_extension,
+                file_size=file_size or 0,
+                is_admin=bool(is_admin)
+            ))
+            db.commit()
+            return True
+        except Exception as e:
+            logger.error(f"File job yaratishda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def get_pending_file_jobs(self) -> List[Dict]:
+        """Tugallanmagan fayl tahlili ishlari (yaratilish tartibida)"""
+        db = self._get_session()
+        try:
+            jobs = db.query(FileJob).order_by(FileJob.created_at).all()
+            return [self._file_job_record(job) for job in jobs]
+        except Exception as e:
+            logger.error(f"File job'larni olishda xatolik: {e}", exc_info=True)
+            return []
+        finally:
+            db.close()
+    
+    def bump_file_job_attempts(self, job_id: str) -> int:
+        """Davom ettirishlar sonini oshirish; yangi qiymat (ish topilmasa 0)"""
+        db = self._get_session()
+        try:
+            job = db.query(FileJob).filter(FileJob.job_id == job_id).first()
+            if not job:
+                return 0
+            job.attempts = (job.attempts or 0) + 1
+            db.commit()
+            return job.attempts
+        except Exception as e:
+            logger.error(f"File job attempts yangilashda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+    
+    def save_file_job_chunk(self, job_id: str, chunk_index: int, chunk_hash: str, result: Optional[Dict]) -> bool:
+        """AI tahlil qilgan qism natijasini saqlash"""
+        db = self._get_session()
+        try:
+            chunk = db.query(FileJobChunk).filter(
+                FileJobChunk.job_id == job_id,
+                FileJobChunk.chunk_index == chunk_index
+            ).first()
+            if chunk:
+                chunk.chunk_hash = chunk_hash
+                chunk.result = result
+            else:
+                db.add(FileJobChunk(job_id=job_id, chunk_index=chunk_index, chunk_hash=chunk_hash, result=result))
+            db.commit()
+            return True
+        except Exception as e:
+            logger.error(f"File job qismini saqlashda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def get_file_job_chunks(self, job_id: str) -> Dict[int, Dict]:
+        """Saqlangan qismlar: {chunk_index: {'chunk_hash': ..., 'result': ...}}"""
+        db = self._get_session()
+        try:
+            chunks = db.query(FileJobChunk).filter(FileJobChunk.job_id == job_id).all()
+            return {
+                chunk.chunk_index: {'chunk_hash': chunk.chunk_hash, 'result': chunk.result}
+                for chunk in chunks
+            }
+        except Exception as e:
+            logger.error(f"File job qismlarini olishda xatolik: {e}", exc_info=True)
+            return {}
+        finally:
+            db.close()
+    
+    def delete_file_job(self, job_id: str) -> bool:
+        """Ishni va uning qismlarini o'chirish (tahlil tugaganda yoki bekor qilinganda)"""
+        db = self._get_session()
+        try:
+            db.query(FileJobChunk).filter(FileJobChunk.job_id == job_id).delete(synchronize_session=False)
+            deleted = db.query(FileJob).filter(FileJob.job_id == job_id).delete(synchronize_session=False)
+            db.commit()
+            return bool(deleted)
+        except Exception as e:
+            logger.error(f"File job o'chirishda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    # ===== Broadcasts =====
+    
+    def create_broadcast(self, broadcast_id: str, kind: str, text: str, created_by: int, admin_chat_id: int,
+                         recipients: List[int]) -> bool:
+        """Broadcast va uning barcha qabul qiluvchilarini ('pending') saqlash"""
+        db = self._get_session()
+        try:
+            db.add(Broadcast(
+                broadcast_id=broadcast_id,
+                kind=kind,
+                text=text,
+                created_by=created_by,
+                admin_chat_id=admin_chat_id
+            ))
+            db.flush()
+            rows = [{'broadcast_id': broadcast_id, 'chat_id': cid, 'status': 'pending'} for cid in recipients]
+            for start in range(0, len(rows), 1000):
+                db.execute(insert(BroadcastRecipient), rows[start:start + 1000])
+            db.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Broadcast yaratishda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def get_unfinished_broadcasts(self) -> List[Dict]:
+        """Yakunlanmagan broadcast'lar (yaratilish tartibida)"""
+        db = self._get_session()
+        try:
+            broadcasts = db.query(Broadcast).filter(Broadcast.finished_at.is_(None)).order_by(Broadcast.created_at).all()
+            return [
+                {
+                    'broadcast_id': b.broadcast_id,
+                    'kind': b.kind,
+                    'text': b.text,
+                    'created_by': b.created_by,
+                    'admin_chat_id': b.admin_chat_id,
+                    'created_at': b.created_at.isoformat() if b.created_at else None
+                }
+                for b in broadcasts
+            ]
+        except Exception as e:
+            logger.error(f"Broadcast'larni olishda xatolik: {e}", exc_info=True)
+            return []
+        finally:
+            db.close()
+    
+    def get_pending_broadcast_recipients(self, broadcast_id: str) -> List[int]:
+        """Hali yuborilmagan qabul qiluvchilar"""
+        db = self._get_session()
+        try:
+            rows = db.query(BroadcastRecipient.chat_id).filter(
+                BroadcastRecipient.broadcast_id == broadcast_id,
+                BroadcastRecipient.status == 'pending'
+            ).all()
+            return [row[0] for row in rows]
+        except Exception as e:
+            logger.error(f"Broadcast qabul qiluvchilarini olishda xatolik: {e}", exc_info=True)
+            return []
+        finally:
+            db.close()
+    
+    def get_broadcast_counts(self, broadcast_id: str) -> Dict[str, int]:
+        """Holatlar bo'yicha qabul qiluvchilar soni: {'pending': .., 'sent': .., ...}"""
+        db = self._get_session()
+        try:
+            rows = db.query(BroadcastRecipient.status, func.count()).filter(
+                BroadcastRecipient.broadcast_id == broadcast_id
+            ).group_by(BroadcastRecipient.status).all()
+            return {status: count for status, count in rows}
+        except Exception as e:
+            logger.error(f"Broadcast statistikasini olishda xatolik: {e}", exc_info=True)
+            return {}
+        finally:
+            db.close()
+    
+    def update_broadcast_recipients(self, broadcast_id: str, updates: List[Dict]) -> bool:
+        """Qabul qiluvchilar holatini yangilash: [{'chat_id', 'status', 'error'}]"""
+        if not updates:
+            return True
+        grouped: Dict[tuple, List[int]] = {}
+        for row in updates:
+            grouped.setdefault((row['status'], row.get('error')), []).append(row['chat_id'])
+        db = self._get_session()
+        try:
+            for (status, error), chat_ids in grouped.items():
+                db.query(BroadcastRecipient).filter(
+                    BroadcastRecipient.broadcast_id == broadcast_id,
+                    BroadcastRecipient.chat_id.in_(chat_ids)
+                ).update({'status': status, 'error': error}, synchronize_session=False)
+            db.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Broadcast holatini yangilashda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def finish_broadcast(self, broadcast_id: str) -> bool:
+        """Broadcast'ni yakunlangan deb belgilash"""
+        db = self._get_session()
+        try:
+            broadcast = db.query(Broadcast).filter(Broadcast.broadcast_id == broadcast_id).first()
+            if not broadcast:
+                return False
+            broadcast.finished_at = datetime.utcnow()
+            db.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Broadcast yakunlashda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def mark_unreachable_chats(self, rows: List[Dict]) -> bool:
+        """Botni bloklagan / topilmaydigan chatlarni belgilash: [{'chat_id', 'reason'}]"""
+        if not rows:
+            return True
+        db = self._get_session()
+        try:
+            now = datetime.utcnow()
+            for row in rows:
+                db.merge(UnreachableChat(chat_id=row['chat_id'], reason=(row.get('reason') or '')[:255], marked_at=now))
+            db.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Unreachable chatlarni saqlashda xatolik: {e}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+    
+    def get_unreachable_chats(self) -> Dict[int, str]:
+        """Belgilangan chatlar: {chat_id: marked_at (ISO, last_seen bilan bir xil vaqt)}"""
+        db = self._get_session()
+        try:
+            rows = db.query(UnreachableChat.chat_id, UnreachableChat.marked_at).all()
+            return {chat_id: marked_at.isoformat() for chat_id, marked_at in rows}
+        except Exception as e:
+            logger.error(f"Unreachable chatlarni olishda xatolik: {e}", exc_info=True)
+            return {}
+        finally:
+            db.close()
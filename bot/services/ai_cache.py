@@ -0,0 +1,132 @@
+"""AI tahlil natijalari uchun diskdagi cache (SQLite, LRU)
+
+Bir xil fayl qayta yuklansa (boshqa o'qituvchi yoki retry), matn qismlari
+va savollar bir xil bo'ladi - DeepSeek'ga qayta so'rov yuborish o'rniga
+natija shu cache'dan olinadi. Kalit: normallashtirilgan matn, prompt
+versiyasi, model va parametrlarning sha256 hash'i. Yozuvlar soni
+`max_entries` dan oshsa, eng uzoq ishlatilmaganlari o'chiriladi.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'ai_cache.sqlite3'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_cache (
+    key       TEXT PRIMARY KEY,
+    kind      TEXT NOT NULL,
+    value     TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ai_cache_last_used ON ai_cache (last_used);
+"""
+
+_WS_RE = re.compile(r'[ \t\r\f\v]+')
+_BLANK_LINES_RE = re.compile(r'\n{2,}')
+
+
+def normalize_text(text: str) -> str:
+    """Kalit uchun matnni normallashtirish (bo'shliqlar farqi natijaga ta'sir qilmaydi)"""
+    text = _WS_RE.sub(' ', text or '')
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    return _BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+def make_key(kind: str, *parts: Any) -> str:
+    """Cache kaliti - qismlarning kanonik JSON ko'rinishidan sha256"""
+    payload = json.dumps([kind, *parts], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AIResultCache:
+    """AI natijalari uchun SQLite cache (thread-safe, so'rovlar executor'da bajariladi)"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max(0, int(max_entries))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_sync(self, key: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM ai_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with conn:
+                conn.execute("UPDATE ai_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put_sync(self, key: str, kind: str, value: Any):
+        blob = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT INTO ai_cache (key, kind, value, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, last_used = excluded.last_used",
+                    (key, kind, blob, time.time()),
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()
+                if count > self.max_entries:
+                    # LRU: eng uzoq ishlatilmagan yozuvlarni o'chirish
+                    conn.execute(
+                        "DELETE FROM ai_cache WHERE key IN "
+                        "(SELECT key FROM ai_cache ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            return await asyncio.to_thread(self.get_sync, key)
+        except Exception as e:
+            logger.warning(f"⚠️ AI cache o'qishda xatolik: {e}")
+            return None
+
+    async def put(self, key: str, kind: str, value: Any):
+        if not self.enabled or value is None:
+            return
+        try:
+            await asyncio.to_thread(self.put_sync, key, kind, value)
+        except Exception as e:
+            logger.warning(f"⚠️ AI cache yozishda xatolik: {e}")
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses, 'max_entries': self.max_entries}
+
+
+ai_result_cache = AIResultCache(Config.AI_CACHE_PATH or DEFAULT_CACHE_PATH, Config.AI_CACHE_MAX_ENTRIES)
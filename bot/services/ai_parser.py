@@ -3,32 +3,92 @@ import json
 import re
 import logging
 import asyncio
-from typing import Dict, List, Optional
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 import httpx
 
+from bot.config import Config
+from bot.services.ai_cache import ai_result_cache, make_key, normalize_text
+from bot.services.json_stream import QuestionStreamParser, find_json_dict
+
 logger = logging.getLogger(__name__)
 
+# Promptlar o'zgarganda oshiriladi - eski cache natijalari ishlatilmaydi
+PROMPT_VERSION = 1
+
+
+def _http2_available() -> bool:
+    # h2 httpx[http2] bilan o'rnatiladi
+    return importlib.util.find_spec("h2") is not None
+
 
 class AIParser:
     """DeepSeek AI orqali test savollarini tahlil qilish"""
     
+    # Barcha AIParser obyektlari uchun umumiy (keep-alive, connection pool) HTTP client
+    _client: Optional[httpx.AsyncClient] = None
+    _client_loop: Optional[asyncio.AbstractEventLoop] = None
+    # Process bo'yicha umumiy AI so'rovlari cheklovi (Config.MAX_CONCURRENT_AI_REQUESTS)
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+    
     def __init__(self, api_key: str, api_url: str):
         self.api_key = api_key
         self.api_url = api_url
-        self.semaphore: Optional[asyncio.Semaphore] = None
     
-    def _get_semaphore(self, max_concurrent: int = 2) -> asyncio.Semaphore:
-        """AI so'rovlari uchun semaphore"""
-        if self.semaphore is None:
-            self.semaphore = asyncio.Semaphore(max(1, max_concurrent))
-        return self.semaphore
+    @classmethod
+    def _get_client(cls) -> httpx.AsyncClient:
+        """Umumiy AsyncClient (lazy yaratiladi, TLS ulanishlar qayta ishlatiladi)"""
+        loop = asyncio.get_running_loop()
+        if cls._client is None or cls._client.is_closed or cls._client_loop is not loop:
+            http2 = Config.AI_HTTP2 and _http2_available()
+            if Config.AI_HTTP2 and not http2:
+                logger.warning("⚠️ AI_HTTP2 yoqilgan, lekin 'h2' paketi yo'q - HTTP/1.1 ishlatiladi")
+            cls._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(120.0, connect=Config.AI_HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=Config.AI_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.AI_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=Config.AI_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                http2=http2,
+            )
+            cls._client_loop = loop
+            logger.info(
+                f"🌐 AI HTTP client yaratildi (http2={http2}, "
+                f"max_connections={Config.AI_HTTP_MAX_CONNECTIONS}, keepalive={Config.AI_HTTP_MAX_KEEPALIVE})"
+            )
+        return cls._client
+    
+    @asynccontextmanager
+    async def _http_client(self):
+        """Umumiy clientni berish (har so'rovda yangi client va TLS handshake o'rniga)"""
+        yield self._get_client()
+    
+    @classmethod
+    async def aclose(cls):
+        """Umumiy HTTP clientni yopish (Application post_shutdown'da)"""
+        client, cls._client, cls._client_loop = cls._client, None, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+    
+    @classmethod
+    def _get_semaphore(cls, max_concurrent: Optional[int] = None) -> asyncio.Semaphore:
+        """AI so'rovlari uchun umumiy semaphore (barcha AIParser obyektlari uchun bitta)"""
+        loop = asyncio.get_running_loop()
+        if cls._semaphore is None or cls._semaphore_loop is not loop:
+            cls._semaphore = asyncio.Semaphore(max(1, max_concurrent or Config.MAX_CONCURRENT_AI_REQUESTS))
+            cls._semaphore_loop = loop
+        return cls._semaphore
     
     @staticmethod
     def extract_json_dict(text: str) -> Optional[Dict]:
         """AI javobidan birinchi valid JSON dict'ni ajratib olish.
         
         Regex (greedy) ko'pincha 1-chi `{` dan oxirgi `}` gacha olib, JSON'ni buzib qo'yadi.
-        Shu sabab `json.JSONDecoder().raw_decode()` orqali har bir `{` joyidan boshlab o'qib ko'ramiz.
+        Shu sabab obyekt chegaralari qavs chuqurligi bo'yicha bitta o'tishda topiladi
+        (`find_json_dict`); max_tokens'da kesilgan javobdan tayyor savollar tiklanadi.
         """
         if not text:
             return None
@@ -45,27 +105,17 @@ class AIParser:
         except Exception as e:
             logger.debug(f"Full JSON parse kutilmagan xatolik: {e}")
 
-        decoder = json.JSONDecoder()
-        for idx, ch in enumerate(text):
-            if ch != "{":
-                continue
-            try:
-                obj, _ = decoder.raw_decode(text[idx:])
-                if isinstance(obj, dict):
-                    return obj
-            except (json.JSONDecodeError, ValueError, TypeError):
-                # JSON parsing xatolik - keyingi { pozitsiyasiga o'tish
-                continue
-            except Exception as e:
-                logger.debug(f"JSON decode kutilmagan xatolik (pozitsiya {idx}): {e}")
-                continue
-        return None
+        try:
+            return find_json_dict(text)
+        except Exception as e:
+            logger.debug(f"JSON skanerlash kutilmagan xatolik: {e}")
+            return None
     
     async def precheck_has_questions(
         self, 
         text: str, 
         model: Optional[str] = None,
-        max_concurrent: int = 2
+        max_concurrent: Optional[int] = None
     ) -> Dict:
         """Faylda test savollari borligini AI orqali tekshirish.
         
@@ -100,8 +150,8 @@ Matn:
             sem = self._get_semaphore(max_concurrent)
             await sem.acquire()
             try:
-                async with httpx.AsyncClient(timeout=40.0) as client:
-                    response = await client.post(self.api_url, headers=headers, json=data)
+                async with self._http_client() as client:
+                    response = await client.post(self.api_url, headers=headers, json=data, timeout=40.0)
                     response.raise_for_status()
                     result = response.json()
                     ai_response = result.get('choices', [{}])[0].get('message', {}).get('content', '')
@@ -129,15 +179,109 @@ Matn:
         progress_callback=None,
         strict_correct: bool = True,
         model: Optional[str] = None,
-        max_concurrent: int = 2,
+        max_concurrent: Optional[int] = None,
         timeout: int = 120,
         cancel_check=None
     ) -> Optional[Dict]:
-        """AI orqali savollarni ajratish.
+        """AI orqali savollarni ajratish (natija matn hash'i bo'yicha cache'lanadi).
         
         Returns:
             {"title": "...", "questions": [...]}
         """
+        key = make_key('analyze', PROMPT_VERSION, model or 'deepseek-chat', bool(strict_correct), normalize_text(text))
+        cached = await ai_result_cache.get(key)
+        if cached is not None:
+            logger.info(f"♻️ AI tahlil natijasi cache'dan olindi ({len(cached.get('questions') or [])} savol)")
+            if progress_callback:
+                await progress_callback(85, "♻️ Natija cache'dan olindi...")
+            return cached
+        
+        result = await self._analyze_with_ai(
+            text,
+            progress_callback=progress_callback,
+            strict_correct=strict_correct,
+            model=model,
+            max_concurrent=max_concurrent,
+            timeout=timeout,
+            cancel_check=cancel_check,
+        )
+        if result and result.get('questions') and not result.get('partial'):
+            await ai_result_cache.put(key, 'analyze', result)
+        return result
+    
+    async def _stream_completion(
+        self,
+        client: httpx.AsyncClient,
+        headers: Dict,
+        data: Dict,
+        timeout: float,
+        progress_callback=None,
+        cancel_check=None
+    ) -> Tuple[str, List[Dict], Optional[str], bool]:
+        """Javobni SSE oqimi bilan olish.
+        
+        Returns:
+            (to'liq matn, oqimda yopilgan savollar, title, completed). Umumiy `timeout`
+            tugasa yoki ulanish uzilsa, shu paytgacha tayyor bo'lgan savollar qaytariladi.
+            `completed` faqat `[DONE]` yoki `finish_reason == "stop"` kelganda True.
+        """
+        parser = QuestionStreamParser()
+        parts: List[str] = []
+        completed = False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        async with client.stream('POST', self.api_url, headers=headers, json=dict(data, stream=True), timeout=timeout) as response:
+            if response.status_code >= 400:
+                await response.aread()
+            response.raise_for_status()
+            try:
+                async for line in response.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue  # keep-alive izohlari
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        completed = True
+                        break
+                    try:
+                        choice = json.loads(payload)['choices'][0]
+                        delta = choice.get('delta') or {}
+                    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                        continue
+                    if choice.get('finish_reason') == 'stop':
+                        completed = True
+                    content = delta.get('content') or ''
+                    if not content:
+                        continue
+                    parts.append(content)
+                    
+                    if parser.feed(content) and progress_callback:
+                        await progress_callback(
+                            min(80, 50 + len(parser.questions)),
+                            f"✍️ {len(parser.questions)} ta savol tayyor, AI yozishda davom etmoqda..."
+                        )
+                    if cancel_check and cancel_check():
+                        break
+                    if loop.time() > deadline:
+                        logger.warning(f"⏱ AI oqimi {timeout:.0f}s da to'xtatildi - {len(parser.questions)} ta tayyor savol olinadi")
+                        break
+            except httpx.TransportError as e:
+                if not parser.questions:
+                    raise
+                logger.warning(f"⚠️ AI oqimi uzildi ({e}) - {len(parser.questions)} ta tayyor savol olinadi")
+        
+        return ''.join(parts), parser.questions, parser.title, completed
+    
+    async def _analyze_with_ai(
+        self,
+        text: str,
+        progress_callback=None,
+        strict_correct: bool = True,
+        model: Optional[str] = None,
+        max_concurrent: Optional[int] = None,
+        timeout: int = 120,
+        cancel_check=None
+    ) -> Optional[Dict]:
         try:
             if progress_callback:
                 await progress_callback(30, "🤖 AI ga so'rov yuborilmoqda...")
@@ -214,10 +358,19 @@ Faqat JSON qaytaring. JSON dan boshqa matn yozmang."""
                 if cancel_check and cancel_check():
                     return None
                 
-                async with httpx.AsyncClient(timeout=float(timeout)) as client:
+                async with self._http_client() as client:
+                    streamed: List[Dict] = []
+                    stream_title: Optional[str] = None
+                    completed = True
                     try:
-                        response = await client.post(self.api_url, headers=headers, json=data)
-                        response.raise_for_status()
+                        if Config.AI_STREAMING:
+                            ai_response, streamed, stream_title, completed = await self._stream_completion(
+                                client, headers, data, float(timeout),
+                                progress_callback=progress_callback, cancel_check=cancel_check
+                            )
+                        else:
+                            response = await client.post(self.api_url, headers=headers, json=data, timeout=float(timeout))
+                            response.raise_for_status()
                     except httpx.TimeoutException as e:
                         logger.error(f"AI timeout: {e}")
                         if progress_callback:
@@ -242,8 +395,12 @@ Faqat JSON qaytaring. JSON dan boshqa matn yozmang."""
                         await progress_callback(85, "📊 AI javobini qayta ishlanmoqda...")
 
                     try:
-                        result = response.json()
-                        ai_response = result.get('choices', [{}])[0].get('message', {}).get('content', '')
+                        if not Config.AI_STREAMING:
+                            result = response.json()
+                            choice = result.get('choices', [{}])[0]
+                            ai_response = choice.get('message', {}).get('content', '')
+                            # max_tokens'da kesilgan javob
+                            completed = choice.get('finish_reason') != 'length'
                         
                         # AI javob bo'sh bo'lsa
                         if not ai_response or not ai_response.strip():
@@ -294,6 +451,16 @@ Faqat JSON qaytaring. JSON dan boshqa matn yozmang."""
                                 logger.debug(f"Butun javobni JSON sifatida parse qilishda xatolik: {e}")
                                 pass
                     
+                    # Javob to'liq kelmadi (timeout/uzilish/cancel/max_tokens) - natija cache'lanmaydi
+                    # va checkpoint'ga yozilmaydi (find_json_dict kesilgan javobni ham tuzatadi)
+                    partial = not completed
+                    if partial:
+                        logger.info("AI javobi to'liq emas - natija qisman deb belgilandi")
+                    if not parsed_data and streamed:
+                        parsed_data = {'title': stream_title or '', 'questions': streamed}
+                        partial = True
+                        logger.info(f"AI javobi to'liq emas, oqimdan {len(streamed)} ta savol olindi")
+                    
                     if parsed_data:
                         title = (parsed_data.get('title') or '').strip()
                         questions = parsed_data.get('questions', [])
@@ -320,7 +487,8 @@ Faqat JSON qaytaring. JSON dan boshqa matn yozmang."""
                                 })
                                 
                                 # Real-time: har bir savol topilganda darhol progress yangilash
-                                if progress_callback:
+                                # (oqim rejimida progress savollar kelgan paytda berilgan)
+                                if progress_callback and not streamed:
                                     # Cancel tekshiruvi
                                     if cancel_check and cancel_check():
                                         return None
@@ -337,7 +505,10 @@ Faqat JSON qaytaring. JSON dan boshqa matn yozmang."""
                             # Final: topilgan savollar sonini ko'rsatish
                             await progress_callback(100, f"✅ {len(cleaned_questions)} ta savol topildi!")
 
-                        return {"title": title[:64], "questions": cleaned_questions}
+                        result = {"title": title[:64], "questions": cleaned_questions}
+                        if partial:
+                            result["partial"] = True
+                        return result
                     
                     # Agar JSON parse qilinmasa, xatolik
                     if progress_callback:
@@ -360,7 +531,43 @@ Faqat JSON qaytaring. JSON dan boshqa matn yozmang."""
         self,
         questions: List[Dict],
         model: Optional[str] = None,
-        max_concurrent: int = 2,
+        max_concurrent: Optional[int] = None,
+        detailed_prompt: bool = False,
+        progress_callback=None,
+        cancel_check=None
+    ) -> Optional[List[int]]:
+        """AI orqali to'g'ri javoblarni aniqlash (savollar hash'i bo'yicha cache'lanadi)"""
+        if not questions:
+            return None
+        key = make_key(
+            'answers', PROMPT_VERSION, model or 'deepseek-chat', bool(detailed_prompt),
+            [
+                [normalize_text(str(q.get('question', ''))), [normalize_text(str(o)) for o in (q.get('options') or [])]]
+                for q in questions
+            ],
+        )
+        cached = await ai_result_cache.get(key)
+        if cached is not None:
+            logger.info(f"♻️ To'g'ri javoblar cache'dan olindi ({len(questions)} savol)")
+            return cached
+        
+        result = await self._pick_correct_answers(
+            questions,
+            model=model,
+            max_concurrent=max_concurrent,
+            detailed_prompt=detailed_prompt,
+            progress_callback=progress_callback,
+            cancel_check=cancel_check,
+        )
+        if result is not None:
+            await ai_result_cache.put(key, 'answers', result)
+        return result
+    
+    async def _pick_correct_answers(
+        self,
+        questions: List[Dict],
+        model: Optional[str] = None,
+        max_concurrent: Optional[int] = None,
         detailed_prompt: bool = False,
         progress_callback=None,
         cancel_check=None
@@ -466,8 +673,8 @@ Har bir savol uchun aniq va to'g'ri javob indeksini qaytaring. Faqat JSON qaytar
                 if progress_callback:
                     await progress_callback(50, f"⏳ AI javob kutmoqda... ({len(questions)} ta savol)")
                 
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.post(self.api_url, headers=headers, json=data)
+                async with self._http_client() as client:
+                    response = await client.post(self.api_url, headers=headers, json=data, timeout=60.0)
                     response.raise_for_status()
                     
                     # Cancel tekshiruvi javobdan keyin
@@ -0,0 +1,311 @@
+"""Admin broadcast: parallel yetkazish va davom ettiriladigan holat
+
+Qabul qiluvchilar aniqlangach, broadcast va har bir qabul qiluvchi
+('pending') DB'ga yoziladi. Xabarlar BROADCAST_CONCURRENCY ta worker
+tomonidan parallel yuboriladi - tezlikni egress scheduler cheklaydi
+(broadcast yo'lagi, ya'ni quiz xabarlaridan keyin). Yetkazish holati
+partiyalab saqlanadi: bot qayta ishga tushsa, `resume_broadcasts` faqat
+hali 'pending' qolganlarga yuboradi.
+
+Botni bloklagan, o'chirilgan yoki topilmaydigan chatlar belgilanadi va
+keyingi broadcast'larda o'tkazib yuboriladi (belgilangandan keyin yana
+faol bo'lgan foydalanuvchi/guruh qayta qo'shiladi).
+
+Qabul qiluvchilarni aniqlash ham fonda bajariladi - handler kutib qolmaydi.
+Bot to'xtaganda `stop_broadcasts` task'larni bekor qiladi va tayyor
+natijalarni saqlaydi; qolganlari keyingi ishga tushishda davom etadi.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from telegram import Bot, KeyboardButton, ReplyKeyboardMarkup
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden
+
+from bot.config import Config
+from bot.models import async_storage
+from bot.services.egress import LANE_BROADCAST
+
+logger = logging.getLogger(__name__)
+
+KIND_USERS = 'users'
+KIND_GROUPS = 'groups'
+
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+STATUS_BLOCKED = 'blocked'
+
+# Holat shu sondagi natijadan keyin DB'ga yoziladi (crash'da ko'pi bilan shuncha qayta yuboriladi)
+FLUSH_EVERY = 50
+# Admin'ga progress xabari yangilanish oralig'i (sekund)
+PROGRESS_INTERVAL = 3.0
+
+# Fonda ishlayotgan broadcast task'lari (GC yig'ib olmasligi uchun)
+_running: Set[asyncio.Task] = set()
+
+
+def _is_unreachable(error: Exception) -> bool:
+    """Chat endi xabar qabul qilmaydi (bloklangan, o'chirilgan, guruhdan chiqarilgan, topilmadi)"""
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and 'chat not found' in str(error).lower()
+
+
+def _skip_unreachable(chat_id: int, last_seen: Optional[str], unreachable: Dict[int, str]) -> bool:
+    marked_at = unreachable.get(chat_id)
+    if marked_at is None:
+        return False
+    # belgilangandan keyin faol bo'lgan bo'lsa (botni qayta ishga tushirgan) - qayta urinamiz
+    return not (last_seen and marked_at and last_seen > marked_at)
+
+
+async def resolve_targets(bot: Bot, kind: str) -> List[int]:
+    """Broadcast qabul qiluvchilari (guruhlarda bot adminligi parallel tekshiriladi)"""
+    unreachable = await async_storage.get_unreachable_chats()
+
+    if kind == KIND_USERS:
+        targets = []
+        for u in await async_storage.get_users():
+            user_id = int(u.get('user_id') or 0)
+            if user_id <= 0:
+                continue
+            # last_chat_type None yoki 'private' bo'lsa private chatga yuborish mumkin
+            if u.get('last_chat_type') not in ['private', None] and u.get('last_chat_id') != user_id:
+                continue
+            if _skip_unreachable(user_id, u.get('last_seen'), unreachable):
+                continue
+            targets.append(user_id)
+        return targets
+
+    candidates = [
+        int(g['chat_id']) for g in await async_storage.get_groups()
+        if not _skip_unreachable(int(g['chat_id']), g.get('last_seen'), unreachable)
+    ]
+    limit = asyncio.Semaphore(max(1, Config.BROADCAST_CONCURRENCY))
+    newly_unreachable = []
+    bot_id = bot.id
+
+    async def check(gid: int) -> Optional[int]:
+        async with limit:
+            try:
+                member = await bot.get_chat_member(gid, bot_id, rate_limit_args=LANE_BROADCAST)
+            except Exception as e:
+                if _is_unreachable(e):
+                    newly_unreachable.append({'chat_id': gid, 'reason': str(e)[:255]})
+                logger.debug(f"Group {gid} check failed: {e}")
+                return None
+        return gid if member.status in ['administrator', 'creator'] else None
+
+    checked = await asyncio.gather(*(check(gid) for gid in candidates))
+    if newly_unreachable:
+        await async_storage.mark_unreachable_chats(newly_unreachable)
+    return [gid for gid in checked if gid is not None]
+
+
+class BroadcastRun:
+    """Bitta broadcast'ni yetkazish (yangi yoki restart'dan keyin davom ettirilgan)"""
+
+    def __init__(self, bot: Bot, broadcast_id: Optional[str], text: str, admin_chat_id: int,
+                 status_msg, total: int, counts: Optional[Dict[str, int]] = None):
+        self.bot = bot
+        self.broadcast_id = broadcast_id
+        self.text = text
+        self.admin_chat_id = admin_chat_id
+        self.status_msg = status_msg
+        self.total = total
+        counts = counts or {}
+        self.sent = counts.get(STATUS_SENT, 0)
+        self.failed = counts.get(STATUS_FAILED, 0)
+        self.blocked = counts.get(STATUS_BLOCKED, 0)
+        self.failed_samples: List[str] = []
+        self._updates: List[Dict] = []
+        self._unreachable: List[Dict] = []
+        self._last_progress = time.monotonic()
+
+    async def _flush(self):
+        updates, self._updates = self._updates, []
+        unreachable, self._unreachable = self._unreachable, []
+        if self.broadcast_id and updates:
+            await async_storage.update_broadcast_recipients(self.broadcast_id, updates)
+        if unreachable:
+            await async_storage.mark_unreachable_chats(unreachable)
+
+    async def _progress(self):
+        now = time.monotonic()
+        if now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        try:
+            await self.status_msg.edit_text(
+                f"🚀 Yuborilmoqda...\n\n✅ Yuborildi: {self.sent}/{self.total}\n"
+                f"❌ Xatolik: {self.failed + self.blocked}"
+            )
+        except Exception as e:
+            logger.debug(f"Status message edit xatolik (broadcast): {e}")
+
+    async def _deliver(self, chat_id: int):
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=self.text, rate_limit_args=LANE_BROADCAST)
+            self.sent += 1
+            self._updates.append({'chat_id': chat_id, 'status': STATUS_SENT, 'error': None})
+        except Exception as e:
+            error = str(e)[:255]
+            logger.warning(f"Broadcast failed for {chat_id}: {error}")
+            if _is_unreachable(e):
+                self.blocked += 1
+                self._updates.append({'chat_id': chat_id, 'status': STATUS_BLOCKED, 'error': error})
+                self._unreachable.append({'chat_id': chat_id, 'reason': error})
+            else:
+                self.failed += 1
+                self._updates.append({'chat_id': chat_id, 'status': STATUS_FAILED, 'error': error})
+                if len(self.failed_samples) < 10:
+                    self.failed_samples.append(str(chat_id))
+        if len(self._updates) >= FLUSH_EVERY:
+            await self._flush()
+        await self._progress()
+
+    async def run(self, recipients: List[int]):
+        pending = iter(recipients)
+
+        async def worker():
+            for chat_id in pending:
+                await self._deliver(chat_id)
+
+        workers = max(1, min(Config.BROADCAST_CONCURRENCY, len(recipients)))
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # Bot to'xtatilmoqda - 'pending' qolganlar restart'dan keyin yuboriladi
+            logger.info(
+                f"⏸ Broadcast to'xtatildi (id={self.broadcast_id}, yuborildi={self.sent}/{self.total})"
+            )
+            raise
+        finally:
+            # Bitta worker xatolik bersa, qolganlari fonda yuborishda davom etmasin
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # To'xtatilganda ham tayyor natijalar saqlansin
+            await self._flush()
+
+        if self.broadcast_id:
+            await async_storage.finish_broadcast(self.broadcast_id)
+
+        final_text = (
+            f"✅ **Yakunlandi**\n\n"
+            f"✅ Yuborildi: **{self.sent}**\n"
+            f"❌ Xatolik: **{self.failed + self.blocked}**"
+            + (f" (bloklagan/topilmadi: {self.blocked})" if self.blocked else "")
+            + f"\n📊 Jami: **{self.total}** ta"
+        )
+        if self.failed_samples:
+            final_text += f"\n\n⚠️ Xatolik bo'lgan userlar (namuna): {', '.join(self.failed_samples[:5])}"
+
+        try:
+            await self.status_msg.edit_text(final_text, parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            logger.warning(f"Status message edit failed: {e}")
+            markup = ReplyKeyboardMarkup([[KeyboardButton("⬅️ Orqaga")]], resize_keyboard=True)
+            await self.bot.send_message(
+                chat_id=self.admin_chat_id,
+                text=final_text,
+                reply_markup=markup,
+                parse_mode=ParseMode.MARKDOWN
+            )
+        logger.info(
+            f"Broadcast completed: sent={self.sent}, failed={self.failed}, blocked={self.blocked}, total={self.total}"
+        )
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+
+async def _run_new_broadcast(bot: Bot, kind: str, text: str, created_by: int, admin_chat_id: int, status_msg):
+    try:
+        targets = await resolve_targets(bot, kind)
+        logger.info(f"Broadcast {kind}: {len(targets)} target")
+        if not targets:
+            await status_msg.edit_text("❌ Hech qanday target topilmadi.")
+            return
+
+        broadcast_id = uuid.uuid4().hex
+        if not await async_storage.create_broadcast(broadcast_id, kind, text, created_by, admin_chat_id, targets):
+            # holat saqlanmasa ham yuborish davom etadi (faqat resume bo'lmaydi)
+            broadcast_id = None
+
+        await status_msg.edit_text(f"🚀 Yuborish boshlandi... target: {len(targets)} ta\n\n⏳ Kuting...")
+        await BroadcastRun(bot, broadcast_id, text, admin_chat_id, status_msg, len(targets)).run(targets)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Broadcast xatolik ({kind}): {e}", exc_info=True)
+        try:
+            await status_msg.edit_text(f"❌ Broadcast xatolik: {str(e)[:100]}")
+        except Exception:
+            pass
+
+
+async def start_broadcast(bot: Bot, kind: str, text: str, created_by: int, admin_chat_id: int):
+    """Status xabarini yuborish; qabul qiluvchilarni aniqlash va yetkazish fonda"""
+    status_msg = await bot.send_message(chat_id=admin_chat_id, text="🔎 Qabul qiluvchilar aniqlanmoqda...")
+    _spawn(_run_new_broadcast(bot, kind, text, created_by, admin_chat_id, status_msg))
+
+
+async def stop_broadcasts():
+    """Fondagi broadcast'larni bekor qilish va tayyor natijalar saqlanishini kutish"""
+    tasks = list(_running)
+    if not tasks:
+        return
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    logger.info(f"⏸ {len(tasks)} ta broadcast to'xtatildi, qolganlari qayta ishga tushganda yuboriladi")
+
+
+async def resume_broadcasts(application) -> int:
+    """Restart'dan oldin yakunlanmagan broadcast'larni qolgan qabul qiluvchilar bilan davom ettirish"""
+    bot = application.bot
+    max_age = timedelta(hours=Config.BROADCAST_MAX_AGE_HOURS)
+    resumed = 0
+    for broadcast in await async_storage.get_unfinished_broadcasts():
+        broadcast_id = broadcast['broadcast_id']
+        admin_chat_id = broadcast['admin_chat_id']
+        counts = await async_storage.get_broadcast_counts(broadcast_id)
+        total = sum(counts.values())
+        pending = await async_storage.get_pending_broadcast_recipients(broadcast_id)
+        try:
+            created_at = datetime.fromisoformat(broadcast['created_at']) if broadcast.get('created_at') else None
+        except (TypeError, ValueError):
+            created_at = None
+
+        if not pending or (created_at is not None and datetime.utcnow() - created_at > max_age):
+            await async_storage.finish_broadcast(broadcast_id)
+            if pending:
+                logger.warning(f"🗑 Eski broadcast davom ettirilmaydi (id={broadcast_id}, qolgan={len(pending)})")
+            continue
+
+        try:
+            status_msg = await bot.send_message(
+                chat_id=admin_chat_id,
+                text=(
+                    f"♻️ Bot qayta ishga tushdi - broadcast davom ettirilmoqda\n\n"
+                    f"✅ Yuborilgan: {counts.get(STATUS_SENT, 0)}/{total}\n"
+                    f"⏳ Qolgan: {len(pending)} ta"
+                )
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Broadcast status xabarini yuborib bo'lmadi (id={broadcast_id}): {e}")
+            continue
+
+        _spawn(BroadcastRun(bot, broadcast_id, broadcast['text'], admin_chat_id, status_msg, total, counts).run(pending))
+        resumed += 1
+        logger.info(f"♻️ Broadcast davom ettirildi (id={broadcast_id}, qolgan={len(pending)}/{total})")
+    return resumed
@@ -8,7 +8,11 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from bot.config import Config
-from bot.models import storage
+from bot.models import async_storage
+from bot.models.persistence import mark_dirty
+from bot.services.quiz_snapshot import get_session_snapshot
+from bot.services.session_manager import get_session_registry
+from bot.services.leaderboard import resolve_display_names
 
 logger = logging.getLogger(__name__)
 
@@ -58,11 +62,12 @@ async def start_championship(
             'start_time': start_time,
             'scheduled': start_time > time.time()  # Kelajakda boshlanishi kerakmi
         }
+        mark_dirty(context.bot_data, 'championships')
         
         # Agar kelajakda boshlanishi kerak bo'lsa, scheduler qo'shamiz
         if start_time > time.time():
             delay = start_time - time.time()
-            quiz = storage.get_quiz(quiz_id)
+            quiz = await async_storage.get_quiz(quiz_id)
             title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
             
             await context.bot.send_message(
@@ -112,7 +117,7 @@ async def _actually_start_championship(
         
         fake_message = FakeMessage(chat_id)
         
-        quiz = storage.get_quiz(quiz_id)
+        quiz = await async_storage.get_quiz(quiz_id)
         title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
         questions_count = len(quiz.get('questions', [])) if quiz else 0
         
@@ -160,44 +165,34 @@ async def handle_championship_quiz_end(
         if not championship.get('is_active', False):
             return False
         
-        # Quiz natijalarini yig'ish
-        quiz = storage.get_quiz(quiz_id)
-        if not quiz:
-            return False
-        
-        questions = quiz.get('questions', [])
-        sessions = context.bot_data.get('sessions', {})
+        # Quiz natijalarini yig'ish (session snapshot'idan)
+        registry = get_session_registry(context.bot_data)
         
-        # Barcha foydalanuvchilarning javoblarini yig'ish
-        group_prefix = f"quiz_{chat_id}_"
-        for session_key, session in sessions.items():
-            if session_key.startswith(group_prefix) and session.get('quiz_id') == quiz_id:
+        # Barcha foydalanuvchilarning javoblarini yig'ish (tugaganlari ham)
+        for session_key, session in registry.chat_sessions(chat_id, active_only=False):
+            if session.get('quiz_id') == quiz_id:
                 user_id_session = session.get('user_id')
                 if not user_id_session:
                     continue
                 
-                # User javoblarini olish
-                user_answers = session.get('user_answers', {})
-                if not user_answers:
-                    user_answers = {user_id_session: session.get('answers', {})}
+                snapshot = await get_session_snapshot(session, quiz_id)
+                if not snapshot:
+                    continue
+                questions = snapshot.questions
                 
-                # Har bir foydalanuvchi uchun ball hisoblash
-                for uid, answers in user_answers.items():
+                # Har bir foydalanuvchi uchun ball hisoblash (shuffle hisobga olinadi)
+                for uid, _ in session.player_items():
                     if uid not in championship['scores']:
                         championship['scores'][uid] = {
                             'total_correct': 0,
                             'total_questions': 0
                         }
                     
-                    correct_count = 0
-                    for i, q_data in enumerate(questions):
-                        correct_answer = q_data.get('correct_answer')
-                        user_answer = answers.get(i)
-                        if correct_answer is not None and user_answer == correct_answer:
-                            correct_count += 1
+                    correct_count, _ = session.score(uid, questions)
                     
                     championship['scores'][uid]['total_correct'] = correct_count
-                    championship['scores'][uid]['total_questions'] = len([q for q in questions if q.get('correct_answer') is not None])
+                    championship['scores'][uid]['total_questions'] = snapshot.graded_total
+        mark_dirty(context.bot_data, 'championships')
         
         # Chempionat yakunlandi (faqat bitta quiz)
         await show_championship_results(context, chat_id)
@@ -224,6 +219,7 @@ async def show_championship_results(
         
         championship = context.bot_data['championships'][championship_key]
         championship['is_active'] = False
+        mark_dirty(context.bot_data, 'championships')
         
         scores = championship['scores']
         
@@ -255,7 +251,7 @@ async def show_championship_results(
         results.sort(key=lambda x: (x['percentage'], x['total_correct']), reverse=True)
         
         # Natijalarni formatlash
-        quiz = storage.get_quiz(championship.get('quiz_id', ''))
+        quiz = await async_storage.get_quiz(championship.get('quiz_id', ''))
         quiz_title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
         
         result_text = "🏆 **Chempionat yakunlandi!**\n\n"
@@ -263,17 +259,12 @@ async def show_championship_results(
         result_text += "📊 **Yakuniy natijalar:**\n\n"
         
         medals = ["🥇", "🥈", "🥉"]
-        for i, result in enumerate(results[:10]):  # Top 10
+        top_results = results[:10]  # Top 10
+        # Ismlar bazadan bitta query bilan, topilmaganlari parallel get_chat_member bilan
+        names = await resolve_display_names(context.bot, chat_id, [r['user_id'] for r in top_results])
+        for i, result in enumerate(top_results):
             medal = medals[i] if i < 3 else f"{i+1}."
-            user_id = result['user_id']
-            
-            # Foydalanuvchi ma'lumotlarini olish
-            try:
-                user = await context.bot.get_chat_member(chat_id, user_id)
-                user_name = user.user.first_name or f"User {user_id}"
-            except Exception as e:
-                logger.debug(f"Foydalanuvchi ma'lumotlarini olishda xatolik (user_id={user_id}, chat_id={chat_id}): {e}")
-                user_name = f"User {user_id}"
+            user_name = names[result['user_id']]
             
             result_text += f"{medal} **{user_name}**\n"
             result_text += f"   📊 {result['total_correct']}/{result['total_questions']} ({result['percentage']:.0f}%)\n\n"
@@ -286,6 +277,7 @@ async def show_championship_results(
         
         # Chempionatni o'chirish
         context.bot_data['championships'].pop(championship_key, None)
+        mark_dirty(context.bot_data, 'championships')
         
     except Exception as e:
         logger.error(f"Championship natijalarini ko'rsatishda xatolik: {e}", exc_info=True)
@@ -322,30 +314,12 @@ async def stop_championship(
         championship['is_active'] = False
         
         # Aktiv quizlarni to'xtatish
-        sessions = context.bot_data.setdefault('sessions', {})
-        group_locks = context.bot_data.setdefault('group_locks', {})
-        
-        stopped = 0
-        
-        # Lock orqali topish
-        session_key = group_locks.get(chat_id)
-        if session_key and session_key in sessions and sessions[session_key].get('is_active', False):
-            sessions[session_key]['is_active'] = False
-            stopped += 1
-        
-        # Barcha aktiv sessionlarni topish
-        prefix = f"quiz_{chat_id}_"
-        for k, s in list(sessions.items()):
-            if k.startswith(prefix) and s.get('is_active', False):
-                s['is_active'] = False
-                stopped += 1
-        
-        # Lock bo'shatish
-        if chat_id in group_locks:
-            group_locks.pop(chat_id)
+        # Guruhdagi barcha aktiv sessionlarni to'xtatish va lock'ni bo'shatish
+        get_session_registry(context.bot_data).deactivate_chat(chat_id)
         
         # Chempionatni o'chirish
         context.bot_data['championships'].pop(championship_key, None)
+        mark_dirty(context.bot_data, 'championships')
         
         logger.info(f"Championship to'xtatildi: chat_id={chat_id}")
         return True
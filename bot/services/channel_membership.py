@@ -0,0 +1,90 @@
+"""Majburiy obuna kanallari bo'yicha a'zolik tekshiruvi (cache bilan)
+
+/start har chaqirilganda har bir kanal uchun ketma-ket `get_chat_member`
+o'rniga: kanallar ro'yxati storage cache'idan olinadi, (user, kanal)
+natijalari xotirada saqlanadi (a'zo - uzoqroq, a'zo emas - qisqa muddat),
+cache'da yo'q kanallar esa parallel tekshiriladi.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bot.config import Config
+from bot.models import async_storage
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHE_ENTRIES = 50000
+
+# (user_id, channel_id) -> (a'zomi, amal qilish muddati)
+_membership: Dict[Tuple[int, int], Tuple[bool, float]] = {}
+
+
+def _cache_get(user_id: int, channel_id: int, now: float) -> Optional[bool]:
+    item = _membership.get((user_id, channel_id))
+    if item is None:
+        return None
+    if item[1] < now:
+        _membership.pop((user_id, channel_id), None)
+        return None
+    return item[0]
+
+
+def _cache_put(user_id: int, channel_id: int, is_member: bool, now: float):
+    ttl = Config.CHANNEL_MEMBER_CACHE_TTL if is_member else Config.CHANNEL_NON_MEMBER_CACHE_TTL
+    if ttl <= 0:
+        return
+    if len(_membership) >= MAX_CACHE_ENTRIES:
+        # Eskirgan yozuvlarni tozalash, baribir to'la bo'lsa - hammasini
+        for key in [k for k, v in _membership.items() if v[1] < now]:
+            _membership.pop(key, None)
+        if len(_membership) >= MAX_CACHE_ENTRIES:
+            _membership.clear()
+    _membership[(user_id, channel_id)] = (is_member, now + ttl)
+
+
+def forget_user(user_id: int):
+    """Foydalanuvchining "a'zo emas" natijalarini o'chirish ("Obuna bo'ldim" bosilganda)"""
+    for key in [k for k, v in _membership.items() if k[0] == user_id and not v[0]]:
+        _membership.pop(key, None)
+
+
+async def _check_member(bot, channel_id: int, user_id: int) -> Optional[bool]:
+    """A'zolik (xatolik bo'lsa None - cache'lanmaydi)"""
+    try:
+        member = await bot.get_chat_member(channel_id, user_id)
+        return member.status not in ['left', 'kicked']
+    except Exception as e:
+        logger.error(f"Channel subscription check error: {e}")
+        return None
+
+
+async def get_unsubscribed_channels(bot, user_id: int) -> List[Dict]:
+    """Foydalanuvchi obuna bo'lmagan majburiy kanallar (xatolik bo'lsa ham qo'shiladi)"""
+    channels = await async_storage.get_required_channels()
+    if not channels:
+        return []
+
+    now = time.monotonic()
+    not_subscribed = []
+    to_check = []
+    for ch in channels:
+        cached = _cache_get(user_id, ch.get('channel_id'), now)
+        if cached is None:
+            to_check.append(ch)
+        elif not cached:
+            not_subscribed.append(ch)
+
+    if to_check:
+        results = await asyncio.gather(*(_check_member(bot, ch.get('channel_id'), user_id) for ch in to_check))
+        for ch, is_member in zip(to_check, results):
+            if is_member is not None:
+                _cache_put(user_id, ch.get('channel_id'), is_member, now)
+            if not is_member:
+                not_subscribed.append(ch)
+
+    # Kanallar tartibini saqlash
+    order = {id(ch): i for i, ch in enumerate(channels)}
+    not_subscribed.sort(key=lambda ch: order[id(ch)])
+    return not_subscribed
@@ -0,0 +1,320 @@
+"""Telegram'ga chiquvchi so'rovlar rejalashtiruvchisi (rate limiter)
+
+`send_poll`, `send_message`, `edit_message_text` va h.k. butun kod bo'ylab
+to'g'ridan-to'g'ri chaqiriladi. Bu klass PTB'ning `BaseRateLimiter` sifatida
+Application'ga ulanadi - shu sababli har bir Bot API so'rovi shu yerdan
+o'tadi va chaqiruv joylarini o'zgartirish shart emas:
+
+- umumiy token bucket (~30 xabar/s) va har bir chat uchun alohida bucket
+  (guruh - ~20 xabar/daqiqa, private chat - ~1 xabar/s, qisqa burst bilan);
+- ustuvorlik yo'laklari: quiz poll'lari > natijalar va oddiy xabarlar >
+  progress tahrirlari > broadcast. Har bir chatning o'z FIFO navbati bor
+  (chat ichida tartib yo'laklardan qat'i nazar saqlanadi); token
+  bo'shaganda navbat boshidagi so'rovi eng yuqori yo'lakda bo'lgan chat
+  o'tadi. Limitga yetgan chat boshqa chatlarni to'sib qo'ymaydi;
+- `RetryAfter` (flood control) - chat (yoki umumiy) bucket ko'rsatilgan
+  vaqtga to'xtatiladi va so'rov qayta navbatga qo'yiladi.
+
+Yo'lakni chaqiruvchi o'zi ham berishi mumkin:
+`bot.send_message(..., rate_limit_args=LANE_BROADCAST)`.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+LANE_POLL = 0
+LANE_MESSAGE = 1
+LANE_EDIT = 2
+LANE_BROADCAST = 3
+
+# Xabar chiqaradigan endpoint'lar va ularning standart yo'lagi; qolganlari
+# (getFile, getChatMember, answerCallbackQuery, ...) bucket'dan o'tmaydi
+ENDPOINT_LANES = {
+    'sendPoll': LANE_POLL,
+    'stopPoll': LANE_POLL,
+    'sendMessage': LANE_MESSAGE,
+    'sendDocument': LANE_MESSAGE,
+    'sendPhoto': LANE_MESSAGE,
+    'sendMediaGroup': LANE_MESSAGE,
+    'copyMessage': LANE_MESSAGE,
+    'forwardMessage': LANE_MESSAGE,
+    'editMessageText': LANE_EDIT,
+    'editMessageReplyMarkup': LANE_EDIT,
+    'editMessageCaption': LANE_EDIT,
+}
+
+# Bu sondan ko'p chat bucket'i bo'lsa, to'lib turganlari (ya'ni yangisidan farqi yo'q) o'chiriladi
+MAX_IDLE_CHAT_BUCKETS = 5000
+
+
+class TokenBucket:
+    """Sekundiga `rate` token, ko'pi bilan `capacity` ta yig'iladi"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = max(1e-6, float(rate))
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Keyingi token uchun kutish (sekund), token bo'lsa 0"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float):
+        """Kamida `seconds` davomida token bermaslik (RetryAfter)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    # PTB yangi versiyalarida retry_after - timedelta
+    value = error.retry_after
+    if hasattr(value, 'total_seconds'):
+        value = value.total_seconds()
+    return max(0.0, float(value))
+
+
+class EgressScheduler(BaseRateLimiter[int]):
+    """Ustuvorlikli, token bucket asosidagi Telegram rate limiter"""
+
+    def __init__(
+        self,
+        global_per_second: float = 30,
+        group_per_minute: float = 20,
+        private_per_second: float = 1,
+        private_burst: int = 3,
+        max_retries: int = 3,
+    ):
+        self.global_per_second = float(global_per_second)
+        self.group_per_minute = float(group_per_minute)
+        self.private_per_second = float(private_per_second)
+        self.private_burst = int(private_burst)
+        self.max_retries = max(0, int(max_retries))
+        self._global: Optional[TokenBucket] = None
+        self._chats: Dict[Any, TokenBucket] = {}
+        # chat -> FIFO [(yo'lak, seq, future)]; ready: (yo'lak, seq, chat), sleeping: (vaqt, seq, chat)
+        self._queues: Dict[Any, Deque[Tuple[int, int, asyncio.Future]]] = {}
+        self._ready: List[Tuple[int, int, Any]] = []
+        self._sleeping: List[Tuple[float, int, Any]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+        self.sent = 0
+        self.flood_waits = 0
+
+    async def initialize(self) -> None:
+        self._global = TokenBucket(self.global_per_second, self.global_per_second, time.monotonic())
+
+    async def shutdown(self) -> None:
+        dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher is not None:
+            dispatcher.cancel()
+        for queue in self._queues.values():
+            for _, _, future in queue:
+                if not future.done():
+                    future.cancel()
+        self._queues.clear()
+        self._ready.clear()
+        self._sleeping.clear()
+
+    def _chat_bucket(self, chat_id: Any, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Manfiy id va @username - guruh/kanal, musbat id - private chat
+            if isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0):
+                bucket = TokenBucket(self.group_per_minute / 60, self.group_per_minute, now)
+            else:
+                bucket = TokenBucket(self.private_per_second, self.private_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune(self, now: float):
+        if len(self._chats) <= MAX_IDLE_CHAT_BUCKETS or now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for chat_id in [c for c, b in self._chats.items() if c not in self._queues and b.is_full(now)]:
+            del self._chats[chat_id]
+
+    def _schedule(self, chat_id: Any, queue: Deque[Tuple[int, int, asyncio.Future]]):
+        """Chatni navbat boshidagi so'rov kaliti bilan ready heap'ga qo'yish (bo'sh bo'lsa o'chirish)"""
+        while queue and queue[0][2].done():
+            queue.popleft()
+        if not queue:
+            del self._queues[chat_id]
+            return
+        lane, seq, _ = queue[0]
+        heapq.heappush(self._ready, (lane, seq, chat_id))
+
+    def _grant(self) -> Optional[float]:
+        """Token yetgan so'rovlarni ustuvorlik tartibida o'tkazish
+
+        Har bir chat ready yoki sleeping heap'ida bittadan turadi. Ready -
+        navbat boshidagi so'rovning (yo'lak, seq) kaliti bo'yicha; chat
+        bucket'i bo'sh bo'lsa, chat token paydo bo'ladigan vaqtgacha
+        sleeping heap'ga o'tadi. Shu sababli tick'dagi ish faqat o'tgan /
+        uyg'ongan chatlar soniga bog'liq.
+
+        Returns:
+            keyingi tekshiruvgacha kutish (sekund), navbat bo'sh bo'lsa None
+        """
+        now = time.monotonic()
+        if self._global is None:
+            self._global = TokenBucket(self.global_per_second, self.global_per_second, now)
+        sleeping = self._sleeping
+        while sleeping and sleeping[0][0] <= now:
+            _, _, chat_id = heapq.heappop(sleeping)
+            self._schedule(chat_id, self._queues[chat_id])
+
+        next_wait: Optional[float] = None
+        ready = self._ready
+        while ready:
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                # umumiy limit - hech kim o'tmaydi
+                next_wait = global_wait
+                break
+            lane, seq, chat_id = heapq.heappop(ready)
+            queue = self._queues[chat_id]
+            head = queue[0] if queue else None
+            if head is None or head[2].done() or head[0] != lane or head[1] != seq:
+                # navbat boshi o'zgargan (bekor qilingan yoki retry oldinga qo'yilgan)
+                self._schedule(chat_id, queue)
+                continue
+            bucket = self._chat_bucket(chat_id, now) if chat_id is not None else None
+            chat_wait = bucket.wait_time(now) if bucket is not None else 0.0
+            if chat_wait > 0:
+                heapq.heappush(sleeping, (now + chat_wait, seq, chat_id))
+                continue
+            self._global.take()
+            if bucket is not None:
+                bucket.take()
+            queue.popleft()[2].set_result(None)
+            self._schedule(chat_id, queue)
+
+        if sleeping:
+            sleep_wait = max(0.0, sleeping[0][0] - now)
+            next_wait = sleep_wait if next_wait is None else min(next_wait, sleep_wait)
+        self._prune(now)
+        if not self._queues:
+            return None
+        return next_wait if next_wait is not None else 0.05
+
+    async def _dispatch_loop(self):
+        while True:
+            delay = self._grant()
+            self._wakeup.clear()
+            try:
+                if delay is None:
+                    await self._wakeup.wait()
+                else:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _acquire(self, lane: int, chat_id: Any, seq: int, retry: bool = False):
+        """Chat navbatiga qo'yish va token kutish
+
+        `retry` (RetryAfter'dan keyin qayta urinish) bo'lsa so'rov chat
+        navbatining boshiga qaytadi - chat ichidagi tartib buzilmaydi.
+        """
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            self._queues[chat_id] = deque([(lane, seq, future)])
+            heapq.heappush(self._ready, (lane, seq, chat_id))
+        elif retry:
+            queue.appendleft((lane, seq, future))
+        else:
+            queue.append((lane, seq, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        self._wakeup.set()
+        await future
+
+    def _pause(self, chat_id: Any, seconds: float):
+        now = time.monotonic()
+        if chat_id is not None:
+            self._chat_bucket(chat_id, now).pause(now, seconds)
+        elif self._global is not None:
+            self._global.pause(now, seconds)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict, List[Dict]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict, List[Dict]]:
+        lane = rate_limit_args if isinstance(rate_limit_args, int) else ENDPOINT_LANES.get(endpoint)
+        chat_id = data.get('chat_id') if data else None
+        attempt = 0
+        seq = next(self._seq)
+        while True:
+            if lane is not None:
+                await self._acquire(lane, chat_id, seq, retry=attempt > 0)
+            try:
+                result = await callback(*args, **kwargs)
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                attempt += 1
+                self.flood_waits += 1
+                wait = _retry_after_seconds(e)
+                self._pause(chat_id, wait)
+                if attempt > self.max_retries:
+                    logger.error(f"❌ Telegram flood limit: {endpoint} chat={chat_id} - {attempt - 1} marta qayta urinildi")
+                    raise
+                logger.warning(
+                    f"⏳ Telegram flood limit: {endpoint} chat={chat_id}, {wait:.1f}s kutiladi "
+                    f"({attempt}/{self.max_retries})"
+                )
+                if lane is None:
+                    await asyncio.sleep(wait)
+
+    def stats(self) -> Dict:
+        return {
+            'waiting': sum(1 for queue in self._queues.values() for entry in queue if not entry[2].done()),
+            'chats': len(self._chats),
+            'sent': self.sent,
+            'flood_waits': self.flood_waits,
+        }
+
+
+egress_scheduler = EgressScheduler(
+    Config.EGRESS_GLOBAL_PER_SECOND,
+    Config.EGRESS_GROUP_PER_MINUTE,
+    Config.EGRESS_PRIVATE_PER_SECOND,
+    Config.EGRESS_PRIVATE_BURST,
+    Config.EGRESS_MAX_RETRIES,
+)
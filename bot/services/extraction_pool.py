@@ -0,0 +1,147 @@
+"""PDF/DOCX fayllardan matn ajratish uchun process pool
+
+PyPDF2 va python-docx sof Python'da, sinxron ishlaydi - katta PDF event
+loop'ni (va shu paytda ketayotgan barcha quizlarni) bir necha sekundga
+to'xtatib qo'yadi. Shu sabab og'ir formatlar alohida process'larda
+ajratiladi: worker'lar soni cheklangan, har bir ish uchun timeout va
+worker uchun xotira limiti (RLIMIT_AS) bor. TXT inline o'qiladi.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from bot.config import Config
+from bot.services.file_parser import FileParser
+
+logger = logging.getLogger(__name__)
+
+POOLED_EXTENSIONS = ('.pdf', '.docx', '.doc')
+
+
+def _init_worker(max_memory_mb: int):
+    """Worker process'ni sozlash: xotira limiti (POSIX)"""
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning(f"⚠️ Worker xotira limitini o'rnatib bo'lmadi: {e}")
+
+
+class ExtractionPool:
+    """Cheklangan ProcessPoolExecutor ustidagi async interfeys
+
+    `queued` - navbatda kutayotgan va bajarilayotgan ishlar soni (navbat
+    chuqurligi); u `max_workers` dan oshsa, pool to'liq band. Pool'ga bir
+    vaqtda faqat `max_workers` ta ish beriladi (semaphore), shuning uchun
+    timeout navbatda kutilgan vaqtni emas, faqat ajratish vaqtini o'lchaydi.
+    """
+
+    def __init__(self, max_workers: int = 2, timeout: float = 60, max_memory_mb: int = 1024):
+        self.max_workers = max(0, int(max_workers))
+        self.timeout = float(timeout)
+        self.max_memory_mb = int(max_memory_mb)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queued = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: thread'lari bor (DB pool, executor) process'ni fork qilmaslik uchun
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.max_memory_mb,),
+            )
+            logger.info(f"📄 Matn ajratish pool'i yaratildi ({self.max_workers} worker, limit {self.max_memory_mb} MB)")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _reset(self):
+        """Pool'ni to'xtatish (osilib qolgan worker'lar bilan birga); keyingi ishda yangisi yaratiladi"""
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # ProcessPoolExecutor'da ishni to'xtatish API'si yo'q - worker'lar terminate qilinadi,
+        # navbatdagi ishlar BrokenProcessPool bilan yakunlanadi
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False)
+        for process in processes:
+            try:
+                if process.is_alive():
+                    process.terminate()
+            except Exception as e:
+                logger.debug(f"Worker'ni to'xtatishda xatolik: {e}")
+
+    async def extract_text(self, file_content: bytes, file_extension: str) -> Tuple[str, bool]:
+        """Fayldan matn ajratish (PDF/DOCX - pool'da, xatolik yoki timeout bo'lsa "")
+
+        Returns:
+            (matn, kesildimi) - matn FILE_MAX_TEXT_CHARS da kesilgan bo'lsa True
+        """
+        max_chars = Config.FILE_MAX_TEXT_CHARS
+        if file_extension.lower() not in POOLED_EXTENSIONS or self.max_workers <= 0:
+            return FileParser.extract_text_limited(file_content, file_extension, max_chars)
+
+        loop = asyncio.get_running_loop()
+        self.queued += 1
+        if self.queued > self.max_workers:
+            logger.info(f"📥 Matn ajratish navbati: {self.queued} ta ish ({self.max_workers} worker)")
+        try:
+            async with self._get_semaphore():
+                # Timeout worker bo'sh bo'lgandan keyin boshlanadi
+                future = loop.run_in_executor(
+                    self._get_executor(), FileParser.extract_text_limited, file_content, file_extension, max_chars
+                )
+                result = await asyncio.wait_for(future, timeout=self.timeout)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.error(f"⏱ Matn ajratish {self.timeout:.0f}s dan oshdi ({file_extension}, {len(file_content)} bayt) - pool qayta ishga tushiriladi")
+            self._reset()
+            return "", False
+        except BrokenProcessPool as e:
+            self.failures += 1
+            logger.error(f"❌ Matn ajratish worker'i to'xtadi ({file_extension}): {e}")
+            self._reset()
+            return "", False
+        finally:
+            self.queued -= 1
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.max_workers,
+            'queued': self.queued,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'failures': self.failures,
+        }
+
+
+extraction_pool = ExtractionPool(
+    Config.FILE_EXTRACT_WORKERS,
+    Config.FILE_EXTRACT_TIMEOUT,
+    Config.FILE_EXTRACT_MAX_MEMORY_MB,
+)
@@ -1,11 +1,18 @@
 """File parser - turli formatdagi fayllardan matn ajratish"""
 import logging
 from io import BytesIO
+from typing import Iterable, Iterator, Optional, Tuple
 import docx
 import PyPDF2
 
+from bot.utils.validators import extract_answer_key_map
+
 logger = logging.getLogger(__name__)
 
+# Matn kesilganda javoblar kaliti qidiriladigan oxirgi sahifalar / paragraflar soni
+ANSWER_KEY_TAIL_PAGES = 2
+ANSWER_KEY_TAIL_PARAGRAPHS = 40
+
 
 class FileParser:
     """Fayl tahlil qiluvchi - TXT, PDF, DOCX formatlarni qo'llab-quvvatlaydi"""
@@ -19,49 +26,117 @@ class FileParser:
             return file_content.decode('utf-8', errors='ignore')
     
     @staticmethod
-    def extract_from_pdf(file_content: bytes) -> str:
-        """PDF fayldan matn ajratish"""
+    def _join_limited(pieces: Iterable[str], max_chars: int = 0, sep: str = "\n") -> Tuple[str, Optional[int]]:
+        """Bo'laklarni max_chars ga yetguncha yig'ish.
+        
+        Returns:
+            (matn, o'qilgan bo'laklar soni - agar limitda to'xtagan bo'lsa, aks holda None)
+        """
+        parts = []
+        total = 0
+        for count, piece in enumerate(pieces, 1):
+            parts.append(piece)
+            total += len(piece) + len(sep)
+            if max_chars and total >= max_chars:
+                return sep.join(parts), count
+        return sep.join(parts), None
+    
+    @staticmethod
+    def _with_answer_key(text: str, tail_text: str) -> str:
+        """Kesilgan matnga hujjat oxiridagi javoblar kalitini qo'shish (ixcham "Javoblar: 1-A, ..." satri)"""
+        try:
+            answer_key = extract_answer_key_map(tail_text)
+        except Exception:
+            answer_key = {}
+        if not answer_key:
+            return text
+        pairs = ", ".join(f"{qn}-{ans}" for qn, ans in sorted(answer_key.items()))
+        return f"{text}\nJavoblar: {pairs}\n"
+    
+    @staticmethod
+    def iter_pdf_pages(pdf_reader) -> Iterator[str]:
+        """PDF sahifalari matni - kerak bo'lganda bittadan o'qiladi"""
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ""
+    
+    @staticmethod
+    def _pdf_text(file_content: bytes, max_chars: int = 0) -> Tuple[str, bool]:
+        """PDF matni va u max_chars da kesilganmi"""
         try:
             pdf_file = BytesIO(file_content)
             pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            text, pages_read = FileParser._join_limited(FileParser.iter_pdf_pages(pdf_reader), max_chars)
+            text += "\n"
+            if pages_read is not None:
+                total_pages = len(pdf_reader.pages)
+                if pages_read < total_pages:
+                    logger.info(f"📄 PDF {pages_read}/{total_pages} sahifada to'xtatildi ({len(text)} belgi)")
+                    tail_start = max(pages_read, total_pages - ANSWER_KEY_TAIL_PAGES)
+                    tail = "\n".join(pdf_reader.pages[i].extract_text() or "" for i in range(tail_start, total_pages))
+                    return FileParser._with_answer_key(text, tail), True
+            return text, False
         except Exception as e:
             logger.error(f"PDF xatolik: {e}")
-            return ""
+            return "", False
     
     @staticmethod
-    def extract_from_docx(file_content: bytes) -> str:
-        """DOCX fayldan matn ajratish"""
+    def _docx_text(file_content: bytes, max_chars: int = 0) -> Tuple[str, bool]:
+        """DOCX matni va u max_chars da kesilganmi"""
         try:
             doc_file = BytesIO(file_content)
             doc = docx.Document(doc_file)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return text
+            paragraphs = doc.paragraphs
+            text, read = FileParser._join_limited((paragraph.text for paragraph in paragraphs), max_chars)
+            if read is not None and read < len(paragraphs):
+                tail_start = max(read, len(paragraphs) - ANSWER_KEY_TAIL_PARAGRAPHS)
+                return FileParser._with_answer_key(text, "\n".join(p.text for p in paragraphs[tail_start:])), True
+            return text, False
         except Exception as e:
             logger.error(f"DOCX xatolik: {e}")
-            return ""
+            return "", False
+    
+    @staticmethod
+    def extract_from_pdf(file_content: bytes, max_chars: int = 0) -> str:
+        """PDF fayldan matn ajratish (max_chars yig'ilgach qolgan sahifalar o'qilmaydi)"""
+        return FileParser._pdf_text(file_content, max_chars)[0]
     
     @staticmethod
-    def extract_text(file_content: bytes, file_extension: str) -> str:
-        """Fayl kengaytmasiga qarab matn ajratish"""
+    def extract_from_docx(file_content: bytes, max_chars: int = 0) -> str:
+        """DOCX fayldan matn ajratish"""
+        return FileParser._docx_text(file_content, max_chars)[0]
+    
+    @staticmethod
+    def extract_text(file_content: bytes, file_extension: str, max_chars: int = 0) -> str:
+        """Fayl kengaytmasiga qarab matn ajratish (max_chars > 0 bo'lsa, matn shu hajm atrofida kesiladi)"""
+        return FileParser.extract_text_limited(file_content, file_extension, max_chars)[0]
+    
+    @staticmethod
+    def extract_text_limited(file_content: bytes, file_extension: str, max_chars: int = 0) -> Tuple[str, bool]:
+        """`extract_text` kabi, lekin matn max_chars da kesilganini ham qaytaradi.
+        
+        Returns:
+            (matn, kesildimi) - kesilgan bo'lsa, foydalanuvchiga aytiladi
+        """
         extension = file_extension.lower()
         
-        if extension == '.txt':
-            return FileParser.extract_from_txt(file_content)
-        elif extension == '.pdf':
-            return FileParser.extract_from_pdf(file_content)
+        if extension == '.pdf':
+            return FileParser._pdf_text(file_content, max_chars)
         elif extension in ['.docx', '.doc']:
-            return FileParser.extract_from_docx(file_content)
+            return FileParser._docx_text(file_content, max_chars)
+        elif extension == '.txt':
+            text = FileParser.extract_from_txt(file_content)
         else:
             # Noma'lum format - UTF-8 sifatida o'qishga harakat
             try:
-                return file_content.decode('utf-8')
+                text = file_content.decode('utf-8')
             except (UnicodeDecodeError, UnicodeError, AttributeError) as e:
                 logger.debug(f"Noma'lum format fayl UTF-8 decode xatolik: {e}")
-                return file_content.decode('utf-8', errors='ignore')
+                text = file_content.decode('utf-8', errors='ignore')
+        
+        if max_chars and len(text) > max_chars:
+            cut = text.rfind("\n", 0, max_chars)
+            return FileParser._with_answer_key(text[:cut if cut > 0 else max_chars], text[-12000:]), True
+        return text, False
 
 
 # Alias for backward compatibility
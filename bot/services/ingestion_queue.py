@@ -0,0 +1,211 @@
+"""Yuklangan fayllarni tahlil qilish navbati
+
+Har bir yuklash uchun darhol `process_file_background` ishga tushirilmaydi:
+bir vaqtda faqat `workers` ta fayl tahlil qilinadi, qolganlari navbatda
+kutadi (fayl hali yuklab olinmagan - xotira band qilinmaydi). Navbat
+tarif bo'yicha ustuvor: Pro > Core > Free, bir xil tarifda - kelish tartibi.
+Navbatdagi va bajarilayotgan fayllarning umumiy hajmi `max_queued_bytes`
+dan oshsa, yangi fayl qabul qilinmaydi.
+
+Foydalanuvchi bekor qilishi (`cancel_user`) va bot to'xtashi (`stop`)
+farqlanadi: `on_cancel` faqat birinchisida chaqiriladi. Bot to'xtaganda
+ishlar checkpoint'lari bilan qoladi va qayta ishga tushganda davom etadi.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from bot.config import Config
+from bot.services.subscription import PLAN_CORE, PLAN_FREE, PLAN_PRO
+
+logger = logging.getLogger(__name__)
+
+PLAN_PRIORITY = {PLAN_PRO: 0, PLAN_CORE: 1, PLAN_FREE: 2}
+
+# Navbat o'rni haqida xabar beriladigan birinchi ishlar soni (Telegram edit limiti uchun)
+MAX_POSITION_NOTIFICATIONS = 50
+
+
+class IngestionJob:
+    """Navbatdagi bitta fayl
+
+    `run` - tahlilni bajaruvchi coroutine funksiya; `on_position(n)` -
+    navbatdagi o'rni o'zgarganda; `on_cancel()` - foydalanuvchi bekor
+    qilganda (navbatda ham, bajarilayotganda ham) chaqiriladi.
+    """
+    __slots__ = ('user_id', 'plan', 'priority', 'size_bytes', 'run', 'on_position', 'on_cancel',
+                 'seq', 'task', 'cancelled', 'last_position')
+
+    def __init__(
+        self,
+        user_id: int,
+        plan: str,
+        size_bytes: int,
+        run: Callable[[], Awaitable],
+        on_position: Optional[Callable[[int], Awaitable]] = None,
+        on_cancel: Optional[Callable[[], Awaitable]] = None,
+    ):
+        self.user_id = user_id
+        self.plan = plan
+        self.priority = PLAN_PRIORITY.get(plan, PLAN_PRIORITY[PLAN_FREE])
+        self.size_bytes = max(0, int(size_bytes or 0))
+        self.run = run
+        self.on_position = on_position
+        self.on_cancel = on_cancel
+        self.seq = 0
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+        self.last_position: Optional[int] = None
+
+
+class IngestionQueue:
+    """Ustuvorlikli, hajmi cheklangan fayl tahlil navbati (event loop ichida ishlaydi)"""
+
+    def __init__(self, workers: int = 3, max_queued_bytes: int = 0):
+        self.workers = max(1, int(workers))
+        self.max_queued_bytes = max(0, int(max_queued_bytes))
+        self._heap: List[Tuple[int, int, IngestionJob]] = []
+        self._running: Set[IngestionJob] = set()
+        # Fon callback'lari (navbat o'rni, bekor qilish xabari) - GC bo'lmasligi va stop'da kutish uchun
+        self._callbacks: Set[asyncio.Task] = set()
+        self._seq = itertools.count()
+        self._stopping = False
+        self.queued_bytes = 0
+
+    def submit(self, job: IngestionJob) -> Optional[int]:
+        """Ishni navbatga qo'yish.
+
+        Returns:
+            0 - darhol boshlandi, N - navbatdagi o'rni, None - hajm limiti to'lgan
+        """
+        if self._stopping:
+            return None
+        busy = bool(self._heap or self._running)
+        if busy and self.max_queued_bytes and self.queued_bytes + job.size_bytes > self.max_queued_bytes:
+            logger.warning(
+                f"📥 Navbat to'la: {self.queued_bytes / 1048576:.1f} MB band, "
+                f"yangi fayl {job.size_bytes / 1048576:.1f} MB (user_id={job.user_id})"
+            )
+            return None
+        job.seq = next(self._seq)
+        self.queued_bytes += job.size_bytes
+        heapq.heappush(self._heap, (job.priority, job.seq, job))
+        self._dispatch()
+        return self.position(job)
+
+    def position(self, job: IngestionJob) -> int:
+        """Navbatdagi o'rni (1 dan), bajarilayotgan yoki tugagan bo'lsa 0"""
+        if job.task is not None or job.cancelled:
+            return 0
+        key = (job.priority, job.seq)
+        return 1 + sum(1 for prio, seq, other in self._heap if (prio, seq) < key and not other.cancelled)
+
+    def _dispatch(self):
+        if self._stopping:
+            return
+        while len(self._running) < self.workers and self._heap:
+            _, _, job = heapq.heappop(self._heap)
+            if job.cancelled:
+                continue
+            self._running.add(job)
+            job.task = asyncio.create_task(self._run(job))
+        self._notify_positions()
+
+    def _notify_positions(self):
+        waiting = sorted(entry for entry in self._heap if not entry[2].cancelled)
+        for position, (_, _, job) in enumerate(waiting[:MAX_POSITION_NOTIFICATIONS], 1):
+            if job.last_position != position and job.on_position:
+                job.last_position = position
+                self._spawn_callback(job.on_position(position))
+
+    def _spawn_callback(self, coro: Awaitable):
+        task = asyncio.create_task(self._safe_call(coro))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    @staticmethod
+    async def _safe_call(coro: Awaitable):
+        try:
+            await coro
+        except Exception as e:
+            logger.debug(f"Navbat callback xatolik: {e}")
+
+    async def _run(self, job: IngestionJob):
+        try:
+            await job.run()
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                # cancel_user emas (bot to'xtatilmoqda) - checkpoint o'chirilmaydi
+                logger.info(f"⏸ Fayl tahlili to'xtatildi, keyin davom etadi (user_id={job.user_id})")
+                raise
+            logger.info(f"🛑 Fayl tahlili bekor qilindi (user_id={job.user_id})")
+            if job.on_cancel:
+                await self._safe_call(job.on_cancel())
+        except Exception as e:
+            logger.error(f"❌ Fayl tahlili xatolik (user_id={job.user_id}): {e}", exc_info=True)
+        finally:
+            self._running.discard(job)
+            self.queued_bytes -= job.size_bytes
+            self._dispatch()
+
+    def cancel_user(self, user_id: int) -> int:
+        """Foydalanuvchining barcha ishlarini bekor qilish (slot darhol bo'shaydi); nechta ish bekor qilindi"""
+        cancelled = 0
+        for _, _, job in self._heap:
+            if job.user_id == user_id and not job.cancelled:
+                job.cancelled = True
+                self.queued_bytes -= job.size_bytes
+                cancelled += 1
+                if job.on_cancel:
+                    self._spawn_callback(job.on_cancel())
+        if cancelled:
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+
+        for job in list(self._running):
+            if job.user_id == user_id and job.task is not None and not job.task.done():
+                job.cancelled = True
+                job.task.cancel()
+                cancelled += 1
+
+        self._notify_positions()
+        return cancelled
+
+    async def stop(self) -> int:
+        """Bot to'xtaganda: yangi ish qabul qilmaslik, bajarilayotganlarni to'xtatish
+
+        `on_cancel` chaqirilmaydi - ishlar DB'dagi checkpoint'lari bilan qoladi
+        va keyingi ishga tushishda `resume_file_jobs` ularni davom ettiradi.
+        Qaytaradi: to'xtatilgan (bajarilayotgan + navbatdagi) ishlar soni.
+        """
+        self._stopping = True
+        waiting_jobs = [job for _, _, job in self._heap if not job.cancelled]
+        waiting = len(waiting_jobs)
+        self.queued_bytes -= sum(job.size_bytes for job in waiting_jobs)
+        self._heap.clear()
+        tasks = [job.task for job in self._running if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # Qisqa xabar callback'lari (bot hali ishlayapti) oxirigacha kutiladi
+        if self._callbacks:
+            await asyncio.gather(*list(self._callbacks), return_exceptions=True)
+        stopped = len(tasks) + waiting
+        if stopped:
+            logger.info(f"⏸ Fayl tahlil navbati to'xtatildi: {len(tasks)} bajarilayotgan, {waiting} navbatdagi ish")
+        return stopped
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'running': len(self._running),
+            'waiting': sum(1 for entry in self._heap if not entry[2].cancelled),
+            'queued_bytes': self.queued_bytes,
+            'max_queued_bytes': self.max_queued_bytes,
+        }
+
+
+ingestion_queue = IngestionQueue(Config.INGEST_WORKERS, Config.INGEST_MAX_QUEUED_MB * 1024 * 1024)
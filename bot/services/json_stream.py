@@ -0,0 +1,222 @@
+"""AI javobidagi JSON'ni oqim (stream) bo'yicha o'qish
+
+DeepSeek javobi SSE orqali bo'lak-bo'lak keladi. `QuestionStreamParser`
+har bir bo'lakdan keyin `"questions": [...]` massivida yopilgan savol
+obyektlarini darhol qaytaradi - to'liq javobni kutish shart emas, timeout
+bo'lsa ham tayyor savollar yo'qolmaydi.
+
+`find_json_dict` - to'liq javob uchun: matn bir marta skanerlanib JSON
+obyektlari chegaralari topiladi, max_tokens'da kesilgan javob esa oxirgi
+to'liq element gacha qisqartirilib, ochiq qavslar yopiladi.
+"""
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+_QUESTIONS_RE = re.compile(r'"questions"\s*:\s*\[')
+_TITLE_RE = re.compile(r'"title"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class QuestionStreamParser:
+    """`{"title": ..., "questions": [{...}, ...]}` javobi uchun inkremental parser
+
+    Matn faqat bir marta skanerlanadi: satr ichidagi qavslar va escape
+    belgilar hisobga olinadi, massiv darajasidagi har bir `{...}` yopilganda
+    o'sha bo'lak `json.loads` qilinadi. Butun javob bufer'da to'planmaydi -
+    faqat hali yopilmagan savol obyekti (va massivgacha bo'lgan qism) saqlanadi,
+    shuning uchun har bir bo'lak chiziqli vaqtda qayta ishlanadi.
+    """
+
+    def __init__(self):
+        self.title: Optional[str] = None
+        self.questions: List[Dict] = []
+        self.finished = False
+        self._in_array = False
+        # questions massivigacha bo'lgan matn (title shu yerda qidiriladi)
+        self._head = ''
+        self._seek_from = 0
+        self._title_from = 0
+        # massiv ichidagi skanerlanmagan qism: joriy ochiq obyekt + yangi bo'laklar
+        self._buf = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self._obj_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Yangi bo'lakni qo'shish; shu bo'lak bilan yopilgan savollarni qaytarish"""
+        if not chunk or self.finished:
+            return []
+        if self._in_array:
+            self._buf += chunk
+            return self._scan()
+
+        self._head += chunk
+        self._find_title()
+        m = _QUESTIONS_RE.search(self._head, self._seek_from)
+        if not m:
+            # kalit bo'laklar chegarasida bo'linib qolishi mumkin
+            self._seek_from = max(0, len(self._head) - 32)
+            self._trim_head()
+            return []
+        self._in_array = True
+        self._buf = self._head[m.end():]
+        self._head = ''
+        self._pos = 0
+        return self._scan()
+
+    def _find_title(self):
+        if self.title is not None:
+            return
+        m = _TITLE_RE.search(self._head, self._title_from)
+        if m:
+            try:
+                self.title = json.loads(f'"{m.group(1)}"')
+            except ValueError:
+                self.title = m.group(1)
+            return
+        # "title" kaliti kelgan bo'lsa, qiymati tugaguncha shu joydan qidiriladi
+        key = self._head.find('"title"', self._title_from)
+        if key >= 0:
+            self._title_from = key
+        else:
+            self._title_from = max(self._title_from, len(self._head) - len('"title"') + 1)
+
+    def _trim_head(self):
+        """Qayta qidirilmaydigan boshlang'ich qismni tashlab yuborish"""
+        cut = self._seek_from if self.title is not None else min(self._seek_from, self._title_from)
+        if cut > 0:
+            self._head = self._head[cut:]
+            self._seek_from -= cut
+            self._title_from = max(0, self._title_from - cut)
+
+    def _scan(self) -> List[Dict]:
+        text = self._buf
+        emitted: List[Dict] = []
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in '{[':
+                if ch == '{' and self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 0:
+                    # questions massivi yopildi
+                    self.finished = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        obj = json.loads(text[self._obj_start:i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        self.questions.append(obj)
+                        emitted.append(obj)
+                    self._obj_start = None
+            i += 1
+
+        # Skanerlangan va endi kerak bo'lmagan qismni tashlab yuborish
+        keep = i if self._obj_start is None else self._obj_start
+        self._buf = '' if self.finished else text[keep:]
+        self._pos = i - keep
+        if self._obj_start is not None:
+            self._obj_start = 0
+        return emitted
+
+
+def _scan_object_spans(text: str) -> Tuple[List[Tuple[int, int, int]], Optional[str]]:
+    """Matndagi JSON obyektlari: [(boshlanish, tugash, chuqurlik)] va kesilgan obyekt tuzatmasi
+
+    Bitta o'tish, nusxa olinmaydi. Satrlar (va ulardagi qavslar, escape'lar)
+    faqat obyekt ichida hisobga olinadi - obyektdan tashqaridagi oddiy
+    matndagi qo'shtirnoqlar skanerni buzmaydi. Oxirgi obyekt yopilmagan
+    bo'lsa, u oxirgi yopilgan ichki element gacha qisqartirilib, ochiq
+    qavslar yopilgan ko'rinishi ham qaytariladi.
+    """
+    spans: List[Tuple[int, int, int]] = []
+    stack: List[Tuple[str, int]] = []
+    in_str = False
+    escape = False
+    last_cut: Optional[Tuple[int, str]] = None
+
+    for i, ch in enumerate(text):
+        if in_str:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = bool(stack)
+        elif ch == '{' or (ch == '[' and stack):
+            stack.append((ch, i))
+        elif (ch == '}' or ch == ']') and stack:
+            opener, start = stack.pop()
+            if (opener == '{') != (ch == '}'):
+                # mos kelmagan qavs - bu nomzod JSON emas
+                stack.clear()
+                last_cut = None
+                continue
+            if opener == '{':
+                spans.append((start, i + 1, len(stack)))
+            if stack:
+                closers = ''.join('}' if o == '{' else ']' for o, _ in reversed(stack))
+                last_cut = (i + 1, closers)
+            else:
+                last_cut = None
+
+    repaired = None
+    if stack and last_cut is not None:
+        repaired = text[stack[0][1]:last_cut[0]] + last_cut[1]
+    return spans, repaired
+
+
+def _load_dict(candidate: str) -> Optional[Dict]:
+    try:
+        obj = json.loads(candidate)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def find_json_dict(text: str) -> Optional[Dict]:
+    """Matndan birinchi valid JSON dict (chiziqli vaqt)
+
+    Tartib: tashqi obyektlar, kesilgan oxirgi obyektning tuzatilgan
+    ko'rinishi, so'ng ichki obyektlar (tashqisi buzilgan bo'lsa).
+    """
+    if not text:
+        return None
+    spans, repaired = _scan_object_spans(text)
+
+    for start, end, depth in spans:
+        if depth == 0:
+            obj = _load_dict(text[start:end])
+            if obj is not None:
+                return obj
+
+    if repaired is not None:
+        obj = _load_dict(repaired)
+        if obj is not None:
+            return obj
+
+    for start, end, depth in sorted(s for s in spans if s[2] > 0):
+        obj = _load_dict(text[start:end])
+        if obj is not None:
+            return obj
+    return None
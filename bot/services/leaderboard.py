@@ -0,0 +1,86 @@
+"""Leaderboard uchun ishtirokchi ismlarini aniqlash
+
+Natijalar jadvalidagi har bir qator uchun ketma-ket `get_chat_member`
+chaqirish o'rniga, ismlar avval `users` jadvalidan bitta query bilan
+olinadi. Faqat bazada ismi yo'q foydalanuvchilar uchun `get_chat_member`
+parallel chaqiriladi. Natija chat bo'yicha qisqa muddat cache'lanadi
+(qayta o'tkazilgan quiz yoki chempionat yakunlari uchun).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from bot.models import async_storage
+
+logger = logging.getLogger(__name__)
+
+NAME_CACHE_TTL = 600  # sekund
+NAME_CACHE_MAX_CHATS = 512
+
+# chat_id -> {user_id: (ism, amal qilish muddati)}
+_name_cache: "OrderedDict[int, Dict[int, Tuple[str, float]]]" = OrderedDict()
+
+
+def _cache_get(chat_id: int, user_ids, now: float) -> Dict[int, str]:
+    chat_names = _name_cache.get(chat_id)
+    if not chat_names:
+        return {}
+    _name_cache.move_to_end(chat_id)
+    found = {}
+    for uid in user_ids:
+        item = chat_names.get(uid)
+        if item is not None and item[1] > now:
+            found[uid] = item[0]
+    return found
+
+
+def _cache_put(chat_id: int, names: Dict[int, str], now: float):
+    if not names:
+        return
+    chat_names = _name_cache.setdefault(chat_id, {})
+    _name_cache.move_to_end(chat_id)
+    expires_at = now + NAME_CACHE_TTL
+    for uid, name in names.items():
+        chat_names[uid] = (name, expires_at)
+    while len(_name_cache) > NAME_CACHE_MAX_CHATS:
+        _name_cache.popitem(last=False)
+
+
+async def _fetch_member_name(bot, chat_id: int, user_id: int):
+    try:
+        member = await bot.get_chat_member(chat_id, user_id)
+        return member.user.first_name if member.user else None
+    except Exception as e:
+        logger.debug(f"Foydalanuvchi ma'lumotlarini olishda xatolik (user_id={user_id}, chat_id={chat_id}): {e}")
+        return None
+
+
+async def resolve_display_names(bot, chat_id: int, user_ids: Iterable[int]) -> Dict[int, str]:
+    """Foydalanuvchilar ismlari: cache -> users jadvali (bitta query) -> get_chat_member (parallel)
+
+    Topilmagan foydalanuvchilar uchun "User <id>" qaytariladi.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    now = time.monotonic()
+    names = _cache_get(chat_id, user_ids, now)
+
+    missing = [uid for uid in user_ids if uid not in names]
+    if missing:
+        try:
+            from_db = await async_storage.get_user_names(missing)
+        except Exception as e:
+            logger.debug(f"User ismlarini bazadan olishda xatolik (chat_id={chat_id}): {e}")
+            from_db = {}
+        names.update(from_db)
+        _cache_put(chat_id, from_db, now)
+        missing = [uid for uid in missing if uid not in names]
+
+    if missing:
+        fetched = await asyncio.gather(*(_fetch_member_name(bot, chat_id, uid) for uid in missing))
+        from_api = {uid: name for uid, name in zip(missing, fetched) if name}
+        names.update(from_api)
+        _cache_put(chat_id, from_api, now)
+
+    return {uid: names.get(uid) or f"User {uid}" for uid in user_ids}
@@ -0,0 +1,150 @@
+"""Quiz savollari uchun yagona scheduler (min-heap)
+
+Har bir savol uchun alohida `asyncio.create_task(auto_next())` o'rniga barcha
+sessionlarning keyingi muddati bitta heap'da saqlanadi va bitta runner task
+eng yaqin muddatgacha uxlaydi. Qo'shish/bekor qilish/qayta rejalash O(log N).
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DueCallback = Callable[[], Awaitable[None]]
+
+
+class QuestionScheduler:
+    """Session kaliti bo'yicha muddatli callback'larni boshqaruvchi scheduler
+
+    Har bir session uchun faqat bitta aktiv yozuv bo'ladi: `schedule()` qayta
+    chaqirilsa eski yozuv bekor qilinadi (lazy deletion - heap'dan o'chirilmaydi,
+    faqat token orqali e'tiborsiz qoldiriladi).
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, str]] = []
+        self._entries: Dict[str, Tuple[int, float, DueCallback]] = {}
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        # Ishlayotgan callback task'lari (GC bo'lmasligi va shutdown'da kutish uchun)
+        self._callbacks: Set[asyncio.Task] = set()
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, session_key: str, due_at: float, callback: DueCallback):
+        """Session uchun callback'ni `due_at` (time.time()) vaqtida chaqirishni rejalash"""
+        token = next(self._counter)
+        due_at = float(due_at)
+        self._entries[session_key] = (token, due_at, callback)
+        heapq.heappush(self._heap, (due_at, token, session_key))
+        # Heap juda ko'p bekor qilingan yozuvlar bilan to'lib ketmasligi uchun
+        if len(self._heap) > 64 and len(self._heap) > 4 * len(self._entries):
+            self._compact()
+        self._ensure_runner()
+        if self._heap[0][1] == token and self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, session_key: str) -> bool:
+        """Session uchun rejalashtirilgan callback'ni bekor qilish"""
+        return self._entries.pop(session_key, None) is not None
+
+    def due_at(self, session_key: str) -> Optional[float]:
+        """Session'ning rejalashtirilgan vaqti (yo'q bo'lsa None)"""
+        entry = self._entries.get(session_key)
+        return entry[1] if entry else None
+
+    def _compact(self):
+        """Bekor qilingan yozuvlarni heap'dan tozalash"""
+        self._heap = [
+            (due_at, token, key)
+            for key, (token, due_at, _) in self._entries.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> List[DueCallback]:
+        """Muddati kelgan callback'larni heap'dan olish"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, token, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != token:
+                continue  # bekor qilingan yoki qayta rejalangan
+            del self._entries[key]
+            due.append(entry[2])
+        return due
+
+    def _ensure_runner(self):
+        if self._runner is not None and not self._runner.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._runner = loop.create_task(self._run())
+
+    async def _run(self):
+        """Yagona runner: eng yaqin muddatgacha uxlash va callback'larni ishga tushirish"""
+        while True:
+            try:
+                self._wakeup.clear()
+                for callback in self._pop_due(time.time()):
+                    self.fired += 1
+                    task = asyncio.create_task(self._invoke(callback))
+                    self._callbacks.add(task)
+                    task.add_done_callback(self._callbacks.discard)
+
+                # Bekor qilingan yozuvlarni tepadan tashlab yuborish
+                while self._heap:
+                    _, token, key = self._heap[0]
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[0] == token:
+                        break
+                    heapq.heappop(self._heap)
+
+                timeout = None
+                if self._heap:
+                    timeout = max(0.0, self._heap[0][0] - time.time())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"QuestionScheduler runner xatolik: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    @staticmethod
+    async def _invoke(callback: DueCallback):
+        try:
+            await callback()
+        except Exception as e:
+            logger.error(f"QuestionScheduler callback xatolik: {e}", exc_info=True)
+
+    async def shutdown(self):
+        """Runner task'ni va ishlayotgan callback'larni to'xtatish"""
+        self._entries.clear()
+        self._heap.clear()
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._runner = None
+        callbacks = list(self._callbacks)
+        for task in callbacks:
+            task.cancel()
+        if callbacks:
+            await asyncio.gather(*callbacks, return_exceptions=True)
+
+
+# Global scheduler (bitta bot jarayoni uchun)
+question_scheduler = QuestionScheduler()
@@ -1,5 +1,6 @@
 """Quiz session va poll management"""
 import asyncio
+import functools
 import time
 import logging
 from typing import Optional
@@ -8,9 +9,13 @@ from telegram.error import BadRequest
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from bot.config import Config
-from bot.models import storage
+from bot.models import async_storage
 from bot.utils.helpers import safe_send_markdown, _markdown_to_plain
-from bot.services.session_manager import get_session_lock, cleanup_session_lock, cleanup_old_sessions
+from bot.services.session_manager import get_session_lock, cleanup_session_lock, cleanup_old_sessions, get_session_registry
+from bot.services.quiz_snapshot import build_quiz_snapshot, get_session_snapshot
+from bot.services.question_scheduler import question_scheduler
+from bot.services.session_state import QuizSession, PollRecord
+from bot.services.leaderboard import resolve_display_names
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +24,43 @@ MAX_ACTIVE_QUIZZES_PER_GROUP = Config.MAX_ACTIVE_QUIZZES_PER_GROUP
 MAX_ACTIVE_QUIZZES_PER_USER_IN_GROUP = Config.MAX_ACTIVE_QUIZZES_PER_USER_IN_GROUP
 MAX_ACTIVE_QUIZZES_PER_USER_PRIVATE = Config.MAX_ACTIVE_QUIZZES_PER_USER_PRIVATE
 
+# Fon sweep (advance_due_sessions) qancha ish qilganini kuzatish uchun hisoblagichlar
+sweep_stats = {
+    'runs': 0,
+    'sessions_checked': 0,
+    'advanced': 0,
+    'stuck_cleaned': 0,
+    'last_duration_ms': 0.0,
+}
+# Aktiv sessionlar soni limitdan oshsa, keyingi sweep shu joydan davom etadi
+_sweep_cursor = 0
+
+# Fonda yozilayotgan natijalar (task'lar GC bo'lmasligi va shutdown'da kutish uchun)
+_pending_result_writes: set = set()
+
+
+async def _save_results_background(rows: list, quiz_id: str, chat_id: int):
+    try:
+        saved = await async_storage.save_results_bulk(rows)
+        logger.info(f"💾 Natijalar saqlandi: quiz_id={quiz_id}, chat_id={chat_id}, {saved}/{len(rows)} ta")
+    except Exception as e:
+        logger.error(f"❌ Natijalarni saqlashda xatolik (quiz_id={quiz_id}, chat_id={chat_id}): {e}", exc_info=True)
+
+
+def schedule_results_save(rows: list, quiz_id: str, chat_id: int):
+    """Guruh natijalarini bitta bulk yozuv bilan fonda saqlash (leaderboard kutmaydi)"""
+    if not rows:
+        return
+    task = asyncio.create_task(_save_results_background(rows, quiz_id, chat_id))
+    _pending_result_writes.add(task)
+    task.add_done_callback(_pending_result_writes.discard)
+
+
+async def drain_pending_result_writes():
+    """Shutdown'da fondagi natija yozuvlari tugashini kutish"""
+    if _pending_result_writes:
+        await asyncio.gather(*list(_pending_result_writes), return_exceptions=True)
+
 
 async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_id: int, time_seconds: int, force_start: bool = False):
     """Quiz sessiyasini boshlash
@@ -28,7 +70,7 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
     """
     logger.info(f"start_quiz_session: quiz_id={quiz_id}, chat_id={chat_id}, user_id={user_id}, time={time_seconds}s, force_start={force_start}")
     
-    quiz = storage.get_quiz(quiz_id)
+    quiz = await async_storage.get_quiz(quiz_id)
     
     if not quiz:
         logger.warning(f"Quiz topilmadi: {quiz_id}")
@@ -38,7 +80,9 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
             await context.bot.send_message(chat_id=chat_id, text="❌ Quiz topilmadi!")
         return
     
-    questions = quiz.get('questions', [])
+    # Savollarni muzlatish - sessiya davomida shu snapshot ishlatiladi
+    snapshot = build_quiz_snapshot(quiz)
+    questions = snapshot.questions
     if not questions:
         logger.warning(f"Quizda savollar yo'q: {quiz_id}")
         try:
@@ -63,7 +107,7 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
             chat_type = 'private'
 
     # GROUP allowlist check
-    if chat_type in ['group', 'supergroup'] and (not storage.group_allows_quiz(chat_id, quiz_id)):
+    if chat_type in ['group', 'supergroup'] and (not await async_storage.group_allows_quiz(chat_id, quiz_id)):
         await context.bot.send_message(
             chat_id=chat_id,
             text=(
@@ -77,7 +121,7 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
     
     # Private quiz check (faqat guruhlar uchun)
     if chat_type in ['group', 'supergroup']:
-        if not storage.is_quiz_allowed_in_group(quiz_id, chat_id):
+        if not await async_storage.is_quiz_allowed_in_group(quiz_id, chat_id):
             await context.bot.send_message(
                 chat_id=chat_id,
                 text=(
@@ -90,15 +134,12 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
             return
     # Shaxsiy chatda private quiz ham ishlaydi
 
+    registry = get_session_registry(context.bot_data)
+
     # PRIVATE CHAT LIMITS
     if chat_type == 'private':
-        sessions = context.bot_data.setdefault('sessions', {})
         # Check per-user limit in private chat
-        active_for_user_private = 0
-        prefix = f"quiz_{chat_id}_{user_id}_"
-        for k, s in sessions.items():
-            if k.startswith(prefix) and s.get('is_active', False):
-                active_for_user_private += 1
+        active_for_user_private = registry.count_active(chat_id, user_id=user_id)
         if active_for_user_private >= MAX_ACTIVE_QUIZZES_PER_USER_PRIVATE:
             try:
                 await message.reply_text(
@@ -133,21 +174,14 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
                     )
                     return
         
-        sessions = context.bot_data.setdefault('sessions', {})
-        group_locks = context.bot_data.setdefault('group_locks', {})
-        
         # Agar force_start=True bo'lsa, aktiv sessionlarni tozalash va natijalarni e'lon qilish
         if force_start:
             logger.info(f"force_start=True: aktiv sessionlarni tozalash, chat_id={chat_id}")
             
-            # Stuck sessionlarni tozalash
-            await advance_due_sessions(context)
-            
             # Guruhdagi barcha aktiv sessionlarni tozalash va natijalarni e'lon qilish
-            group_prefix = f"quiz_{chat_id}_"
             cleaned = 0
-            for k, s in list(sessions.items()):
-                if k.startswith(group_prefix) and s.get('is_active', False):
+            for k, s in registry.chat_sessions(chat_id):
+                if s.get('is_active', False):
                     logger.info(f"force_start: aktiv session tozalanmoqda va natijalar e'lon qilinmoqda: {k}")
                     
                     # Natijalarni e'lon qilish
@@ -164,19 +198,14 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
                     cleaned += 1
             
             # Lock bo'shatish
-            if chat_id in group_locks:
-                logger.info(f"force_start: lock tozalanmoqda: chat_id={chat_id}")
-                group_locks.pop(chat_id)
+            if registry.release_group_lock(chat_id):
+                logger.info(f"force_start: lock tozalandi: chat_id={chat_id}")
             
             if cleaned > 0:
                 logger.info(f"force_start: {cleaned} ta aktiv session tozalandi va natijalar e'lon qilindi, chat_id={chat_id}")
         
         # Check active quizzes in group
-        active_in_group = 0
-        group_prefix = f"quiz_{chat_id}_"
-        for k, s in sessions.items():
-            if k.startswith(group_prefix) and s.get('is_active', False):
-                active_in_group += 1
+        active_in_group = registry.count_active(chat_id)
         if active_in_group >= MAX_ACTIVE_QUIZZES_PER_GROUP:
             await context.bot.send_message(
                 chat_id=chat_id,
@@ -188,11 +217,7 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
             return
 
         # Check per-user limit
-        active_for_user = 0
-        prefix = f"quiz_{chat_id}_{user_id}_"
-        for k, s in sessions.items():
-            if k.startswith(prefix) and s.get('is_active', False):
-                active_for_user += 1
+        active_for_user = registry.count_active(chat_id, user_id=user_id)
         if active_for_user >= MAX_ACTIVE_QUIZZES_PER_USER_IN_GROUP:
             await context.bot.send_message(
                 chat_id=chat_id,
@@ -201,42 +226,29 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
             return
     
     # Create session (thread-safe)
-    if 'sessions' not in context.bot_data:
-        context.bot_data['sessions'] = {}
-    
     # Session lock - concurrent access uchun
     session_lock = await get_session_lock(session_key)
     async with session_lock:
         # Memory optimizatsiyasi - eski sessionlarni tozalash
-        active_count = sum(1 for s in context.bot_data['sessions'].values() if s.get('is_active', False))
-        if active_count > 500:  # Agar 500+ aktiv session bo'lsa, tozalash
+        if registry.active_total() > 500:  # Agar 500+ aktiv session bo'lsa, tozalash
             cleanup_old_sessions(context.bot_data, max_age_seconds=1800, max_sessions=500)
         
-        context.bot_data['sessions'][session_key] = {
-            'quiz_id': quiz_id,
-            'current_question': 0,
-            'answers': {},
-            'time_seconds': time_seconds,
-            'started_at': time.time(),
-            'is_active': True,
-            'chat_id': chat_id,
-            'user_id': user_id,
-            'chat_type': chat_type,
-            'last_question_sent_at': None,
-            'last_question_index': None,
-            'next_due_at': None
-        }
-        
-        # Backward compatibility
-        if context.chat_data is not None:
-            context.chat_data[session_key] = context.bot_data['sessions'][session_key]
+        registry.add_session(session_key, QuizSession(
+            quiz_id=quiz_id,
+            chat_id=chat_id,
+            user_id=user_id,
+            chat_type=chat_type,
+            time_seconds=time_seconds,
+            started_at=time.time(),
+            num_questions=snapshot.total,
+            quiz_snapshot=snapshot,
+        ))
 
     # Set group lock
     if chat_type in ['group', 'supergroup']:
-        group_locks = context.bot_data.setdefault('group_locks', {})
-        group_locks[chat_id] = session_key
+        registry.acquire_group_lock(chat_id, session_key)
     
-    title = quiz.get('title', 'Quiz')
+    title = snapshot.title
     time_text = f"{time_seconds}s" if time_seconds < 60 else f"{time_seconds//60}min"
     
     start_text = (
@@ -265,31 +277,32 @@ async def start_quiz_session(message, context, quiz_id: str, chat_id: int, user_
 
 async def send_quiz_question(message, context, quiz_id: str, chat_id: int, user_id: int, question_index: int):
     """Savolni yuborish"""
-    quiz = storage.get_quiz(quiz_id)
-    
-    if not quiz:
-        logger.warning(f"Quiz {quiz_id} topilmadi")
-        return
-    
-    questions = quiz.get('questions', [])
     session_key = f"quiz_{chat_id}_{user_id}_{quiz_id}"
     
     # Session check
-    if 'sessions' not in context.bot_data or session_key not in context.bot_data['sessions']:
+    session = context.bot_data.get('sessions', {}).get(session_key)
+    if session is None:
         logger.warning(f"Session {session_key} not found in bot_data")
         return
     
-    if not context.bot_data['sessions'][session_key].get('is_active', False):
+    snapshot = await get_session_snapshot(session, quiz_id)
+    if not snapshot:
+        logger.warning(f"Quiz {quiz_id} topilmadi")
+        return
+    
+    questions = snapshot.questions
+    
+    if not session.is_active:
         logger.warning(f"Session {session_key} is not active")
         return
     
     # Agar pauzada bo'lsa, yangi savol yubormaslik
-    if context.bot_data['sessions'][session_key].get('is_paused', False):
+    if session.is_paused:
         logger.info(f"Session {session_key} is paused, not sending question")
         return
     
     # Get chat type from session
-    chat_type = context.bot_data['sessions'][session_key].get('chat_type', 'private')
+    chat_type = session.chat_type or 'private'
     
     if question_index >= len(questions):
         # Chempionat tekshiruvi
@@ -302,13 +315,11 @@ async def send_quiz_question(message, context, quiz_id: str, chat_id: int, user_
         return
     
     q_data = questions[question_index]
-    question_text = q_data.get('question', '')
-    options = q_data.get('options', [])
-    correct_answer = q_data.get('correct_answer')
+    options = list(q_data.options)
+    correct_answer = q_data.correct_answer
     
     # Variantlarni shuffle qilish (aralashtirish)
     import random
-    shuffle_mapping = None  # {new_index: original_index}
     if len(options) > 1:
         # To'g'ri javob indeksini saqlash
         original_correct = correct_answer
@@ -318,40 +329,24 @@ async def send_quiz_question(message, context, quiz_id: str, chat_id: int, user_
         random.shuffle(indices)
         # Variantlarni yangi tartibda qayta tartiblash
         shuffled_options = [options[i] for i in indices]
-        # Shuffle mapping yaratish (new_index -> original_index)
-        # Masalan: agar indices = [2, 0, 1] bo'lsa, demak:
-        # new_index 0 -> original_index 2
-        # new_index 1 -> original_index 0
-        # new_index 2 -> original_index 1
-        shuffle_mapping = {new_idx: orig_idx for new_idx, orig_idx in enumerate(indices)}
         # To'g'ri javob yangi indeksini topish
         if original_correct is not None and 0 <= original_correct < len(indices):
             correct_answer = indices.index(original_correct)
         options = shuffled_options
         
-        # Shuffle mapping'ni session'da saqlash (user_answer yangi indeks, uni original indeksga o'girish uchun)
-        if 'shuffle_mappings' not in context.bot_data['sessions'][session_key]:
-            context.bot_data['sessions'][session_key]['shuffle_mappings'] = {}
-        context.bot_data['sessions'][session_key]['shuffle_mappings'][question_index] = shuffle_mapping
+        # Permutatsiyani session'da saqlash (indices[yangi_indeks] = asl_indeks)
+        # Masalan: indices = [2, 0, 1] bo'lsa, ko'rsatilgan 0-variant asl 2-variant
+        session.set_permutation(question_index, indices)
     
-    time_seconds = context.bot_data['sessions'][session_key].get('time_seconds', 30)
+    time_seconds = session.time_seconds or 30
     
     if len(options) < 2:
         await send_quiz_question(message, context, quiz_id, chat_id, user_id, question_index + 1)
         return
     
-    # Clean options (max 100 chars)
-    cleaned_options = []
-    for opt in options[:10]:
-        if len(opt) > 100:
-            cleaned_options.append(opt[:97] + "...")
-        else:
-            cleaned_options.append(opt)
-    
-    poll_question = f"❓ Savol {question_index + 1}/{len(questions)}\n\n{question_text}"
-    
-    if len(poll_question) > 300:
-        poll_question = poll_question[:297] + "..."
+    # Variantlar snapshot'da allaqachon 100 belgigacha qisqartirilgan
+    cleaned_options = options[:10]
+    poll_question = q_data.poll_question
     
     try:
         if correct_answer is not None and 0 <= correct_answer < len(cleaned_options):
@@ -400,173 +395,159 @@ async def send_quiz_question(message, context, quiz_id: str, chat_id: int, user_
         return
     
     # Save poll info (bu kod faqat muvaffaqiyatli yuborilgandan keyin ishlaydi)
-    if 'polls' not in context.bot_data:
-        context.bot_data['polls'] = {}
-    
-    context.bot_data['polls'][poll_message.poll.id] = {
-        'quiz_id': quiz_id,
-        'question_index': question_index,
-        'user_id': user_id,
-        'chat_id': chat_id,
-        'explanation': q_data.get('explanation', ''),
-        'session_key': session_key,
-        'message_id': poll_message.message_id
-    }
+    get_session_registry(context.bot_data).add_poll(poll_message.poll.id, PollRecord(
+        quiz_id=quiz_id,
+        question_index=question_index,
+        user_id=user_id,
+        chat_id=chat_id,
+        session_key=session_key,
+        message_id=poll_message.message_id,
+    ))
 
     # Update timing for restart resilience
     current_time = time.time()
-    context.bot_data['sessions'][session_key]['last_question_sent_at'] = current_time
-    context.bot_data['sessions'][session_key]['last_question_index'] = question_index
-    context.bot_data['sessions'][session_key]['next_due_at'] = current_time + float(time_seconds) + 1.0
+    session.last_question_sent_at = current_time
+    session.last_question_index = question_index
+    session.next_due_at = current_time + float(time_seconds) + 1.0
+    # Savol yuborilgan vaqt (javob vaqtlarini hisoblash uchun)
+    session.mark_question_sent(question_index, current_time)
+    
+    # Auto advance to next question - yagona scheduler orqali (alohida sleeping task yo'q)
+    question_scheduler.schedule(
+        session_key,
+        current_time + float(time_seconds),
+        functools.partial(_on_question_due, message, context, quiz_id, chat_id, user_id, question_index)
+    )
+
+
+async def _on_question_due(message, context, quiz_id: str, chat_id: int, user_id: int, question_index: int):
+    """Savol vaqti tugaganda scheduler tomonidan chaqiriladi (avvalgi auto_next)"""
+    session_key = f"quiz_{chat_id}_{user_id}_{quiz_id}"
+    logger.info(f"auto_next: question {question_index} due, checking session {session_key}")
     
-    # Har bir savol uchun vaqtni saqlash (userlar uchun)
-    if 'question_times' not in context.bot_data['sessions'][session_key]:
-        context.bot_data['sessions'][session_key]['question_times'] = {}
-    if question_index not in context.bot_data['sessions'][session_key]['question_times']:
-        context.bot_data['sessions'][session_key]['question_times'][question_index] = {}
-    # Savol yuborilgan vaqtni saqlash
-    context.bot_data['sessions'][session_key]['question_times'][question_index]['sent_at'] = current_time
+    if 'sessions' not in context.bot_data or session_key not in context.bot_data['sessions']:
+        logger.warning(f"auto_next: session {session_key} not found in bot_data")
+        return
     
-    # Ketma-ket javob berilmagan savollar sonini kuzatish
-    if 'consecutive_no_answers' not in context.bot_data['sessions'][session_key]:
-        context.bot_data['sessions'][session_key]['consecutive_no_answers'] = 0
-    if 'last_answered_question' not in context.bot_data['sessions'][session_key]:
-        context.bot_data['sessions'][session_key]['last_answered_question'] = -1
+    session = context.bot_data['sessions'][session_key]
+    chat_type = session.get('chat_type', 'private')
+    time_seconds = session.get('time_seconds', 30)
     
-    # Auto advance to next question
-    async def auto_next():
-        logger.info(f"auto_next started: waiting {time_seconds}s for question {question_index}")
-        await asyncio.sleep(time_seconds)
-        
-        logger.info(f"auto_next woke up: checking session {session_key}")
-        
-        if 'sessions' not in context.bot_data or session_key not in context.bot_data['sessions']:
-            logger.warning(f"auto_next: session {session_key} not found in bot_data")
-            return
-        
-        session = context.bot_data['sessions'][session_key]
-        
-        if not session.get('is_active', False):
-            logger.warning(f"auto_next: session {session_key} is not active")
-            return
-        
-        # Pauzada bo'lsa, auto_next ishlamasin
-        if session.get('is_paused', False):
-            logger.info(f"auto_next: session {session_key} is paused, skipping")
-            return
-        
-        current_q = session.get('current_question', 0)
-        logger.info(f"auto_next: current_question={current_q}, expected={question_index}")
-        
-        # Agar current_question o'zgargan bo'lsa (early advance ishlagan), skip qilamiz
-        if current_q != question_index:
-            logger.info(f"auto_next: question already advanced to {current_q} (early advance worked), skipping")
-            return
-        
-        # Javob berilganligini tekshirish
-        last_answered = session.get('last_answered_question', -1)
-        user_answers = session.get('user_answers', {})
+    if not session.get('is_active', False):
+        logger.warning(f"auto_next: session {session_key} is not active")
+        return
+    
+    # Pauzada bo'lsa, auto_next ishlamasin
+    if session.get('is_paused', False):
+        logger.info(f"auto_next: session {session_key} is paused, skipping")
+        return
+    
+    current_q = session.get('current_question', 0)
+    logger.info(f"auto_next: current_question={current_q}, expected={question_index}")
+    
+    # Agar current_question o'zgargan bo'lsa (early advance ishlagan), skip qilamiz
+    if current_q != question_index:
+        logger.info(f"auto_next: question already advanced to {current_q} (early advance worked), skipping")
+        return
+    
+    # Javob berilganligini tekshirish
+    last_answered = session.get('last_answered_question', -1)
+    
+    # Private chatda faqat starter, guruhda hech bo'lmaganda bitta user javob berganmi
+    has_answer = session.has_answer(question_index, user_id if chat_type == 'private' else None)
+    
+    if not has_answer:
+        # Javob berilmagan
+        consecutive_no_answers = session.get('consecutive_no_answers', 0) + 1
+        session['consecutive_no_answers'] = consecutive_no_answers
         
-        # Private chatda faqat starter javob berganligini tekshiramiz
-        if chat_type == 'private':
-            starter_answers = user_answers.get(user_id, {})
-            has_answer = question_index in starter_answers
-        else:
-            # Guruhda hech bo'lmaganda bitta user javob berganligini tekshiramiz
-            has_answer = any(question_index in answers for answers in user_answers.values())
+        logger.info(f"auto_next: no answer for question {question_index}, consecutive={consecutive_no_answers}")
         
-        if not has_answer:
-            # Javob berilmagan
-            consecutive_no_answers = session.get('consecutive_no_answers', 0) + 1
-            session['consecutive_no_answers'] = consecutive_no_answers
+        # Birinchi marta javob berilmasa, ogohlantirish xabari yuborish
+        if consecutive_no_answers == 1:
+            warning_text = f"⚠️ **Ogohlantirish**\n\n"
+            warning_text += f"❌ Savol {question_index + 1} ga javob berilmadi.\n\n"
+            warning_text += f"📋 Agar keyingi savolga ham javob berilmasa, quiz to'xtatiladi."
             
-            logger.info(f"auto_next: no answer for question {question_index}, consecutive={consecutive_no_answers}")
+            try:
+                await context.bot.send_message(
+                    chat_id=chat_id,
+                    text=warning_text,
+                    parse_mode=ParseMode.MARKDOWN
+                )
+                logger.info(f"auto_next: Ogohlantirish xabari yuborildi (question {question_index + 1})")
+            except Exception as e:
+                logger.warning(f"auto_next: Ogohlantirish xabari yuborishda xatolik: {e}")
+        
+        # Agar ketma-ket 2 marta javob berilmasa, pauza qilish
+        if consecutive_no_answers >= 2:
+            logger.warning(f"auto_next: pausing quiz after {consecutive_no_answers} consecutive no answers (quiz_id={quiz_id}, chat_id={chat_id})")
+            current_time = time.time()
+            session['is_paused'] = True
+            session['paused_at_question'] = question_index
+            session['paused_at'] = current_time  # Pauza vaqtini saqlash
             
-            # Birinchi marta javob berilmasa, ogohlantirish xabari yuborish
-            if consecutive_no_answers == 1:
-                warning_text = f"⚠️ **Ogohlantirish**\n\n"
-                warning_text += f"❌ Savol {question_index + 1} ga javob berilmadi.\n\n"
-                warning_text += f"📋 Agar keyingi savolga ham javob berilmasa, quiz to'xtatiladi."
-                
+            # Pauza xabari va davom etish tugmasi
+            pause_text = "⏸️ **Quiz pauza qilindi**\n\n"
+            pause_text += f"❌ Ketma-ket **{consecutive_no_answers}** marta javob berilmadi.\n\n"
+            pause_text += "📋 Quiz to'xtatildi, lekin davom ettirish mumkin.\n\n"
+            pause_text += "⏰ **Eslatma:** Davom etish tugmasi 6 soatgacha ishlaydi.\n\n"
+            pause_text += "▶️ Davom etish uchun tugmani bosing:"
+            
+            keyboard = [[InlineKeyboardButton("▶️ Davom etish", callback_data=f"resume_{quiz_id}")]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            # Bir necha marta urinib ko'rish
+            message_sent = False
+            for attempt in range(3):
                 try:
                     await context.bot.send_message(
                         chat_id=chat_id,
-                        text=warning_text,
+                        text=pause_text,
+                        reply_markup=reply_markup,
                         parse_mode=ParseMode.MARKDOWN
                     )
-                    logger.info(f"auto_next: Ogohlantirish xabari yuborildi (question {question_index + 1})")
+                    message_sent = True
+                    logger.info(f"auto_next: Pauza xabari muvaffaqiyatli yuborildi (attempt {attempt + 1})")
+                    break
                 except Exception as e:
-                    logger.warning(f"auto_next: Ogohlantirish xabari yuborishda xatolik: {e}")
+                    logger.warning(f"auto_next: Pauza xabari yuborishda xatolik (attempt {attempt + 1}): {e}")
+                    if attempt < 2:
+                        await asyncio.sleep(1)  # 1 soniya kutib, qayta urinib ko'rish
+            
+            if not message_sent:
+                logger.error(f"auto_next: CRITICAL - Pauza xabari yuborilmadi! Quiz to'xtatildi, lekin foydalanuvchiga bildirilmadi (chat_id={chat_id}, quiz_id={quiz_id})")
             
-            # Agar ketma-ket 2 marta javob berilmasa, pauza qilish
-            if consecutive_no_answers >= 2:
-                logger.warning(f"auto_next: pausing quiz after {consecutive_no_answers} consecutive no answers (quiz_id={quiz_id}, chat_id={chat_id})")
-                current_time = time.time()
-                session['is_paused'] = True
-                session['paused_at_question'] = question_index
-                session['paused_at'] = current_time  # Pauza vaqtini saqlash
-                
-                # Pauza xabari va davom etish tugmasi
-                pause_text = "⏸️ **Quiz pauza qilindi**\n\n"
-                pause_text += f"❌ Ketma-ket **{consecutive_no_answers}** marta javob berilmadi.\n\n"
-                pause_text += "📋 Quiz to'xtatildi, lekin davom ettirish mumkin.\n\n"
-                pause_text += "⏰ **Eslatma:** Davom etish tugmasi 6 soatgacha ishlaydi.\n\n"
-                pause_text += "▶️ Davom etish uchun tugmani bosing:"
-                
-                keyboard = [[InlineKeyboardButton("▶️ Davom etish", callback_data=f"resume_{quiz_id}")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                # Bir necha marta urinib ko'rish
-                message_sent = False
-                for attempt in range(3):
-                    try:
-                        await context.bot.send_message(
-                            chat_id=chat_id,
-                            text=pause_text,
-                            reply_markup=reply_markup,
-                            parse_mode=ParseMode.MARKDOWN
-                        )
-                        message_sent = True
-                        logger.info(f"auto_next: Pauza xabari muvaffaqiyatli yuborildi (attempt {attempt + 1})")
-                        break
-                    except Exception as e:
-                        logger.warning(f"auto_next: Pauza xabari yuborishda xatolik (attempt {attempt + 1}): {e}")
-                        if attempt < 2:
-                            await asyncio.sleep(1)  # 1 soniya kutib, qayta urinib ko'rish
-                
-                if not message_sent:
-                    logger.error(f"auto_next: CRITICAL - Pauza xabari yuborilmadi! Quiz to'xtatildi, lekin foydalanuvchiga bildirilmadi (chat_id={chat_id}, quiz_id={quiz_id})")
-                
-                return
-        else:
-            # Javob berilgan, counter'ni reset qilish
-            session['consecutive_no_answers'] = 0
-            session['last_answered_question'] = question_index
-        
-        # Quiz yakunlanganligini tekshirish
-        if question_index + 1 >= len(questions):
-            logger.info(f"auto_next: quiz finished at question {question_index + 1}")
-            session['is_active'] = False
-            from bot.services.quiz_service import show_quiz_results
-            await show_quiz_results(message, context, quiz_id, chat_id, user_id)
             return
-        
-        # Keyingi savolga o'tish (faqat agar early advance ishlamagan bo'lsa)
-        if current_q == question_index:
-            logger.info(f"auto_next: moving to next question {question_index + 1}")
-            session['current_question'] = question_index + 1
-            session['next_due_at'] = time.time() + float(time_seconds) + 1.0
-            await send_quiz_question(message, context, quiz_id, chat_id, user_id, question_index + 1)
-        else:
-            logger.info(f"auto_next: question already changed to {current_q}, skipping")
+    else:
+        # Javob berilgan, counter'ni reset qilish
+        session['consecutive_no_answers'] = 0
+        session['last_answered_question'] = question_index
+    
+    # Quiz yakunlanganligini tekshirish
+    snapshot = await get_session_snapshot(session, quiz_id)
+    total_questions = snapshot.total if snapshot else 0
+    if question_index + 1 >= total_questions:
+        logger.info(f"auto_next: quiz finished at question {question_index + 1}")
+        session['is_active'] = False
+        await show_quiz_results(message, context, quiz_id, chat_id, user_id)
+        return
     
-    asyncio.create_task(auto_next())
+    # Keyingi savolga o'tish (faqat agar early advance ishlamagan bo'lsa)
+    if current_q == question_index:
+        logger.info(f"auto_next: moving to next question {question_index + 1}")
+        session['current_question'] = question_index + 1
+        session['next_due_at'] = time.time() + float(time_seconds) + 1.0
+        await send_quiz_question(message, context, quiz_id, chat_id, user_id, question_index + 1)
+    else:
+        logger.info(f"auto_next: question already changed to {current_q}, skipping")
 
 
 async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_id: int):
     """Natijalarni ko'rsatish"""
-    
-    quiz = storage.get_quiz(quiz_id)
+    session_key = f"quiz_{chat_id}_{user_id}_{quiz_id}"
+    session_data = context.bot_data.get('sessions', {}).get(session_key)
+    quiz = await get_session_snapshot(session_data, quiz_id)
     
     if not quiz:
         try:
@@ -575,25 +556,19 @@ async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_i
             logger.warning(f"Quiz topilmadi xabarini yuborishda xatolik (chat_id={chat_id}): {e}")
         return
     
-    questions = quiz.get('questions', [])
-    session_key = f"quiz_{chat_id}_{user_id}_{quiz_id}"
-    total = len(questions)
-    graded_total = sum(1 for q in questions if (isinstance(q, dict) and q.get('correct_answer') is not None))
+    questions = quiz.questions
+    total = quiz.total
+    graded_total = quiz.graded_total
     
     # Deactivate session and get answers
-    user_answers_dict = {}
-    if 'sessions' in context.bot_data and session_key in context.bot_data['sessions']:
-        # Save answers before cleanup
-        session_data = context.bot_data['sessions'][session_key]
-        session_data['is_active'] = False
-        session_data['finished_at'] = time.time()  # Finish vaqtini saqlash
-        user_answers_dict = session_data.get('user_answers', {})
-        if not user_answers_dict:
-            answers = session_data.get('answers', {})
-            if answers:
-                user_answers_dict = {user_id: answers}
+    players = {}
+    if session_data is not None:
+        session_data.is_active = False
+        session_data.finished_at = time.time()  # Finish vaqtini saqlash
+        question_scheduler.cancel(session_key)
+        players = dict(session_data.player_items())
     
-    logger.info(f"Calculating results: quiz_id={quiz_id}, total_questions={total}, users={list(user_answers_dict.keys())}")
+    logger.info(f"Calculating results: quiz_id={quiz_id}, total_questions={total}, users={list(players.keys())}")
     
     # Get chat type
     try:
@@ -616,48 +591,32 @@ async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_i
     
     if chat_type in ['group', 'supergroup']:
         # Group results
-        title = quiz.get('title', 'Quiz')
+        title = quiz.title
         result_text = f"🎉 **{title} - Yakuniy natijalar**\n\n"
         if graded_total != total:
             result_text += f"ℹ️ Baholanadigan savollar: **{graded_total}/{total}**\n\n"
         
+        from bot.utils.helpers import is_vip_user
         user_results = []
-        session_data = context.bot_data.get('sessions', {}).get(session_key, {})
-        question_times = session_data.get('question_times', {})
+        result_rows = []
         
-        for uid, answers in user_answers_dict.items():
-            correct_count = 0
-            # Shuffle mapping'larni olish
-            shuffle_mappings = session_data.get('shuffle_mappings', {})
-            
-            # Vaqt ma'lumotlarini olish
-            user_answer_times = {}
-            
-            for i, q_data in enumerate(questions):
-                correct_answer = q_data.get('correct_answer')
-                user_answer = answers.get(i)
-                
-                # Agar shuffle bo'lgan bo'lsa, user_answer'ni original indeksga o'girish
-                if i in shuffle_mappings and user_answer is not None:
-                    shuffle_mapping = shuffle_mappings[i]
-                    # user_answer - bu yangi (shuffled) indeks
-                    # Uni original indeksga o'girish kerak
-                    if user_answer in shuffle_mapping:
-                        user_answer = shuffle_mapping[user_answer]
-                
-                if correct_answer is not None and user_answer == correct_answer:
-                    correct_count += 1
-                
-                # Vaqtni olish
-                if i in question_times:
-                    user_times = question_times[i].get('user_times', {})
-                    if uid in user_times:
-                        user_answer_times[i] = user_times[uid]
+        for uid, player in players.items():
+            # Javoblar shuffle permutatsiyasi orqali asl indeksga o'giriladi
+            correct_count, user_answer_times = session_data.score(uid, questions)
+            answers = player.answers_dict()
             
             score_total = graded_total
             percentage = (correct_count / score_total * 100) if score_total > 0 else 0
             
-            storage.save_result(quiz_id, uid, chat_id, answers, correct_count, score_total, answer_times=user_answer_times)
+            result_rows.append({
+                'quiz_id': quiz_id,
+                'user_id': uid,
+                'chat_id': chat_id,
+                'answers': answers,
+                'correct_count': correct_count,
+                'total_count': score_total,
+                'answer_times': user_answer_times,
+            })
             
             # Vaqt statistikasini hisoblash
             total_time = sum(user_answer_times.values()) if user_answer_times else 0
@@ -669,34 +628,33 @@ async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_i
                 'total': score_total,
                 'percentage': percentage,
                 'total_time': total_time,
-                'avg_time': avg_time
+                'avg_time': avg_time,
+                'is_vip': is_vip_user(uid)
             })
             logger.info(f"User {uid}: {correct_count}/{score_total} ({percentage:.0f}%), avg_time={avg_time:.2f}s")
         
+        # Barcha natijalar bitta tranzaksiyada, fonda yoziladi
+        schedule_results_save(result_rows, quiz_id, chat_id)
+        
         # VIP userlar uchun maxsus tartiblash - VIP userlar birinchi o'rinda
-        from bot.utils.helpers import is_vip_user
         user_results.sort(key=lambda x: (
             x['percentage'], 
             x['correct_count'],
-            is_vip_user(x['user_id'])  # VIP userlar tie-breaker sifatida birinchi
+            x['is_vip']  # VIP userlar tie-breaker sifatida birinchi
         ), reverse=True)
         
         if user_results:
             result_text += "🏆 **Top 10 Ishtirokchilar:**\n\n"
             medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
+            top_results = user_results[:10]
+            names = await resolve_display_names(context.bot, chat_id, [r['user_id'] for r in top_results])
             
-            for i, result in enumerate(user_results[:10]):
+            for i, result in enumerate(top_results):
                 medal = medals[i] if i < len(medals) else f"{i+1}."
-                try:
-                    user = await context.bot.get_chat_member(chat_id, result['user_id'])
-                    user_name = user.user.first_name if user.user else f"User {result['user_id']}"
-                except Exception as e:
-                    logger.debug(f"Foydalanuvchi ma'lumotlarini olishda xatolik (user_id={result['user_id']}, chat_id={chat_id}): {e}")
-                    user_name = f"User {result['user_id']}"
+                user_name = names[result['user_id']]
                 
                 # VIP user badge va maxsus format
-                from bot.utils.helpers import is_vip_user
-                is_vip = is_vip_user(result['user_id'])
+                is_vip = result['is_vip']
                 vip_badge = "⭐ " if is_vip else ""
                 
                 # Vaqt statistikasi
@@ -716,8 +674,7 @@ async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_i
         
         # Release group lock
         try:
-            group_locks = context.bot_data.setdefault('group_locks', {})
-            group_locks.pop(chat_id, None)
+            get_session_registry(context.bot_data).release_group_lock(chat_id)
         except Exception:
             pass
 
@@ -732,37 +689,12 @@ async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_i
             logger.error(f"Natijani guruhga yuborishda xatolik: {e}", exc_info=True)
     else:
         # Private chat results
-        answers = user_answers_dict.get(user_id, {})
-        correct_count = 0
-        
-        # Shuffle mapping'larni olish
-        session_data = context.bot_data.get('sessions', {}).get(session_key, {})
-        shuffle_mappings = session_data.get('shuffle_mappings', {})
-        question_times = session_data.get('question_times', {})
-        
-        # Vaqt ma'lumotlarini olish
-        user_answer_times = {}
-        
-        for i, q_data in enumerate(questions):
-            correct_answer = q_data.get('correct_answer')
-            user_answer = answers.get(i)
-            
-            # Agar shuffle bo'lgan bo'lsa, user_answer'ni original indeksga o'girish
-            if i in shuffle_mappings and user_answer is not None:
-                shuffle_mapping = shuffle_mappings[i]
-                # user_answer - bu yangi (shuffled) indeks
-                # Uni original indeksga o'girish kerak
-                if user_answer in shuffle_mapping:
-                    user_answer = shuffle_mapping[user_answer]
-            
-            if correct_answer is not None and user_answer == correct_answer:
-                correct_count += 1
-            
-            # Vaqtni olish
-            if i in question_times:
-                user_times = question_times[i].get('user_times', {})
-                if user_id in user_times:
-                    user_answer_times[i] = user_times[user_id]
+        player = players.get(user_id)
+        answers = player.answers_dict() if player is not None else {}
+        if session_data is not None:
+            correct_count, user_answer_times = session_data.score(user_id, questions)
+        else:
+            correct_count, user_answer_times = 0, {}
         
         score_total = graded_total
         percentage = (correct_count / score_total * 100) if score_total > 0 else 0
@@ -786,7 +718,7 @@ async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_i
             emoji = "💪"
             grade = "Yana harakat qiling"
         
-        title = quiz.get('title', 'Quiz')
+        title = quiz.title
         result_text = f"{emoji} **{title} - Sizning natijangiz**\n\n"
         if graded_total != total:
             result_text += f"ℹ️ Baholanadigan savollar: **{graded_total}/{total}**\n"
@@ -823,7 +755,7 @@ async def show_quiz_results(message, context, quiz_id: str, chat_id: int, user_i
         )
         
         try:
-            storage.save_result(quiz_id, user_id, chat_id, answers, correct_count, score_total, answer_times=user_answer_times)
+            await async_storage.save_result(quiz_id, user_id, chat_id, answers, correct_count, score_total, answer_times=user_answer_times)
         except Exception as e:
             logger.error(f"Natijani saqlashda xatolik (quiz_id={quiz_id}, user_id={user_id}): {e}", exc_info=True)
 
@@ -852,11 +784,12 @@ async def cleanup_inactive_sessions(context_or_app, max_age_seconds: int = 7200)
             return
         
         now = time.time()
-        group_locks = bot_data.setdefault('group_locks', {})
-        polls = bot_data.get('polls', {})
+        registry = get_session_registry(bot_data)
+        group_locks = registry.group_locks
         
         removed_sessions = 0
         removed_locks = 0
+        removed_polls = 0
         
         # Inactive sessionlarni olib tashlash
         for session_key, sess in list(sessions.items()):
@@ -871,24 +804,15 @@ async def cleanup_inactive_sessions(context_or_app, max_age_seconds: int = 7200)
             # Agar session juda eski bo'lsa (max_age_seconds dan ko'p), olib tashlaymiz
             # last_activity va started_at None bo'lishi mumkin, shuning uchun tekshiramiz
             if started_at and last_activity and isinstance(started_at, (int, float)) and isinstance(last_activity, (int, float)) and now - last_activity > max_age_seconds:
-                # Associated polls'larni ham tozalash
-                session_polls = [poll_id for poll_id, poll_data in list(polls.items()) 
-                               if poll_data.get('session_key') == session_key]
-                for poll_id in session_polls:
-                    polls.pop(poll_id, None)
-                
-                # Session'ni olib tashlash
-                sessions.pop(session_key, None)
+                # Session, uning pollari (teskari indeks orqali) va lock'ini olib tashlash
+                had_lock = group_locks.get(sess.get('chat_id')) == session_key
+                removed_polls += registry.remove_session(session_key)
                 removed_sessions += 1
-                
-                # Lock bo'shatish
-                chat_id = sess.get('chat_id')
-                if chat_id and chat_id in group_locks and group_locks[chat_id] == session_key:
-                    group_locks.pop(chat_id)
+                if had_lock:
                     removed_locks += 1
         
         if removed_sessions > 0:
-            logger.info(f"cleanup_inactive_sessions: {removed_sessions} ta inactive session tozalandi, {removed_locks} ta lock olib tashlandi")
+            logger.info(f"cleanup_inactive_sessions: {removed_sessions} ta inactive session, {removed_polls} ta poll tozalandi, {removed_locks} ta lock olib tashlandi")
             
     except Exception as e:
         logger.error(f"cleanup_inactive_sessions error: {e}", exc_info=True)
@@ -896,32 +820,42 @@ async def cleanup_inactive_sessions(context_or_app, max_age_seconds: int = 7200)
 
 async def advance_due_sessions(context):
     """
-    Restartdan keyin ham quizlar "osilib qolmasligi" uchun:
-    har kelgan update'da due bo'lgan sessionlarni keyingi savolga o'tkazib yuboramiz.
+    Restartdan keyin ham quizlar "osilib qolmasligi" uchun fon sweep:
+    JobQueue orqali davriy chaqiriladi (har update'da emas) va due bo'lgan
+    sessionlarni keyingi savolga o'tkazadi. Scheduler'da rejalashtirilgan
+    sessionlar o'tkazib yuboriladi - ular o'z vaqtida avtomatik ishlaydi.
     Shuningdek, stuck sessionlarni tozalaydi.
     """
+    global _sweep_cursor
+    started = time.perf_counter()
+    sweep_stats['runs'] += 1
     try:
-        # Avval inactive sessionlarni tozalash (memory leak'ni oldini olish uchun)
-        await cleanup_inactive_sessions(context)
-        
         sessions = context.bot_data.get('sessions', {})
         if not sessions:
             return
         now = time.time()
-        group_locks = context.bot_data.setdefault('group_locks', {})
+        registry = get_session_registry(context.bot_data)
 
         checked = 0
         stuck_cleaned = 0
+        advanced = 0
         max_check = 500  # Limit'ni 50 dan 500 ga oshirdik
         
-        for session_key, sess in list(sessions.items()):
-            if checked >= max_check:
-                logger.warning(f"advance_due_sessions: {max_check} ta limit yetib keldi, qolgan sessionlar keyingi update'da tekshiriladi")
-                break
-            checked += 1
-
-            if not sess.get('is_active', False):
+        # Faqat aktiv sessionlar (registry indeksi); limitdan oshsa aylanma kursor bilan
+        active_keys = registry.active_session_keys()
+        if not active_keys:
+            return
+        start = _sweep_cursor % len(active_keys)
+        batch = (active_keys[start:] + active_keys[:start])[:max_check]
+        _sweep_cursor = start + len(batch)
+        if len(active_keys) > max_check:
+            logger.warning(f"advance_due_sessions: {len(active_keys)} ta aktiv session, {max_check} tasi tekshiriladi - qolganlari keyingi sweep'da")
+        
+        for session_key in batch:
+            sess = sessions.get(session_key)
+            if sess is None or not sess.get('is_active', False):
                 continue
+            checked += 1
             
             # Stuck sessionlarni tozalash - agar session juda eski bo'lsa (30 daqiqadan ko'p)
             started_at = sess.get('started_at', 0)
@@ -932,15 +866,18 @@ async def advance_due_sessions(context):
                 
                 # Lock bo'shatish
                 chat_id = sess.get('chat_id')
-                if chat_id and chat_id in group_locks and group_locks[chat_id] == session_key:
+                if registry.release_group_lock(chat_id, session_key):
                     logger.warning(f"Stuck lock tozalandi: chat_id={chat_id}")
-                    group_locks.pop(chat_id)
                 continue
             
             # Agar pauzada bo'lsa, davom etmaslik
             if sess.get('is_paused', False):
                 continue
             
+            # Scheduler kuzatayotgan sessionlar o'z vaqtida ishlaydi
+            if question_scheduler.due_at(session_key) is not None:
+                continue
+            
             due_at = sess.get('next_due_at')
             last_idx = sess.get('last_question_index')
             current_q = sess.get('current_question', 0)
@@ -959,16 +896,8 @@ async def advance_due_sessions(context):
                         continue
                     
                     # Javob berilganligini tekshirish
-                    user_answers = sess.get('user_answers', {})
                     chat_type = sess.get('chat_type', 'private')
-                    
-                    # Agar javob berilgan bo'lsa, keyingi savolga o'tish
-                    has_answer = False
-                    if chat_type == 'private':
-                        starter_answers = user_answers.get(user_id, {})
-                        has_answer = last_idx in starter_answers
-                    else:
-                        has_answer = any(last_idx in answers for answers in user_answers.values())
+                    has_answer = sess.has_answer(last_idx, user_id if chat_type == 'private' else None)
                     
                     if has_answer:
                         # Javob berilgan, keyingi savolga o'tish
@@ -977,6 +906,7 @@ async def advance_due_sessions(context):
                         sess['next_due_at'] = now + 10.0
                         sess['consecutive_no_answers'] = 0  # Reset counter
                         logger.info(f"advance_due_sessions: advancing {session_key} to q={next_idx} (answer received)")
+                        advanced += 1
                         await send_quiz_question(None, context, quiz_id, int(chat_id), int(user_id), next_idx)
                     else:
                         # Javob berilmagan, consecutive counter'ni oshirish
@@ -1042,11 +972,17 @@ async def advance_due_sessions(context):
                             sess['current_question'] = next_idx
                             sess['next_due_at'] = now + 10.0
                             logger.info(f"advance_due_sessions: advancing {session_key} to q={next_idx} (no answer, but continuing)")
+                            advanced += 1
                             await send_quiz_question(None, context, quiz_id, int(chat_id), int(user_id), next_idx)
         
+        sweep_stats['sessions_checked'] += checked
+        sweep_stats['advanced'] += advanced
+        sweep_stats['stuck_cleaned'] += stuck_cleaned
         if stuck_cleaned > 0:
             logger.info(f"advance_due_sessions: {stuck_cleaned} ta stuck session tozalandi")
             
     except Exception as e:
         logger.error(f"advance_due_sessions error: {e}", exc_info=True)
+    finally:
+        sweep_stats['last_duration_ms'] = (time.perf_counter() - started) * 1000.0
 
@@ -0,0 +1,90 @@
+"""Session uchun muzlatilgan (immutable) quiz snapshot
+
+Quiz sessiyasi boshlanganda savollar bir marta o'qiladi va ixcham, faqat
+o'qiladigan ko'rinishga keltiriladi: variantlar 100 belgigacha qisqartiriladi,
+poll matni oldindan formatlanadi. Keyingi savollar, natijalar va early-advance
+shu snapshot'dan foydalanadi - DB'ga qayta murojaat qilinmaydi va quiz
+o'rtasida tahrirlansa ham o'yinchilar ko'rayotgan savollar o'zgarmaydi.
+"""
+import logging
+from typing import NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_OPTION_CHARS = 100
+MAX_POLL_QUESTION_CHARS = 300
+
+
+class QuestionSnapshot(NamedTuple):
+    """Bitta savolning muzlatilgan ko'rinishi"""
+    poll_question: str
+    options: Tuple[str, ...]
+    correct_answer: Optional[int]
+    explanation: str
+
+
+class QuizSnapshot(NamedTuple):
+    """Butun quizning muzlatilgan ko'rinishi"""
+    quiz_id: str
+    title: str
+    questions: Tuple[QuestionSnapshot, ...]
+    graded_total: int
+
+    @property
+    def total(self) -> int:
+        return len(self.questions)
+
+
+def _clean_option(opt) -> str:
+    """Variantni Telegram poll limiti (100 belgi) ga moslash"""
+    text = str(opt) if opt is not None else ""
+    if len(text) > MAX_OPTION_CHARS:
+        return text[:MAX_OPTION_CHARS - 3] + "..."
+    return text
+
+
+def build_quiz_snapshot(quiz: dict) -> QuizSnapshot:
+    """Storage'dan olingan quiz dict'dan snapshot yaratish"""
+    raw_questions = [q for q in (quiz.get('questions') or []) if isinstance(q, dict)]
+    total = len(raw_questions)
+    questions = []
+    graded_total = 0
+    for idx, q in enumerate(raw_questions):
+        poll_question = f"❓ Savol {idx + 1}/{total}\n\n{q.get('question', '')}"
+        if len(poll_question) > MAX_POLL_QUESTION_CHARS:
+            poll_question = poll_question[:MAX_POLL_QUESTION_CHARS - 3] + "..."
+        correct_answer = q.get('correct_answer')
+        if correct_answer is not None:
+            graded_total += 1
+        questions.append(QuestionSnapshot(
+            poll_question=poll_question,
+            options=tuple(_clean_option(o) for o in (q.get('options') or [])),
+            correct_answer=correct_answer,
+            explanation=q.get('explanation', '') or '',
+        ))
+    return QuizSnapshot(
+        quiz_id=quiz.get('quiz_id', ''),
+        title=quiz.get('title') or 'Quiz',
+        questions=tuple(questions),
+        graded_total=graded_total,
+    )
+
+
+async def get_session_snapshot(session: Optional[dict], quiz_id: str) -> Optional[QuizSnapshot]:
+    """Session'ga biriktirilgan snapshot'ni olish
+
+    Eski (snapshot'siz) sessionlar uchun quiz bir marta storage'dan o'qiladi
+    va snapshot session'ga biriktiriladi.
+    """
+    snapshot = session.get('quiz_snapshot') if session else None
+    if isinstance(snapshot, QuizSnapshot):
+        return snapshot
+
+    from bot.models import async_storage
+    quiz = await async_storage.get_quiz(quiz_id)
+    if not quiz:
+        return None
+    snapshot = build_quiz_snapshot(quiz)
+    if session is not None:
+        session['quiz_snapshot'] = snapshot
+    return snapshot
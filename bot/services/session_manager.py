@@ -4,11 +4,15 @@
 Session management optimizatsiyasi - concurrent access va memory management
 """
 import asyncio
+import functools
 import time
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from collections import defaultdict
 
+from bot.models.persistence import mark_dirty
+from bot.services.session_state import QuizSession, PollRecord
+
 logger = logging.getLogger(__name__)
 
 # Session locks - concurrent access uchun
@@ -83,12 +87,229 @@ def cleanup_old_sessions(bot_data: dict, max_age_seconds: int = 3600, max_sessio
             if key not in keys_to_remove:
                 keys_to_remove.append(key)
     
-    # Tozalash
+    # Tozalash (pollari va lock'i bilan birga)
+    registry = get_session_registry(bot_data)
     for key in keys_to_remove:
-        sessions.pop(key, None)
+        registry.remove_session(key)
         removed += 1
     
     if removed > 0:
         logger.info(f"🧹 {removed} ta eski session tozalandi (memory optimizatsiyasi)")
     
     return removed
+
+
+class SessionRegistry:
+    """bot_data['sessions'] / ['polls'] / ['group_locks'] ustidan indekslar
+
+    Ma'lumotlar o'zi bot_data'da qoladi (persistence o'zgarmaydi), registry
+    faqat teskari indekslarni saqlaydi:
+      - session_key -> poll_id'lar (cleanup'da barcha pollarni skanerlamaslik uchun)
+      - chat_id -> session_key'lar (guruhdagi aktiv quizlarni sanash uchun)
+      - aktiv session_key'lar (QuizSession.is_active o'zgarishlari orqali)
+    Indekslar o'qilganda bot_data bilan solishtiriladi, shuning uchun
+    `is_active` ni to'g'ridan-to'g'ri o'zgartirgan eski kod ham buzilmaydi.
+    """
+
+    def __init__(self, bot_data: dict):
+        self.bot_data = bot_data
+        self._session_polls: Dict[str, Set[str]] = defaultdict(set)
+        self._chat_sessions: Dict[int, Set[str]] = defaultdict(set)
+        self._active: Dict[str, None] = {}  # tartiblangan to'plam
+        self.rebuild()
+
+    @property
+    def sessions(self) -> dict:
+        return self.bot_data.setdefault('sessions', {})
+
+    @property
+    def polls(self) -> dict:
+        return self.bot_data.setdefault('polls', {})
+
+    @property
+    def group_locks(self) -> dict:
+        return self.bot_data.setdefault('group_locks', {})
+
+    def rebuild(self):
+        """Indekslarni bot_data'dan qayta qurish (startup / persistence'dan keyin)
+
+        Eski formatdagi (dict) session va pollar shu yerda yozuvlarga aylantiriladi.
+        """
+        self._session_polls.clear()
+        self._chat_sessions.clear()
+        self._active.clear()
+        sessions = self.sessions
+        polls = self.polls
+        migrated = 0
+        for session_key, sess in list(sessions.items()):
+            if isinstance(sess, dict):
+                sess = sessions[session_key] = QuizSession.from_dict(sess)
+                migrated += 1
+            self._watch(session_key, sess)
+            chat_id = sess.get('chat_id')
+            if chat_id is not None:
+                self._chat_sessions[chat_id].add(session_key)
+        for poll_id, poll_data in list(polls.items()):
+            if isinstance(poll_data, dict):
+                poll_data = polls[poll_id] = PollRecord.from_dict(poll_data)
+                migrated += 1
+            session_key = poll_data.get('session_key')
+            if session_key:
+                self._session_polls[session_key].add(poll_id)
+        if migrated:
+            logger.info(f"🔁 SessionRegistry: {migrated} ta eski (dict) session/poll yozuvga aylantirildi")
+
+    # ---------- sessions ----------
+
+    def _on_active_change(self, session_key: str, active: bool):
+        if active:
+            self._active[session_key] = None
+        else:
+            self._active.pop(session_key, None)
+
+    def _watch(self, session_key: str, sess: QuizSession):
+        sess.watch_active(functools.partial(self._on_active_change, session_key))
+        if sess.get('is_active', False):
+            self._active[session_key] = None
+
+    def _unwatch(self, session_key: str, sess: QuizSession):
+        sess.watch_active(None)
+        self._active.pop(session_key, None)
+
+    def add_session(self, session_key: str, session: QuizSession):
+        """Yangi sessionni ro'yxatga olish"""
+        old = self.sessions.get(session_key)
+        if old is session:
+            return
+        if old is not None:
+            # Eski sessionning pollari endi kerak emas
+            self._drop_polls(session_key)
+            self._unwatch(session_key, old)
+        self.sessions[session_key] = session
+        self._watch(session_key, session)
+        chat_id = session.get('chat_id')
+        if chat_id is not None:
+            self._chat_sessions[chat_id].add(session_key)
+
+    def chat_sessions(self, chat_id: int, user_id: Optional[int] = None,
+                      active_only: bool = True) -> List[Tuple[str, QuizSession]]:
+        """Chatdagi sessionlar (ixtiyoriy: faqat user_id niki va faqat aktivlar)"""
+        keys = self._chat_sessions.get(chat_id)
+        if not keys:
+            return []
+        sessions = self.sessions
+        result = []
+        for session_key in list(keys):
+            sess = sessions.get(session_key)
+            if sess is None:
+                keys.discard(session_key)  # tashqaridan o'chirilgan
+                continue
+            if active_only and not sess.get('is_active', False):
+                continue
+            if user_id is not None and sess.get('user_id') != user_id:
+                continue
+            result.append((session_key, sess))
+        if not keys:
+            self._chat_sessions.pop(chat_id, None)
+        return result
+
+    def active_total(self) -> int:
+        """Barcha chatlardagi aktiv sessionlar soni (skanerlashsiz)"""
+        return len(self._active)
+
+    def active_session_keys(self) -> List[str]:
+        """Aktiv sessionlar kalitlari (aktiv bo'lgan tartibida)"""
+        return list(self._active)
+
+    def count_active(self, chat_id: int, user_id: Optional[int] = None) -> int:
+        """Chatdagi (yoki chatdagi bitta userning) aktiv quizlari soni"""
+        return len(self.chat_sessions(chat_id, user_id=user_id))
+
+    def deactivate_chat(self, chat_id: int, user_id: Optional[int] = None) -> List[Tuple[str, QuizSession]]:
+        """Chatdagi aktiv sessionlarni to'xtatish va group lock'ni bo'shatish"""
+        stopped = self.chat_sessions(chat_id, user_id=user_id)
+        for _, sess in stopped:
+            sess['is_active'] = False
+        if user_id is None:
+            self.release_group_lock(chat_id)
+        return stopped
+
+    def remove_session(self, session_key: str) -> int:
+        """Sessionni pollari va lock'i bilan birga o'chirish (qaytaradi: o'chirilgan pollar soni)"""
+        sess = self.sessions.pop(session_key, None)
+        removed_polls = self._drop_polls(session_key)
+        if sess is not None:
+            self._unwatch(session_key, sess)
+            chat_id = sess.get('chat_id')
+            keys = self._chat_sessions.get(chat_id)
+            if keys is not None:
+                keys.discard(session_key)
+                if not keys:
+                    self._chat_sessions.pop(chat_id, None)
+            self.release_group_lock(chat_id, session_key)
+        return removed_polls
+
+    # ---------- polls ----------
+
+    def add_poll(self, poll_id: str, poll_data: PollRecord):
+        """Yuborilgan pollni session indeksiga qo'shish"""
+        self.polls[poll_id] = poll_data
+        session_key = poll_data.get('session_key')
+        if session_key:
+            self._session_polls[session_key].add(poll_id)
+
+    def session_poll_ids(self, session_key: str) -> Set[str]:
+        return set(self._session_polls.get(session_key, ()))
+
+    def _drop_polls(self, session_key: str) -> int:
+        poll_ids = self._session_polls.pop(session_key, None)
+        if not poll_ids:
+            return 0
+        polls = self.polls
+        removed = 0
+        for poll_id in poll_ids:
+            if polls.pop(poll_id, None) is not None:
+                removed += 1
+        return removed
+
+    # ---------- group locks ----------
+
+    def acquire_group_lock(self, chat_id: int, session_key: str):
+        self.group_locks[chat_id] = session_key
+        mark_dirty(self.bot_data, 'group_locks')
+
+    def release_group_lock(self, chat_id: Optional[int], session_key: Optional[str] = None) -> bool:
+        """Lock'ni bo'shatish (session_key berilsa - faqat shu session egasi bo'lsa)"""
+        if chat_id is None:
+            return False
+        group_locks = self.group_locks
+        if chat_id not in group_locks:
+            return False
+        if session_key is not None and group_locks[chat_id] != session_key:
+            return False
+        group_locks.pop(chat_id, None)
+        mark_dirty(self.bot_data, 'group_locks')
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sessions': len(self.sessions),
+            'active_sessions': len(self._active),
+            'polls': len(self.polls),
+            'indexed_chats': len(self._chat_sessions),
+            'indexed_sessions_with_polls': len(self._session_polls),
+            'group_locks': len(self.group_locks),
+        }
+
+
+# bot_data obyekti -> registry (bitta Application uchun bitta registry)
+_registries: Dict[int, SessionRegistry] = {}
+
+
+def get_session_registry(bot_data: dict) -> SessionRegistry:
+    """bot_data uchun SessionRegistry (birinchi chaqiruvda indekslar quriladi)"""
+    registry = _registries.get(id(bot_data))
+    if registry is None or registry.bot_data is not bot_data:
+        registry = SessionRegistry(bot_data)
+        _registries[id(bot_data)] = registry
+    return registry
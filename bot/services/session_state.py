@@ -0,0 +1,348 @@
+"""Quiz session va poll uchun ixcham (__slots__) yozuvlar
+
+Avval har bir session ichma-ich dict'lar edi: `user_answers[uid][q]`,
+`question_times[q]['user_times'][uid]`, `shuffle_mappings[q]` - katta
+guruhlarda xotira va pickle hajmining asosiy qismi shular edi. Endi har bir
+o'yinchining javoblari va vaqtlari savol indeksi bo'yicha `array` larda,
+variantlar tartibi esa `bytes` permutatsiya sifatida saqlanadi.
+
+Eski kod bilan moslik uchun yozuvlar dict'ga o'xshash `get()`, `[]`, `in`,
+`pop()` ni qo'llab-quvvatlaydi. Maydon qiymati None bo'lsa, kalit "yo'q"
+hisoblanadi (dict'dagi yo'q kalit kabi).
+
+Har bir QuizSession o'zgarganda `rev` yangi qiymat oladi - persistence faqat
+reviziyasi o'zgargan sessionlarni qayta yozadi.
+"""
+import itertools
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+NO_CHOICE = -1
+NO_TIME = -1.0
+
+# Global monoton hisoblagich - session reviziyalari uchun
+_revisions = itertools.count(1)
+
+
+class _RecordMapping:
+    """__slots__ maydonlari uchun dict-uslubidagi kirish"""
+    __slots__ = ()
+    _FIELDS: frozenset = frozenset()
+
+    def get(self, key: str, default=None):
+        if key in self._FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self._get_extra(key, default)
+
+    def __getitem__(self, key: str):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        if key in self._FIELDS:
+            setattr(self, key, value)
+        else:
+            self._set_extra(key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def pop(self, key: str, default=None):
+        value = self.get(key)
+        if key in self._FIELDS:
+            setattr(self, key, None)
+        else:
+            self._pop_extra(key)
+        return default if value is None else value
+
+    def setdefault(self, key: str, default=None):
+        value = self.get(key)
+        if value is None:
+            self[key] = default
+            return default
+        return value
+
+    def _get_extra(self, key, default):
+        return default
+
+    def _set_extra(self, key, value):
+        raise KeyError(key)
+
+    def _pop_extra(self, key):
+        return None
+
+
+class PlayerAnswers:
+    """Bitta o'yinchining javoblari (ko'rsatilgan indeks) va javob vaqtlari"""
+    __slots__ = ('choices', 'times')
+
+    def __init__(self, num_questions: int = 0):
+        self.choices = array('b', [NO_CHOICE]) * num_questions
+        self.times = array('f', [NO_TIME]) * num_questions
+
+    def _ensure(self, question_index: int):
+        missing = question_index + 1 - len(self.choices)
+        if missing > 0:
+            self.choices.extend([NO_CHOICE] * missing)
+            self.times.extend([NO_TIME] * missing)
+
+    def set(self, question_index: int, choice: Optional[int], answer_time: Optional[float] = None):
+        self._ensure(question_index)
+        self.choices[question_index] = NO_CHOICE if choice is None else int(choice)
+        if answer_time is not None:
+            self.times[question_index] = float(answer_time)
+
+    def choice(self, question_index: int) -> Optional[int]:
+        if question_index >= len(self.choices):
+            return None
+        value = self.choices[question_index]
+        return None if value == NO_CHOICE else value
+
+    def time(self, question_index: int) -> Optional[float]:
+        if question_index >= len(self.times):
+            return None
+        value = self.times[question_index]
+        return None if value < 0 else float(value)
+
+    def has(self, question_index: int) -> bool:
+        return self.choice(question_index) is not None
+
+    def answers_dict(self) -> Dict[int, int]:
+        """{savol_indeksi: tanlangan variant} - save_result uchun"""
+        return {i: c for i, c in enumerate(self.choices) if c != NO_CHOICE}
+
+    def times_dict(self) -> Dict[int, float]:
+        return {i: float(t) for i, t in enumerate(self.times) if t >= 0}
+
+    def __getstate__(self):
+        return (self.choices.tobytes(), self.times.tobytes())
+
+    def __setstate__(self, state):
+        choices, times = state
+        self.choices = array('b')
+        self.choices.frombytes(choices)
+        self.times = array('f')
+        self.times.frombytes(times)
+
+
+class QuizSession(_RecordMapping):
+    """bot_data['sessions'] dagi bitta quiz sessiyasi"""
+    __slots__ = (
+        'quiz_id', 'chat_id', 'user_id', 'chat_type', 'time_seconds',
+        'started_at', 'finished_at', 'is_active', 'is_paused', 'paused_at',
+        'paused_at_question', 'current_question', 'last_question_sent_at',
+        'last_question_index', 'next_due_at', 'consecutive_no_answers',
+        'last_answered_question', 'quiz_snapshot',
+        'sent_at', 'permutations', 'players', 'extra', 'rev', '_on_active_change',
+    )
+    _FIELDS = frozenset(__slots__[:18])
+
+    def __init__(self, quiz_id: str, chat_id: int, user_id: int, chat_type: str = 'private',
+                 time_seconds: int = 30, started_at: float = 0.0, num_questions: int = 0,
+                 quiz_snapshot=None):
+        object.__setattr__(self, '_on_active_change', None)
+        self.rev = 0
+        self.quiz_id = quiz_id
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.chat_type = chat_type
+        self.time_seconds = time_seconds
+        self.started_at = started_at
+        self.finished_at = None
+        self.is_active = True
+        self.is_paused = False
+        self.paused_at = None
+        self.paused_at_question = None
+        self.current_question = 0
+        self.last_question_sent_at = None
+        self.last_question_index = None
+        self.next_due_at = None
+        self.consecutive_no_answers = 0
+        self.last_answered_question = -1
+        self.quiz_snapshot = quiz_snapshot
+        # Savol bo'yicha: yuborilgan vaqt (0 - yuborilmagan) va variantlar permutatsiyasi
+        self.sent_at = array('d', [0.0]) * num_questions
+        self.permutations: List[Optional[bytes]] = [None] * num_questions
+        self.players: Dict[int, PlayerAnswers] = {}
+        self.extra: Optional[dict] = None
+
+    def __setattr__(self, name, value):
+        if name == 'is_active':
+            was_active = bool(getattr(self, 'is_active', False))
+            object.__setattr__(self, name, value)
+            callback = getattr(self, '_on_active_change', None)
+            if callback is not None and bool(value) != was_active:
+                callback(bool(value))
+        else:
+            object.__setattr__(self, name, value)
+        if name != 'rev':
+            object.__setattr__(self, 'rev', next(_revisions))
+
+    def __getstate__(self):
+        # Registry callback'i pickle qilinmaydi - yuklanganda rebuild() qayta ulaydi
+        return None, {
+            name: getattr(self, name) for name in self.__slots__
+            if name != '_on_active_change' and hasattr(self, name)
+        }
+
+    def touch(self):
+        """Joyida (in-place) o'zgartirishdan keyin reviziyani yangilash"""
+        object.__setattr__(self, 'rev', next(_revisions))
+
+    def watch_active(self, callback: Optional[Callable[[bool], None]]):
+        """is_active o'zgarganda chaqiriladigan callback (SessionRegistry hisoblagichi uchun)"""
+        object.__setattr__(self, '_on_active_change', callback)
+
+    @property
+    def num_questions(self) -> int:
+        return len(self.sent_at)
+
+    def _ensure(self, question_index: int):
+        missing = question_index + 1 - len(self.sent_at)
+        if missing > 0:
+            self.sent_at.extend([0.0] * missing)
+            self.permutations.extend([None] * missing)
+
+    # ---------- savol yuborish ----------
+
+    def mark_question_sent(self, question_index: int, sent_at: float):
+        self._ensure(question_index)
+        self.sent_at[question_index] = sent_at
+        self.touch()
+
+    def set_permutation(self, question_index: int, indices: Iterable[int]):
+        """Shuffle tartibi: indices[ko'rsatilgan_indeks] = asl_indeks"""
+        self._ensure(question_index)
+        self.permutations[question_index] = bytes(indices)
+        self.touch()
+
+    # ---------- javoblar ----------
+
+    def record_answer(self, user_id: int, question_index: int, choice: Optional[int],
+                      now: float) -> Optional[float]:
+        """Javobni yozish; javob vaqtini (savol yuborilganidan beri) qaytaradi"""
+        self._ensure(question_index)
+        sent_at = self.sent_at[question_index]
+        answer_time = now - sent_at if sent_at > 0 else None
+        player = self.players.get(user_id)
+        if player is None:
+            player = self.players[user_id] = PlayerAnswers(self.num_questions)
+        player.set(question_index, choice, answer_time)
+        self.touch()
+        return answer_time
+
+    def has_answer(self, question_index: int, user_id: Optional[int] = None) -> bool:
+        """Savolga javob berilganmi (user_id berilsa - shu user, aks holda kimdir)"""
+        if user_id is not None:
+            player = self.players.get(user_id)
+            return player is not None and player.has(question_index)
+        return any(p.has(question_index) for p in self.players.values())
+
+    def original_choice(self, player: PlayerAnswers, question_index: int) -> Optional[int]:
+        """Ko'rsatilgan (shuffled) javobni asl variant indeksiga o'girish"""
+        choice = player.choice(question_index)
+        if choice is None:
+            return None
+        perm = self.permutations[question_index] if question_index < len(self.permutations) else None
+        if perm is not None and choice < len(perm):
+            return perm[choice]
+        return choice
+
+    def score(self, user_id: int, questions) -> Tuple[int, Dict[int, float]]:
+        """(to'g'ri javoblar soni, {savol: javob vaqti}) - snapshot savollari bo'yicha"""
+        player = self.players.get(user_id)
+        if player is None:
+            return 0, {}
+        correct = 0
+        for i, q_data in enumerate(questions):
+            if q_data.correct_answer is not None and self.original_choice(player, i) == q_data.correct_answer:
+                correct += 1
+        return correct, player.times_dict()
+
+    def player_items(self) -> Iterator[Tuple[int, PlayerAnswers]]:
+        return iter(list(self.players.items()))
+
+    # ---------- dict moslik / migratsiya ----------
+
+    def _get_extra(self, key, default):
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def _set_extra(self, key, value):
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+        self.touch()
+
+    def _pop_extra(self, key):
+        if self.extra is not None:
+            self.extra.pop(key, None)
+            self.touch()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'QuizSession':
+        """Eski (dict) sessionni yozuvga aylantirish"""
+        sess = cls(
+            quiz_id=data.get('quiz_id'),
+            chat_id=data.get('chat_id'),
+            user_id=data.get('user_id'),
+            chat_type=data.get('chat_type', 'private'),
+            time_seconds=data.get('time_seconds', 30),
+            started_at=data.get('started_at', 0.0),
+        )
+        for key in cls._FIELDS:
+            if key in data:
+                setattr(sess, key, data[key])
+
+        for q, info in (data.get('question_times') or {}).items():
+            if isinstance(info, dict) and info.get('sent_at'):
+                sess.mark_question_sent(int(q), info['sent_at'])
+        for q, mapping in (data.get('shuffle_mappings') or {}).items():
+            if isinstance(mapping, dict) and mapping:
+                sess.set_permutation(int(q), (mapping[i] for i in range(len(mapping))))
+
+        user_answers = data.get('user_answers') or {}
+        if not user_answers and data.get('answers') and data.get('user_id') is not None:
+            user_answers = {data['user_id']: data['answers']}
+        for uid, answers in user_answers.items():
+            player = sess.players.setdefault(uid, PlayerAnswers(sess.num_questions))
+            for q, choice in (answers or {}).items():
+                player.set(int(q), choice)
+        for q, info in (data.get('question_times') or {}).items():
+            if not isinstance(info, dict):
+                continue
+            for uid, answer_time in (info.get('user_times') or {}).items():
+                player = sess.players.get(uid)
+                if player is not None and player.has(int(q)):
+                    player.times[int(q)] = float(answer_time)
+        return sess
+
+
+class PollRecord(_RecordMapping):
+    """bot_data['polls'] dagi bitta quiz poll'i"""
+    __slots__ = ('quiz_id', 'question_index', 'user_id', 'chat_id', 'session_key', 'message_id')
+    _FIELDS = frozenset(__slots__)
+
+    def __init__(self, quiz_id: str, question_index: int, user_id: int, chat_id: int,
+                 session_key: str, message_id: Optional[int] = None):
+        self.quiz_id = quiz_id
+        self.question_index = question_index
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.session_key = session_key
+        self.message_id = message_id
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PollRecord':
+        return cls(
+            quiz_id=data.get('quiz_id'),
+            question_index=data.get('question_index'),
+            user_id=data.get('user_id'),
+            chat_id=data.get('chat_id'),
+            session_key=data.get('session_key'),
+            message_id=data.get('message_id'),
+        )
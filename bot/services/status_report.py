@@ -7,7 +7,7 @@ import logging
 from datetime import datetime
 from typing import Optional
 from telegram.ext import Application
-from bot.models import storage
+from bot.models import async_storage
 from bot.services.email_service import email_service
 
 logger = logging.getLogger(__name__)
@@ -25,10 +25,10 @@ async def generate_status_report(application: Application) -> str:
     """
     try:
         # Statistikani yig'ish
-        quizzes_count = storage.get_quizzes_count()
-        results_count = storage.get_results_count()
-        users_count = storage.get_users_count()
-        groups_count = storage.get_groups_count()
+        quizzes_count = await async_storage.get_quizzes_count()
+        results_count = await async_storage.get_results_count()
+        users_count = await async_storage.get_users_count()
+        groups_count = await async_storage.get_groups_count()
         
         # Quiz statistikalarini yig'ish
         from datetime import datetime, timedelta
@@ -43,7 +43,7 @@ async def generate_status_report(application: Application) -> str:
         quizzes_this_month = 0
         
         # Barcha quizlarni olish va sanalarni tekshirish
-        all_quizzes = storage.get_all_quizzes()
+        all_quizzes = await async_storage.get_all_quizzes()
         for quiz in all_quizzes:
             created_at_str = quiz.get('created_at')
             if created_at_str:
@@ -310,7 +310,6 @@ async def send_status_report_to_admin(application: Application, report_html: str
     try:
         from bot.config import Config
         from telegram.constants import ParseMode
-        from bot.models import storage
         
         # Admin ID larni olish
         admin_ids = Config.ADMIN_USER_IDS
@@ -319,14 +318,21 @@ async def send_status_report_to_admin(application: Application, report_html: str
             return False
         
         # Statistikani yig'ish (qisqa formatda)
-        quizzes_count = storage.get_quizzes_count()
-        results_count = storage.get_results_count()
-        users_count = storage.get_users_count()
-        groups_count = storage.get_groups_count()
+        quizzes_count = await async_storage.get_quizzes_count()
+        results_count = await async_storage.get_results_count()
+        users_count = await async_storage.get_users_count()
+        groups_count = await async_storage.get_groups_count()
         
         sessions = application.bot_data.get('sessions', {}) or {}
         active_sessions = sum(1 for s in sessions.values() if s.get('is_active', False))
         
+        from bot.services.extraction_pool import extraction_pool
+        from bot.services.ingestion_queue import ingestion_queue
+        from bot.services.egress import egress_scheduler
+        extract_stats = extraction_pool.stats()
+        ingest_stats = ingestion_queue.stats()
+        egress_stats = egress_scheduler.stats()
+        
         # Quiz statistikalarini yig'ish
         from datetime import datetime, timedelta
         now = datetime.now()
@@ -338,7 +344,7 @@ async def send_status_report_to_admin(application: Application, report_html: str
         quizzes_this_week = 0
         quizzes_this_month = 0
         
-        all_quizzes = storage.get_all_quizzes()
+        all_quizzes = await async_storage.get_all_quizzes()
         for quiz in all_quizzes:
             created_at_str = quiz.get('created_at')
             if created_at_str:
@@ -398,7 +404,13 @@ async def send_status_report_to_admin(application: Application, report_html: str
             f"👥 Guruhlar: <b>{groups_count}</b>\n"
             f"🟢 Aktiv sessionlar: <b>{active_sessions}</b>\n\n"
             f"<b>🔧 Bot Holati:</b>\n"
-            f"{webhook_mode} - {webhook_status}\n\n"
+            f"{webhook_mode} - {webhook_status}\n"
+            f"📄 Matn ajratish navbati: <b>{extract_stats['queued']}</b>/{extract_stats['workers']} "
+            f"(timeout: {extract_stats['timeouts']}, xato: {extract_stats['failures']})\n"
+            f"📥 Fayl navbati: {ingest_stats['running']}/{ingest_stats['workers']} ishlamoqda, "
+            f"{ingest_stats['waiting']} kutmoqda ({ingest_stats['queued_bytes'] / 1048576:.1f} MB)\n"
+            f"📤 Telegram navbati: {egress_stats['waiting']} kutmoqda, "
+            f"flood limit: {egress_stats['flood_waits']} marta\n\n"
             f"📧 To'liq hisobot email ga yuborildi."
         )
         
@@ -6,7 +6,7 @@ Subscription Plans - Free, Core, Pro tariflar tizimi
 import logging
 from typing import Dict, Optional
 from datetime import datetime, timedelta
-from bot.models import storage
+from bot.models import async_storage
 
 logger = logging.getLogger(__name__)
 
@@ -87,14 +87,14 @@ PLAN_FEATURES = {
 }
 
 
-def get_user_plan(user_id: int) -> str:
+async def get_user_plan(user_id: int) -> str:
     """Foydalanuvchi tarifini olish"""
     # Sudo va VIP userlar Pro tarifga ega
-    if storage.is_sudo_user(user_id) or storage.is_vip_user(user_id):
+    if await async_storage.is_sudo_user(user_id) or await async_storage.is_vip_user(user_id):
         return PLAN_PRO
     
     # Premium user tekshirish
-    premium_info = storage.get_premium_user(user_id)
+    premium_info = await async_storage.get_premium_user(user_id)
     if premium_info:
         # Premium muddati tekshirish
         premium_until = premium_info.get('premium_until')
@@ -116,13 +116,13 @@ def get_plan_features(plan: str) -> Dict:
     return PLAN_FEATURES.get(plan, PLAN_FEATURES[PLAN_FREE])
 
 
-def can_create_quiz(user_id: int) -> tuple[bool, str]:
+async def can_create_quiz(user_id: int) -> tuple[bool, str]:
     """Foydalanuvchi quiz yarata oladimi?"""
-    plan = get_user_plan(user_id)
+    plan = await get_user_plan(user_id)
     features = get_plan_features(plan)
     
     # Bu oy yaratilgan quizlar soni
-    quizzes_this_month = storage.get_user_quizzes_count_this_month(user_id)
+    quizzes_this_month = await async_storage.get_user_quizzes_count_this_month(user_id)
     limit = features['quizzes_per_month']
     
     if quizzes_this_month >= limit:
@@ -136,9 +136,9 @@ def can_create_quiz(user_id: int) -> tuple[bool, str]:
     return True, ""
 
 
-def can_parse_file(user_id: int, file_extension: str, file_size_mb: float) -> tuple[bool, str]:
+async def can_parse_file(user_id: int, file_extension: str, file_size_mb: float) -> tuple[bool, str]:
     """Foydalanuvchi fayl parse qila oladimi?"""
-    plan = get_user_plan(user_id)
+    plan = await get_user_plan(user_id)
     features = get_plan_features(plan)
     
     # Fayl tipi tekshirish
@@ -164,9 +164,9 @@ def can_parse_file(user_id: int, file_extension: str, file_size_mb: float) -> tu
     return True, ""
 
 
-def can_use_ai_parsing(user_id: int) -> tuple[bool, str]:
+async def can_use_ai_parsing(user_id: int) -> tuple[bool, str]:
     """Foydalanuvchi AI parsing ishlata oladimi?"""
-    plan = get_user_plan(user_id)
+    plan = await get_user_plan(user_id)
     features = get_plan_features(plan)
     
     if not features['ai_parsing']:
@@ -179,11 +179,11 @@ def can_use_ai_parsing(user_id: int) -> tuple[bool, str]:
     return True, ""
 
 
-def get_plan_info_text(user_id: int) -> str:
+async def get_plan_info_text(user_id: int) -> str:
     """Foydalanuvchi tarif ma'lumotlarini matn ko'rinishida olish"""
-    plan = get_user_plan(user_id)
+    plan = await get_user_plan(user_id)
     features = get_plan_features(plan)
-    quizzes_this_month = storage.get_user_quizzes_count_this_month(user_id)
+    quizzes_this_month = await async_storage.get_user_quizzes_count_this_month(user_id)
     
     text = f"📦 <b>Joriy Tarif: {features['name_uz']}</b>\n\n"
     text += f"📊 Bu oy yaratilgan quizlar: {quizzes_this_month}/{features['quizzes_per_month']}\n\n"
@@ -8,6 +8,8 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from bot.config import Config
+from bot.models.persistence import mark_dirty
+from bot.services.session_manager import get_session_registry
 
 logger = logging.getLogger(__name__)
 
@@ -36,8 +38,8 @@ async def create_start_voting(
     try:
         quiz = context.bot_data.get('quizzes', {}).get(quiz_id)
         if not quiz:
-            from bot.models import storage
-            quiz = storage.get_quiz(quiz_id)
+            from bot.models import async_storage
+            quiz = await async_storage.get_quiz(quiz_id)
         
         title = quiz.get('title', 'Quiz') if quiz else 'Quiz'
         question = f"🚀 Quizni boshlash?\n\n📝 {title}\n\n⏱ Vaqt: {time_seconds}s har bir savol uchun\n\n✅ {VOTING_MIN_VOTES_TO_START} ta ovoz kerak"
@@ -68,6 +70,7 @@ async def create_start_voting(
             'voters_list': [],
             'message_id': poll.message_id
         }
+        mark_dirty(context.bot_data, 'votings')
         
         logger.info(f"Voting yaratildi: poll_id={poll_id}, type=start, quiz_id={quiz_id}, chat_id={chat_id}")
         return poll_id
@@ -116,6 +119,7 @@ async def create_stop_voting(
             'voters_list': [],
             'message_id': poll.message_id
         }
+        mark_dirty(context.bot_data, 'votings')
         
         logger.info(f"Voting yaratildi: poll_id={poll_id}, type=stop, chat_id={chat_id}")
         return poll_id
@@ -167,6 +171,7 @@ async def handle_voting_answer(
             voting['votes']['no'] += 1
     
     voting['voters_list'].append(user_id)
+    mark_dirty(context.bot_data, 'votings')
     
     yes_votes = voting['votes']['yes']
     min_votes = voting['min_votes']
@@ -186,10 +191,6 @@ async def handle_voting_answer(
                 time_seconds = voting['time_seconds']
                 user_id = voting['user_id']
                 
-                # Quiz boshlashdan oldin stuck sessionlarni tozalash
-                from bot.services.quiz_service import advance_due_sessions
-                await advance_due_sessions(context)
-                
                 from bot.services.quiz_service import start_quiz_session
                 
                 # Fake message yaratish
@@ -223,30 +224,8 @@ async def handle_voting_answer(
                 
             elif voting_type == 'stop':
                 # Quizni to'xtatish
-                from bot.services.quiz_service import advance_due_sessions
-                await advance_due_sessions(context)
-                
-                sessions = context.bot_data.setdefault('sessions', {})
-                group_locks = context.bot_data.setdefault('group_locks', {})
-                
-                stopped = 0
-                
-                # Lock orqali topish
-                session_key = group_locks.get(chat_id)
-                if session_key and session_key in sessions and sessions[session_key].get('is_active', False):
-                    sessions[session_key]['is_active'] = False
-                    stopped += 1
-                
-                # Barcha aktiv sessionlarni topish
-                prefix = f"quiz_{chat_id}_"
-                for k, s in list(sessions.items()):
-                    if k.startswith(prefix) and s.get('is_active', False):
-                        s['is_active'] = False
-                        stopped += 1
-                
-                # Lock bo'shatish
-                if chat_id in group_locks:
-                    group_locks.pop(chat_id)
+                # Guruhdagi barcha aktiv sessionlarni to'xtatish va lock'ni bo'shatish
+                stopped = len(get_session_registry(context.bot_data).deactivate_chat(chat_id))
                 
                 await context.bot.send_message(
                     chat_id=chat_id,
@@ -256,6 +235,7 @@ async def handle_voting_answer(
             
             # Voting ni o'chirish
             context.bot_data['votings'].pop(poll_id, None)
+            mark_dirty(context.bot_data, 'votings')
             return True
             
         except Exception as e:
@@ -3,6 +3,7 @@ import re
 import logging
 import time
 import functools
+from collections import OrderedDict
 from typing import Optional
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.error import BadRequest
@@ -10,10 +11,14 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from bot.config import Config
-from bot.models import storage
+from bot.models import storage, async_storage, activity_buffer
 
 logger = logging.getLogger(__name__)
 
+# get_chat_title_cached uchun LRU cache (chat_id -> title)
+CHAT_TITLE_CACHE_SIZE = 5000
+_chat_titles: "OrderedDict[int, str]" = OrderedDict()
+
 # Quiz vaqt variantlari (soniyalarda)
 TIME_OPTIONS = {
     '10s': 10,
@@ -61,12 +66,12 @@ def private_main_keyboard(user_id: int) -> ReplyKeyboardMarkup:
 
 
 def track_update(update: Update):
-    """Foydalanuvchi va guruhni tracking qilish"""
+    """Foydalanuvchi va guruhni tracking qilish (write-behind buffer orqali, DB'ga darhol yozilmaydi)"""
     try:
         user = update.effective_user
         chat = update.effective_chat
         if user:
-            storage.track_user(
+            activity_buffer.track_user(
                 user_id=user.id,
                 username=getattr(user, "username", None),
                 first_name=getattr(user, "first_name", None),
@@ -75,7 +80,7 @@ def track_update(update: Update):
                 last_chat_type=getattr(chat, "type", None) if chat else None,
             )
         if chat and getattr(chat, "type", None) in ['group', 'supergroup']:
-            storage.track_group(
+            activity_buffer.track_group(
                 chat_id=chat.id,
                 title=getattr(chat, "title", None),
                 chat_type=getattr(chat, "type", None),
@@ -84,14 +89,14 @@ def track_update(update: Update):
         pass
 
 
-def collect_known_group_ids(context) -> set[int]:
+async def collect_known_group_ids(context) -> set[int]:
     """
     Telegram API botga 'men qaysi guruhlardaman' ro'yxatini bermaydi.
     Shuning uchun storage + runtime sessions/polls dan guruh chat_id larni yig'amiz.
     """
     ids: set[int] = set()
     try:
-        for g in storage.get_groups():
+        for g in await async_storage.get_groups():
             try:
                 ids.add(int(g.get('chat_id')))
             except Exception:
@@ -262,21 +267,21 @@ async def get_webhook_status(context: ContextTypes.DEFAULT_TYPE) -> dict:
 
 
 async def get_chat_title_cached(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> str:
-    """Chat title olish va cache qilish"""
-    cache_key = f'_chat_title_{chat_id}'
-    
-    if cache_key in context.bot_data:
-        return context.bot_data[cache_key]
+    """Chat title olish va cache qilish (xotirada - bot_data/persistence'ga yozilmaydi)"""
+    title = _chat_titles.get(chat_id)
+    if title is not None:
+        _chat_titles.move_to_end(chat_id)
+        return title
     
     try:
         chat_obj = await context.bot.get_chat(chat_id)
         title = (getattr(chat_obj, "title", None) or str(chat_id))[:40]
-        context.bot_data[cache_key] = title
-        return title
     except Exception:
         title = str(chat_id)
-        context.bot_data[cache_key] = title
-        return title
+    _chat_titles[chat_id] = title
+    if len(_chat_titles) > CHAT_TITLE_CACHE_SIZE:
+        _chat_titles.popitem(last=False)
+    return title
 
 
 async def _is_group_admin(update: Update, context) -> bool:
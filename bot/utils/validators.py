@@ -1,13 +1,79 @@
 """Validation va helper funksiyalar"""
 import re
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
+
+# validate_questions uchun oldindan kompilyatsiya qilingan patternlar
+_MARK_PREFIX_RE = re.compile(r"^(?:✅|✔|✓|\*|\[\s*x\s*\]|\(\s*x\s*\))\s*", re.IGNORECASE)
+_LABEL_PREFIX_RE = re.compile(r"^(?:\(?[A-Da-d]\)?|\d{1,3})\s*[).:\-]\s*")
+_STAR_SUFFIX_RE = re.compile(r"\s*\*\s*$")
+_CORRECT_SUFFIX_RE = re.compile(r"\(\s*(?:to[''`]?\s*g[''`]?\s*ri|togri|correct)\s*\)\s*$", re.IGNORECASE)
+_WS_RE = re.compile(r"\s+")
+_ANSWER_LETTER_RE = re.compile(r"[A-Ja-j]")
+
+# Algoritmik parserlar uchun: variantdagi to'g'ri javob belgilari va savol raqami
+_OPTION_MARK_PREFIX_RE = re.compile(r"^(?:=|✅|✔|✓|\*|\+(?!\d)|\[\s*x\s*\]|\(\s*x\s*\))\s*", re.IGNORECASE)
+_PLUS_SUFFIX_RE = re.compile(r"\s+\+\s*$")
+_GIFT_OPTION_RE = re.compile(r"([=~])([^=~]*)")
+_SAVOL_RE = re.compile(r"^savol\s*\d{1,3}\b", re.IGNORECASE)
+_QUESTION_NUMBER_RE = re.compile(r"^\s*(?:savol\s*)?\d{1,3}\s*(?:\)|[.:\-](?!\d))\s*|^\s*savol\s*\d{1,3}\s+", re.IGNORECASE)
+
+# Savol/variant/javob kaliti belgilarini bitta o'tishda topadigan skaner.
+# Satr boshidagi belgilar (^ ...) va satr ichidagi belgilar bitta alternation'da;
+# har bir topilma nomli guruh bo'yicha xususiyatga aylanadi.
+_FEATURE_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"(?P<q_num>\d{1,3}[).:\-]\s+\S)"
+    r"|(?P<q_word>(?:savol|question|вопрос|سؤال)\s*(?:\d{1,3}\b|[:\-]?\s*\S))"
+    r"|(?P<opt_letter>[A-Za-z][).:\-]\s+\S)"
+    r"|(?P<opt_roman>[ivxlcdm]+[).:\-]\s+\S)"
+    r"|(?P<opt_tilde>~\s+\S)"
+    r"|(?P<opt_dash>[-–—]\s+\S)"
+    r"|(?P<opt_star>\*\s+\S)"
+    r"|(?P<opt_bullet>[•·▪▫]\s+\S)"
+    r")"
+    r"|(?P<answer_key>\b(?:javoblar|javob|to'g'ri\s+javob|answers?|key)\b"
+    r"|\b\d{1,3}\s*[-:=]\s*(?:[A-Da-d]|\d{1,3})\b)"
+    r"|(?P<html_list><[ou]l>|<li>)"
+    r"|(?P<qmark>\?)",
+    re.MULTILINE | re.IGNORECASE,
+)
+FEATURE_NAMES = tuple(_FEATURE_RE.groupindex)
+
+
+def scan_quiz_features(text: str) -> Dict[str, int]:
+    """Matndagi savol/variant/javob kaliti belgilari soni (bitta o'tish).
+
+    Kalitlar: q_num, q_word, opt_letter, opt_roman, opt_tilde, opt_dash,
+    opt_star, opt_bullet, answer_key, html_list, qmark.
+    "1) ..." satri ham savol, ham raqamli variant bo'lishi mumkin - q_num ikkalasini bildiradi.
+    """
+    features = dict.fromkeys(FEATURE_NAMES, 0)
+    for m in _FEATURE_RE.finditer(text or ""):
+        features[m.lastgroup] += 1
+    return features
+
+
+def iter_feature_lines(text: str) -> Iterator[Tuple[int, int]]:
+    """Kamida bitta belgi bor satrlar chegaralari (start, end) - bitta o'tishda.
+
+    Satrda birinchi topilmadan keyin qidiruv keyingi satrdan davom etadi.
+    """
+    pos = 0
+    search = _FEATURE_RE.search
+    while True:
+        m = search(text, pos)
+        if not m:
+            return
+        start = text.rfind("\n", 0, m.start()) + 1
+        end = text.find("\n", m.end())
+        if end < 0:
+            end = len(text)
+        yield start, end
+        pos = end + 1
 
 
 def validate_questions(questions: List[Dict], require_correct: bool = False) -> List[Dict]:
     """AI qaytargan savollarni tekshirish va tozalash."""
-    
-    _MARK_RE = r"(?:✅|✔|✓|\*|\[\s*x\s*\]|\(\s*x\s*\))"
-    _LABEL_RE = r"(?:\(?[A-Da-d]\)?|\d{1,3})\s*[).:\-]\s*"
 
     def _is_marked_correct(raw: str) -> bool:
         """To'g'ri javob belgilari tekshiruvi"""
@@ -15,12 +81,12 @@ def validate_questions(questions: List[Dict], require_correct: bool = False) ->
         if not s:
             return False
         s = s.lstrip("~").strip()
-        if re.match(rf"^{_MARK_RE}\s*", s, flags=re.IGNORECASE):
+        if _MARK_PREFIX_RE.match(s):
             return True
-        s2 = re.sub(rf"^{_LABEL_RE}", "", s)
-        if re.match(rf"^{_MARK_RE}\s*", s2, flags=re.IGNORECASE):
+        s2 = _LABEL_PREFIX_RE.sub("", s, count=1)
+        if _MARK_PREFIX_RE.match(s2):
             return True
-        if re.search(r"\*\s*$", s) or re.search(r"\*\s*$", s2):
+        if _STAR_SUFFIX_RE.search(s) or _STAR_SUFFIX_RE.search(s2):
             return True
         return False
 
@@ -28,18 +94,18 @@ def validate_questions(questions: List[Dict], require_correct: bool = False) ->
         """Variantni tozalash"""
         s = (raw or "").strip()
         s = s.lstrip("~").strip()
-        s = re.sub(rf"^{_MARK_RE}\s*", "", s, flags=re.IGNORECASE)
-        s = re.sub(rf"^{_LABEL_RE}", "", s)
-        s = re.sub(rf"^{_MARK_RE}\s*", "", s, flags=re.IGNORECASE)
-        s = re.sub(r"\(\s*(?:to[''`]?\s*g[''`]?\s*ri|togri|correct)\s*\)\s*$", "", s, flags=re.IGNORECASE)
-        s = re.sub(r"\s*\*\s*$", "", s)
+        s = _MARK_PREFIX_RE.sub("", s, count=1)
+        s = _LABEL_PREFIX_RE.sub("", s, count=1)
+        s = _MARK_PREFIX_RE.sub("", s, count=1)
+        s = _CORRECT_SUFFIX_RE.sub("", s)
+        s = _STAR_SUFFIX_RE.sub("", s)
         s = s.strip().rstrip(" ;")
-        s = re.sub(r"\s+", " ", s).strip()
+        s = _WS_RE.sub(" ", s).strip()
         return s
 
     def _norm(s: str) -> str:
         """String normalizatsiya"""
-        return re.sub(r"\s+", " ", (s or "").strip()).lower()
+        return _WS_RE.sub(" ", (s or "").strip()).lower()
 
     def _coerce_correct_index(raw_correct, raw_len: int) -> Optional[int]:
         """Correct answer indeksini aniqlash"""
@@ -56,7 +122,7 @@ def validate_questions(questions: List[Dict], require_correct: bool = False) ->
             if 1 <= idx <= raw_len:
                 return idx - 1
         s = str(raw_correct).strip()
-        if re.fullmatch(r"[A-Ja-j]", s):
+        if _ANSWER_LETTER_RE.fullmatch(s):
             idx = ord(s.lower()) - ord("a")
             if 0 <= idx < raw_len:
                 return idx
@@ -135,21 +201,14 @@ def sanitize_ai_input(text: str, max_chars: int = 35000) -> str:
     if len(text) <= max_chars:
         return text
 
-    lines = text.splitlines()
+    # Faqat savol/variant/javob kaliti belgisi bor satrlar (skaner bitta o'tishda topadi)
     keep: list[str] = []
-    for line in lines:
-        if (
-            re.search(r"^\s*\d{1,3}[).]\s+\S", line)
-            or re.search(r"^\s*[A-Da-d][).]\s+\S", line)
-            or re.search(r"^\s*~\s+\S", line)
-            or re.search(r"^\s*savol\s*\d{1,3}\b", line, re.IGNORECASE)
-            or re.search(r"\b(javoblar|javob|to'g'ri\s+javob|answer|answers|key)\b", line, re.IGNORECASE)
-            or re.search(r"\b\d{1,3}\s*[-:=]\s*[A-Da-d]\b", line)
-            or re.search(r"\b\d{1,3}\s*[-:=]\s*\d{1,3}\b", line)
-            or "?" in line
-        ):
-            keep.append(line)
-        if sum(len(x) + 1 for x in keep) >= max_chars:
+    kept_chars = 0
+    for start, end in iter_feature_lines(text):
+        line = text[start:end].rstrip("\r")
+        keep.append(line)
+        kept_chars += len(line) + 1
+        if kept_chars >= max_chars:
             break
 
     compact = "\n".join(keep).strip()
@@ -259,25 +318,10 @@ def quick_has_quiz_patterns(text: str) -> bool:
     if not text:
         return False
     sample = text[:12000]  # Ko'proq matnni tekshirish
-    
-    # Savol patternlari (ko'proq formatlar)
-    has_q = bool(re.search(r"(^|\n)\s*\d{1,3}[).:\-]\s+\S", sample))  # 1), 1., 1:, 1-
-    has_q_dot = bool(re.search(r"(^|\n)\s*\d{1,3}\.\s+\S", sample))  # 1. savol
-    has_qmark = "?" in sample  # Savolda so'roq belgisi
-    has_savol = bool(re.search(r"(^|\n)\s*(?:savol|question|вопрос|سؤال)\s*\d{1,3}\b", sample, re.IGNORECASE))
-    has_q_word = bool(re.search(r"(^|\n)\s*(?:savol|question|вопрос|سؤال)\s*[:\-]?\s*\S", sample, re.IGNORECASE))
-    
-    # Variant patternlari (ko'proq formatlar)
-    has_opts_letter = bool(re.search(r"(^|\n)\s*[A-Za-z][).:\-]\s+\S", sample))  # A), A., A:, A-
-    has_opts_number = bool(re.search(r"(^|\n)\s*[1-9]\d{0,2}[).:\-]\s+\S", sample))  # 1), 1., 1:, 1-
-    has_opts_roman = bool(re.search(r"(^|\n)\s*[ivxlcdmIVXLCDM]+[).:\-]\s+\S", sample))  # i), ii), iii)
-    has_tilde_opts = bool(re.search(r"(^|\n)\s*~\s+\S", sample))  # ~ variant
-    has_dash_opts = bool(re.search(r"(^|\n)\s*[-–—]\s+\S", sample))  # - variant
-    has_asterisk_opts = bool(re.search(r"(^|\n)\s*\*\s+\S", sample))  # * variant
-    has_bullet_opts = bool(re.search(r"(^|\n)\s*[•·▪▫]\s+\S", sample))  # • variant
+    features = scan_quiz_features(sample)
     
     # Ketma-ket qisqa satrlar (variantlar bo'lishi mumkin)
-    lines = sample.split('\n')
+    lines = sample.split('\n', 50)
     consecutive_short_lines = 0
     for i, line in enumerate(lines[:50]):  # Birinchi 50 satrni tekshirish
         stripped = line.strip()
@@ -292,16 +336,13 @@ def quick_has_quiz_patterns(text: str) -> bool:
             consecutive_short_lines = 0
     has_consecutive = consecutive_short_lines >= 3
     
-    # Markdown va HTML formatlar
-    has_markdown = bool(re.search(r"(^|\n)\s*\d+\.\s+\*\*.*\?\*\*", sample))  # 1. **Savol?**
-    has_html = bool(re.search(r"<[ou]l>|<li>", sample, re.IGNORECASE))  # HTML list
-    
-    # Umumiy tekshiruv
-    has_question_pattern = has_q or has_q_dot or has_qmark or has_savol or has_q_word or has_markdown
-    has_option_pattern = (
-        has_opts_letter or has_opts_number or has_opts_roman or 
-        has_tilde_opts or has_dash_opts or has_asterisk_opts or 
-        has_bullet_opts or has_consecutive or has_html
+    # Umumiy tekshiruv ("1) ..." satri savol ham, raqamli variant ham bo'lishi mumkin;
+    # markdown "1. **Savol?**" ham q_num ga kiradi)
+    has_question_pattern = bool(features['q_num'] or features['q_word'] or features['qmark'])
+    has_option_pattern = bool(
+        features['q_num'] or features['opt_letter'] or features['opt_roman'] or
+        features['opt_tilde'] or features['opt_dash'] or features['opt_star'] or
+        features['opt_bullet'] or features['html_list'] or has_consecutive
     )
     
     return has_question_pattern and has_option_pattern
@@ -311,34 +352,57 @@ def parse_tilde_quiz(text: str) -> List[Dict]:
     """
     Algoritmik parser:
     Savol satri: '?' bor bo'lgan satr (yoki 'Savol N' satri).
-    Variantlar: '~ ' bilan boshlanuvchi satrlar.
+    Variantlar: '~ ' (to'g'risi '= ') bilan boshlanuvchi satrlar yoki GIFT '{ =... ~... }'.
     Blok yakuni: bo'sh satr yoki '}' satri yoki keyingi savol.
     """
     if not text:
         return []
-    lines = [ln.rstrip() for ln in text.splitlines()]
-    questions: list[Dict] = []
+    return [q for _, _, q, _ in _parse_tilde_blocks([ln.rstrip() for ln in text.splitlines()])]
+
+
+def _parse_tilde_blocks(lines: List[str]) -> List[Tuple[int, int, Dict, bool]]:
+    """parse_tilde_quiz bloklari: (boshlanish satri, tugash satri, savol, ishonchlimi)
+
+    GIFT ko'rinishi ham qo'llanadi: "Savol? { =To'g'ri ~Xato ~Xato }" (bir
+    satrda yoki bir necha satrda). "=" va boshqa belgilar correct_answer'ga
+    o'tkaziladi. Blok ichida tanilmagan satr bo'lsa blok ishonchsiz - u AI'ga
+    qoldiq sifatida ketadi.
+    """
+    questions: list[Tuple[int, int, Dict, bool]] = []
     i = 0
     while i < len(lines):
         ln = lines[i].strip()
         if not ln:
             i += 1
             continue
-        if ln.startswith("~"):
+        if ln.startswith(("~", "=")):
             i += 1
             continue
-        if ln == "}":
+        if ln in ("{", "}"):
             i += 1
             continue
 
-        is_q = ("?" in ln) or bool(re.match(r"^savol\s*\d{1,3}\b", ln, re.IGNORECASE))
+        is_q = _is_tilde_question(ln)
         if not is_q:
             i += 1
             continue
 
-        q_text = ln
-        opts: list[str] = []
+        q_text, brace, inline = ln.partition("{")
+        in_braces = bool(brace)
+        q_lines = [q_text]
+        opts: list[Tuple[str, bool]] = []
+        unknown = 0
         j = i + 1
+        if in_braces:
+            body, closing, _ = inline.partition("}")
+            opts.extend(_split_gift_options(body))
+            if closing:
+                in_braces = False
+                # bir satrli GIFT blok - shu satrning o'zi
+                _append_tilde_block(questions, i, j, q_lines, opts, unknown)
+                i = j
+                continue
+
         while j < len(lines):
             nxt = lines[j].strip()
             if not nxt:
@@ -346,32 +410,104 @@ def parse_tilde_quiz(text: str) -> List[Dict]:
                     break
                 j += 1
                 continue
-            if nxt == "}":
+            if nxt == "}" or (in_braces and nxt.endswith("}") and not nxt.startswith(("~", "="))):
                 j += 1
                 break
-            if (("?" in nxt) or bool(re.match(r"^savol\s*\d{1,3}\b", nxt, re.IGNORECASE))) and not nxt.startswith("~"):
+            if nxt == "{":
+                in_braces = True
+                j += 1
+                continue
+            if nxt.startswith(("~", "=")):
+                if in_braces:
+                    body, closing, _ = nxt.partition("}")
+                    opts.extend(_split_gift_options(body))
+                    if closing:
+                        j += 1
+                        break
+                else:
+                    opt = nxt[1:].strip().rstrip(" ;")
+                    if opt:
+                        opts.append(_split_correct_mark(opt if nxt[0] == "~" else "=" + opt))
+                j += 1
+                continue
+            if _is_tilde_question(nxt):
                 break
-            if nxt.startswith("~"):
-                opt = nxt.lstrip("~").strip()
-                # ko'p uchraydigan tugash belgilari
-                opt = opt.rstrip(" ;")
-                if opt:
-                    opts.append(opt)
+            if opts:
+                # variantlar orasidagi tanilmagan satr (feedback, izoh, ...)
+                unknown += 1
+            else:
+                # savol matnining davomi
+                q_lines.append(nxt)
             j += 1
 
-        if len(opts) >= 2:
-            questions.append({
-                "question": q_text,
-                "options": opts[:10],
-                "correct_answer": None,
-                "explanation": ""
-            })
-
+        _append_tilde_block(questions, i, j, q_lines, opts, unknown)
         i = max(i + 1, j)
 
     return questions
 
 
+def _is_tilde_question(ln: str) -> bool:
+    return ("?" in ln) or ("{" in ln) or bool(_SAVOL_RE.match(ln))
+
+
+def _split_gift_options(body: str) -> List[Tuple[str, bool]]:
+    """GIFT "{ =A ~B ~C }" ichidagi variantlar: [(matn, to'g'rimi)]"""
+    opts = []
+    for mark, raw in _GIFT_OPTION_RE.findall(body):
+        opt = raw.strip().rstrip(" ;")
+        if opt:
+            opts.append(_split_correct_mark(opt if mark == "~" else "=" + opt))
+    return opts
+
+
+def _append_tilde_block(
+    questions: List[Tuple[int, int, Dict, bool]], start: int, end: int,
+    q_lines: List[str], opts: List[Tuple[str, bool]], unknown: int
+):
+    if len(opts) < 2:
+        return
+    q_text = _strip_question_number(" ".join(x.strip() for x in q_lines if x.strip()))
+    options, correct, marks = _options_with_correct(opts)
+    questions.append((start, end, {
+        "question": q_text,
+        "options": options,
+        "correct_answer": correct,
+        "explanation": ""
+    }, len(opts) <= 10 and not unknown and marks <= 1 and bool(q_text)))
+
+
+def _split_correct_mark(opt: str) -> Tuple[str, bool]:
+    """Variant matnidan to'g'ri javob belgisini ajratish: (toza matn, belgilanganmi)
+
+    Belgilar: boshida "=", "*", "+", "✅", "[x]"; oxirida "*", " +", "(to'g'ri)".
+    """
+    s = (opt or "").strip()
+    marked = False
+    m = _OPTION_MARK_PREFIX_RE.match(s)
+    if m and m.end() < len(s):
+        s = s[m.end():]
+        marked = True
+    for suffix_re in (_STAR_SUFFIX_RE, _PLUS_SUFFIX_RE, _CORRECT_SUFFIX_RE):
+        stripped = suffix_re.sub("", s)
+        if stripped != s and stripped.strip():
+            s = stripped
+            marked = True
+    return s.strip().rstrip(" ;").strip(), marked
+
+
+def _options_with_correct(opts: List[Tuple[str, bool]]) -> Tuple[List[str], Optional[int], int]:
+    """(variantlar[:10], correct_answer, belgilanganlar soni) - bitta belgi bo'lsagina javob aniq"""
+    options = [text for text, _ in opts[:10]]
+    marked = [n for n, (_, is_correct) in enumerate(opts[:10]) if is_correct]
+    return options, (marked[0] if len(marked) == 1 else None), len(marked)
+
+
+def _strip_question_number(q_text: str) -> str:
+    """"1) ", "12. ", "Savol 3:" kabi raqam prefiksini olib tashlash"""
+    stripped = _QUESTION_NUMBER_RE.sub("", q_text, count=1).strip()
+    return stripped or q_text.strip()
+
+
 def parse_numbered_quiz(text: str) -> List[Dict]:
     """
     Algoritmik parser:
@@ -380,15 +516,23 @@ def parse_numbered_quiz(text: str) -> List[Dict]:
     """
     if not text:
         return []
+    return [q for _, _, q, _ in _parse_numbered_blocks([ln.rstrip() for ln in text.splitlines()])]
+
 
-    lines = [ln.rstrip() for ln in (text or "").splitlines()]
-    questions: list[Dict] = []
+def _parse_numbered_blocks(lines: List[str]) -> List[Tuple[int, int, Dict, bool]]:
+    """parse_numbered_quiz bloklari: (boshlanish satri, tugash satri, savol, ishonchlimi)
+
+    Ishonchli blok - barcha variantlari belgili ("A)", "1)", "~", "=") va
+    to'g'ri javob belgisi ko'pi bilan bitta bo'lgan savol. Raqamsiz qisqa
+    satrlardan yig'ilgan variantlar taxminiy hisoblanadi.
+    """
+    questions: list[Tuple[int, int, Dict, bool]] = []
 
     def _is_option_line(s: str) -> bool:
         s = (s or "").strip()
         if not s:
             return False
-        if s.startswith("~"):
+        if s.startswith(("~", "=")):
             return True
         if re.match(r"^\s*[A-Da-d][).:\-]\s+\S", s):
             return True
@@ -414,6 +558,15 @@ def parse_numbered_quiz(text: str) -> List[Dict]:
             or ("?" in s)
         )
 
+    def _is_lettered_question(idx: int) -> bool:
+        """"1) Savol" satri, undan keyin "A) ..." varianti keladi (1..10 raqamli savollar)"""
+        if not re.match(r"^\s*\d{1,3}[).]\s+\S", lines[idx]):
+            return False
+        for n in range(idx + 1, len(lines)):
+            if lines[n].strip():
+                return bool(re.match(r"^\s*[A-Da-d][).:\-]\s+\S", lines[n]))
+        return False
+
     def _extract_option(s: str) -> Optional[str]:
         s = (s or "").strip()
         if not s:
@@ -421,6 +574,9 @@ def parse_numbered_quiz(text: str) -> List[Dict]:
         if s.startswith("~"):
             opt = s.lstrip("~").strip()
             return opt or None
+        if s.startswith("="):
+            # "=" belgisi _split_correct_mark uchun qoldiriladi
+            return s if s.lstrip("=").strip() else None
         m = re.match(r"^\s*[A-Da-d][).:\-]\s*(.+)$", s)
         if m:
             opt = m.group(1).strip()
@@ -443,7 +599,7 @@ def parse_numbered_quiz(text: str) -> List[Dict]:
             i += 1
             continue
 
-        if not _is_question_start(ln):
+        if not (_is_question_start(ln) or _is_lettered_question(i)):
             i += 1
             continue
 
@@ -464,10 +620,11 @@ def parse_numbered_quiz(text: str) -> List[Dict]:
                 j += 1
                 continue
             break
-        q_text = " ".join(q_lines).strip()
+        q_text = _strip_question_number(" ".join(q_lines).strip())
 
-        # 2) variantlarni yig'amiz
-        opts: list[str] = []
+        # 2) variantlarni yig'amiz (matn va to'g'ri javob belgisi)
+        opts: list[Tuple[str, bool]] = []
+        labeled = True
         k = j
         while k < len(lines):
             nxt = lines[k].strip()
@@ -478,31 +635,84 @@ def parse_numbered_quiz(text: str) -> List[Dict]:
                 continue
             if _is_question_start(nxt) and not _is_option_line(nxt):
                 break
+            if opts and _is_lettered_question(k):
+                break
 
             opt = _extract_option(nxt)
             if opt is None:
                 # raqamsiz variantlar: qisqa qatordan iborat blok
                 if len(nxt) <= 120 and not _is_question_start(nxt):
                     opt = nxt
+                    labeled = False
                 else:
                     break
 
-            opt = (opt or "").rstrip(" ;").strip()
+            opt, is_correct = _split_correct_mark(opt or "")
             if opt:
-                opts.append(opt)
+                opts.append((opt, is_correct))
             k += 1
             if len(opts) >= 10:
                 break
 
         if len(opts) >= 2:
-            questions.append({
+            options, correct, marks = _options_with_correct(opts)
+            questions.append((i, k, {
                 "question": q_text,
-                "options": opts[:10],
-                "correct_answer": None,
+                "options": options,
+                "correct_answer": correct,
                 "explanation": ""
-            })
+            }, labeled and marks <= 1))
 
         i = max(i + 1, k)
 
     return questions
 
+
+def split_parsed_and_residue(
+    text: str, min_residue_chars: int = 40
+) -> Tuple[List[Tuple[int, Dict]], List[Tuple[int, str]]]:
+    """Algoritmik parsing: ishonchli savollar va parse qilinmagan qoldiq qismlar.
+
+    Ikkala parser butun matn bo'yicha ishlaydi, ko'proq ishonchli savol
+    topgani tanlanadi. Ishonchsiz bloklar va hech bir savolga kirmagan
+    satrlar qoldiq bo'ladi - faqat ular (savol belgilari bo'lsa) AI'ga
+    yuboriladi.
+
+    Returns:
+        (savollar, qoldiqlar) - ikkalasi ham matndagi satr raqami bilan,
+        hujjat tartibini tiklash uchun: [(satr, savol)], [(satr, matn)]
+    """
+    if not text:
+        return [], []
+
+    lines = [ln.rstrip() for ln in text.splitlines()]
+    candidates = []
+    for parser in (_parse_numbered_blocks, _parse_tilde_blocks):
+        try:
+            candidates.append([b for b in parser(lines) if b[3]])
+        except Exception:
+            continue
+    blocks = max(candidates, key=len) if candidates else []
+
+    covered = [False] * len(lines)
+    parsed: List[Tuple[int, Dict]] = []
+    for start, end, question, _ in blocks:
+        parsed.append((start, question))
+        for n in range(start, min(end, len(lines))):
+            covered[n] = True
+
+    residue: List[Tuple[int, str]] = []
+    span_start = None
+    for n in range(len(lines) + 1):
+        if n < len(lines) and not covered[n]:
+            if span_start is None:
+                span_start = n
+            continue
+        if span_start is not None:
+            span = "\n".join(lines[span_start:n]).strip()
+            if len(span) >= min_residue_chars and quick_has_quiz_patterns(span):
+                residue.append((span_start, span))
+            span_start = None
+
+    return parsed, residue
+
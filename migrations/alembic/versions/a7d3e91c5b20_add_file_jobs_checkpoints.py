@@ -0,0 +1,56 @@
+"""add file jobs checkpoints
+
+Revision ID: a7d3e91c5b20
+Revises: 4c2ba48d6985
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e91c5b20'
+down_revision: Union[str, None] = '4c2ba48d6985'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - fayl tahlili ishlari va qism checkpoint'lari."""
+    op.create_table(
+        'file_jobs',
+        sa.Column('job_id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('status_message_id', sa.BigInteger(), nullable=True),
+        sa.Column('file_id', sa.String(length=255), nullable=False),
+        sa.Column('file_name', sa.String(length=500), nullable=True),
+        sa.Column('file_extension', sa.String(length=20), nullable=True),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('job_id', name='file_jobs_pkey')
+    )
+    op.create_index('idx_file_job_user_id', 'file_jobs', ['user_id'], unique=False)
+
+    op.create_table(
+        'file_job_chunks',
+        sa.Column('job_id', sa.String(length=32), nullable=False),
+        sa.Column('chunk_index', sa.Integer(), nullable=False),
+        sa.Column('chunk_hash', sa.String(length=64), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['file_jobs.job_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('job_id', 'chunk_index', name='file_job_chunks_pkey')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - file job jadvallarini o'chirish."""
+    op.drop_table('file_job_chunks')
+    op.drop_index('idx_file_job_user_id', table_name='file_jobs')
+    op.drop_table('file_jobs')
@@ -0,0 +1,60 @@
+"""add broadcasts and unreachable chats
+
+Revision ID: c41f8e2d7a96
+Revises: a7d3e91c5b20
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8e2d7a96'
+down_revision: Union[str, None] = 'a7d3e91c5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - broadcast'lar, yetkazish holati va unreachable chatlar."""
+    op.create_table(
+        'broadcasts',
+        sa.Column('broadcast_id', sa.String(length=32), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('created_by', sa.BigInteger(), nullable=False),
+        sa.Column('admin_chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('broadcast_id', name='broadcasts_pkey')
+    )
+
+    op.create_table(
+        'broadcast_recipients',
+        sa.Column('broadcast_id', sa.String(length=32), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('error', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(['broadcast_id'], ['broadcasts.broadcast_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('broadcast_id', 'chat_id', name='broadcast_recipients_pkey')
+    )
+    op.create_index('idx_broadcast_recipient_status', 'broadcast_recipients', ['broadcast_id', 'status'], unique=False)
+
+    op.create_table(
+        'unreachable_chats',
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('reason', sa.String(length=255), nullable=True),
+        sa.Column('marked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('chat_id', name='unreachable_chats_pkey')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - broadcast jadvallarini o'chirish."""
+    op.drop_table('unreachable_chats')
+    op.drop_index('idx_broadcast_recipient_status', table_name='broadcast_recipients')
+    op.drop_table('broadcast_recipients')
+    op.drop_table('broadcasts')
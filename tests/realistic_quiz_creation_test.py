@@ -100,7 +100,7 @@ async def simulate_realistic_quiz_creation(application: Application, chat_id: in
         )
         
         # 2. Premium/quota tekshiruvi (haqiqiy jarayonda)
-        can_create, error_msg = can_create_quiz(user_id)
+        can_create, error_msg = await can_create_quiz(user_id)
         if not can_create:
             response_time = time.time() - start_time
             result.add_result(False, response_time, error_msg, is_quota_error=True)
@@ -125,7 +125,7 @@ async def simulate_realistic_quiz_creation(application: Application, chat_id: in
         saved_quiz = storage.get_quiz(quiz_id)
         if saved_quiz and saved_quiz.get('quiz_id') == quiz_id:
             # 6. User plan tekshiruvi (statistika uchun)
-            plan = get_user_plan(user_id)
+            plan = await get_user_plan(user_id)
             
             response_time = time.time() - start_time
             result.add_result(True, response_time)
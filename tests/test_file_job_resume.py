@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fayl tahlili checkpoint testi - bot to'xtaganda ish DB'da qoladi va
+`resume_file_jobs` uni qayta navbatga qo'yadi; /cancel esa ishni o'chiradi
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot.handlers.quiz as quiz_handlers
+from bot.models.async_storage import AsyncStorage
+from bot.models.storage import Storage
+from bot.services.ingestion_queue import IngestionQueue
+
+
+class FakeMessage:
+    def __init__(self, chat_id, message_id=1):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.edits = []
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+        return self
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        return FakeMessage(chat_id, message_id)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+        return FakeMessage(chat_id)
+
+
+class FakeContext:
+    def __init__(self):
+        self.user_data = {}
+
+
+class FakeContextTypes:
+    @staticmethod
+    def context(application, chat_id=None, user_id=None):
+        return FakeContext()
+
+
+class FakeApplication:
+    context_types = FakeContextTypes
+
+    def __init__(self):
+        self.bot = FakeBot()
+
+
+def _setup(monkeypatch, tmp_path):
+    store = AsyncStorage(Storage(str(tmp_path / "storage.json")), max_workers=1)
+    queue = IngestionQueue(workers=2)
+    started = []
+
+    async def fake_process(context, file_id, file_name, file_extension, status_msg, user_id, is_admin, job_id=None):
+        # tahlil davom etayotgan payt (AI so'rovi kutilmoqda)
+        started.append(job_id)
+        await store.save_file_job_chunk(job_id, 0, "hash0", {"questions": []})
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(quiz_handlers, "async_storage", store)
+    monkeypatch.setattr(quiz_handlers, "ingestion_queue", queue)
+    monkeypatch.setattr(quiz_handlers, "process_file_background", fake_process)
+    monkeypatch.setattr(quiz_handlers, "Message", FakeMessage)
+    return store, queue, started
+
+
+async def _start_job(store, job_id, user_id=42, chat_id=42):
+    await store.create_file_job(job_id, user_id, chat_id, "file-id", "test.pdf", ".pdf", 1024, True, 1)
+    status_msg = FakeMessage(chat_id)
+    position = await quiz_handlers.submit_file_job(
+        FakeContext(), job_id, "file-id", "test.pdf", ".pdf", 1024, status_msg, user_id, True
+    )
+    assert position == 0
+    await asyncio.sleep(0.05)
+    return status_msg
+
+
+def test_shutdown_keeps_checkpoint_and_resume_requeues(monkeypatch, tmp_path):
+    store, queue, started = _setup(monkeypatch, tmp_path)
+
+    async def scenario():
+        status_msg = await _start_job(store, "job1")
+        assert started == ["job1"]
+
+        assert await queue.stop() == 1
+        assert not any("bekor qilindi" in text for text in status_msg.edits)
+        jobs = await store.get_pending_file_jobs()
+        assert [job["job_id"] for job in jobs] == ["job1"]
+        assert 0 in await store.get_file_job_chunks("job1")
+
+        # qayta ishga tushish: yangi navbat, checkpoint'dagi ish davom ettiriladi
+        resumed_queue = IngestionQueue(workers=2)
+        monkeypatch.setattr(quiz_handlers, "ingestion_queue", resumed_queue)
+        assert await quiz_handlers.resume_file_jobs(FakeApplication()) == 1
+        await asyncio.sleep(0.05)
+        assert started == ["job1", "job1"]
+        assert resumed_queue.stats()["running"] == 1
+        await resumed_queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_user_cancel_deletes_checkpoint(monkeypatch, tmp_path):
+    store, queue, started = _setup(monkeypatch, tmp_path)
+
+    async def scenario():
+        status_msg = await _start_job(store, "job2", user_id=7, chat_id=7)
+        assert queue.cancel_user(7) == 1
+        await asyncio.sleep(0.05)
+        assert status_msg.edits[-1] == "❌ Jarayon bekor qilindi."
+        assert await store.get_pending_file_jobs() == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+json_stream testi - bo'laklarga bo'lingan AI javobini oqim bo'yicha o'qish va
+kesilgan javobni tuzatish
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.services.json_stream import QuestionStreamParser, find_json_dict
+
+RESPONSE = {
+    "title": "Fizika \"asoslari\"",
+    "questions": [
+        {"question": "Qavslar {ichida} [bor]?", "options": ["ha", "yo'q"], "correct_answer": 0},
+        {"question": "Yo'l: C:\\temp va \"iqtibos\"", "options": ["} ]", "\\"], "correct_answer": 1},
+        {"question": "Oxirgi savol", "options": ["1", "2", "3"], "correct_answer": 2},
+    ],
+}
+
+
+def _feed_in_chunks(text, cuts):
+    parser = QuestionStreamParser()
+    emitted = []
+    prev = 0
+    for cut in list(cuts) + [len(text)]:
+        emitted.extend(parser.feed(text[prev:cut]))
+        prev = cut
+    return parser, emitted
+
+
+def test_stream_parser_handles_chunks_split_mid_string_and_mid_escape():
+    text = json.dumps(RESPONSE, ensure_ascii=False)
+    mid_string = text.index("ichida") + 3
+    mid_escape = text.index("\\\\temp") + 1  # "\\" juftligi o'rtasida
+    mid_quote_escape = text.index('\\"iqtibos') + 1  # \" o'rtasida
+    key_split = text.index('"questions"') + 5
+    cuts = sorted([key_split, mid_string, mid_escape, mid_quote_escape])
+
+    parser, emitted = _feed_in_chunks(text, cuts)
+
+    assert emitted == RESPONSE["questions"]
+    assert parser.questions == RESPONSE["questions"]
+    assert parser.title == RESPONSE["title"]
+    assert parser.finished
+
+
+def test_stream_parser_one_char_at_a_time():
+    text = json.dumps(RESPONSE, ensure_ascii=False)
+    parser, emitted = _feed_in_chunks(text, range(1, len(text)))
+    assert emitted == RESPONSE["questions"]
+    assert parser.title == RESPONSE["title"]
+    assert parser.finished
+
+
+def test_find_json_dict_repairs_truncated_output():
+    text = json.dumps(RESPONSE, ensure_ascii=False)
+    # max_tokens'da uchinchi savol o'rtasida kesilgan javob
+    truncated = "Mana natija:\n" + text[:text.index("Oxirgi") + 3]
+
+    result = find_json_dict(truncated)
+
+    assert result is not None
+    assert result["title"] == RESPONSE["title"]
+    assert result["questions"] == RESPONSE["questions"][:2]
+
+
+def test_find_json_dict_prefers_complete_outer_object():
+    text = 'Javob: "izoh" ' + json.dumps(RESPONSE) + " tamom"
+    assert find_json_dict(text) == RESPONSE
+    assert find_json_dict("json yo'q") is None
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QuestionScheduler testi - bekor qilingan / qayta rejalangan yozuvlar (lazy deletion)
+tartibni buzmasligi
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.services.question_scheduler import QuestionScheduler
+
+
+def _callback(fired, name):
+    async def callback():
+        fired.append(name)
+    return callback
+
+
+def test_cancelled_and_rescheduled_entries_are_skipped_in_due_order():
+    scheduler = QuestionScheduler()  # loop yo'q - runner ishga tushmaydi
+    fired = []
+
+    scheduler.schedule("a", 50, _callback(fired, "a"))
+    scheduler.schedule("b", 20, _callback(fired, "b"))
+    scheduler.schedule("c", 30, _callback(fired, "c"))
+    scheduler.schedule("d", 40, _callback(fired, "d"))
+    scheduler.schedule("a", 10, _callback(fired, "a2"))  # eski (50) yozuv heap'da qoladi
+    assert scheduler.cancel("c")
+    assert not scheduler.cancel("c")
+    assert len(scheduler) == 3
+    assert scheduler.due_at("a") == 10
+
+    for callback in scheduler._pop_due(35):
+        asyncio.run(callback())
+    assert fired == ["a2", "b"]
+
+    for callback in scheduler._pop_due(100):
+        asyncio.run(callback())
+    assert fired == ["a2", "b", "d"]
+    assert len(scheduler) == 0
+
+
+def test_runner_fires_in_due_order_and_skips_cancelled():
+    async def scenario():
+        scheduler = QuestionScheduler()
+        fired = []
+        now = time.time()
+        scheduler.schedule("a", now + 0.15, _callback(fired, "a"))
+        scheduler.schedule("b", now + 0.05, _callback(fired, "b"))
+        scheduler.schedule("c", now + 0.10, _callback(fired, "c"))
+        scheduler.schedule("a", now + 0.02, _callback(fired, "a2"))
+        scheduler.cancel("c")
+
+        await asyncio.sleep(0.3)
+        await scheduler.shutdown()
+        return fired, scheduler.fired
+
+    fired, count = asyncio.run(scenario())
+    assert fired == ["a2", "b"]
+    assert count == 2
+
+
+def test_shutdown_cancels_running_callbacks():
+    async def scenario():
+        scheduler = QuestionScheduler()
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        scheduler.schedule("a", time.time(), slow)
+        await asyncio.sleep(0.05)
+        assert len(scheduler._callbacks) == 1
+        await scheduler.shutdown()
+        return cancelled, len(scheduler._callbacks)
+
+    cancelled, remaining = asyncio.run(scenario())
+    assert cancelled == [True]
+    assert remaining == 0
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QuizCache testi - LRU + TTL chiqarib tashlash va versiya orqali invalidatsiya
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot.models.quiz_cache as quiz_cache_module
+from bot.models.quiz_cache import QuizCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def _quiz(quiz_id):
+    return {"quiz_id": quiz_id, "questions": [{"question": "?", "options": ["a", "b"]}]}
+
+
+def test_lru_evicts_least_recently_used_and_ttl_expires(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(quiz_cache_module, "time", clock)
+    cache = QuizCache(max_size=2, ttl_seconds=60)
+
+    cache.put("q1", _quiz("q1"), cache.version("q1"))
+    cache.put("q2", _quiz("q2"), cache.version("q2"))
+    assert cache.get("q1") is not None  # q1 endi eng yangi
+    cache.put("q3", _quiz("q3"), cache.version("q3"))
+
+    assert cache.get("q2") is None
+    assert cache.get("q1")["quiz_id"] == "q1"
+    assert cache.get("q3")["quiz_id"] == "q3"
+
+    clock.now += 61
+    assert cache.get("q1") is None
+    assert cache.get("q3") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_put_with_stale_version_is_ignored_after_invalidate():
+    cache = QuizCache(max_size=8, ttl_seconds=60)
+
+    # DB o'qish boshlandi, shu payt quiz tahrirlandi
+    version = cache.version("q1")
+    cache.invalidate("q1")
+    cache.put("q1", _quiz("q1"), version)
+    assert cache.get("q1") is None
+
+    cache.put("q1", _quiz("q1"), cache.version("q1"))
+    assert cache.get("q1") is not None
+    cache.invalidate("q1")
+    assert cache.get("q1") is None
+
+
+def test_get_returns_copy():
+    cache = QuizCache(max_size=8, ttl_seconds=60)
+    cache.put("q1", _quiz("q1"), cache.version("q1"))
+
+    copy = cache.get("q1")
+    copy["questions"][0]["options"].append("c")
+    assert cache.get("q1")["questions"][0]["options"] == ["a", "b"]
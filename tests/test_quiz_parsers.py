@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Algoritmik parserlar testi - split_parsed_and_residue (tilde, GIFT, harfli variantlar)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.utils.validators import split_parsed_and_residue
+
+
+def _questions(text):
+    parsed, residue = split_parsed_and_residue(text)
+    return [q for _, q in parsed], residue
+
+
+def test_gift_inline_and_multiline_blocks_keep_correct_answer():
+    text = (
+        "O'zbekiston poytaxti qaysi? { =Toshkent ~Samarqand ~Buxoro ~Xiva }\n"
+        "\n"
+        "2+2 nechaga teng? {\n"
+        "~3\n"
+        "=4\n"
+        "~5\n"
+        "}\n"
+    )
+    questions, residue = _questions(text)
+
+    assert residue == []
+    assert questions[0] == {
+        "question": "O'zbekiston poytaxti qaysi?",
+        "options": ["Toshkent", "Samarqand", "Buxoro", "Xiva"],
+        "correct_answer": 0,
+        "explanation": "",
+    }
+    assert questions[1]["options"] == ["3", "4", "5"]
+    assert questions[1]["correct_answer"] == 1
+
+
+def test_lettered_inline_marks_are_stripped_and_numbering_removed():
+    text = (
+        "1) O'zbekiston poytaxti qaysi?\n"
+        "A) Samarqand\n"
+        "B) Toshkent *\n"
+        "C) Buxoro\n"
+        "\n"
+        "2) 2+2 nechaga teng?\n"
+        "A) 3\n"
+        "B) 5\n"
+        "C) 4 +\n"
+        "\n"
+        "3. Qaysi til C oilasiga kiradi?\n"
+        "A) C++\n"
+        "B) Haskell\n"
+    )
+    questions, residue = _questions(text)
+
+    assert residue == []
+    assert [q["question"] for q in questions] == [
+        "O'zbekiston poytaxti qaysi?",
+        "2+2 nechaga teng?",
+        "Qaysi til C oilasiga kiradi?",
+    ]
+    assert questions[0]["options"] == ["Samarqand", "Toshkent", "Buxoro"]
+    assert questions[0]["correct_answer"] == 1
+    assert questions[1]["options"] == ["3", "5", "4"]
+    assert questions[1]["correct_answer"] == 2
+    # "C++" - belgi emas, variant matnining o'zi
+    assert questions[2]["options"] == ["C++", "Haskell"]
+    assert questions[2]["correct_answer"] is None
+
+
+def test_tilde_block_with_unrecognised_line_goes_to_residue():
+    text = (
+        "Savol 1: Quyosh qaysi yulduz turiga kiradi?\n"
+        "~ Sariq mitti\n"
+        "~ Qizil gigant\n"
+        "~ Oq mitti\n"
+        "\n"
+        "Qaysi biri sut emizuvchi?\n"
+        "~ Kit\n"
+        "~ Akula\n"
+        "Izoh: kit sut emizuvchi, bu satr tanilmaydi\n"
+        "~ Losos\n"
+    )
+    questions, residue = _questions(text)
+
+    assert [q["question"] for q in questions] == ["Quyosh qaysi yulduz turiga kiradi?"]
+    assert len(residue) == 1
+    _, span = residue[0]
+    assert span.startswith("Qaysi biri sut emizuvchi?")
+    assert "Izoh:" in span and span.endswith("~ Losos")
+
+
+def test_multiple_marks_are_not_confident():
+    text = (
+        "Qaysilari juft son? { =2 =4 ~3 }\n"
+        "\n"
+        "Qaysi biri rang? { =Qizil ~Stol ~Kitob }\n"
+    )
+    questions, residue = _questions(text)
+
+    assert [q["question"] for q in questions] == ["Qaysi biri rang?"]
+    assert questions[0]["correct_answer"] == 0
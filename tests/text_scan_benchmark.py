@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Text Scan Benchmark - quick_has_quiz_patterns va sanitize_ai_input tezligi
+(eski ko'p-regexli versiya va yangi bitta o'tishli skaner solishtiriladi)
+"""
+import re
+import sys
+import os
+import time
+from datetime import datetime
+from typing import Callable
+
+# Bot kodini import qilish
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.utils.validators import quick_has_quiz_patterns, sanitize_ai_input, scan_quiz_features
+
+
+def legacy_quick_has_quiz_patterns(text: str) -> bool:
+    """Eski versiya: har bir pattern uchun alohida re.search"""
+    if not text:
+        return False
+    sample = text[:12000]
+    has_q = bool(re.search(r"(^|\n)\s*\d{1,3}[).:\-]\s+\S", sample))
+    has_q_dot = bool(re.search(r"(^|\n)\s*\d{1,3}\.\s+\S", sample))
+    has_qmark = "?" in sample
+    has_savol = bool(re.search(r"(^|\n)\s*(?:savol|question|вопрос|سؤال)\s*\d{1,3}\b", sample, re.IGNORECASE))
+    has_q_word = bool(re.search(r"(^|\n)\s*(?:savol|question|вопрос|سؤال)\s*[:\-]?\s*\S", sample, re.IGNORECASE))
+    has_opts_letter = bool(re.search(r"(^|\n)\s*[A-Za-z][).:\-]\s+\S", sample))
+    has_opts_number = bool(re.search(r"(^|\n)\s*[1-9]\d{0,2}[).:\-]\s+\S", sample))
+    has_opts_roman = bool(re.search(r"(^|\n)\s*[ivxlcdmIVXLCDM]+[).:\-]\s+\S", sample))
+    has_tilde_opts = bool(re.search(r"(^|\n)\s*~\s+\S", sample))
+    has_dash_opts = bool(re.search(r"(^|\n)\s*[-–—]\s+\S", sample))
+    has_asterisk_opts = bool(re.search(r"(^|\n)\s*\*\s+\S", sample))
+    has_bullet_opts = bool(re.search(r"(^|\n)\s*[•·▪▫]\s+\S", sample))
+    has_markdown = bool(re.search(r"(^|\n)\s*\d+\.\s+\*\*.*\?\*\*", sample))
+    has_html = bool(re.search(r"<[ou]l>|<li>", sample, re.IGNORECASE))
+    has_question_pattern = has_q or has_q_dot or has_qmark or has_savol or has_q_word or has_markdown
+    has_option_pattern = (
+        has_opts_letter or has_opts_number or has_opts_roman or has_tilde_opts or
+        has_dash_opts or has_asterisk_opts or has_bullet_opts or has_html
+    )
+    return has_question_pattern and has_option_pattern
+
+
+def legacy_sanitize_ai_input(text: str, max_chars: int = 35000) -> str:
+    """Eski versiya: har bir satr uchun 7 ta regex"""
+    text = (text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    keep = []
+    for line in text.splitlines():
+        if (
+            re.search(r"^\s*\d{1,3}[).]\s+\S", line)
+            or re.search(r"^\s*[A-Da-d][).]\s+\S", line)
+            or re.search(r"^\s*~\s+\S", line)
+            or re.search(r"^\s*savol\s*\d{1,3}\b", line, re.IGNORECASE)
+            or re.search(r"\b(javoblar|javob|to'g'ri\s+javob|answer|answers|key)\b", line, re.IGNORECASE)
+            or re.search(r"\b\d{1,3}\s*[-:=]\s*[A-Da-d]\b", line)
+            or re.search(r"\b\d{1,3}\s*[-:=]\s*\d{1,3}\b", line)
+            or "?" in line
+        ):
+            keep.append(line)
+        if sum(len(x) + 1 for x in keep) >= max_chars:
+            break
+    compact = "\n".join(keep).strip()
+    if len(compact) >= 200:
+        return compact[:max_chars]
+    return text[:max_chars]
+
+
+def build_document(target_bytes: int) -> str:
+    """Test hujjati: izoh paragraflari, savollar, variantlar va javoblar kaliti"""
+    parts = []
+    size = 0
+    n = 0
+    while size < target_bytes:
+        n += 1
+        block = (
+            f"Mavzu bo'yicha izoh {n}: bu paragraf oddiy matn, unda savol belgilari yo'q va u "
+            f"AI uchun kerak emas, lekin hujjatda uchraydi.\n\n"
+            f"{n}) Hujayraning {n}-qismi qanday vazifani bajaradi?\n"
+            f"A) Energiya ishlab chiqaradi\n"
+            f"B) Oqsil sintez qiladi\n"
+            f"C) Moddalarni tashiydi\n"
+            f"D) Irsiy axborotni saqlaydi\n\n"
+        )
+        parts.append(block)
+        size += len(block.encode('utf-8'))
+    parts.append("Javoblar: " + ", ".join(f"{i}-A" for i in range(1, n + 1)) + "\n")
+    return "".join(parts)
+
+
+def bench(fn: Callable, arg: str, rounds: int) -> float:
+    """O'rtacha bajarilish vaqti (millisekund)"""
+    fn(arg)  # isitish (re cache)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(arg)
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def run_benchmark(size_kb: int, rounds: int):
+    document = build_document(size_kb * 1024)
+    # Qisqartirish ishlashi uchun max_chars hujjatdan kichik bo'lishi kerak
+    max_chars = min(35000, len(document) // 2)
+
+    print(f"\n{'='*60}")
+    print("🚀 Text Scan Benchmark")
+    print(f"{'='*60}")
+    print(f"📄 Hujjat hajmi: {len(document.encode('utf-8')) / 1024:.1f} KB ({len(document.splitlines())} satr)")
+    print(f"🔁 Takrorlar: {rounds}")
+    print(f"⏰ Vaqt: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    assert quick_has_quiz_patterns(document) == legacy_quick_has_quiz_patterns(document)
+
+    cases = [
+        ("quick_has_quiz_patterns", legacy_quick_has_quiz_patterns, quick_has_quiz_patterns),
+        ("sanitize_ai_input", lambda t: legacy_sanitize_ai_input(t, max_chars), lambda t: sanitize_ai_input(t, max_chars)),
+    ]
+    for name, old_fn, new_fn in cases:
+        old_ms = bench(old_fn, document, rounds)
+        new_ms = bench(new_fn, document, rounds)
+        print(f"⏱️  {name}:")
+        print(f"   • Eski: {old_ms:.3f} ms")
+        print(f"   • Yangi: {new_ms:.3f} ms")
+        print(f"   • Tezlashish: {old_ms / max(new_ms, 1e-9):.1f}x\n")
+
+    features_ms = bench(scan_quiz_features, document, rounds)
+    print(f"🔎 scan_quiz_features (butun hujjat): {features_ms:.3f} ms")
+    print(f"   {scan_quiz_features(document)}")
+
+    print(f"\n{'='*60}")
+    print("✅ Benchmark yakunlandi!")
+    print(f"{'='*60}\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Text Scan Benchmark')
+    parser.add_argument('--size-kb', type=int, default=200, help='Hujjat hajmi KB da (default: 200)')
+    parser.add_argument('--rounds', type=int, default=20, help='Takrorlar soni (default: 20)')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.size_kb, args.rounds)